@@ -193,14 +193,20 @@ from onetick.py.sources import (Tick, TTicks, Ticks, Orders, Trades, NBBO, Quote
                                 ObSnapshot, ObSnapshotWide, ObSnapshotFlat, ObSummary, ObSize, ObVwap, ObNumLevels,
                                 by_symbol, ODBC, SplitQueryOutputBySymbol, DataFile, PointInTime, RefData,
                                 ReadSnapshot, ShowSnapshotList, FindSnapshotSymbols,
-                                ReadFromDataFrame, LoadTicksFromDataFrame, ReadFromKdb)
+                                ReadFromDataFrame, LoadTicksFromDataFrame, ReadFromKdb, SymbolListFile)
 from onetick.py.utils import adaptive, range, perf
 from onetick.py.session import Session, TestSession, Config, Locator, HTTPSession
 from onetick.py.servers import RemoteTS, LoadBalancing, FaultTolerance
 from onetick.py.db import DB, RefDB
 from onetick.py.db._inspection import databases, derived_databases
 from onetick.py.cache import create_cache, delete_cache, modify_cache_config
-from onetick.py import state
+from onetick.py.result_cache import ResultCache
+from onetick.py.incremental import IncrementalRunner
+from onetick.py.cache_promoter import CachePromoter
+from onetick.py.autotuner import Autotuner
+from onetick.py.hedging import HedgedExecutor
+from onetick.py.build_profiler import profile_build
+from onetick.py import state, tracing, session_pool
 from onetick.py.core.source import Source, MetaFields
 from onetick.py.core.multi_output_source import MultiOutputSource
 from onetick.py.core.eval_query import eval
@@ -213,9 +219,10 @@ from onetick.py.core.per_tick_script import (
     tick_deque_tick,
     dynamic_tick,
 )
-from onetick.py.callback import CallbackBase
+from onetick.py.callback import CallbackBase, CEPConsumer
 from onetick.py.sql import SqlQuery
 from onetick.py.run import run, run_async
+from onetick.py.result_writer import ResultWriterCallback, run_to_parquet, run_to_arrow_dataset
 from onetick.py.math import rand, now
 from onetick.py.misc import (
     bit_and, bit_or, bit_at, bit_xor, bit_not,
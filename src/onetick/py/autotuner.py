@@ -0,0 +1,324 @@
+import json
+import math
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+from onetick import py as otp
+from onetick.py import configuration, utils
+
+
+# number of the last runs of each query used for the decisions
+_HISTORY_SIZE = 20
+# maximum number of queries in the statistics file, least recently used are removed
+_MAX_QUERIES = 1000
+# preallocation hint is a bit bigger than the maximum observed number of ticks
+_TICKS_HINT_MARGIN = 1.2
+
+
+def _peak_rss() -> Optional[int]:
+    """
+    Peak resident set size of the process since its start in bytes or None if it can't be measured.
+
+    It's the high-water mark of the whole process, not of the single query.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux and other systems
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _result_stats(result) -> tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    Returns the number of symbols, ticks per symbol and the size of the result in bytes.
+    """
+    if isinstance(result, pd.DataFrame):
+        dfs = [result]
+    elif isinstance(result, dict) and all(isinstance(df, pd.DataFrame) for df in result.values()):
+        dfs = list(result.values())
+    else:
+        return None, None, None
+    ticks = [len(df) for df in dfs]
+    size = int(sum(df.memory_usage(index=False, deep=False).sum() for df in dfs))
+    return len(dfs), max(ticks, default=0), size
+
+
+def _symbols_count(symbols) -> Optional[int]:
+    if symbols is None or isinstance(symbols, str):
+        return 1
+    if isinstance(symbols, (list, tuple)):
+        return len(symbols)
+    return None
+
+
+@dataclass
+class AutotuneDecision:
+    """
+    Parameters of :py:func:`otp.run <onetick.py.run>` chosen by :py:class:`otp.Autotuner <onetick.py.Autotuner>`.
+    """
+    #: fingerprint of the query
+    fingerprint: str
+    #: chosen parameters, only the ones that were not set by the user
+    params: dict = field(default_factory=dict)
+    #: explanation of the decisions
+    reasons: list = field(default_factory=list)
+
+
+class Autotuner:
+    """
+    Chooses ``concurrency``, ``batch_size`` and ``max_expected_ticks_per_symbol`` parameters
+    of :py:func:`otp.run <onetick.py.run>` based on the statistics of the previous runs of the same query.
+
+    For each query (identified by the hash of its graph, so time range and symbols are not taken into account)
+    the number of symbols, the number of ticks per symbol, the execution time and the size of the result are recorded.
+    Statistics are saved to the local file and reused between python processes.
+
+    The decisions are:
+
+    * ``max_expected_ticks_per_symbol`` is set to the maximum observed number of ticks per symbol plus a margin,
+      so the memory for the result is preallocated at once.
+    * ``concurrency`` for multi-symbol queries is found by trying increasing values (1, 2, 4, ...)
+      until the execution time per symbol stops improving.
+    * ``batch_size`` is limited so that the result of one batch of symbols fits in ``memory_limit`` bytes.
+
+    Parameters explicitly passed to :py:func:`otp.run <onetick.py.run>` are never changed.
+    Only :py:class:`onetick.py.Source` queries are tuned.
+
+    Parameters
+    ----------
+    path: str, optional
+        Path to the statistics file.
+        By default, :py:attr:`otp.config.autotuner_stats_file<onetick.py.configuration.Config.autotuner_stats_file>`
+        is used.
+    max_concurrency: int, optional
+        Maximum value of ``concurrency``. By default, the number of cores of the local machine is used.
+    memory_limit: int
+        Maximum size of the result of one batch of symbols in bytes.
+
+    See also
+    --------
+    ``autotune`` parameter of :py:func:`otp.run <onetick.py.run>`
+
+    Examples
+    --------
+    >>> tuner = otp.Autotuner()
+    >>> data = otp.DataSource('US_COMP', tick_type='TRD')
+    >>> for _ in range(3):
+    ...     df = otp.run(data, symbols=['AAPL', 'MSFT', 'IBM', 'ORCL'], autotune=tuner,  # doctest: +SKIP
+    ...                  date=otp.dt(2024, 2, 1))
+    >>> tuner.last_decision  # doctest: +SKIP
+    AutotuneDecision(fingerprint='4f0c...', params={'max_expected_ticks_per_symbol': 540120, 'concurrency': 4},
+                     reasons=['max_expected_ticks_per_symbol=540120: up to 450100 ticks per symbol in 2 runs',
+                              'concurrency=4: exploring, concurrency 2 was the fastest so far (0.41 s per symbol)'])
+    """
+
+    _default: Optional['Autotuner'] = None
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 max_concurrency: Optional[int] = None,
+                 memory_limit: int = 1024 ** 3):
+        self.path = path or otp.config.autotuner_stats_file
+        self.max_concurrency = max_concurrency or utils.get_local_number_of_cores()
+        self.memory_limit = memory_limit
+        self._lock = threading.Lock()
+        self._stats: Optional[dict] = None
+        self.last_decision: Optional[AutotuneDecision] = None
+
+    @classmethod
+    def get_default(cls) -> 'Autotuner':
+        """
+        Autotuner used when ``autotune=True`` is passed to :py:func:`otp.run <onetick.py.run>`.
+        """
+        if cls._default is None or cls._default.path != otp.config.autotuner_stats_file:
+            cls._default = cls()
+        return cls._default
+
+    def run(self, query, **kwargs):
+        """
+        Run the query with :py:func:`otp.run <onetick.py.run>` using the tuned parameters
+        and record its statistics.
+
+        Parameters
+        ----------
+        query:
+            Query to run.
+        kwargs:
+            Parameters of :py:func:`otp.run <onetick.py.run>`.
+        """
+        kwargs.pop('autotune', None)
+        if not isinstance(query, otp.Source) or kwargs.get('running'):
+            return self._run(query, kwargs)
+        fingerprint = query._fingerprint()
+        symbols = _symbols_count(kwargs.get('symbols'))
+        decision = self.decide(fingerprint, symbols, kwargs)
+        kwargs.update(decision.params)
+        self.last_decision = decision
+        if decision.params:
+            otp.get_logger(__name__).info(f'Autotuner decisions: {"; ".join(decision.reasons)}')
+
+        start_time = time.perf_counter()
+        result = self._run(query, kwargs)
+        wall_time = time.perf_counter() - start_time
+
+        result_symbols, max_ticks, size = _result_stats(result)
+        concurrency = kwargs.get('concurrency', utils.default)
+        if concurrency is utils.default:
+            concurrency = configuration.default_query_concurrency()
+        self._record(fingerprint, {
+            'symbols': result_symbols or symbols,
+            'max_ticks_per_symbol': max_ticks,
+            'result_size': size,
+            'wall_time': wall_time,
+            # the difference of the high-water marks is 0 after the first large run, so the mark itself is saved
+            'process_peak_rss': _peak_rss(),
+            'concurrency': concurrency,
+            'time': time.time(),
+        })
+        return result
+
+    def decide(self, fingerprint: str, symbols: Optional[int] = None,
+               kwargs: Optional[dict] = None) -> AutotuneDecision:
+        """
+        Choose the parameters for the next run of the query.
+
+        Parameters
+        ----------
+        fingerprint: str
+            Fingerprint of the query.
+        symbols: int, optional
+            Number of symbols the query will be run for. By default, the number from the last run is used.
+        kwargs: dict, optional
+            Parameters of :py:func:`otp.run <onetick.py.run>` set by the user, they are not changed.
+        """
+        kwargs = kwargs or {}
+        decision = AutotuneDecision(fingerprint)
+        runs = self._load().get(fingerprint, {}).get('runs', [])
+        if not runs:
+            decision.reasons.append('no statistics for the query yet')
+            return decision
+        if symbols is None:
+            symbols = runs[-1]['symbols']
+
+        def is_set(name):
+            return kwargs.get(name, utils.default) not in (utils.default, None)
+
+        ticks = [run['max_ticks_per_symbol'] for run in runs if run.get('max_ticks_per_symbol') is not None]
+        if ticks and not is_set('max_expected_ticks_per_symbol'):
+            hint = max(1, math.ceil(max(ticks) * _TICKS_HINT_MARGIN))
+            decision.params['max_expected_ticks_per_symbol'] = hint
+            decision.reasons.append(f'max_expected_ticks_per_symbol={hint}: '
+                                    f'up to {max(ticks)} ticks per symbol in {len(ticks)} runs')
+
+        if symbols and symbols > 1 and not is_set('concurrency'):
+            concurrency, reason = self._choose_concurrency(runs, symbols)
+            if concurrency is not None:
+                decision.params['concurrency'] = concurrency
+                decision.reasons.append(f'concurrency={concurrency}: {reason}')
+
+        sizes = [run['result_size'] / run['symbols'] for run in runs if run.get('result_size') and run.get('symbols')]
+        if sizes and symbols and symbols > 1 and not is_set('batch_size'):
+            size_per_symbol = max(sizes)
+            if size_per_symbol * symbols > self.memory_limit:
+                batch_size = max(1, int(self.memory_limit // size_per_symbol))
+                decision.params['batch_size'] = batch_size
+                decision.reasons.append(f'batch_size={batch_size}: up to {int(size_per_symbol)} bytes per symbol, '
+                                        f'memory limit is {self.memory_limit} bytes')
+        return decision
+
+    def _choose_concurrency(self, runs: list, symbols: int) -> tuple[Optional[int], str]:
+        limit = max(1, min(symbols, self.max_concurrency))
+        times: dict[int, list] = {}
+        for run in runs:
+            if run.get('symbols', 0) > 1 and run.get('concurrency') is not None:
+                times.setdefault(run['concurrency'], []).append(run['wall_time'] / run['symbols'])
+        if not times:
+            return None, ''
+        mean_times = {concurrency: sum(values) / len(values) for concurrency, values in times.items()}
+        best = min(mean_times, key=mean_times.__getitem__)
+        # next value on the 1, 2, 4, ... ladder
+        candidate = 1
+        while candidate <= best:
+            candidate *= 2
+        candidate = min(candidate, limit)
+        if candidate > best and candidate not in mean_times:
+            return candidate, (f'exploring, concurrency {best} was the fastest so far '
+                               f'({mean_times[best]:.3g} s per symbol)')
+        if best > limit:
+            return limit, f'limited by the number of symbols and cores ({limit})'
+        return best, f'the fastest of the tried values {sorted(mean_times)} ({mean_times[best]:.3g} s per symbol)'
+
+    def report(self) -> pd.DataFrame:
+        """
+        Statistics of the recorded queries: number of runs, the last number of symbols,
+        the maximum number of ticks per symbol, the average execution time and the best ``concurrency``.
+        """
+        rows = []
+        for fingerprint, stats in self._load().items():
+            runs = stats['runs']
+            ticks = [run['max_ticks_per_symbol'] for run in runs if run.get('max_ticks_per_symbol') is not None]
+            fastest = min(runs, key=lambda run: run['wall_time'] / max(run.get('symbols') or 1, 1))
+            rows.append({
+                'FINGERPRINT': fingerprint,
+                'RUNS': len(runs),
+                'SYMBOLS': runs[-1].get('symbols'),
+                'MAX_TICKS_PER_SYMBOL': max(ticks) if ticks else None,
+                'AVG_WALL_TIME': sum(run['wall_time'] for run in runs) / len(runs),
+                'BEST_CONCURRENCY': fastest.get('concurrency'),
+            })
+        return pd.DataFrame(rows, columns=['FINGERPRINT', 'RUNS', 'SYMBOLS', 'MAX_TICKS_PER_SYMBOL',
+                                           'AVG_WALL_TIME', 'BEST_CONCURRENCY'])
+
+    def clear(self):
+        """
+        Remove all recorded statistics.
+        """
+        with self._lock:
+            self._stats = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    @staticmethod
+    def _run(query, kwargs):
+        # nested otp.run calls (e.g. from the result cache) must not be tuned again
+        with otp.config.override(autotune=False):
+            return otp.run(query, **kwargs)
+
+    def _load(self) -> dict:
+        with self._lock:
+            if self._stats is None:
+                self._stats = {}
+                try:
+                    with open(self.path) as f:
+                        self._stats = json.load(f)
+                except FileNotFoundError:
+                    pass
+                except (OSError, ValueError) as e:
+                    otp.get_logger(__name__).warning(f"Can't read autotuner statistics from {self.path}: {e}")
+            return self._stats
+
+    def _record(self, fingerprint: str, run: dict):
+        stats = self._load()
+        with self._lock:
+            entry = stats.pop(fingerprint, {'runs': []})
+            entry['runs'] = (entry['runs'] + [run])[-_HISTORY_SIZE:]
+            # the most recently used queries are in the end
+            stats[fingerprint] = entry
+            while len(stats) > _MAX_QUERIES:
+                del stats[next(iter(stats))]
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(stats, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                otp.get_logger(__name__).warning(f"Can't save autotuner statistics to {self.path}: {e}")
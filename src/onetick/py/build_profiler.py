@@ -0,0 +1,244 @@
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Literal, Optional
+
+import pandas as pd
+
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+# profile collecting the data at the moment, EPs and copies are reported to it
+_active: Optional['BuildProfile'] = None
+
+
+def _record(counter: str):
+    """
+    Report the creation of the EP (``counter='eps'``) or the copy of the source (``counter='copies'``)
+    to the active profile.
+    """
+    if _active is not None:
+        _active._record(counter)
+
+
+def _code_name(code) -> str:
+    # co_qualname is available since python 3.11
+    return getattr(code, 'co_qualname', code.co_name)
+
+
+def _called_name(frame) -> str:
+    code = frame.f_code
+    if code.co_argcount and code.co_varnames[0] == 'self':
+        # the class of the object is used, because many methods of the Source are defined in separate modules
+        return f"{type(frame.f_locals['self']).__name__}.{code.co_name}"
+    return _code_name(code)
+
+
+class _SiteStats:
+    __slots__ = ('calls', 'eps', 'copies', 'time')
+
+    def __init__(self):
+        self.calls = 0
+        self.eps = 0
+        self.copies = 0
+        self.time = 0.0
+
+
+class BuildProfile:
+    """
+    Statistics of the graph construction collected by :func:`otp.profile_build <onetick.py.profile_build>`.
+
+    The statistics are aggregated by the user code line calling onetick-py
+    and the onetick-py function called on this line.
+    Nested calls of onetick-py functions are attributed to the outermost call.
+    """
+
+    def __init__(self):
+        # (stack of user frames, called function) -> statistics
+        self._sites: dict[tuple, _SiteStats] = defaultdict(_SiteStats)
+        self._thread_id = threading.get_ident()
+        self._depth = 0
+        self._site: Optional[_SiteStats] = None
+        self._site_key: Optional[tuple] = None
+        self._start = 0.0
+        self._previous_profile = None
+
+    def _profile(self, frame, event, arg):
+        if event == 'call':
+            if self._depth:
+                self._depth += 1
+            elif frame.f_code.co_filename.startswith(_PACKAGE_DIR):
+                self._enter(frame)
+        elif event == 'return' and self._depth:
+            self._depth -= 1
+            if not self._depth:
+                self._site.time += time.perf_counter() - self._start  # type: ignore[union-attr]
+                self._site = None
+
+    def _enter(self, frame):
+        stack = []
+        user_frame = frame.f_back
+        while user_frame is not None and user_frame.f_code.co_filename.startswith(_PACKAGE_DIR):
+            user_frame = user_frame.f_back
+        while user_frame is not None:
+            code = user_frame.f_code
+            stack.append((code.co_filename, user_frame.f_lineno, _code_name(code)))
+            user_frame = user_frame.f_back
+        self._site_key = (tuple(reversed(stack)), _called_name(frame))
+        self._site = self._sites[self._site_key]
+        self._site.calls += 1
+        self._depth = 1
+        self._start = time.perf_counter()
+
+    def _record(self, counter):
+        if self._site is not None and threading.get_ident() == self._thread_id:
+            setattr(self._site, counter, getattr(self._site, counter) + 1)
+
+    def _start_profiling(self):
+        global _active
+        if _active is not None:
+            raise ValueError("otp.profile_build() can't be used inside of another otp.profile_build()")
+        _active = self
+        self._previous_profile = sys.getprofile()
+        sys.setprofile(self._profile)
+
+    def _stop_profiling(self):
+        global _active
+        sys.setprofile(self._previous_profile)
+        _active = None
+        if self._site is not None:
+            # the call of the profiler's context manager exit itself
+            self._site.calls -= 1
+            if not self._site.calls:
+                del self._sites[self._site_key]  # type: ignore[arg-type]
+        self._depth = 0
+        self._site = None
+
+    @property
+    def eps(self) -> int:
+        """Total number of created EPs."""
+        return sum(stats.eps for stats in self._sites.values())
+
+    @property
+    def copies(self) -> int:
+        """Total number of source copies."""
+        return sum(stats.copies for stats in self._sites.values())
+
+    @property
+    def time(self) -> float:
+        """Total time in seconds spent in onetick-py functions."""
+        return sum(stats.time for stats in self._sites.values())
+
+    def report(self, sort_by: str = 'TIME', ascending: bool = False) -> pd.DataFrame:
+        """
+        Returns the statistics per user code line and called onetick-py function.
+
+        Columns:
+
+        * ``FILE``, ``LINE``, ``FUNCTION`` - location of the user code calling onetick-py
+        * ``CALL`` - onetick-py function called on this line
+        * ``CALLS`` - number of calls
+        * ``EPS`` - number of EPs created
+        * ``COPIES`` - number of source copies
+        * ``TIME`` - time in seconds spent in onetick-py, including the overhead of the profiler
+
+        Parameters
+        ----------
+        sort_by: str
+            Column to sort the rows by.
+        ascending: bool
+            Sort in ascending order.
+        """
+        aggregated: dict[tuple, _SiteStats] = defaultdict(_SiteStats)
+        for (stack, call), stats in self._sites.items():
+            location = stack[-1] if stack else ('', 0, '')
+            total = aggregated[(*location, call)]
+            total.calls += stats.calls
+            total.eps += stats.eps
+            total.copies += stats.copies
+            total.time += stats.time
+        columns = ['FILE', 'LINE', 'FUNCTION', 'CALL', 'CALLS', 'EPS', 'COPIES', 'TIME']
+        if sort_by not in columns:
+            raise ValueError(f"Parameter 'sort_by' must be one of {columns}, got '{sort_by}'")
+        df = pd.DataFrame(
+            [(*key, stats.calls, stats.eps, stats.copies, stats.time) for key, stats in aggregated.items()],
+            columns=columns,
+        )
+        return df.sort_values(sort_by, ascending=ascending, kind='stable', ignore_index=True)
+
+    def flamegraph(self, metric: Literal['time', 'eps', 'copies', 'calls'] = 'time') -> str:
+        """
+        Returns the statistics in the collapsed stack format
+        used by `flamegraph.pl <https://github.com/brendangregg/FlameGraph>`_ and
+        `speedscope <https://www.speedscope.app>`_.
+
+        Each line contains the user code stack with the called onetick-py function on top
+        separated by semicolons, and the value of the ``metric``.
+        Time is reported in microseconds.
+        """
+        if metric not in ('time', 'eps', 'copies', 'calls'):
+            raise ValueError(f"Parameter 'metric' must be one of 'time', 'eps', 'copies', 'calls', got '{metric}'")
+        lines = []
+        for (stack, call), stats in self._sites.items():
+            value = getattr(stats, metric)
+            if metric == 'time':
+                value = round(value * 1e6)
+            if not value:
+                continue
+            frames = [f'{name} ({filename}:{line})' for filename, line, name in stack]
+            frames.append(f'onetick.py {call}')
+            # semicolons separate frames in this format
+            lines.append(';'.join(frame.replace(';', ':') for frame in frames) + f' {value}')
+        return '\n'.join(lines)
+
+    def save_flamegraph(self, path: str, metric: Literal['time', 'eps', 'copies', 'calls'] = 'time'):
+        """
+        Saves the output of :meth:`flamegraph` to the file ``path``.
+        """
+        with open(path, 'w') as f:
+            f.write(self.flamegraph(metric) + '\n')
+
+
+@contextmanager
+def profile_build():
+    """
+    Context manager profiling the construction of the queries in the current thread.
+
+    For each line of the user code calling onetick-py functions it counts the number of created EPs,
+    the number of source copies and the time spent in onetick-py.
+    Python profiling hook is used, so the code runs slower while it's profiled.
+
+    Returns
+    -------
+    :class:`~onetick.py.build_profiler.BuildProfile`
+
+    Examples
+    --------
+    >>> def strategy():
+    ...     data = otp.Tick(A=1)
+    ...     for i in range(100):
+    ...         data[f'B{i}'] = data['A'] + i
+    ...     return data.agg({'S': otp.agg.sum('A')})
+    >>> with otp.profile_build() as profile:
+    ...     data = strategy()
+    >>> profile.report(sort_by='EPS')[['FUNCTION', 'CALL', 'CALLS', 'EPS', 'COPIES']]  # doctest: +SKIP
+       FUNCTION              CALL  CALLS  EPS  COPIES
+    0  strategy  Tick.__setitem__    100  100       0
+    1  strategy          Tick.agg      1    2       6
+    2  strategy     Tick.__init__      1    1       0
+    3  strategy  Tick.__getitem__    100    0       0
+    4  strategy    Column.__add__    100    0       0
+    5  strategy               sum      1    0       0
+
+    Save the flamegraph to visualize it with ``flamegraph.pl`` or https://www.speedscope.app:
+
+    >>> profile.save_flamegraph('build.folded', metric='eps')  # doctest: +SKIP
+    """
+    profile = BuildProfile()
+    profile._start_profiling()
+    try:
+        yield profile
+    finally:
+        profile._stop_profiling()
@@ -0,0 +1,218 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from onetick import py as otp
+from onetick.py import utils
+from onetick.py.cache import create_cache, delete_cache
+
+
+@dataclass
+class _SubgraphStats:
+    uses: int = 0
+    cache_name: Optional[str] = None
+    # promotion failed, e.g. the query can't be cached on the remote server
+    not_cacheable: bool = False
+    uncached_runs: int = 0
+    uncached_time: float = 0.0
+    cached_runs: int = 0
+    cached_time: float = 0.0
+
+    @property
+    def saved_time(self) -> float:
+        if not self.uncached_runs or not self.cached_runs:
+            return 0.0
+        return self.cached_runs * self.uncached_time / self.uncached_runs - self.cached_time
+
+
+class CachePromoter:
+    """
+    Automatically promotes frequently executed queries and subgraphs into OneTick caches.
+
+    The promoter counts how many times structurally identical sources
+    (with the same event processors and parameters, but possibly different time ranges) are used.
+    When the number of usages of the source reaches ``threshold``,
+    the cache is created for it with :py:func:`otp.create_cache <onetick.py.create_cache>`,
+    and the next usages of the source are replaced with :py:class:`otp.ReadCache <onetick.py.ReadCache>`
+    reading the same time range from the cache.
+
+    The sources are identified by the hash of their graph, so the time range, symbols and
+    :py:func:`otp.run <onetick.py.run>` parameters are not taken into account.
+    The query is cached separately for each symbol and time interval on the server.
+    Note that the source must not depend on the current time or other state that changes between the runs.
+
+    Caches are created for the current session only and can be deleted with :py:meth:`cleanup`
+    or by using the promoter as a context manager.
+    As :py:func:`otp.create_cache <onetick.py.create_cache>` saves the query to the local .otq file,
+    only local OneTick server is supported.
+
+    Parameters
+    ----------
+    threshold: int
+        Number of usages of the source before it is promoted to the cache.
+    tick_type: str
+        Tick type for the cache management event processors and
+        :py:class:`otp.ReadCache <onetick.py.ReadCache>`.
+    symbol: str, optional
+        Symbol for the cache management event processors.
+        By default, :py:attr:`otp.config.default_symbol<onetick.py.configuration.Config.default_symbol>` is used.
+    db: str, optional
+        Database for the cache management event processors and :py:class:`otp.ReadCache <onetick.py.ReadCache>`.
+        By default, :py:attr:`otp.config.default_db<onetick.py.configuration.Config.default_db>` is used.
+
+    See also
+    --------
+    | :py:func:`otp.create_cache <onetick.py.create_cache>`
+    | :py:class:`otp.ReadCache <onetick.py.ReadCache>`
+    | :py:meth:`Source.cache <onetick.py.Source.cache>`
+
+    Examples
+    --------
+    >>> def slow_query():
+    ...     data = otp.DataSource('US_COMP', tick_type='TRD', symbols='AAPL')
+    ...     return data.agg({'VOLUME': otp.agg.sum('SIZE')}, bucket_interval=60)
+    >>> with otp.CachePromoter(threshold=2) as promoter:  # doctest: +SKIP
+    ...     for day in range(1, 10):
+    ...         df = promoter.run(slow_query(), date=otp.dt(2024, 2, day))
+    ...     print(promoter.report())
+                       CACHE_NAME  USES  UNCACHED_RUNS  CACHED_RUNS  SAVED_TIME
+    0  __otp_promoted_5d4bf2a37f3c1e9a2b7c     9              2            7       12.52
+    """
+
+    def __init__(self,
+                 threshold: int = 3,
+                 tick_type: str = 'ANY',
+                 symbol: Optional[str] = None,
+                 db: Optional[str] = None):
+        if threshold < 1:
+            raise ValueError("Parameter 'threshold' must be a positive integer")
+        self.threshold = threshold
+        self.tick_type = tick_type
+        self.symbol = symbol
+        self.db = db
+        self._stats: dict[str, _SubgraphStats] = {}
+
+    def wrap(self, source: 'otp.Source') -> 'otp.Source':
+        """
+        Register the usage of the ``source`` and return the source to be used instead of it.
+
+        Can be used for the parts of the bigger graphs, e.g. for the branches built by the same code in a loop.
+
+        Returns
+        -------
+        :py:class:`onetick.py.Source`
+            ``source`` itself if it's not promoted to the cache (yet)
+            or :py:class:`otp.ReadCache <onetick.py.ReadCache>` source reading the cached data.
+        """
+        return self._wrap(source)[0]
+
+    def run(self, query: 'otp.Source', **kwargs):
+        """
+        Run the ``query`` with :py:func:`otp.run <onetick.py.run>` reading the data from the cache if it's promoted.
+
+        The execution time of the query is measured for the :py:meth:`report`.
+
+        Parameters
+        ----------
+        query: :py:class:`onetick.py.Source`
+            Query to run.
+        kwargs:
+            Parameters of :py:func:`otp.run <onetick.py.run>`.
+        """
+        source, stats = self._wrap(query)
+        start_time = time.perf_counter()
+        result = otp.run(source, **kwargs)
+        duration = time.perf_counter() - start_time
+        if source is query:
+            stats.uncached_runs += 1
+            stats.uncached_time += duration
+        else:
+            stats.cached_runs += 1
+            stats.cached_time += duration
+        return result
+
+    def report(self) -> pd.DataFrame:
+        """
+        Returns the statistics of the usage of the tracked sources.
+
+        Columns:
+
+        * ``CACHE_NAME`` - name of the created cache or empty string if the source is not promoted.
+        * ``USES`` - the number of usages of the source.
+        * ``UNCACHED_RUNS``, ``CACHED_RUNS`` - the number of runs with :py:meth:`run` without and with the cache.
+        * ``SAVED_TIME`` - estimated number of seconds saved by reading the data from the cache,
+          based on the average execution time of the query without the cache.
+        """
+        return pd.DataFrame(
+            [
+                {
+                    'CACHE_NAME': stats.cache_name or '',
+                    'USES': stats.uses,
+                    'UNCACHED_RUNS': stats.uncached_runs,
+                    'CACHED_RUNS': stats.cached_runs,
+                    'SAVED_TIME': stats.saved_time,
+                }
+                for stats in self._stats.values()
+            ],
+            columns=['CACHE_NAME', 'USES', 'UNCACHED_RUNS', 'CACHED_RUNS', 'SAVED_TIME'],
+        )
+
+    @property
+    def saved_time(self) -> float:
+        """
+        Estimated total number of seconds saved by reading the data from the caches.
+        """
+        return sum(stats.saved_time for stats in self._stats.values())
+
+    def cleanup(self):
+        """
+        Delete all caches created by this promoter and reset the statistics.
+        """
+        for stats in self._stats.values():
+            if stats.cache_name:
+                delete_cache(stats.cache_name, tick_type=self.tick_type, symbol=self.symbol, db=self.db)
+        self._stats.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+
+    def _wrap(self, source: 'otp.Source') -> tuple['otp.Source', _SubgraphStats]:
+        fingerprint = source._fingerprint()
+        stats = self._stats.setdefault(fingerprint, _SubgraphStats())
+        if stats.cache_name is None and not stats.not_cacheable and stats.uses >= self.threshold:
+            self._promote(source, fingerprint, stats)
+        stats.uses += 1
+        if stats.cache_name is None:
+            return source, stats
+        return self._read_cache(source, stats.cache_name), stats
+
+    def _promote(self, source: 'otp.Source', fingerprint: str, stats: _SubgraphStats):
+        cache_name = f'__otp_promoted_{fingerprint[:20]}'
+        try:
+            create_cache(cache_name, query=source, inheritability=True,
+                         tick_type=self.tick_type, symbol=self.symbol, db=self.db)
+        except Exception as e:
+            # the source is still used as is
+            stats.not_cacheable = True
+            otp.get_logger(__name__).warning(f"Can't create cache {cache_name} for the source: {e}")
+            return
+        stats.cache_name = cache_name
+        otp.get_logger(__name__).info(f'Source is used {stats.uses} times, promoted to cache {cache_name}')
+
+    def _read_cache(self, source: 'otp.Source', cache_name: str) -> 'otp.Source':
+        from onetick.py.sources import ReadCache
+
+        start, end = source._get_widest_time_range()
+        return ReadCache(
+            cache_name=cache_name,
+            start=start if start is not None else utils.adaptive,
+            end=end if end is not None else utils.adaptive,
+            tick_type=self.tick_type,
+            db=self.db if self.db is not None else utils.adaptive_to_default,
+            schema=dict(source.schema),
+        )
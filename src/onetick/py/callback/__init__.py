@@ -1,4 +1,5 @@
 from .callback import CallbackBase
+from .batched import BatchedCallback, CEPConsumer, TickBatch
 from .callbacks import (
     LogCallback,
     ManualDataframeCallback,
@@ -0,0 +1,500 @@
+import threading
+import time as _time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from onetick import py as otp
+from .callback import CallbackBase
+
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+_DTYPES: dict[str, tuple[np.dtype, Any]] = {
+    'int': (np.dtype(np.int64), 0),
+    'float': (np.dtype(np.float64), 0.0),
+    'string': (np.dtype(object), ''),
+    'datetime': (np.dtype('datetime64[ns]'), np.datetime64(0, 'ns')),
+}
+
+
+class _RingBuffer:
+    """
+    Preallocated columnar buffer of the ticks of one symbol.
+    """
+
+    def __init__(self, columns: dict[str, str], capacity: int):
+        self.capacity = capacity
+        self.columns = columns
+        self.times = np.empty(capacity, dtype='datetime64[ns]')
+        self.arrays: dict[str, np.ndarray] = {}
+        self.defaults: dict[str, Any] = {}
+        for name, dtype_str in columns.items():
+            dtype, default = _DTYPES.get(dtype_str, (np.dtype(object), None))
+            self.arrays[name] = np.empty(capacity, dtype=dtype)
+            self.defaults[name] = default
+        self.start = 0
+        self.size = 0
+        # monotonic time when the oldest tick in the buffer was received
+        self.oldest_received = 0.0
+
+    def append(self, tick, time):
+        index = (self.start + self.size) % self.capacity
+        if self.size == 0:
+            self.oldest_received = _time.monotonic()
+        self.times[index] = time
+        for name, array in self.arrays.items():
+            array[index] = tick.get(name, self.defaults[name])
+        self.size += 1
+
+    def drop_oldest(self):
+        self.start = (self.start + 1) % self.capacity
+        self.size -= 1
+
+    def take(self, count: int) -> dict[str, np.ndarray]:
+        indices = (self.start + np.arange(count)) % self.capacity
+        data = {'Time': self.times[indices]}
+        for name, array in self.arrays.items():
+            data[name] = array[indices]
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+        # the rest of the ticks were received later, but it's not tracked for each tick
+        self.oldest_received = _time.monotonic()
+        return data
+
+
+@dataclass
+class TickBatch:
+    """
+    Micro-batch of ticks of one symbol delivered by :py:class:`otp.CEPConsumer <onetick.py.CEPConsumer>`.
+    """
+    #: name of the symbol
+    symbol: str
+    #: mapping from field names (including ``Time``) to numpy arrays with their values
+    data: dict[str, np.ndarray]
+    #: number of seconds passed since the first tick of the batch was received from OneTick
+    lag: float = 0.0
+    _received: float = field(default=0.0, repr=False)
+    # timestamps are in GMT and must be converted to the timezone of the query
+    _utc: bool = field(default=False, repr=False)
+
+    def __len__(self):
+        return len(self.data['Time'])
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        Returns ticks as :pandas:`pandas.DataFrame`.
+        """
+        return pd.DataFrame(self.data)
+
+    def to_arrow(self):
+        """
+        Returns ticks as :pyarrow:`pyarrow.Table`.
+        """
+        try:
+            import pyarrow
+        except ImportError:
+            raise ValueError("Module pyarrow can't be imported, but it is required to convert batches to arrow. "
+                             "Use 'pip install pyarrow' command to install it.")
+        return pyarrow.table(self.data)
+
+
+@dataclass
+class _BatchState:
+    """
+    State shared between all replicas of :py:class:`BatchedCallback`.
+    """
+    condition: threading.Condition = field(default_factory=threading.Condition)
+    replicas: list = field(default_factory=list)
+    # batches that are ready regardless of the buffers, e.g. when the schema has changed
+    pending: deque = field(default_factory=deque)
+    next_replica: int = 0
+    finished: bool = False
+    stopped: bool = False
+    error: Optional[BaseException] = None
+    ticks_received: int = 0
+    ticks_delivered: int = 0
+    ticks_dropped: int = 0
+    batches_delivered: int = 0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+
+
+class BatchedCallback(CallbackBase):
+    """
+    Callback accumulating ticks into per-symbol columnar ring buffers and delivering them in micro-batches.
+
+    Ticks are only copied into the preallocated numpy arrays in :meth:`process_tick`,
+    all other work is done by the consumer of the batches in its own thread with :meth:`get_batch`.
+    Usually it's used via :py:class:`otp.CEPConsumer <onetick.py.CEPConsumer>`.
+
+    Parameters
+    ----------
+    batch_size: int
+        The batch is delivered when this number of ticks is buffered for the symbol.
+    max_latency: float
+        The batch is delivered when the oldest buffered tick of the symbol was received this number of seconds ago,
+        even if there are less than ``batch_size`` ticks.
+    capacity: int
+        Maximum number of buffered ticks for each symbol.
+    overflow: str
+        What to do when the buffer of the symbol is full:
+
+        * ``block`` - wait until the consumer takes the ticks from the buffer,
+          so OneTick stops delivering the ticks too,
+        * ``drop_oldest`` - remove the oldest buffered tick,
+        * ``drop_newest`` - ignore the new tick.
+    timezone: str, optional
+        Timezone of the ``Time`` field and datetime fields in the batches.
+        By default, :py:attr:`otp.config.tz<onetick.py.configuration.Config.tz>` is used.
+    """
+
+    def __init__(self,
+                 batch_size: int = 1000,
+                 max_latency: float = 0.1,
+                 capacity: int = 100_000,
+                 overflow: str = 'block',
+                 timezone: Optional[str] = None,
+                 _state: Optional[_BatchState] = None):
+        super().__init__()
+        if batch_size < 1:
+            raise ValueError("Parameter 'batch_size' must be a positive integer")
+        if capacity < batch_size:
+            raise ValueError("Parameter 'capacity' can't be less than 'batch_size'")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Parameter 'overflow' must be one of {OVERFLOW_POLICIES}, got '{overflow}'")
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.capacity = capacity
+        self.overflow = overflow
+        self.timezone = timezone or otp.config.tz
+        self._state = _BatchState() if _state is None else _state
+        self._symbol_name = ''
+        self._buffer: Optional[_RingBuffer] = None
+
+    def replicate(self):
+        return BatchedCallback(self.batch_size, self.max_latency, self.capacity, self.overflow,
+                               timezone=self.timezone, _state=self._state)
+
+    def process_symbol_name(self, symbol_name):
+        self._symbol_name = symbol_name
+
+    def process_tick_descriptor(self, tick_descriptor):
+        columns = {name: type_dict['type'] for name, type_dict in tick_descriptor}
+        state = self._state
+        with state.condition:
+            if self._buffer is None:
+                state.replicas.append(self)
+            elif self._buffer.size:
+                # ticks with the old schema are delivered separately
+                state.pending.append(self._make_batch(self._buffer, self._buffer.size))
+                state.condition.notify_all()
+            self._buffer = _RingBuffer(columns, self.capacity)
+
+    def process_tick(self, tick, time):
+        state = self._state
+        buffer = self._buffer
+        with state.condition:
+            state.ticks_received += 1
+            if buffer.size == buffer.capacity:
+                if self.overflow == 'drop_newest':
+                    state.ticks_dropped += 1
+                    return
+                if self.overflow == 'drop_oldest':
+                    buffer.drop_oldest()
+                    state.ticks_dropped += 1
+                else:
+                    while buffer.size == buffer.capacity and not state.stopped:
+                        state.condition.wait()
+                    if state.stopped:
+                        state.ticks_dropped += 1
+                        return
+            buffer.append(tick, time)
+            if buffer.size == 1 or buffer.size >= self.batch_size:
+                # the first tick starts the latency timer of the consumer
+                state.condition.notify_all()
+
+    def process_ticks(self, ticks):
+        # WebAPI delivers all ticks at once after the query is finished
+        times = np.asarray(ticks['Time'])
+        with self._state.condition:
+            self._state.ticks_received += len(times)
+            for start in range(0, len(times), self.batch_size):
+                data = {name: np.asarray(values)[start:start + self.batch_size] for name, values in ticks.items()}
+                self._state.pending.append(TickBatch(self._symbol_name, data, _received=_time.monotonic()))
+            self._state.condition.notify_all()
+
+    def done(self):
+        with self._state.condition:
+            self._state.condition.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        """
+        Mark the query as finished, the consumer gets the remaining ticks and then ``None`` from :meth:`get_batch`.
+        """
+        with self._state.condition:
+            self._state.finished = True
+            self._state.error = error
+            self._state.condition.notify_all()
+
+    def stop(self):
+        """
+        Stop accepting new ticks and release the blocked OneTick threads.
+        """
+        with self._state.condition:
+            self._state.stopped = True
+            self._state.finished = True
+            self._state.condition.notify_all()
+
+    def get_batch(self, timeout: Optional[float] = None) -> Optional[TickBatch]:
+        """
+        Wait for the next batch of ticks.
+
+        Parameters
+        ----------
+        timeout: float, optional
+            Maximum number of seconds to wait.
+
+        Returns
+        -------
+        :py:class:`~onetick.py.callback.batched.TickBatch` or None
+            None is returned when the query is finished and all ticks are delivered or when ``timeout`` is exceeded.
+        """
+        batch = self._next_batch(timeout)
+        if batch is not None and batch._utc:
+            # converting outside the lock to not block OneTick threads
+            for name, values in batch.data.items():
+                if values.dtype.kind == 'M':
+                    batch.data[name] = self._to_timezone(values)
+            batch._utc = False
+        return batch
+
+    def _next_batch(self, timeout: Optional[float]) -> Optional[TickBatch]:
+        state = self._state
+        deadline = None if timeout is None else _time.monotonic() + timeout
+        with state.condition:
+            while True:
+                if state.pending:
+                    return self._delivered(state.pending.popleft())
+                now = _time.monotonic()
+                wait = None
+                replicas = state.replicas
+                for i in range(len(replicas)):
+                    # round-robin, so all symbols are delivered even if some of them are very active
+                    replica = replicas[(state.next_replica + i) % len(replicas)]
+                    buffer = replica._buffer
+                    if buffer is None or not buffer.size:
+                        continue
+                    ready_in = buffer.oldest_received + self.max_latency - now
+                    if buffer.size >= self.batch_size or ready_in <= 0 or state.finished:
+                        state.next_replica = (state.next_replica + i + 1) % len(replicas)
+                        batch = replica._make_batch(buffer, min(buffer.size, self.batch_size))
+                        # blocked producer may continue
+                        state.condition.notify_all()
+                        return self._delivered(batch)
+                    wait = ready_in if wait is None else min(wait, ready_in)
+                if state.finished:
+                    if state.error is not None:
+                        raise state.error
+                    return None
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                state.condition.wait(wait)
+
+    @property
+    def metrics(self) -> dict:
+        """
+        Statistics of the delivery of the ticks:
+
+        * ``ticks_received`` - number of ticks received from OneTick,
+        * ``ticks_delivered`` - number of ticks delivered to the consumer,
+        * ``ticks_dropped`` - number of ticks dropped because of the buffer overflow,
+        * ``ticks_buffered`` - number of ticks waiting in the buffers,
+        * ``batches_delivered`` - number of delivered batches,
+        * ``last_lag``, ``max_lag`` - lag of the last batch and the maximum lag of the batches in seconds.
+        """
+        state = self._state
+        with state.condition:
+            buffered = sum(replica._buffer.size for replica in state.replicas if replica._buffer is not None)
+            buffered += sum(len(batch) for batch in state.pending)
+            return {
+                'ticks_received': state.ticks_received,
+                'ticks_delivered': state.ticks_delivered,
+                'ticks_dropped': state.ticks_dropped,
+                'ticks_buffered': buffered,
+                'batches_delivered': state.batches_delivered,
+                'last_lag': state.last_lag,
+                'max_lag': state.max_lag,
+            }
+
+    def _make_batch(self, buffer: _RingBuffer, count: int) -> TickBatch:
+        received = buffer.oldest_received
+        return TickBatch(self._symbol_name, buffer.take(count), _received=received, _utc=True)
+
+    def _delivered(self, batch: TickBatch) -> TickBatch:
+        state = self._state
+        if batch._received:
+            batch.lag = _time.monotonic() - batch._received
+        state.ticks_delivered += len(batch)
+        state.batches_delivered += 1
+        state.last_lag = batch.lag
+        state.max_lag = max(state.max_lag, batch.lag)
+        return batch
+
+    def _to_timezone(self, values: np.ndarray) -> np.ndarray:
+        times = pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(self.timezone).tz_localize(None)
+        return times.to_numpy()
+
+
+class CEPConsumer:
+    """
+    High-throughput consumer of the results of CEP (``running=True``) queries delivering ticks in micro-batches.
+
+    The query is executed with :py:func:`otp.run <onetick.py.run>` in a background thread
+    with :py:class:`~onetick.py.callback.batched.BatchedCallback`,
+    which accumulates ticks of each symbol in preallocated columnar ring buffers.
+    Ticks are delivered as :py:class:`~onetick.py.callback.batched.TickBatch` objects
+    (numpy arrays, can be converted to :pandas:`pandas.DataFrame` or :pyarrow:`pyarrow.Table`)
+    when ``batch_size`` ticks are buffered for the symbol or after ``max_latency`` seconds.
+
+    Batches can be consumed with ``for`` loop or with ``async for`` loop in asyncio code.
+    If the consumer can't keep up with the feed, ``overflow`` policy is applied,
+    see :py:attr:`metrics` for the number of dropped ticks and the lag of the delivery.
+
+    Parameters
+    ----------
+    query:
+        Query to run, the same as in :py:func:`otp.run <onetick.py.run>`.
+    batch_size: int
+        Maximum number of ticks in the batch.
+    max_latency: float
+        Maximum number of seconds the tick is waiting in the buffer before it's delivered.
+    capacity: int
+        Maximum number of buffered ticks for each symbol.
+    overflow: str
+        What to do when the buffer of the symbol is full:
+        ``block`` (default) to stop receiving the ticks until the consumer catches up,
+        ``drop_oldest`` or ``drop_newest`` to drop the ticks.
+    kwargs:
+        Other parameters of :py:func:`otp.run <onetick.py.run>`.
+        Parameter ``running`` is set to True by default.
+
+    Examples
+    --------
+    >>> data = otp.DataSource('US_COMP', tick_type='TRD', symbols=['AAPL', 'MSFT'])
+    >>> with otp.CEPConsumer(data, batch_size=10000, overflow='drop_oldest') as consumer:  # doctest: +SKIP
+    ...     for batch in consumer:
+    ...         df = batch.to_pandas()
+    ...         print(batch.symbol, len(df), consumer.metrics['max_lag'])
+
+    In asyncio code:
+
+    >>> async def consume():
+    ...     async with otp.CEPConsumer(data) as consumer:
+    ...         async for batch in consumer:
+    ...             await process(batch)
+    """
+
+    def __init__(self,
+                 query,
+                 batch_size: int = 1000,
+                 max_latency: float = 0.1,
+                 capacity: int = 100_000,
+                 overflow: str = 'block',
+                 **kwargs):
+        for param in ('callback', 'output_structure', 'manual_dataframe_callback'):
+            if kwargs.get(param):
+                raise ValueError(f"Parameter '{param}' can't be used with otp.CEPConsumer")
+        kwargs.setdefault('running', True)
+        timezone = kwargs.get('timezone') or otp.config.tz
+        self.query = query
+        self._kwargs = kwargs
+        self._callback = BatchedCallback(batch_size, max_latency, capacity, overflow, timezone=timezone)
+        self._cancellation_handle = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Start the query in the background thread. Called automatically when iteration starts.
+        """
+        if self._thread is not None:
+            return
+        from onetick.py.run import _create_cancellation_handle
+        self._cancellation_handle = _create_cancellation_handle(self._kwargs)
+        self._thread = threading.Thread(target=self._run, name='otp-cep-consumer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        error = None
+        try:
+            otp.run(self.query, callback=self._callback, **self._kwargs)
+        except Exception as e:
+            error = e
+        if self._callback._state.stopped:
+            # the error is caused by the cancellation
+            error = None
+        self._callback.finish(error)
+
+    def stop(self):
+        """
+        Cancel the query and stop delivering the ticks.
+        """
+        if self._callback._state.stopped:
+            return
+        self._callback.stop()
+        if self._cancellation_handle is not None and self._thread is not None and self._thread.is_alive():
+            from onetick.py.run import _cancel_query
+            _cancel_query(self._cancellation_handle)
+
+    def get_batch(self, timeout: Optional[float] = None) -> Optional[TickBatch]:
+        """
+        Wait for the next batch of ticks.
+
+        Returns None if the query is finished or stopped and all ticks are delivered,
+        or if ``timeout`` seconds have passed.
+        """
+        self.start()
+        return self._callback.get_batch(timeout)
+
+    @property
+    def metrics(self) -> dict:
+        """
+        Statistics of the delivery of the ticks, see :py:attr:`BatchedCallback.metrics`.
+        """
+        return self._callback.metrics
+
+    def __iter__(self):
+        while True:
+            batch = self.get_batch()
+            if batch is None:
+                return
+            yield batch
+
+    async def __aiter__(self):
+        import asyncio
+        self.start()
+        while True:
+            # waiting with timeout, so the thread is not blocked forever if the loop is cancelled
+            batch = await asyncio.to_thread(self._callback.get_batch, self._callback.max_latency or 0.1)
+            if batch is not None:
+                yield batch
+            elif self._callback._state.finished and not self.metrics['ticks_buffered']:
+                return
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
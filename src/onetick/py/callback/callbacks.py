@@ -1,4 +1,3 @@
-import datetime
 from functools import cached_property
 
 import pandas as pd
@@ -35,6 +34,7 @@ class ManualDataframeCallback(CallbackBase):
         # dict of columns names and lists with their values
         self._columns = None
         self._defaults = None
+        self._datetime_columns: set[str] = set()
         self._result = None
 
     def replicate(self):
@@ -59,9 +59,12 @@ class ManualDataframeCallback(CallbackBase):
         if self._columns is None:
             self._columns = {'Time': []}
             self._defaults = {}
+            self._datetime_columns = {'Time'}
         for name, type_dict in tick_descriptor:
             if name not in self._columns:
                 dtype_str = type_dict['type']
+                if dtype_str == 'datetime':
+                    self._datetime_columns.add(name)
                 default = self._get_default_value_by_type(dtype_str)
                 # save default value for column, will be used in other places
                 self._defaults[name] = default
@@ -73,23 +76,25 @@ class ManualDataframeCallback(CallbackBase):
         Called for each tick of the symbol.
         """
         assert self._columns is not None
+        # datetime values are always in UTC, they are converted to the timezone all at once in done()
         for name in self._columns:
             if name == 'Time':
-                value = self._convert_to_timezone(time)
+                value = time
             elif name not in tick:
                 value = self._defaults[name]
             else:
                 value = tick[name]
-                if isinstance(value, datetime.datetime):
-                    # datetime values are always in UTC
-                    value = self._convert_to_timezone(value)
             self._columns[name].append(value)
 
     def done(self):
         """
         Called once for each symbol after all ticks are processed.
         """
-        self._result = pd.DataFrame(self._columns)
+        columns = self._columns or {}
+        for name in self._datetime_columns:
+            if columns.get(name):
+                columns[name] = utils.convert_timezone_array(columns[name], 'UTC', self._timezone)
+        self._result = pd.DataFrame(columns)
 
     @cached_property
     def result(self):
@@ -108,13 +113,6 @@ class ManualDataframeCallback(CallbackBase):
             return results.popitem()[1]
         return results
 
-    def _convert_to_timezone(self, dt):
-        """
-        Converting timezone-naive ``dt`` object in UTC timezone
-        to the timezone specified by user and returning also timezone-naive object.
-        """
-        return utils.convert_timezone(dt, 'UTC', self._timezone)
-
     def _get_default_value_by_type(self, dtype_str):
         """
         Converting type names returned by process_tick_descriptor()
@@ -123,9 +121,7 @@ class ManualDataframeCallback(CallbackBase):
             'int': 0,
             'float': 0.0,
             'string': '',
-            'datetime': self._convert_to_timezone(
-                # epoch in timezone specified by user converted to UTC, that's what OneTick would return
-                pd.Timestamp(1970, 1, 1).tz_localize(self._timezone).tz_convert('UTC').tz_localize(None)
-            )
+            # epoch in timezone specified by user converted to UTC, that's what OneTick would return
+            'datetime': pd.Timestamp(1970, 1, 1).tz_localize(self._timezone).tz_convert('UTC').tz_localize(None),
         }
         return defaults[dtype_str]
@@ -0,0 +1,79 @@
+import argparse
+import sys
+
+import onetick.py as otp
+
+
+def parser_impl(parser):
+    parser.description = ('Compare two performance summary files generated by measure_perf.exe '
+                          'or aggregate many summary files into the table of hotspots')
+
+    parser.add_argument('paths', nargs='+',
+                        help='Paths to the old and the new summary files, '
+                             'or paths to the summary files and directories with --hotspots')
+    parser.add_argument('--hotspots', help='Aggregate the summary files into the table of hotspots',
+                        action='store_true')
+    parser.add_argument('--by', choices=['tag', 'stack_info'], default='tag',
+                        help='How to align the EPs of the summaries. Default: tag')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative increase of the metric considered a regression. Default: 0.2')
+    parser.add_argument('--min-time', type=int, default=1000,
+                        help='Minimal running time in microseconds of the regressed EP. Default: 1000')
+    parser.add_argument('--min-memory', type=int, default=1 << 20,
+                        help='Minimal allocated memory in bytes of the regressed EP. Default: 1048576')
+    parser.add_argument('--min-ticks', type=int, default=1000,
+                        help='Minimal number of ticks processed by the regressed EP. Default: 1000')
+    parser.add_argument('--all', dest='show_all', action='store_true',
+                        help='Print all aligned EPs, not only the regressions')
+    parser.add_argument('--fail-on-regression', help='Exit with code 1 if there are regressions',
+                        action='store_true')
+    parser.add_argument('--group-by', choices=['EP_name', 'file', 'ep'], default='EP_name',
+                        help='Aggregate hotspots by EP name, summary file or report each EP. Default: EP_name')
+    parser.add_argument('--pattern', default='*',
+                        help='Glob pattern of the summary file names in the directories. Default: *')
+    parser.add_argument('--top', type=int, help='Print only this number of the hotspots')
+
+
+def perf_diff(paths, by='tag', threshold=0.2, min_time=1000, min_memory=1 << 20, min_ticks=1000,
+              show_all=False, fail_on_regression=False, **kwargs) -> int:
+    if len(paths) != 2:
+        raise ValueError('Exactly two summary files should be specified, use --hotspots to aggregate more files')
+    diff = otp.perf.compare(paths[0], paths[1], by=by, threshold=threshold,
+                            min_time=min_time, min_memory=min_memory, min_ticks=min_ticks)
+    regressions = diff.regressions
+    if show_all:
+        print(diff)
+    elif not regressions.empty:
+        print(otp.perf.PerformanceDiff(regressions))
+    print(f'Found {len(regressions)} regression(s) in {len(diff.dataframe)} EP(s)')
+    return 1 if fail_on_regression and not regressions.empty else 0
+
+
+def perf_hotspots(paths, group_by='EP_name', pattern='*', top=None, **kwargs) -> int:
+    df = otp.perf.hotspots(paths, group_by=group_by, pattern=pattern)
+    if top is not None:
+        df = df.head(top)
+    print(df.to_string(index=False))
+    return 0
+
+
+def run(args):
+    kwargs = vars(args)
+    kwargs.pop('func', None)
+    if not kwargs['hotspots'] and len(kwargs['paths']) != 2:
+        # reported like argparse errors, the parser itself is not available here
+        print('onetick perf-diff: error: exactly two summary files should be specified, '
+              'use --hotspots to aggregate more files', file=sys.stderr)
+        sys.exit(2)
+    if kwargs.pop('hotspots'):
+        exit_code = perf_hotspots(**kwargs)
+    else:
+        exit_code = perf_diff(**kwargs)
+    if exit_code:
+        sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    parser_impl(arg_parser)
+    run(arg_parser.parse_args())
@@ -344,6 +344,13 @@ def _is_supported_where_clause_for_back_ticks():
     return 'where_clause_for_back_ticks' in otq.Passthrough.Parameters.list_parameters()
 
 
+def _is_supported_passthrough_throw_for_missing_fields():
+    """
+    Check if THROW_FOR_MISSING_FIELDS parameter is supported by PASSTHROUGH EP
+    """
+    return 'throw_for_missing_fields' in otq.Passthrough.Parameters.list_parameters()
+
+
 def _is_supported_bucket_units_for_tick_generator():
     """
     Implemented 0029117: Add BUCKET_INTERVAL_UNITS to TICK_GENERATOR EP
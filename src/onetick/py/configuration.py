@@ -1,4 +1,5 @@
 import os
+from contextvars import ContextVar
 from datetime import datetime
 from typing import Iterable, Union, Optional
 from contextlib import suppress, contextmanager
@@ -6,11 +7,12 @@ from textwrap import dedent
 
 import dotenv
 from onetick.py.otq import otq
-from .utils import default_license_dir, default_license_file, get_local_number_of_cores
+from .utils import default_license_dir, default_license_file, default_cache_dir, get_local_number_of_cores
 import onetick.py.types as ott
 
 DEFAULT_LICENSE_DIR = default_license_dir()
 DEFAULT_LICENSE_FILE = default_license_file()
+DEFAULT_CACHE_DIR = default_cache_dir()
 
 DATETIME_FORMATS = (
     '%Y/%m/%d %H:%M:%S.%f',
@@ -93,6 +95,10 @@ class nothing(metaclass=_nothing):
     """
 
 
+# values of the configuration options set with otp.config.override() in the current thread or asyncio task
+_CONFIG_OVERRIDES: ContextVar[dict] = ContextVar('onetick_py_config_overrides', default={})
+
+
 class OtpProperty:
     """
     .. attribute:: {name}
@@ -147,8 +153,15 @@ class OtpProperty:
             env_var_desc=env_var_desc
         )
 
+    # whether the value can be set for the current context only with otp.config.override()
+    _context_local = True
+
     def __get__(self, obj, objtype=None):
-        if self._set_value is not nothing:
+        overrides = _CONFIG_OVERRIDES.get()
+        if self._name in overrides:
+            if overrides[self._name] is not nothing:
+                return overrides[self._name]
+        elif self._set_value is not nothing:
             return self._set_value
         if self._env_var_name:
             env_var_value = os.environ.get(self._env_var_name, None)
@@ -168,15 +181,17 @@ class OtpProperty:
         return self._base_default
 
     def __set__(self, obj, value):
+        self._set_value = self._validate(value)
+
+    def _validate(self, value):
         # assigning to nothing is permitted
         # assigning to nothing will reset value to default
         if not isinstance(value, self._allowed_types) and value is not nothing:
             raise ValueError(f'Type of passed configuration value "{type(value)}" should be one of '
                              f'the allowed types for this configuration {self._allowed_types}')
         if value is nothing:
-            self._set_value = value
-        else:
-            self._set_value = self._validator_func(value)
+            return value
+        return self._validator_func(value)
 
 
 class OtpDerivedProperty:
@@ -217,6 +232,9 @@ class OtpShowStackInfoProperty(OtpProperty):
 
        {description}
     """
+    # the value is also set globally in onetick.query
+    _context_local = False
+
     @staticmethod
     def parser(value):
         return parse_true(value)
@@ -370,6 +388,56 @@ class Config:
         finally:
             self[name] = old_value
 
+    @contextmanager
+    def override(self, **values):
+        """
+        Context manager setting configuration values for the current thread or asyncio task only.
+
+        Unlike setting the properties of ``otp.config`` or using ``with otp.config('property', 'value'):``,
+        the values are stored in :py:mod:`contextvars`, so other threads and asyncio tasks
+        running at the same time still see their own values.
+        Asyncio tasks and :py:func:`otp.run_async <onetick.py.run_async>`
+        created inside the scope inherit the values.
+        New threads start with the global values, use :py:func:`contextvars.copy_context` to pass the values to them.
+
+        Overridden values have the highest priority.
+        Value ``otp.config.default`` resets the property to its default value in the scope.
+
+        Parameters
+        ----------
+        values:
+            Names and values of the configuration properties.
+
+        Examples
+        --------
+        >>> from concurrent.futures import ThreadPoolExecutor
+        >>> def run_in_timezone(tz):
+        ...     with otp.config.override(tz=tz):
+        ...         return otp.run(otp.Tick(A=1))['Time'][0]
+        >>> with ThreadPoolExecutor() as executor:
+        ...     list(executor.map(run_in_timezone, ['GMT', 'EST5EDT']))
+        [Timestamp('2003-12-01 00:00:00'), Timestamp('2003-12-01 00:00:00')]
+        >>> otp.config.tz
+        'EST5EDT'
+        """
+        validated = {}
+        for name, value in values.items():
+            option = self.__class__.__dict__.get(name)
+            if isinstance(option, OtpDerivedProperty):
+                raise AttributeError(f'Derived property "{name}" can\'t be overridden')
+            if not isinstance(option, OtpProperty):
+                raise AttributeError(f'"{name}" is not in the list of onetick.py config options!')
+            if not option._context_local:
+                raise ValueError(f'Property "{name}" can\'t be overridden for the current context only')
+            validated[name] = option._validate(value)
+        previous = _CONFIG_OVERRIDES.get()
+        # the dictionary is never modified in place, because it may be shared with other contexts
+        _CONFIG_OVERRIDES.set({**previous, **validated})
+        try:
+            yield
+        finally:
+            _CONFIG_OVERRIDES.set(previous)
+
     @classmethod
     def get_changeable_config_options(cls):
         """
@@ -677,6 +745,24 @@ class Config:
         env_var_name='OTP_ACCESS_TOKEN_SCOPE',
     )
 
+    webapi_register_queries = OtpProperty(
+        description='Upload each distinct .otq file to WebAPI server only once. '
+                    'Queries with the same content are sent to the server with the same name, '
+                    'so the server-side copy of the file is reused by the next requests. '
+                    'If the server evicts the file from its cache, it is uploaded again automatically.',
+        base_default=False,
+        env_var_name='OTP_WEBAPI_REGISTER_QUERIES',
+        env_var_func=parse_true,
+    )
+
+    webapi_keep_alive = OtpProperty(
+        description='Reuse HTTP connections to WebAPI server between the requests made in the same thread '
+                    'instead of opening the new connection for each request.',
+        base_default=False,
+        env_var_name='OTP_WEBAPI_KEEP_ALIVE',
+        env_var_func=parse_true,
+    )
+
     trusted_certificates_file = OtpProperty(
         description='Either a boolean, in which case it controls whether we verify the server TLS certificate '
                     'or a string with the path to the file with list of '
@@ -750,6 +836,48 @@ class Config:
         env_var_func=parse_true,
     )
 
+    prune_columns = OtpProperty(
+        description='Enable column pruning optimization of the generated queries. '
+                    'If set to True, onetick.py calculates the fields that may be used by the nodes of the graph '
+                    'after each source and sets the source to propagate only these fields, '
+                    'so the unused fields are not carried through the graph. '
+                    'The optimization is applied only to the sources whose fields are narrowed downstream '
+                    'to the explicitly listed ones (e.g. with column selection, strict table or aggregation), '
+                    'because the fields not declared in the schema are propagated to the output otherwise. '
+                    'It is not applied to the sources followed by '
+                    'per-tick scripts, regex-based operations, nested queries '
+                    'and other nodes that may use fields implicitly.',
+        base_default=False,
+        env_var_name='OTP_PRUNE_COLUMNS',
+        allowed_types=(str, bool, int),
+        env_var_func=parse_true,
+    )
+
+    eliminate_common_subgraphs = OtpProperty(
+        description='Enable common subgraph elimination optimization of the generated queries. '
+                    'If set to True, identical parts of the graph built separately '
+                    '(e.g. the same data source with the same filters in different branches) '
+                    'are replaced with the single part connected to all consumers, '
+                    'so the same data is not read from the database several times. '
+                    'The number of removed nodes and data reads is logged with INFO level.',
+        base_default=False,
+        env_var_name='OTP_ELIMINATE_COMMON_SUBGRAPHS',
+        allowed_types=(str, bool, int),
+        env_var_func=parse_true,
+    )
+
+    deduplicate_nested_queries = OtpProperty(
+        description='Store identical nested queries in the generated .otq files only once. '
+                    'If set to True, nested queries with generated names '
+                    '(e.g. created by the same code for joins with queries or evals in a loop) '
+                    'are compared by their content and all references to the identical queries '
+                    'point to the single query in the file.',
+        base_default=True,
+        env_var_name='OTP_DEDUPLICATE_NESTED_QUERIES',
+        allowed_types=(str, bool, int),
+        env_var_func=parse_true,
+    )
+
     allow_lowercase_in_saved_fields = OtpProperty(
         description='Allow using lower case characters in field names that are being stored in Onetick databases. '
                     'If set to False, onetick.py would not allow saving fields with lower case characters '
@@ -793,6 +921,78 @@ class Config:
         env_var_func=parse_true,
     )
 
+    result_cache_dir = OtpProperty(
+        description='Default directory where :py:class:`otp.ResultCache<onetick.py.ResultCache>` '
+                    'stores the results of the queries. '
+                    'Default value is system-dependent: '
+                    '**~/.cache/onetick-py/result_cache** for Linux systems.',
+        base_default=os.path.join(DEFAULT_CACHE_DIR, 'result_cache'),
+        env_var_name='OTP_RESULT_CACHE_DIR',
+        allowed_types=str,
+    )
+
+    result_cache_max_size = OtpProperty(
+        description='Default maximum total size (in bytes) of the files stored by '
+                    ':py:class:`otp.ResultCache<onetick.py.ResultCache>`. '
+                    'When it is exceeded, least recently used files are deleted. '
+                    'Default value is 1 GiB.',
+        base_default=1024 ** 3,
+        env_var_name='OTP_RESULT_CACHE_MAX_SIZE',
+        env_var_func=int,
+    )
+
+    autotune = OtpProperty(
+        description='Tune ``concurrency``, ``batch_size`` and ``max_expected_ticks_per_symbol`` parameters of '
+                    ':py:func:`otp.run<onetick.py.run>` automatically based on the statistics of the previous runs '
+                    'of the same query, see :py:class:`otp.Autotuner<onetick.py.Autotuner>`.',
+        base_default=False,
+        env_var_name='OTP_AUTOTUNE',
+        env_var_func=parse_true,
+    )
+
+    autotuner_stats_file = OtpProperty(
+        description='Path to the file with the statistics collected by '
+                    ':py:class:`otp.Autotuner<onetick.py.Autotuner>`. '
+                    'Default value is **autotuner.json** file in the onetick-py cache directory, e.g. '
+                    '**~/.cache/onetick-py/autotuner.json** for Linux systems.',
+        base_default=os.path.join(DEFAULT_CACHE_DIR, 'autotuner.json'),
+        env_var_name='OTP_AUTOTUNER_STATS_FILE',
+        allowed_types=str,
+    )
+
+    async_queries_limit = OtpProperty(
+        description='Maximum number of queries executed at the same time with '
+                    ':py:func:`otp.run_async<onetick.py.run_async>` in one event loop. '
+                    'Other queries wait until the running ones are finished, cancelled or timed out. '
+                    'By default, the number of queries is not limited.',
+        base_default=None,
+        env_var_name='OTP_ASYNC_QUERIES_LIMIT',
+        env_var_func=int,
+        allowed_types=int,
+    )
+
+    query_budget_ticks = OtpProperty(
+        description='Maximum estimated number of ticks read from the databases by the query. '
+                    'If set, the cost of each :py:class:`onetick.py.Source` query is estimated '
+                    'with :py:meth:`Source.estimate_cost<onetick.py.Source.estimate_cost>` before executing it '
+                    'in :py:func:`otp.run<onetick.py.run>` and the query is not executed if the budget is exceeded. '
+                    'By default, the number of ticks is not limited.',
+        base_default=None,
+        env_var_name='OTP_QUERY_BUDGET_TICKS',
+        env_var_func=int,
+        allowed_types=int,
+    )
+
+    query_budget_bytes = OtpProperty(
+        description='Maximum estimated number of bytes read from the databases by the query. '
+                    'See :py:attr:`otp.config.query_budget_ticks<onetick.py.configuration.Config.query_budget_ticks>`. '
+                    'By default, the number of bytes is not limited.',
+        base_default=None,
+        env_var_name='OTP_QUERY_BUDGET_BYTES',
+        env_var_func=int,
+        allowed_types=int,
+    )
+
 
 def get_options_table(cls):
     options_table = ('\n'
@@ -0,0 +1,208 @@
+"""
+Column pruning optimization of the query graph.
+
+For each source of the graph the set of fields that can be used by the downstream nodes is calculated
+and the placeholder PASSTHROUGH node of the source is changed to propagate only these fields.
+
+The schema of the source may be incomplete, e.g. the database may have fields that are not declared,
+and these fields are propagated to the output of the graph.
+So the source is pruned only if all its paths to the output go through the nodes
+that propagate the explicitly listed fields only.
+"""
+import re
+from collections import defaultdict
+
+from onetick.py.core._internal._nodes_history import _Sink, _Source, _SourceByKey, _NodeName
+
+
+_EP_REGEX = re.compile(r'^\s*(\w+)(?:\((.*)\))?\s*$', re.DOTALL)
+_IDENTIFIER_REGEX = re.compile(r'[A-Za-z_]\w*')
+# identifier that is not the name of the called function
+_NOT_FUNCTION_IDENTIFIER_REGEX = re.compile(r'\b[A-Za-z_]\w*\b(?!\s*\()')
+_REGEX_PARAMETER_REGEX = re.compile(r'\bUSE_REGEX=(?:True|true|1)\b')
+_PARAMETER_NAME_REGEX = re.compile(r'\b([A-Z_]+)=')
+# top-level parameter of the event processor: NAME=value or NAME="quoted value"
+_PARAMETER_REGEX = re.compile(r'\s*(\w+)=("(?:[^"\\]|\\.)*"|[^,"]*)\s*(?:,|$)')
+# type in the field declaration, e.g. "double X" or "string[64] S"
+_TYPE_DECLARATION_REGEX = re.compile(
+    r'\b(?:byte|short|int|long|uint|ulong|float|double|decimal|bool|string|varstring|nsectime|msectime)'
+    r'(?:\[\d+\])?\s+(?=[A-Za-z_])'
+)
+_BOOLEAN_VALUES = {'True', 'False', 'true', 'false'}
+_TRUE_REGEX = r'(?:True|true|1)\b'
+_ALL_FIELDS_PARAMETER_REGEX = re.compile(r'\b\w*ALL_FIELDS\w*=' + _TRUE_REGEX)
+_KEEP_INPUT_FIELDS_REGEX = re.compile(r'\bKEEP_INPUT_FIELDS=' + _TRUE_REGEX)
+_DROP_FIELDS_REGEX = re.compile(r'\bDROP_FIELDS=' + _TRUE_REGEX)
+_FIELDS_PARAMETER_REGEX = re.compile(r'\bFIELDS=')
+
+# event processors that reference all input fields they use in their parameters
+# and don't propagate input fields anywhere except their output
+_SAFE_EPS = {
+    'PASSTHROUGH', 'ADD_FIELD', 'ADD_FIELDS', 'UPDATE_FIELD', 'UPDATE_FIELDS', 'WHERE_CLAUSE', 'TABLE',
+    'MERGE', 'MODIFY_QUERY_TIMES', 'DECLARE_STATE_VARIABLES', 'ORDER_BY', 'RENAME_FIELDS', 'LIMIT',
+    'JOIN', 'JOIN_BY_TIME',
+    'FIRST_TICK', 'LAST_TICK', 'HIGH_TICK', 'LOW_TICK', 'NUM_TICKS', 'COMPUTE',
+    'SUM', 'AVERAGE', 'HIGH', 'LOW', 'FIRST', 'LAST', 'VWAP', 'STDDEV', 'MEDIAN', 'NUM_DISTINCT',
+}
+
+
+# event processors that only list fields to propagate or to create, but don't use their values,
+# mapped to the parameters allowed for that
+_NOT_USING_FIELDS_EPS = {
+    'PASSTHROUGH': {'FIELDS', 'DROP_FIELDS', 'THROW_FOR_MISSING_FIELDS'},
+    'TABLE': {'FIELDS', 'KEEP_INPUT_FIELDS'},
+}
+
+# aggregations that propagate only the aggregated and group by fields, unless all fields are requested
+_AGGREGATION_EPS = {
+    'COMPUTE', 'NUM_TICKS', 'SUM', 'AVERAGE', 'HIGH', 'LOW', 'FIRST', 'LAST', 'VWAP', 'STDDEV', 'MEDIAN',
+    'NUM_DISTINCT',
+}
+
+
+def _parse_ep(ep) -> tuple[str, str]:
+    match = _EP_REGEX.match(str(ep))
+    if not match:
+        return '', ''
+    return match.group(1), match.group(2) or ''
+
+
+def _is_safe(name: str, parameters: str) -> bool:
+    return name in _SAFE_EPS and not _REGEX_PARAMETER_REGEX.search(parameters)
+
+
+def _is_narrowing(name: str, parameters: str) -> bool:
+    """
+    Returns True if the event processor propagates only the fields listed in its parameters,
+    so the fields not declared in the schema of the source are not propagated to the output.
+    """
+    if name == 'PASSTHROUGH':
+        return bool(_FIELDS_PARAMETER_REGEX.search(parameters)) and not _DROP_FIELDS_REGEX.search(parameters)
+    if name == 'TABLE':
+        return not _KEEP_INPUT_FIELDS_REGEX.search(parameters)
+    if name in _AGGREGATION_EPS:
+        return not _ALL_FIELDS_PARAMETER_REGEX.search(parameters)
+    return False
+
+
+def _parse_parameters(parameters: str):
+    """
+    Returns the list of the top-level (name, value) parameters of the event processor
+    or None if the parameters can't be parsed.
+    """
+    result = []
+    position = 0
+    while position < len(parameters):
+        match = _PARAMETER_REGEX.match(parameters, position)
+        if not match or match.end() == position:
+            return None
+        result.append((match.group(1), match.group(2)))
+        position = match.end()
+    return result
+
+
+def _get_used_fields(name: str, parameters: str) -> set:
+    """
+    Returns all identifiers from the event processor parameters that may be the names of the used fields.
+    """
+    allowed_parameters = _NOT_USING_FIELDS_EPS.get(name)
+    if allowed_parameters is not None and set(_PARAMETER_NAME_REGEX.findall(parameters)) <= allowed_parameters:
+        # values of the fields are not used, and if the fields are used by the next nodes,
+        # they will be found in their parameters
+        return set()
+    parsed = _parse_parameters(parameters)
+    if parsed is None:
+        return set(_IDENTIFIER_REGEX.findall(parameters))
+    fields = set()
+    for _, value in parsed:
+        if value in _BOOLEAN_VALUES:
+            continue
+        # names of the parameters, functions and the types of the declared fields are not the fields
+        fields.update(_NOT_FUNCTION_IDENTIFIER_REGEX.findall(_TYPE_DECLARATION_REGEX.sub('', value)))
+    return fields
+
+
+def _reaches_output(source_key, successors: dict, eps: dict, output_key) -> bool:
+    """
+    Returns True if the output of the graph can be reached from the source
+    without passing through the nodes propagating only the explicitly listed fields.
+    """
+    visited = set()
+    stack = [source_key]
+    while stack:
+        key = stack.pop()
+        if key in visited:
+            continue
+        visited.add(key)
+        if key != source_key and _is_narrowing(*_parse_ep(eps[key])):
+            continue
+        if key == output_key:
+            return True
+        stack.extend(successors[key])
+    return False
+
+
+def get_pruned_fields(rules: list, eps: dict, source_keys, output_key, output_fields) -> dict:
+    """
+    Calculate the fields that must be propagated by the sources of the graph.
+
+    Parameters
+    ----------
+    rules: list
+        Rules of the nodes history of the graph.
+    eps: dict
+        Mapping from the node key to the event processor object of the built graph.
+    source_keys:
+        Keys of the sources' placeholder nodes.
+    output_key:
+        Key of the output node of the graph.
+    output_fields:
+        Names of the fields in the output of the graph.
+
+    Returns
+    -------
+    dict
+        Mapping from the source key to the set of fields it must propagate.
+        Sources that can't be pruned safely, including the ones propagating all their fields to the output,
+        are not included.
+    """
+    successors = defaultdict(set)
+    for rule in rules:
+        if isinstance(rule, _Sink):
+            successors[rule.p_key].add(rule.key)
+        elif isinstance(rule, (_Source, _SourceByKey)):
+            successors[rule.key].add(rule.p_key)
+    named_nodes = {rule.key for rule in rules if isinstance(rule, _NodeName)}
+
+    result = {}
+    for source_key in source_keys:
+        if source_key not in eps or _parse_ep(eps[source_key]) != ('PASSTHROUGH', ''):
+            continue
+
+        downstream = set()
+        stack = list(successors[source_key])
+        while stack:
+            key = stack.pop()
+            if key not in downstream:
+                downstream.add(key)
+                stack.extend(successors[key])
+
+        # output of the named nodes can be requested by the user too
+        if downstream & named_nodes or source_key in named_nodes:
+            continue
+        # the source must be connected to the output, otherwise it may be the output of another branch
+        if output_key != source_key and output_key not in downstream:
+            continue
+        # the fields not declared in the schema of the source may be propagated to the output
+        if _reaches_output(source_key, successors, eps, output_key):
+            continue
+
+        fields = set(output_fields)
+        for key in downstream:
+            name, parameters = _parse_ep(eps[key])
+            if not _is_safe(name, parameters):
+                break
+            fields.update(_get_used_fields(name, parameters))
+        else:
+            result[source_key] = fields
+    return result
@@ -0,0 +1,250 @@
+"""
+Common subgraph elimination optimization of the query graph.
+
+Nodes of the graph that have the same event processor, parameters, tick types and symbols
+and are fed by the identical subgraphs produce the same output,
+so they are replaced with a single node connected to all consumers.
+"""
+import copy
+import hashlib
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from onetick.py.core._internal._nodes_history import _Sink, _Source, _SourceByKey, _NodeName
+
+
+# attributes of event processor objects that are not included in its string representation
+_EP_ATTRIBUTES = (
+    'tick_types_', 'symbols_', 'node_name_', 'input_pin_names_', 'output_pin_names_',
+    'process_node_locally_', 'output_data_',
+)
+# event processors with side effects must be executed for each branch
+_NOT_MERGEABLE_EP_PREFIXES = ('WRITE', 'SAVE_', 'DELETE', 'CALLBACK')
+
+
+@dataclass
+class CommonSubgraphsReport:
+    """
+    Result of the common subgraph elimination.
+    """
+    #: number of removed nodes
+    eliminated_nodes: int = 0
+    #: number of removed nodes without inputs, i.e. the data reads that are not executed anymore
+    saved_reads: int = 0
+
+
+def _get_edge(rule) -> Optional[tuple]:
+    """
+    Returns the edge created by the rule: (node key, (input pin, input node key, output pin of input node)).
+    """
+    if isinstance(rule, _Sink):
+        return rule.key, (rule.in_pin, rule.p_key, rule.p_out_pin)
+    if isinstance(rule, _Source):
+        return rule.p_key, (rule.p_in_pin, rule.key, rule.out_pin)
+    if isinstance(rule, _SourceByKey):
+        return rule.p_key, (None, rule.key, rule.out_pin)
+    return None
+
+
+def _get_inputs(rules: list) -> dict:
+    """
+    Returns mapping from node key to the list of its inputs: (input pin, input node key, output pin of input node).
+    """
+    inputs: defaultdict[uuid.UUID, list[tuple]] = defaultdict(list)
+    for rule in rules:
+        edge = _get_edge(rule)
+        if edge is not None and edge[1] not in inputs[edge[0]]:
+            inputs[edge[0]].append(edge[1])
+    return inputs
+
+
+def _get_node_description(ep, mergeable_only: bool = True) -> Optional[tuple]:
+    """
+    Returns the hashable description of the event processor or None if it can't be described fully.
+    If ``mergeable_only`` is set, None is also returned for the event processors with side effects.
+    """
+    description = [str(ep).strip()]
+    if mergeable_only and description[0].startswith(_NOT_MERGEABLE_EP_PREFIXES):
+        return None
+    for attr in _EP_ATTRIBUTES:
+        if not hasattr(ep, attr):
+            return None
+        value = getattr(ep, attr)
+        if isinstance(value, dict):
+            value = sorted(value.items())
+        elif isinstance(value, (list, tuple)):
+            value = [str(v) for v in value]
+        description.append(repr(value))
+    return tuple(description)
+
+
+class _SubgraphHasher:
+    """
+    Calculates the hashes of the subgraphs ending in the nodes of the graph described by the ``rules``.
+    The hash is None if some node of the subgraph can't be described fully
+    or, if ``mergeable_only`` is set, can't be merged with other nodes.
+    """
+
+    def __init__(self, rules: list, mergeable_only: bool = True):
+        self.mergeable_only = mergeable_only
+        self.eps: dict[uuid.UUID, Any] = {}
+        self.node_rules: defaultdict[uuid.UUID, list[str]] = defaultdict(list)
+        self.named: set[uuid.UUID] = set()
+        for rule in rules:
+            if isinstance(rule, (_Sink, _Source)):
+                self.eps.setdefault(rule.p_key, rule.p_ep)
+            if hasattr(rule, 'ep'):
+                self.eps.setdefault(rule.key, rule.ep)
+            if isinstance(rule, _NodeName):
+                # named nodes may be requested as outputs of the query
+                self.named.add(rule.key)
+            elif not isinstance(rule, (_Sink, _Source, _SourceByKey)):
+                # tick type and symbol rules
+                self.node_rules[rule.key].append(repr(getattr(rule, 'tt', getattr(rule, 'symbol', None))))
+        self.inputs = _get_inputs(rules)
+        self._hashes: dict[uuid.UUID, Optional[str]] = {}
+
+    def __call__(self, key) -> Optional[str]:
+        hashes = self._hashes
+        # iterative post-order traversal, graphs may be deep
+        stack = [key]
+        while stack:
+            current = stack[-1]
+            if current in hashes:
+                stack.pop()
+                continue
+            pending = [src for _, src, _ in self.inputs[current] if src not in hashes]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            description = None
+            if current in self.eps:
+                description = _get_node_description(self.eps[current], self.mergeable_only)
+            if description is None or (self.mergeable_only and current in self.named) or any(
+                hashes[src] is None for _, src, _ in self.inputs[current]
+            ):
+                hashes[current] = None
+                continue
+            sha = hashlib.sha256(repr(description).encode())
+            sha.update(repr(self.node_rules[current]).encode())
+            for in_pin, src, out_pin in self.inputs[current]:
+                sha.update(repr((in_pin, hashes[src], out_pin)).encode())
+            hashes[current] = sha.hexdigest()
+        return hashes[key]
+
+
+def graph_content_hash(rules: list, root_key) -> Optional[str]:
+    """
+    Returns the hash of the content of the graph described by the ``rules`` with the root node ``root_key``
+    or None if some node of the graph can't be described fully.
+
+    Unlike the keys of the nodes, the hash is the same for the identical graphs built separately.
+    """
+    hasher = _SubgraphHasher(rules, mergeable_only=False)
+    node_hashes = sorted(hasher(key) or '' for key in hasher.eps)
+    root_hash = hasher(root_key)
+    if root_hash is None or '' in node_hashes:
+        return None
+    sha = hashlib.sha256(root_hash.encode())
+    for node_hash in node_hashes:
+        sha.update(node_hash.encode())
+    return sha.hexdigest()
+
+
+def eliminate_common_subgraphs(rules: list) -> tuple[list, dict, CommonSubgraphsReport]:
+    """
+    Find identical subgraphs and rewrite the rules so that each of them is built only once.
+
+    Parameters
+    ----------
+    rules: list
+        Rules of the nodes history of the graph.
+
+    Returns
+    -------
+    tuple
+        New list of rules, mapping from the keys of the eliminated nodes to the keys of the remaining nodes
+        and the report.
+    """
+    get_hash = _SubgraphHasher(rules)
+    eps, inputs = get_hash.eps, get_hash.inputs
+
+    canonical: dict = {}
+    keys_map = {}
+    for key in eps:
+        node_hash = get_hash(key)
+        if node_hash is None:
+            continue
+        if node_hash in canonical:
+            keys_map[key] = canonical[node_hash]
+        else:
+            canonical[node_hash] = key
+
+    _keep_distinct_inputs(inputs, keys_map)
+
+    report = CommonSubgraphsReport(eliminated_nodes=len(keys_map),
+                                   saved_reads=sum(1 for key in keys_map if not inputs[key]))
+    if not keys_map:
+        return list(rules), keys_map, report
+
+    # the edges existing in the original graph are kept as is,
+    # the edges of the eliminated nodes are added only if they are not in the graph yet
+    edges = {_get_edge(rule) for rule in rules if _is_edge(rule) and not _is_remapped(rule, keys_map)}
+    new_rules = []
+    for rule in rules:
+        if not _is_edge(rule):
+            if rule.key in keys_map:
+                # the same rules are already applied to the remaining node
+                continue
+            new_rules.append(rule)
+            continue
+        if not _is_remapped(rule, keys_map):
+            new_rules.append(rule)
+            continue
+        new_rule = copy.copy(rule)
+        for key_param in rule.key_params:
+            key = getattr(rule, key_param)
+            setattr(new_rule, key_param, keys_map.get(key, key))
+        if isinstance(new_rule, (_Sink, _Source)):
+            new_rule.p_ep = eps[new_rule.p_key]
+        new_rule.ep = eps[new_rule.key]
+        edge = _get_edge(new_rule)
+        if edge in edges:
+            continue
+        edges.add(edge)
+        new_rules.append(new_rule)
+    return new_rules, keys_map, report
+
+
+def _keep_distinct_inputs(inputs: dict, keys_map: dict):
+    """
+    Remove the nodes from ``keys_map`` if after merging some remaining node gets the same input more than once,
+    e.g. when identical branches are merged together, the node must still get the ticks from both of them.
+    """
+    changed = True
+    while changed:
+        changed = False
+        for key, key_inputs in inputs.items():
+            if key in keys_map:
+                continue
+            seen: dict = {}
+            for in_pin, src, out_pin in key_inputs:
+                edge = (in_pin, keys_map.get(src, src), out_pin)
+                if edge not in seen:
+                    seen[edge] = src
+                    continue
+                for duplicate in (seen[edge], src):
+                    if duplicate in keys_map:
+                        del keys_map[duplicate]
+                        changed = True
+
+
+def _is_edge(rule) -> bool:
+    return isinstance(rule, (_Sink, _Source, _SourceByKey))
+
+
+def _is_remapped(rule, keys_map: dict) -> bool:
+    return any(getattr(rule, key_param) in keys_map for key_param in rule.key_params)
@@ -0,0 +1,339 @@
+"""
+Pre-flight estimation of the cost of the query.
+
+The data read by each database source of the graph is estimated from the archive stats of the database
+and the number of queried symbols.
+Event processors multiplying the work (per-tick subqueries, queries per group, cross joins) are reported separately.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+from onetick import py as otp
+from onetick.py import configuration, utils
+from onetick.py.otq import otq
+from onetick.py.utils import adaptive, adaptive_to_default, default
+from onetick.py.core._internal._column_pruning import _parse_ep
+from onetick.py.core._internal._common_subgraphs import _get_inputs
+from onetick.py.core._internal._manually_bound_value import _ManuallyBoundValue
+
+
+_READS_COLUMNS = ['DB', 'TICK_TYPE', 'SYMBOLS', 'START', 'END', 'TICKS', 'BYTES']
+_FAN_OUT_COLUMNS = ['EP', 'REASON', 'INPUT_TICKS', 'EXECUTIONS']
+_ALWAYS_TRUE_CRITERIA_REGEX = re.compile(r'\bJOIN_CRITERIA=(?:1 = 1\b|1,|1$|true\b)', re.IGNORECASE)
+
+
+@dataclass
+class QueryCostReport:
+    """
+    Estimated cost of the query returned by :py:meth:`Source.estimate_cost <onetick.py.Source.estimate_cost>`.
+    """
+
+    #: Estimated data read by each database source of the query.
+    #: Columns: ``DB``, ``TICK_TYPE``, ``SYMBOLS`` (number of symbol reads or None if unknown),
+    #: ``START``, ``END``, ``TICKS`` and ``BYTES`` (None if unknown).
+    reads: pd.DataFrame
+    #: Event processors multiplying the work of the query.
+    #: Columns: ``EP``, ``REASON``, ``INPUT_TICKS`` (estimated number of ticks read upstream of the node)
+    #: and ``EXECUTIONS`` (estimated number of executions of the nested query, None if unknown).
+    fan_out: pd.DataFrame
+    #: Parts of the query that could not be estimated.
+    notes: list[str] = field(default_factory=list)
+
+    @property
+    def ticks(self) -> int:
+        """
+        Estimated number of ticks read from the databases (only the known estimates are summed).
+        """
+        return int(self.reads['TICKS'].dropna().sum())
+
+    @property
+    def bytes(self) -> int:
+        """
+        Estimated number of bytes read from the databases (only the known estimates are summed).
+        """
+        return int(self.reads['BYTES'].dropna().sum())
+
+    @property
+    def complete(self) -> bool:
+        """
+        True if the data read by all database sources of the query was estimated.
+        """
+        return not self.notes and bool(self.reads[['TICKS', 'BYTES']].notna().all(axis=None))
+
+    def check_budget(self, max_ticks: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Raise ValueError if the estimated number of ticks or bytes read by the query exceeds the budget.
+        """
+        for name, value, limit in (('ticks', self.ticks, max_ticks), ('bytes', self.bytes, max_bytes)):
+            if limit is not None and value > limit:
+                raise ValueError(f'The query is estimated to read {value} {name}, '
+                                 f'which is more than the budget of {limit} {name}')
+
+    def __str__(self):
+        lines = [f'Estimated ticks: {self.ticks}', f'Estimated bytes: {self.bytes}']
+        if not self.reads.empty:
+            lines += ['', self.reads.to_string()]
+        if not self.fan_out.empty:
+            lines += ['', self.fan_out.to_string()]
+        lines += self.notes
+        return '\n'.join(lines)
+
+
+def _get_symbol_names(symbols) -> Optional[list[str]]:
+    """
+    Returns the names of the symbols or None if they are known only in runtime.
+    """
+    if isinstance(symbols, str):
+        if symbols.startswith('eval('):
+            return None
+        return [symbols]
+    if isinstance(symbols, otq.Symbol):
+        return [symbols.name]
+    if isinstance(symbols, pd.DataFrame):
+        if 'SYMBOL_NAME' not in symbols:
+            return None
+        return [str(symbol) for symbol in symbols['SYMBOL_NAME']]
+    if isinstance(symbols, (list, tuple)):
+        names = []
+        for symbol in symbols:
+            symbol_names = _get_symbol_names(symbol)
+            if symbol_names is None:
+                return None
+            names.extend(symbol_names)
+        return names
+    return None
+
+
+def _get_source_reads(source) -> list[tuple[str, Optional[list[str]]]]:
+    """
+    Returns the tick types read by the graph of the database source and the symbols bound to them.
+    """
+    eps: dict = {}
+    for rule in source.node().copy_rules():
+        rule.build(eps)
+    reads = []
+    for ep in eps.values():
+        tick_types = getattr(ep, 'tick_types_', None) or []
+        symbols = getattr(ep, 'symbols_', None) or []
+        for tick_type in tick_types:
+            reads.append((str(tick_type), _get_symbol_names(list(symbols)) if symbols else []))
+    return reads
+
+
+class _CostEstimator:
+
+    def __init__(self, source, symbols, start, end, timezone, context, query_properties):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.timezone = timezone
+        self.context = context
+        self.query_properties = query_properties
+        self.notes: list[str] = []
+        self._stats: dict = {}
+
+        if symbols is None:
+            self.query_symbols = None
+            self.query_symbols_count: Optional[int] = 1
+        else:
+            self.query_symbols = _get_symbol_names(symbols)
+            self.query_symbols_count = None if self.query_symbols is None else len(self.query_symbols)
+            if self.query_symbols is None:
+                self._note('symbols of the query are evaluated in runtime, all symbols of the databases are assumed')
+
+    def _note(self, note):
+        if note not in self.notes:
+            self.notes.append(note)
+
+    def estimate(self) -> QueryCostReport:
+        reads = []
+        ticks_by_source: dict = {}
+        for key, func in self.source._get_sources_base_ep_func().items():
+            if not func:
+                continue
+            source_reads = self._estimate_source(key, func())
+            reads.extend(source_reads)
+            ticks = [read[5] for read in source_reads]
+            ticks_by_source[key] = None if None in ticks else sum(ticks)
+        reads_df = pd.DataFrame(reads, columns=_READS_COLUMNS, dtype=object)
+        for column in ('START', 'END'):
+            reads_df[column] = pd.to_datetime(reads_df[column])
+        return QueryCostReport(
+            reads=reads_df,
+            fan_out=pd.DataFrame(self._fan_out(ticks_by_source), columns=_FAN_OUT_COLUMNS, dtype=object),
+            notes=self.notes,
+        )
+
+    def _get_time_range(self, key) -> tuple[pd.Timestamp, pd.Timestamp]:
+        start, end = self.source._get_sources_dates()[key]
+        if start is adaptive or start is None:
+            start = self.start
+        if end is adaptive or end is None:
+            end = self.end
+        return utils.to_naive_timestamp(start, self.timezone), utils.to_naive_timestamp(end, self.timezone)
+
+    def _get_unbound_symbols(self, key) -> tuple[Optional[list[str]], Optional[int]]:
+        """
+        Returns symbols of the database source if they are not set in the event processors
+        and the number of times these symbols are read.
+        """
+        bound = self.source._get_sources_symbols().get(key)
+        if isinstance(bound, _ManuallyBoundValue):
+            bound = bound.value
+        if bound is None or bound is adaptive or bound is adaptive_to_default:
+            if self.query_symbols is not None:
+                return self.query_symbols, 1
+            if self.query_symbols_count is None:
+                return None, 1
+            return [configuration.config.default_symbol], 1
+        # bound symbols are read for each unbound symbol of the query
+        return _get_symbol_names(bound), self.query_symbols_count
+
+    def _estimate_source(self, key, source) -> list[tuple]:
+        start, end = self._get_time_range(key)
+        unbound_symbols, unbound_repeat = self._get_unbound_symbols(key)
+        reads = []
+        for tick_type, symbols in _get_source_reads(source):
+            repeat: Optional[int] = unbound_repeat
+            if symbols == []:
+                symbols = unbound_symbols
+            else:
+                repeat = self.query_symbols_count
+            for db_tick_type in tick_type.split('+'):
+                if db_tick_type.startswith('expr('):
+                    self._note(f'tick type {tick_type} is evaluated in runtime and can not be estimated')
+                    continue
+                reads.extend(self._estimate_tick_type(db_tick_type, symbols, repeat, start, end))
+        return reads
+
+    def _estimate_tick_type(self, db_tick_type, symbols, repeat, start, end) -> list[tuple]:
+        db_name, _, tick_type = db_tick_type.rpartition('::')
+        symbols_by_db: dict = {}
+        if db_name:
+            symbols_by_db[db_name] = None if symbols is None else len(symbols)
+        elif symbols is None:
+            self._note(f'database of tick type {tick_type} is set by the symbols evaluated in runtime '
+                       'and can not be estimated')
+        else:
+            # database is taken from the symbol name
+            for symbol in symbols:
+                symbol_db, _, _ = symbol.rpartition('::')
+                if not symbol_db:
+                    self._note(f'database is not specified for tick type {tick_type} and symbol {symbol}')
+                    continue
+                symbols_by_db[symbol_db] = symbols_by_db.get(symbol_db, 0) + 1
+        reads = []
+        for db_name, symbols_count in symbols_by_db.items():
+            if symbols_count is not None and repeat is not None:
+                symbols_count *= repeat
+            elif symbols_count is None:
+                self._note(f'symbols of {db_name}::{tick_type} are evaluated in runtime, '
+                           'all symbols of the database are assumed')
+            ticks, size = self._estimate_read(db_name, symbols_count, start, end)
+            reads.append((db_name, tick_type, symbols_count, start, end, ticks, size))
+        return reads
+
+    def _estimate_read(self, db_name, symbols_count, start, end) -> tuple[Optional[int], Optional[int]]:
+        stats = self._get_archive_stats(db_name, start, end)
+        if stats is None:
+            return None, None
+        if stats.empty:
+            return 0, 0
+        ticks: Optional[float] = 0.0
+        size: Optional[float] = 0.0
+        for _, row in stats.iterrows():
+            fraction = 1.0
+            total_symbols = row.get('TOTAL_SYMBOLS', -1)
+            if symbols_count is not None and total_symbols > 0:
+                # stats are collected across all symbols of the archive
+                fraction = min(symbols_count / total_symbols, 1.0)
+            total_ticks = row.get('TOTAL_TICKS', -1)
+            total_size = row.get('TOTAL_SIZE', -1)
+            ticks = None if ticks is None or total_ticks < 0 else ticks + total_ticks * fraction
+            size = None if size is None or total_size < 0 else size + total_size * fraction
+        if ticks is None:
+            self._note(f'number of ticks is not stored in the archives of database {db_name}')
+        return (None if ticks is None else round(ticks)), (None if size is None else round(size))
+
+    def _get_archive_stats(self, db_name, start, end) -> Optional[pd.DataFrame]:
+        """
+        Returns archive stats of the database, empty dataframe if it has no data in the interval
+        and None if the stats are not available.
+        """
+        from onetick.py.db._inspection import DB
+
+        cache_key = (db_name, start, end)
+        if cache_key in self._stats:
+            return self._stats[cache_key]
+        db = DB(db_name, context=self.context)
+        stats = None
+        try:
+            stats = db.show_archive_stats(start=start, end=end, timezone=self.timezone,
+                                          query_properties=self.query_properties)
+            if stats.empty and db._show_loaded_time_ranges(start, end):
+                # e.g. memory or accelerator database
+                stats = None
+        except Exception as e:
+            otp.get_logger(__name__).info(f"Can't get archive stats of database {db_name}: {e}")
+        if stats is None:
+            self._note(f'archive stats are not available for database {db_name}')
+        self._stats[cache_key] = stats
+        return stats
+
+    def _fan_out(self, ticks_by_source: dict) -> list[tuple]:
+        rules = self.source.node().copy_rules()
+        inputs = _get_inputs(rules)
+        eps: dict = {}
+        for rule in rules:
+            if hasattr(rule, 'p_ep'):
+                eps.setdefault(rule.p_key, rule.p_ep)
+            if hasattr(rule, 'ep'):
+                eps.setdefault(rule.key, rule.ep)
+
+        # keys of the source nodes upstream of each node,
+        # calculated with iterative post-order traversal, because graphs may be deep
+        upstream_sources: dict = {}
+        stack = [self.source.node().key()]
+        while stack:
+            current = stack[-1]
+            if current in upstream_sources:
+                stack.pop()
+                continue
+            pending = [src for _, src, _ in inputs[current] if src not in upstream_sources]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            sources = {current} if current in ticks_by_source else set()
+            for _, src, _ in inputs[current]:
+                sources |= upstream_sources[src]
+            upstream_sources[current] = frozenset(sources)
+
+        fan_out = []
+        # nodes are in topological order
+        for key, sources in upstream_sources.items():
+            name, parameters = _parse_ep(eps.get(key, ''))
+            if name == 'JOIN_WITH_QUERY':
+                reason = 'the query is executed for each input tick'
+            elif name == 'GROUP_BY':
+                reason = 'the query is executed for each group'
+            elif name == 'JOIN' and _ALWAYS_TRUE_CRITERIA_REGEX.search(parameters):
+                reason = 'all pairs of ticks with the same timestamp are joined'
+            else:
+                continue
+            ticks = [ticks_by_source[source_key] for source_key in sources]
+            input_ticks = None if None in ticks else sum(ticks)
+            executions = input_ticks if name == 'JOIN_WITH_QUERY' else None
+            fan_out.append((name, reason, input_ticks, executions))
+        return fan_out
+
+
+def estimate_query_cost(source, symbols=None, start=None, end=None, timezone=None,
+                        context=default, query_properties=None) -> QueryCostReport:
+    """
+    Estimate the data read by the ``source`` executed with ``symbols`` for [``start``, ``end``) interval.
+    """
+    return _CostEstimator(source, symbols, start, end, timezone, context, query_properties).estimate()
@@ -0,0 +1,214 @@
+"""
+Compact encoding of the calculation graph of :class:`onetick.py.Source` used for pickling.
+
+The history of the node is a list of rules referencing EPs and node keys.
+The same EPs, keys and rules are referenced many times: by several rules,
+by the branches merged into the source and by the base sources,
+so they are stored once in the tables and the rules reference them by index.
+EPs in the rules are connected to the graph, only their disconnected copies are stored,
+that's enough, because the graph is always built from the copies of the EPs in the rules.
+EPs are stored as the attributes that differ from the EP of the same class created with the default parameters,
+most of the parameters of EPs are left default, so this takes several times less space than pickling EPs.
+
+The names of the nested queries are generated by each process independently,
+so the restored nested queries get the new names and the references to them are changed.
+"""
+import uuid
+
+from onetick.py.core._source.tmp_otq import TmpOtq, rename_references
+from onetick.py.core._internal._nodes_history import (
+    _Assign, _TickType, _Symbol, _NodeName, _Sink, _Source, _SourceByKey, _NodesHistory,
+)
+from onetick.py.core._internal._proxy_node import _ProxyNode
+
+
+# must be changed each time the format of the encoding is changed
+FORMAT_VERSION = 2
+
+# the order of the fields is the order of the parameters of the constructor of the rule
+_RULE_FIELDS: dict[type, tuple[str, ...]] = {
+    _Assign: ('ep', 'key'),
+    _TickType: ('ep', 'key', 'tt'),
+    _Symbol: ('ep', 'key', 'symbol'),
+    _NodeName: ('key', 'name'),
+    _Sink: ('p_ep', 'p_key', 'p_out_pin', 'ep', 'key', 'in_pin'),
+    _Source: ('p_ep', 'p_key', 'p_in_pin', 'ep', 'key', 'out_pin'),
+    _SourceByKey: ('p_key', 'ep', 'key', 'out_pin'),
+}
+_RULE_CLASSES = tuple(_RULE_FIELDS)
+_RULE_CODES: dict[type, int] = {cls: code for code, cls in enumerate(_RULE_CLASSES)}
+
+# the state of the source is stored as the tuple of the values of these fields,
+# so the names of the fields are not repeated for each source of the graph
+STATE_FIELDS = (
+    'node', 'schema', 'dates', 'modify_query_times', 'base_eps', 'symbols', 'has_output', 'name', 'hash',
+    'state_vars', 'tmp_otq', 'query_parameters', 'properties',
+)
+
+# identifier of the node is generated when EP is created and is different for each EP
+_NODE_INDEX = 'node_index'
+
+
+def _without_node_index(value):
+    if isinstance(value, dict) and _NODE_INDEX in value:
+        return {k: v for k, v in value.items() if k != _NODE_INDEX}
+    return value
+
+
+def _ep_state(ep) -> dict:
+    # EPs can define __slots__, then the state is the tuple of the dict and the slots
+    state = ep.__getstate__()
+    if isinstance(state, tuple):
+        return {k: v for part in state if part for k, v in part.items()}
+    return dict(state or {})
+
+
+def _same(value, default) -> bool:
+    return value is default or (type(value) is type(default) and value == default)
+
+
+class Encoder:
+    """
+    Collects the tables of EPs, keys and rules of the encoded graph.
+    """
+
+    def __init__(self):
+        self.eps: list = []
+        self.keys: list[bytes] = []
+        self.rules: list[tuple] = []
+        self.tmp_query_names: set[str] = set()
+        self._ep_ids: dict[int, int] = {}
+        self._key_ids: dict = {}
+        self._rule_ids: dict[int, int] = {}
+        self._defaults: dict[type, dict] = {}
+        # encoded objects are kept alive, so their ids are not reused during the encoding
+        self._objects: list = []
+
+    def ep(self, ep) -> int:
+        index = self._ep_ids.get(id(ep))
+        if index is None:
+            index = self._ep_ids[id(ep)] = len(self.eps)
+            self.eps.append(self._encode_ep(ep.copy()))
+            self._objects.append(ep)
+        return index
+
+    def _encode_ep(self, ep):
+        cls = type(ep)
+        defaults = self._defaults.get(cls)
+        if defaults is None:
+            # the copy is created the same way as the encoded one
+            defaults = self._defaults[cls] = _ep_state(cls().copy())
+        changed = {}
+        for name, value in _ep_state(ep).items():
+            value = _without_node_index(value)
+            if name not in defaults or not _same(value, _without_node_index(defaults[name])):
+                changed[name] = value
+        return cls, changed
+
+    def key(self, key) -> int:
+        index = self._key_ids.get(key)
+        if index is None:
+            index = self._key_ids[key] = len(self.keys)
+            self.keys.append(key.bytes)
+        return index
+
+    def rule(self, rule) -> int:
+        index = self._rule_ids.get(id(rule))
+        if index is not None:
+            return index
+        values = [_RULE_CODES[type(rule)]]
+        for field in _RULE_FIELDS[type(rule)]:
+            value = getattr(rule, field)
+            if field in rule.key_params:
+                value = self.key(value)
+            elif field.endswith('ep'):
+                value = self.ep(value)
+            values.append(value)
+        index = self._rule_ids[id(rule)] = len(self.rules)
+        self.rules.append(tuple(values))
+        self._objects.append(rule)
+        return index
+
+    def node(self, node: _ProxyNode) -> tuple:
+        rules = [self.rule(rule) for rule in node.copy_rules()]
+        return rules, self.key(node.key()), node.out_pin()
+
+    def tmp_queries(self, queries: dict) -> dict:
+        self.tmp_query_names.update(queries)
+        return queries
+
+    def state(self, state: dict) -> tuple:
+        return tuple(state[name] for name in STATE_FIELDS)
+
+    def tables(self) -> tuple:
+        return self.eps, self.keys, self.rules, sorted(self.tmp_query_names)
+
+
+class Decoder:
+    """
+    Restores the objects from the tables collected by :class:`Encoder`.
+    """
+
+    def __init__(self, tables: tuple):
+        eps, keys, self._rules, tmp_query_names = tables
+        # old name of the nested query -> new name of the query in this process
+        self.renames = TmpOtq.restored_names(tmp_query_names)
+        self._renamed: set = set()
+        self.eps = [self._decode_ep(ep) for ep in eps]
+        self.keys = [uuid.UUID(bytes=key) for key in keys]
+        self._decoded_rules: dict[int, object] = {}
+
+    def _rename(self, value):
+        # each object is processed once, so the new names are not renamed again
+        return rename_references(value, self.renames, self._renamed)
+
+    def _decode_ep(self, encoded):
+        cls, changed = encoded
+        ep = cls().copy()
+        for name, value in changed.items():
+            value = self._rename(value)
+            default = getattr(ep, name, None)
+            if isinstance(default, dict) and _NODE_INDEX in default:
+                value = {**value, _NODE_INDEX: default[_NODE_INDEX]}
+            setattr(ep, name, value)
+        return ep
+
+    def key(self, index: int):
+        return self.keys[index]
+
+    def state(self, encoded: tuple) -> dict:
+        state = {name: self._rename(value) for name, value in zip(STATE_FIELDS, encoded)}
+        state['tmp_otq'] = {self.renames.get(name, name): query for name, query in state['tmp_otq'].items()}
+        return state
+
+    def rule(self, index: int):
+        rule = self._decoded_rules.get(index)
+        if rule is None:
+            code, *values = self._rules[index]
+            cls = _RULE_CLASSES[code]
+            for i, field in enumerate(_RULE_FIELDS[cls]):
+                if field in cls.key_params:
+                    values[i] = self.keys[values[i]]
+                elif field.endswith('ep'):
+                    values[i] = self.eps[values[i]]
+                else:
+                    values[i] = self._rename(values[i])
+            # the same rule objects are shared by the decoded sources, like in the original ones
+            rule = self._decoded_rules[index] = cls(*values)
+        return rule
+
+    def node(self, encoded: tuple) -> _ProxyNode:
+        """
+        Returns the node with the encoded history.
+        Its EPs are not connected, the node must be passed to the constructor of the source to build the graph.
+        """
+        rules, key, out_pin = encoded
+        node = _ProxyNode.__new__(_ProxyNode)
+        node._hist = _NodesHistory()
+        node._hist._rules = [self.rule(rule) for rule in rules]
+        node._key = self.keys[key]
+        node._out_pin = out_pin
+        node._name = ''
+        node._refresh_func = None
+        node._ep = None
+        return node
@@ -1,12 +1,19 @@
-from typing import TYPE_CHECKING
+import datetime
+from typing import TYPE_CHECKING, Optional
+
+import pandas as pd
 
 from onetick import py as otp
+from onetick.py import configuration, utils
 
 if TYPE_CHECKING:
     import pandas
     from onetick.py.core.source import Source
 
 
+_DEFAULT_PREVIEW_WINDOW = datetime.timedelta(hours=1)
+
+
 def plot(self: 'Source', y, x='Time', kind='line', **kwargs):
     """
     Executes the query with known properties and builds a plot resulting dataframe.
@@ -32,7 +39,7 @@ def plot(self: 'Source', y, x='Time', kind='line', **kwargs):
     return result[[y, x]]().plot(x=x, y=y, kind=kind, **kwargs)
 
 
-def count(self: 'Source', **kwargs) -> int:
+def count(self: 'Source', use_archive_stats: bool = False, **kwargs) -> int:
     """
     Returns the number of ticks in the query.
 
@@ -42,6 +49,18 @@ def count(self: 'Source', **kwargs) -> int:
 
     Parameters
     ----------
+    use_archive_stats: bool, default=False
+        If True and the query is an unmodified :py:class:`otp.DataSource <onetick.py.DataSource>`,
+        the number of ticks is *estimated* from the archive stats
+        (see :py:meth:`show_archive_stats <onetick.py.db._inspection.DB.show_archive_stats>`)
+        without reading the ticks.
+        Archive stats are collected across all symbols of the database,
+        so the total number of ticks is scaled by the share of the queried symbols in them,
+        as in :py:meth:`estimate_cost`.
+        Note that archive stats are also collected for the whole archives intersecting the queried interval
+        and across all tick types of the database, so the result is not exact.
+        If archive stats are not available for the database (e.g. older archives or memory databases)
+        or the symbols are evaluated in runtime, the ticks are counted by executing the query.
     kwargs
         parameters that will be passed to :py:func:`otp.run <onetick.py.run>`
 
@@ -66,7 +85,17 @@ def count(self: 'Source', **kwargs) -> int:
     >>> data = otp.Empty()
     >>> data.count()
     0
+
+    Estimate the number of ticks of the symbols for the day without reading them:
+
+    >>> data = otp.DataSource('US_COMP_SAMPLE', tick_type='TRD')
+    >>> data.count(use_archive_stats=True, symbols=['AAPL', 'MSFT'], date=otp.dt(2024, 2, 1))  # doctest: +SKIP
+    461202
     """
+    if use_archive_stats:
+        ticks_count = _count_from_archive_stats(self, kwargs)
+        if ticks_count is not None:
+            return ticks_count
     result = self.copy()
     df = otp.run(result.agg({'__num_rows': otp.agg.count()}), **kwargs)
     if df.empty:
@@ -74,7 +103,61 @@ def count(self: 'Source', **kwargs) -> int:
     return int(df['__num_rows'][0])
 
 
-def head(self: 'Source', n=5, **kwargs) -> 'pandas.DataFrame':
+def estimate_cost(self: 'Source', symbols=None, start=utils.adaptive, end=utils.adaptive, date=None,
+                  timezone=None, context=utils.default, query_properties: Optional[dict] = None):
+    """
+    Estimates the amount of data the query would read from the databases *without executing it*.
+
+    The graph of the query is traversed and for each :py:class:`otp.DataSource <onetick.py.DataSource>`
+    the number of ticks and bytes read is estimated from the archive stats of the database
+    (see :py:meth:`show_archive_stats <onetick.py.db._inspection.DB.show_archive_stats>`)
+    proportionally to the number of queried symbols.
+    Symbols bound to the sources are read for each symbol of the query.
+
+    Also the event processors that multiply the work of the query are reported:
+    :py:meth:`join_with_query` executing the query for each input tick,
+    :py:meth:`process_by_group` executing the query for each group
+    and :py:func:`otp.join <onetick.py.join>` with always true condition.
+
+    Note that archive stats are collected across all tick types of the database,
+    so the estimates are the upper bounds of the data read for the tick type.
+    If archive stats are not available (e.g. older archives or memory databases)
+    or the symbols are evaluated in runtime, the reason is added to the notes of the report.
+
+    Parameters
+    ----------
+    symbols, start, end, date, timezone, context, query_properties
+        The same parameters as in :py:func:`otp.run <onetick.py.run>`.
+
+    Returns
+    -------
+    :py:class:`~onetick.py.core._internal._cost_estimation.QueryCostReport`
+
+    See Also
+    --------
+    | :py:attr:`otp.config.query_budget_ticks<onetick.py.configuration.Config.query_budget_ticks>`
+    | :py:attr:`otp.config.query_budget_bytes<onetick.py.configuration.Config.query_budget_bytes>`
+
+    Examples
+    --------
+    >>> data = otp.DataSource('US_COMP_SAMPLE', tick_type='TRD')
+    >>> report = data.estimate_cost(symbols=['AAPL', 'MSFT'], date=otp.dt(2024, 2, 1))  # doctest: +SKIP
+    >>> report.ticks  # doctest: +SKIP
+    461202
+    >>> report.reads  # doctest: +SKIP
+                   DB TICK_TYPE SYMBOLS      START        END   TICKS     BYTES
+    0  US_COMP_SAMPLE       TRD       2 2024-02-01 2024-02-02  461202  5986185
+    """
+    from onetick.py.core._internal._cost_estimation import estimate_query_cost
+
+    if timezone is None:
+        timezone = configuration.config.tz
+    start, end = _get_time_range(self, {'start': start, 'end': end, 'date': date}, timezone)
+    return estimate_query_cost(self, symbols=symbols, start=start, end=end, timezone=timezone,
+                               context=context, query_properties=query_properties)
+
+
+def head(self: 'Source', n=5, preview: bool = False, preview_window=None, **kwargs) -> 'pandas.DataFrame':
     """
     *Executes the query* and returns first ``n`` ticks as a pandas dataframe.
 
@@ -84,12 +167,25 @@ def head(self: 'Source', n=5, **kwargs) -> 'pandas.DataFrame':
     ----------
     n: int, default=5
         number of ticks to return
+    preview: bool, default=False
+        If True, the query is not executed for the whole time range at once.
+        Instead it is executed for the progressively expanding (doubling) sub-windows
+        from the start of the time range, and the execution stops as soon as ``n`` ticks are collected
+        for each symbol. Symbols are processed in the same query, so they are still processed in parallel,
+        but the symbols that already have ``n`` ticks are not queried for the next sub-windows.
+
+        Note that the results are the same as in non-preview mode only
+        if the ticks in the sub-window don't depend on the ticks outside of it,
+        e.g. the query doesn't have aggregations or state variables.
+        Only string or list of strings can be used as ``symbols`` in this mode.
+    preview_window: :py:class:`datetime.timedelta`, optional
+        The size of the first sub-window in preview mode. Default is one hour.
     kwargs:
         parameters will be passed to :py:func:`otp.run <onetick.py.run>`
 
     Returns
     -------
-    :pandas:`DataFrame <pandas.DataFrame>`
+    :pandas:`DataFrame <pandas.DataFrame>` or dict of them
 
     See Also
     --------
@@ -109,13 +205,21 @@ def head(self: 'Source', n=5, **kwargs) -> 'pandas.DataFrame':
     2 c
     3 d
     4 e
+
+    Get first ticks of each symbol without reading the whole time range:
+
+    >>> data = otp.DataSource('US_COMP_SAMPLE', tick_type='TRD')
+    >>> data.head(symbols=['AAPL', 'MSFT'], start=otp.dt(2024, 2, 1), end=otp.dt(2024, 3, 1),
+    ...           preview=True)  # doctest: +SKIP
     """
+    if preview:
+        return _preview(self, n, from_end=False, window=preview_window, kwargs=kwargs)
     result = self.copy()
     result = result.first(n=n)  # pylint: disable=E1123
     return otp.run(result, **kwargs)
 
 
-def tail(self: 'Source', n=5, **kwargs) -> 'pandas.DataFrame':
+def tail(self: 'Source', n=5, preview: bool = False, preview_window=None, **kwargs) -> 'pandas.DataFrame':
     """
     *Executes the query* and returns last ``n`` ticks as a pandas dataframe.
 
@@ -125,12 +229,25 @@ def tail(self: 'Source', n=5, **kwargs) -> 'pandas.DataFrame':
     ----------
     n: int
         number of ticks to return
+    preview: bool, default=False
+        If True, the query is not executed for the whole time range at once.
+        Instead it is executed for the progressively expanding (doubling) sub-windows
+        from the end of the time range, and the execution stops as soon as ``n`` ticks are collected
+        for each symbol. Symbols are processed in the same query, so they are still processed in parallel,
+        but the symbols that already have ``n`` ticks are not queried for the next sub-windows.
+
+        Note that the results are the same as in non-preview mode only
+        if the ticks in the sub-window don't depend on the ticks outside of it,
+        e.g. the query doesn't have aggregations or state variables.
+        Only string or list of strings can be used as ``symbols`` in this mode.
+    preview_window: :py:class:`datetime.timedelta`, optional
+        The size of the first sub-window in preview mode. Default is one hour.
     kwargs:
         parameters will be passed to :py:func:`otp.run <onetick.py.run>`
 
     Returns
     -------
-    :pandas:`DataFrame <pandas.DataFrame>`
+    :pandas:`DataFrame <pandas.DataFrame>` or dict of them
 
     See Also
     --------
@@ -149,7 +266,134 @@ def tail(self: 'Source', n=5, **kwargs) -> 'pandas.DataFrame':
     2 g
     3 i
     4 k
+
+    Get last ticks of each symbol without reading the whole time range:
+
+    >>> data = otp.DataSource('US_COMP_SAMPLE', tick_type='TRD')
+    >>> data.tail(symbols=['AAPL', 'MSFT'], start=otp.dt(2024, 2, 1), end=otp.dt(2024, 3, 1),
+    ...           preview=True)  # doctest: +SKIP
     """
+    if preview:
+        return _preview(self, n, from_end=True, window=preview_window, kwargs=kwargs)
     result = self.copy()
     result = result.last(n=n)  # pylint: disable=E1123
     return otp.run(result, **kwargs)
+
+
+def _get_time_range(self: 'Source', kwargs: dict, timezone) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    Pop time range parameters from otp.run ``kwargs`` and
+    return the time range the query would be executed for.
+    """
+    start = kwargs.pop('start', utils.adaptive)
+    end = kwargs.pop('end', utils.adaptive)
+    date = kwargs.pop('date', None)
+    if date is not None:
+        start = otp.date(date)
+        end = start + otp.Day(1)
+    sources_start, sources_end = self._get_widest_time_range()
+    if start is utils.adaptive or start is None:
+        start = sources_start or configuration.config.get('default_start_time')
+    if end is utils.adaptive or end is None:
+        end = sources_end or configuration.config.get('default_end_time')
+    if start is None or end is None:
+        raise ValueError('Start and end time of the query must be set')
+    return utils.to_naive_timestamp(start, timezone), utils.to_naive_timestamp(end, timezone)
+
+
+def _preview_windows(start: pd.Timestamp, end: pd.Timestamp, window: datetime.timedelta, from_end: bool):
+    """
+    Generate adjacent sub-windows of [``start``, ``end``) interval, doubling the size of each next one.
+    """
+    while start < end:
+        if from_end:
+            window_start = max(start, end - window)
+            yield window_start, end
+            end = window_start
+        else:
+            window_end = min(end, start + window)
+            yield start, window_end
+            start = window_end
+        window *= 2
+
+
+def _preview(self: 'Source', n: int, from_end: bool, window: Optional[datetime.timedelta], kwargs: dict):
+    from onetick.py.core.source import _is_dict_required
+
+    symbols = kwargs.pop('symbols', None)
+    if symbols is not None and not isinstance(symbols, str) and not (
+        isinstance(symbols, (list, tuple)) and all(isinstance(symbol, str) for symbol in symbols)
+    ):
+        raise ValueError('Only string or list of strings can be used as symbols in preview mode')
+    require_dict = kwargs.pop('require_dict', False) or _is_dict_required(symbols)
+    if window is None:
+        window = _DEFAULT_PREVIEW_WINDOW
+    window = pd.Timedelta(window)
+    if window <= pd.Timedelta(0):
+        raise ValueError(f"Parameter 'preview_window' must be positive, got {window}")
+
+    timezone = kwargs.get('timezone', utils.default)
+    if timezone is utils.default:
+        timezone = configuration.config.tz
+    start, end = _get_time_range(self, kwargs, timezone)
+
+    query = self.copy()
+    # sub-windows are set with otp.run parameters, so the time ranges of the sources must not override them
+    sources_dates = query._get_sources_dates()
+    for key, (source_start, source_end) in sources_dates.items():
+        for value, bound in ((source_start, start), (source_end, end)):
+            if value is not utils.adaptive and utils.to_naive_timestamp(value, timezone) != bound:
+                raise ValueError("Preview mode can't be used for queries with sources having different time ranges")
+        sources_dates[key] = (utils.adaptive, utils.adaptive)
+    query = query.last(n=n) if from_end else query.first(n=n)  # pylint: disable=E1123
+
+    results: dict[str, list] = {}
+    pending = list(symbols) if isinstance(symbols, (list, tuple)) else symbols
+    for window_start, window_end in _preview_windows(start, end, window, from_end):
+        res = otp.run(query, symbols=pending, start=window_start, end=window_end, require_dict=True, **kwargs)
+        for symbol, df in res.items():
+            if from_end:
+                results.setdefault(symbol, []).insert(0, df)
+            else:
+                results.setdefault(symbol, []).append(df)
+        collected = {symbol: sum(len(df) for df in dfs) >= n for symbol, dfs in results.items()}
+        if isinstance(pending, list):
+            pending = [symbol for symbol in pending if not collected.get(symbol, False)]
+            if not pending:
+                break
+        elif all(collected.values()):
+            break
+
+    result = {}
+    for symbol, dfs in results.items():
+        df = utils.concat_dataframes(dfs)
+        result[symbol] = df.tail(n).reset_index(drop=True) if from_end else df.head(n)
+    if not require_dict and len(result) == 1:
+        return next(iter(result.values()))
+    return result
+
+
+def _count_from_archive_stats(self: 'Source', kwargs: dict) -> Optional[int]:
+    """
+    Returns the number of ticks estimated from archive stats if it is possible for this query, otherwise None.
+    """
+    from onetick.py.core._internal._cost_estimation import estimate_query_cost
+
+    if not isinstance(self, otp.DataSource):
+        return None
+    # unmodified data source has only the initial node in its history
+    if len(self.node()._hist._rules) > 1:
+        return None
+
+    kwargs = kwargs.copy()
+    timezone = kwargs.get('timezone', utils.default)
+    if timezone is utils.default:
+        timezone = configuration.config.tz
+    start, end = _get_time_range(self, kwargs, timezone)
+    # archive stats are scaled by the number of queried symbols the same way as in the cost estimation
+    report = estimate_query_cost(self, symbols=kwargs.get('symbols'), start=start, end=end, timezone=timezone,
+                                 context=kwargs.get('context', utils.default),
+                                 query_properties=kwargs.get('query_properties'))
+    if report.notes or report.reads.empty or report.reads['TICKS'].isna().any():
+        return None
+    return report.ticks
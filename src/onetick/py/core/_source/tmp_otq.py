@@ -1,4 +1,9 @@
+import hashlib
 import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
 
 from onetick.py.otq import otq, _tmp_otq_path, otli, pyomd
 from pandas import Timestamp as pd_Timestamp
@@ -6,7 +11,7 @@ from onetick.py.types import datetime as otp_datetime, datetime2expr
 from datetime import datetime, date
 from onetick.py import utils
 from onetick.py.configuration import config
-from onetick.py.log import get_debug_logger
+from onetick.py.log import get_debug_logger, get_logger
 from .query_parameters import _ExtendedQueryParameters
 
 
@@ -28,6 +33,65 @@ def is_millisecond_precision(dt):
     return True
 
 
+_THIS_REFERENCE_REGEX = re.compile(r'THIS::(\w+)')
+
+
+def _is_plain_value(value) -> bool:
+    # values with reliable and complete repr, that can be used in the content hash
+    if value is None or isinstance(value, (str, int, float, bool)) or is_datetime_type(value):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain_value(v) for v in value)
+    if isinstance(value, dict):
+        return all(_is_plain_value(k) and _is_plain_value(v) for k, v in value.items())
+    return False
+
+
+def rename_references(value, renames: dict[str, str], visited: set):
+    """
+    Replaces the references to the queries of the storage (THIS::<name>) in the ``value`` according to ``renames``.
+
+    Strings in the lists, tuples and dictionaries and in the attributes of onetick.query objects
+    (event processors, graphs, symbols) are replaced in place, the new value is returned for strings and tuples.
+    Objects from ``visited`` are not processed again.
+    """
+    if not renames:
+        return value
+    if isinstance(value, str):
+        if 'THIS::' not in value:
+            return value
+        return _THIS_REFERENCE_REGEX.sub(
+            lambda match: f'THIS::{renames.get(match.group(1), match.group(1))}', value
+        )
+    if isinstance(value, type) or id(value) in visited:
+        return value
+    if isinstance(value, tuple):
+        if type(value) is not tuple:
+            return value
+        new_tuple = tuple(rename_references(v, renames, visited) for v in value)
+        return value if all(new is old for new, old in zip(new_tuple, value)) else new_tuple
+    visited.add(id(value))
+    if isinstance(value, list):
+        for i, v in enumerate(value):
+            value[i] = rename_references(v, renames, visited)
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            value[k] = rename_references(v, renames, visited)
+    elif type(value).__module__.startswith('onetick.query'):
+        # event processors, graphs and symbols of onetick.query
+        attributes = dict(getattr(value, '__dict__', {}))
+        for cls in type(value).__mro__:
+            slots = getattr(cls, '__slots__', ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if not name.startswith('__') and hasattr(value, name):
+                    attributes[name] = getattr(value, name)
+        for name, v in attributes.items():
+            new_value = rename_references(v, renames, visited)
+            if new_value is not v:
+                setattr(value, name, new_value)
+    return value
+
+
 class TmpOtq:
     """
     Class that represents a storage of temporary queries
@@ -59,15 +123,42 @@ class TmpOtq:
             self.__n += 1
             return s
 
+        def rename(self, s):
+            """
+            Returns the new string instead of the string ``s`` (possibly followed by a suffix)
+            produced by another instance, e.g. in another process.
+            The suffix (starting with the double underscore) is kept,
+            strings not produced by this class are returned as is.
+            """
+            prefix, suffix = s[:self.__length], s[self.__length:]
+            if len(prefix) != self.__length or not all(self.FIRST_CODE <= ord(c) <= self.LAST_CODE for c in prefix):
+                return s
+            if suffix and not suffix.startswith('__'):
+                return s
+            return self.get_str() + suffix
+
     name_generator = __iter_str()
+    # session-wide mapping from the content hash of the query to the generated name it was stored with,
+    # the least recently used hashes are removed when the mapping grows over the limit
+    names_by_content: 'OrderedDict[str, str]' = OrderedDict()
+    names_by_content_max_size = 10_000
+    # sources can be built in several threads, so the mapping is modified only under this lock
+    _names_by_content_lock = threading.Lock()
 
     def __init__(self):
         self.queries: dict[str, tuple] = {}
 
-    def add_query(self, query, suffix="", name=None, query_parameters: _ExtendedQueryParameters = None):
+    def add_query(self, query, suffix="", name=None, query_parameters: _ExtendedQueryParameters = None,
+                  content_hash: Optional[str] = None):
         """
         Adds query with a unique generated name to the storage.
 
+        If ``name`` is not specified, ``content_hash`` is set and the query with the same content hash,
+        parameters and suffix was recently added to any storage in this session, the name of that query is reused,
+        so identical queries are saved to the file only once
+        (see :py:attr:`otp.config.deduplicate_nested_queries
+        <onetick.py.configuration.Config.deduplicate_nested_queries>`).
+
         Parameters
         ----------
         query: otq.GraphQuery
@@ -79,18 +170,54 @@ class TmpOtq:
             and ``suffix`` parameter will be ignored.
         query_parameters: _ExtendedQueryParameters
             Can specify additional parameters with which this query will be saved to file.
+        content_hash: str, optional
+            Hash of the content of the ``query`` graph, the same for the identical graphs.
 
         Returns
         -------
             result: str , name of the query in the file (without THIS:: prefix).
         """
+        query_parameters = query_parameters or _ExtendedQueryParameters()
+        if name is None and content_hash is not None and config.deduplicate_nested_queries:
+            content_hash = self._content_hash(content_hash, suffix, query_parameters)
+        else:
+            content_hash = None
+        if content_hash is not None:
+            with self._names_by_content_lock:
+                name = self.names_by_content.get(content_hash)
+                if name is not None:
+                    self.names_by_content.move_to_end(content_hash)
+            if name is not None:
+                self.queries.setdefault(name, (query, query_parameters))
+                return name
+
         name = name or self.name_generator.get_str() + suffix
         if name in self.queries:
             raise ValueError(f"There is already a query with name '{name}' in {self.__class__.__name__} storage")
-        query_parameters = query_parameters or _ExtendedQueryParameters()
         self.queries[name] = (query, query_parameters)
+        if content_hash is not None:
+            with self._names_by_content_lock:
+                self.names_by_content[content_hash] = name
+                if len(self.names_by_content) > self.names_by_content_max_size:
+                    self.names_by_content.popitem(last=False)
         return name
 
+    @staticmethod
+    def _content_hash(graph_hash: str, suffix: str, query_parameters: _ExtendedQueryParameters) -> Optional[str]:
+        """
+        Returns the hash of the query graph, its parameters and the name suffix
+        or None if the parameters can't be hashed reliably.
+
+        The names of the nested queries referenced by the graph are already deduplicated,
+        so the same nested queries are referenced by the same names.
+        """
+        parameters = sorted(query_parameters.asdict().items())
+        if not _is_plain_value(parameters):
+            return None
+        sha = hashlib.sha256(graph_hash.encode())
+        sha.update(repr((suffix, parameters)).encode())
+        return sha.hexdigest()
+
     def merge(self, tmp_otq: 'TmpOtq'):
         """
         Adds queries from the tmp_otq storage to the current storage.
@@ -99,6 +226,16 @@ class TmpOtq:
         """
         self.queries.update(tmp_otq.queries)
 
+    @classmethod
+    def restored_names(cls, names) -> dict[str, str]:
+        """
+        Returns the mapping from the names of the queries of the unpickled source to their new names.
+        The names could be generated in another process and collide with the names generated in this one,
+        so the new names are generated for them.
+        The names specified explicitly are not changed.
+        """
+        return {name: cls.name_generator.rename(name) for name in names}
+
     def copy(self):
         """
         Creates a copy of the storage
@@ -62,6 +62,17 @@ class Column(_Operation):
             else:
                 raise ValueError("precision is supported only for columns with float or decimal dtypes")
 
+    @classmethod
+    def _create_validated(cls, name, dtype, obj_ref=None):
+        """
+        Create the column without validation of its name and type,
+        e.g. when copying the column of the existing source.
+        """
+        column = cls.__new__(cls)
+        column.name = name
+        _Operation.__init__(column, dtype=dtype, obj_ref=obj_ref, op_str=name)
+        return column
+
     def rename(self, new_name, update_parent_object=True):
         self._check_name(new_name)
         if self.obj_ref and update_parent_object:
@@ -1,20 +1,73 @@
+import hashlib
 import inspect
+import os
+import threading
+import time
 import types
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
 
 from onetick import py as otp
+from onetick.py import utils
+from onetick.py.core._csv_inspector import _convert_pandas_types
 from onetick.py.core._source._symbol_param import _SymbolParamColumn, _SymbolParamSource
-from onetick.py.core.column_operations.base import OnetickParameter
+from onetick.py.core.column_operations.base import OnetickParameter, Operation
 from onetick.py.core._source.query_parameters import QueryParameters
 
 
+class _MaterializedEvals:
+    """
+    Client-side storage of the results of the materialized evaluated queries.
+
+    At most ``max_size`` results are stored, the least recently used ones are removed.
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # key -> (expiration time or None, result)
+        self._results: 'OrderedDict[tuple, tuple[Optional[float], pd.DataFrame]]' = OrderedDict()
+
+    def get(self, key) -> Optional[pd.DataFrame]:
+        with self._lock:
+            stored = self._results.get(key)
+            if stored is None:
+                return None
+            expiration, result = stored
+            if expiration is not None and time.monotonic() >= expiration:
+                del self._results[key]
+                return None
+            self._results.move_to_end(key)
+            return result
+
+    def set(self, key, result: pd.DataFrame, ttl: Optional[float]):
+        expiration = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._results[key] = (expiration, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+_MATERIALIZED_EVALS = _MaterializedEvals()
+
+
 class _QueryEvalWrapper:
     def __init__(self, query, params=None, output_field=None, request_substitute_symbol=False,
-                 generate_separate_file_only=False):
+                 generate_separate_file_only=False, materialized=False, ttl=None):
         self.query = query
         self.params = params
         self.output_field = output_field
         self.request_substitute_symbol = request_substitute_symbol
         self.generate_separate_file_only = generate_separate_file_only
+        self.materialized = materialized
+        self.ttl = ttl
         self._inner_source = None
         if isinstance(query, otp.Source):
             self._inner_source = query
@@ -46,11 +99,23 @@ class _QueryEvalWrapper:
                        file_suffix='_eval_query.otq',
                        query_name='main_eval_query',
                        symbol_date=None,
-                       running=None) -> str:
+                       running=None,
+                       run_kwargs=None) -> str:
         """
         If self._inner_source is not None, then temporary query needs to be saved
-        or added to tmp_otq storage
+        or added to tmp_otq storage.
+
+        ``run_kwargs`` are the connection parameters of the main query
+        (context, username, alternative_username, password and query_properties),
+        the materialized query is run with them.
         """
+        if self.materialized:
+            # materialized results are passed to the server as a small source with constant ticks
+            source = self._get_materialized_source(start, end, timezone, run_kwargs)
+            return _QueryEvalWrapper(source, output_field=self.output_field).to_eval_string(
+                tmp_otq=tmp_otq, operation_suffix=operation_suffix, start=start, end=end, timezone=timezone,
+                file_suffix=file_suffix, query_name=query_name, symbol_date=symbol_date, running=running,
+            )
         if self._inner_source is not None:
             # if substitute symbol is requested, then we need to set an unbound symbol for query in eval
             # so that onetick can substitute it with the unbound symbol from the external query
@@ -75,6 +140,91 @@ class _QueryEvalWrapper:
                                                       running=running)
         return self._get_eval_string()
 
+    def materialize(self, ttl: Optional[float] = None) -> '_QueryEvalWrapper':
+        """
+        Returns the copy of this object that is evaluated on the client side.
+
+        The evaluated query is run once and its result is stored in memory,
+        next usages of the same query with the same time range, timezone, context, credentials
+        and query properties reuse the stored result instead of evaluating the query on the server again.
+        The result is passed to the main query as a small source with constant ticks.
+
+        The evaluated query is run with its own start and end time if they are set,
+        otherwise with the time range of the main query if it is used as symbols in
+        :py:func:`otp.run <onetick.py.run>`, otherwise with the default time range.
+
+        Parameters
+        ----------
+        ttl: float, optional
+            Number of seconds the result is reused for.
+            By default, the result is reused until the end of the python process.
+
+        Examples
+        --------
+        >>> universe = otp.eval(otp.Ticks(SYMBOL_NAME=['AAPL', 'MSFT'])).materialize(ttl=600)
+        >>> data = otp.Tick(X=1)
+        >>> otp.run(data, symbols=universe)  # doctest: +SKIP
+        {'AAPL':         Time  X
+        0 2003-12-01  1, 'MSFT':         Time  X
+        0 2003-12-01  1}
+        """
+        if self.request_substitute_symbol:
+            raise ValueError("Evaluated query using the symbol of the main query can't be materialized")
+        for name, value in (self.params or {}).items():
+            if isinstance(value, Operation):
+                raise ValueError(f"Evaluated query with parameter '{name}' depending on the main query "
+                                 "can't be materialized")
+            if name == '_CONTINUOUS' and value:
+                raise ValueError("Continuous evaluated query can't be materialized")
+        result = self.copy(self.output_field)
+        result.materialized = True
+        result.ttl = ttl
+        return result
+
+    def _get_materialized_source(self, start, end, timezone, run_kwargs=None) -> 'otp.Source':
+        run_kwargs = _materialized_run_kwargs(run_kwargs)
+        params = dict(self.params or {})
+        start = params.pop('_START_TIME', start)
+        end = params.pop('_END_TIME', end)
+        params.pop('_CONTINUOUS', None)
+        if start is None or start is utils.adaptive:
+            start = otp.config.default_start_time
+        if end is None or end is utils.adaptive:
+            end = otp.config.default_end_time
+        if timezone is None:
+            timezone = otp.config.tz
+
+        if self._inner_source is not None:
+            query = self._inner_source
+            query_id = self._inner_source._fingerprint(timezone=timezone)
+        else:
+            params = {**(self.query.params or {}), **params}
+            query = self.query.path
+            query_id = self.query.path
+            file_path = self.query.path.split('::')[0]
+            if os.path.exists(file_path):
+                query_id += f'@{os.path.getmtime(file_path)}'
+        password = run_kwargs['password']
+        key = (
+            query_id, repr(sorted(params.items())), str(start), str(end), timezone,
+            run_kwargs['context'], run_kwargs['username'], run_kwargs['alternative_username'],
+            # the password itself is not kept in the key
+            hashlib.sha256(password.encode()).hexdigest() if password is not None else None,
+            repr(sorted(run_kwargs['query_properties'].items())),
+        )
+
+        result = _MATERIALIZED_EVALS.get(key)
+        if result is None:
+            result = otp.run(query, start=start, end=end, timezone=timezone, query_params=params or None,
+                             **run_kwargs)
+            # results for all symbols are stored as a single dataframe
+            if isinstance(result, dict):
+                result = pd.concat(list(result.values()), ignore_index=True) if result else pd.DataFrame()
+            _MATERIALIZED_EVALS.set(key, result, self.ttl)
+        else:
+            otp.get_logger(__name__).debug(f'Using materialized result of the evaluated query {query_id}')
+        return _result_to_source(result)
+
     def to_symbol_param(self):
         if self._inner_source:
             return self._inner_source.to_symbol_param()
@@ -91,7 +241,9 @@ class _QueryEvalWrapper:
                                  params=self.params,
                                  output_field=output_field,
                                  request_substitute_symbol=self.request_substitute_symbol,
-                                 generate_separate_file_only=self.generate_separate_file_only)
+                                 generate_separate_file_only=self.generate_separate_file_only,
+                                 materialized=self.materialized,
+                                 ttl=self.ttl)
 
     def __getitem__(self, item):
         return self.copy(item)
@@ -115,6 +267,9 @@ def eval(query, symbol=None, start=None, end=None,
     Note that only constant expressions are allowed in query parameters,
     they must not depend on ticks.
 
+    If the same evaluated query is used by many queries, it can be evaluated on the client side only once
+    with ``materialize()`` method of the returned object.
+
     Parameters
     ----------
     query: :py:class:`onetick.py.Source`, :py:class:`onetick.py.query` or function
@@ -250,6 +405,39 @@ def eval(query, symbol=None, start=None, end=None,
                              generate_separate_file_only=generate_separate_file_only)
 
 
+def _materialized_run_kwargs(run_kwargs: Optional[dict]) -> dict:
+    """
+    Returns the connection parameters of the main query with default values from the config.
+    """
+    run_kwargs = run_kwargs or {}
+    context = run_kwargs.get('context')
+    query_properties = run_kwargs.get('query_properties')
+    if query_properties is not None and not isinstance(query_properties, dict):
+        query_properties = utils.query_properties_to_dict(query_properties)
+    return dict(
+        context=otp.config.context if context is None or context is utils.default else context,
+        username=run_kwargs.get('username') or otp.config.default_username,
+        alternative_username=run_kwargs.get('alternative_username') or otp.config.default_auth_username,
+        password=run_kwargs.get('password') or otp.config.default_password,
+        query_properties=dict(query_properties or {}),
+    )
+
+
+def _result_to_source(result: pd.DataFrame) -> 'otp.Source':
+    columns = [column for column in result.columns if column != 'Time']
+    if result.empty:
+        # the schema of the evaluated query is kept for the empty result
+        schema = {}
+        for column in columns:
+            dtype = result[column].dtype
+            try:
+                schema[column] = otp.types.np2type(dtype)
+            except ValueError:
+                schema[column] = _convert_pandas_types(dtype) or str
+        return otp.Empty(schema=schema)
+    return otp.Ticks({column: result[column].tolist() for column in columns})
+
+
 def prepare_params(**kwargs):
     converted_params = {}
     for key, value in kwargs.items():
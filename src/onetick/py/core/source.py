@@ -1,10 +1,11 @@
+import hashlib
 import os
 import re
 import uuid
 import warnings
 from collections import defaultdict
 from datetime import datetime, date
-from typing import Optional, Union
+from typing import Any, Optional, Union
 from pathlib import Path
 
 import pandas as pd
@@ -12,10 +13,14 @@ import pandas as pd
 from onetick.py.otq import otq
 from onetick import py as otp
 from onetick.py import types as ott
-from onetick.py import utils, configuration
+from onetick.py import utils, configuration, tracing, build_profiler
+from onetick.py.core._internal._column_pruning import get_pruned_fields
+from onetick.py.core._internal._common_subgraphs import eliminate_common_subgraphs, graph_content_hash
 from onetick.py.core._internal._manually_bound_value import _ManuallyBoundValue
 from onetick.py.core._internal._proxy_node import _ProxyNode
+from onetick.py.core._internal._state_objects import _StateBase
 from onetick.py.core._internal._state_vars import StateVars
+from onetick.py.core._internal import _serialization
 from onetick.py.core._source._symbol_param import _SymbolParamColumn, _SymbolParamSource
 from onetick.py.core._source.schema import Schema
 from onetick.py.core._source.symbol import Symbol
@@ -27,6 +32,55 @@ from onetick.py.core.eval_query import _QueryEvalWrapper
 from onetick.py.utils import adaptive, adaptive_to_default, default, render_otq
 from ._source.query_parameters import QueryParameters, _ExtendedQueryParameters
 
+# placeholder query time used when calculating hash of the graph
+_FINGERPRINT_TIME = datetime(1970, 1, 2)
+
+
+def _restore_source(cls, version: int, tables: tuple, state: tuple) -> 'Source':
+    """
+    Restores the source pickled with :meth:`Source.__reduce__`.
+    """
+    if version != _serialization.FORMAT_VERSION:
+        raise ValueError(f"Can't unpickle {cls.__name__} object: it was pickled with the format version {version}, "
+                         f"but this version of onetick-py supports only version {_serialization.FORMAT_VERSION}")
+    return cls._decode(_serialization.Decoder(tables), state)
+
+
+class _ValidatedSchema(dict):
+    """
+    Schema of the existing source passed to the constructor of its copy.
+
+    Names and types of its columns are already validated, so the checks are skipped.
+    """
+
+    def copy(self):
+        return _ValidatedSchema(self)
+
+
+_PROPERTY_KEYS_CACHE: dict[tuple[type, str], bool] = {}
+_PROPERTY_KEYS_CACHE_MAX_SIZE = 65536
+
+
+def _is_property_key(cls: type, key: str) -> bool:
+    cache_key = (cls, key)
+    result = _PROPERTY_KEYS_CACHE.get(cache_key)
+    if result is None:
+        if len(_PROPERTY_KEYS_CACHE) >= _PROPERTY_KEYS_CACHE_MAX_SIZE:
+            _PROPERTY_KEYS_CACHE.clear()
+        result = _PROPERTY_KEYS_CACHE[cache_key] = _check_property_key(cls, key)
+    return result
+
+
+def _check_property_key(cls, key: str) -> bool:
+    properties = cls._PROPERTIES
+    if key in properties:
+        return True
+    if key.replace('_' + Source.__name__.lstrip('_'), "") in properties:
+        return True
+    if key.replace(cls.__name__, "") in properties:
+        return True
+    return False
+
 
 def _is_dict_required(symbols):
     """
@@ -199,26 +253,36 @@ class Source:
         if isinstance(_symbols, OnetickParameter):
             _symbols = _symbols.parameter_expression
 
+        validated = isinstance(schema, _ValidatedSchema)
         schema = self._select_schema(schema, kwargs)
 
-        for key in schema:
-            if self._check_key_in_properties(key):
-                raise ValueError(f"Can't set class property {key}")
-            if self._check_key_is_meta(key):
-                if key == 'TIMESTAMP':
-                    # for backward-compatibility
-                    warnings.warn(f"Setting meta field {key} in schema is not needed", FutureWarning, stacklevel=2)
-                else:
-                    raise ValueError(f"Can't set meta field {key}")
+        if not validated:
+            for key in schema:
+                if self._check_key_in_properties(key):
+                    raise ValueError(f"Can't set class property {key}")
+                if self._check_key_is_meta(key):
+                    if key == 'TIMESTAMP':
+                        # for backward-compatibility
+                        warnings.warn(f"Setting meta field {key} in schema is not needed", FutureWarning, stacklevel=2)
+                    else:
+                        raise ValueError(f"Can't set meta field {key}")
 
         schema.update(
             self.meta_fields.get_onetick_fields_and_types()
         )
 
-        for key, value in schema.items():
-            # calculate value type
-            value_type = ott.get_source_base_type(value)
-            self.__dict__[key] = _Column(name=key, dtype=value_type, obj_ref=self)
+        if validated:
+            # the schema of the copied source may have thousands of fields with a few distinct types
+            value_types: dict = {}
+            for key, value in schema.items():
+                if value not in value_types:
+                    value_types[value] = ott.get_source_base_type(value)
+                self.__dict__[key] = _Column._create_validated(key, value_types[value], self)
+        else:
+            for key, value in schema.items():
+                # calculate value type
+                value_type = ott.get_source_base_type(value)
+                self.__dict__[key] = _Column(name=key, dtype=value_type, obj_ref=self)
 
         # just an alias to Timestamp
         self.__dict__['Time'] = self.__dict__['TIMESTAMP']
@@ -345,13 +409,7 @@ class Source:
         return self.__sources_symbols
 
     def _check_key_in_properties(self, key: str) -> bool:
-        if key in self.__class__._PROPERTIES:
-            return True
-        if key.replace('_' + Source.__name__.lstrip('_'), "") in self.__class__._PROPERTIES:
-            return True
-        if key.replace(self.__class__.__name__, "") in self.__class__._PROPERTIES:
-            return True
-        return False
+        return _is_property_key(self.__class__, key)
 
     def _check_key_is_meta(self, key: str) -> bool:
         return key in self.__class__.meta_fields
@@ -410,10 +468,11 @@ class Source:
         # symbols and date ranges. For example, we can add modify_query_times EP
         # if it is necessary
 
-        obj = self.copy()
-        if has_output:
-            obj.sink(otq.Passthrough())
-        start, end, symbols = obj._set_date_range_and_symbols(symbols, start, end)
+        with tracing.span('copy_graph'):
+            obj = self.copy()
+            if has_output:
+                obj.sink(otq.Passthrough())
+            start, end, symbols = obj._set_date_range_and_symbols(symbols, start, end)
         if start is adaptive:
             start = None
         if end is adaptive:
@@ -425,8 +484,9 @@ class Source:
         elif symbols is None:
             symbols = []
         _symbols = []
-        for sym in symbols:
-            _symbols.append(self._convert_symbol_to_string(sym, tmp_otq=obj._tmp_otq, start=start, end=end))
+        with tracing.span('convert_symbols', symbols=len(symbols)):
+            for sym in symbols:
+                _symbols.append(self._convert_symbol_to_string(sym, tmp_otq=obj._tmp_otq, start=start, end=end))
 
         return obj, start, end, _symbols
 
@@ -593,6 +653,23 @@ class Source:
         finally:
             tmp_file.do_cleanup()
 
+    def _fingerprint(self, timezone=None) -> str:
+        """
+        Returns the hash of the calculation graph of this source (including all sub-queries).
+
+        The hash doesn't depend on generated node ids and query names,
+        so it's the same for the graphs built by the same code.
+        Start and end time of the query are not included in the hash,
+        but the times and symbols bound to the sources of the graph are.
+        """
+        tmp_file = utils.TmpFile(clean_up=True)
+        try:
+            self.to_otq(file_name=tmp_file.path, file_suffix=None, query_name='query', timezone=timezone,
+                        start=_FINGERPRINT_TIME, end=_FINGERPRINT_TIME)
+            return utils.otq_text_fingerprint(Path(tmp_file.path).read_text())
+        finally:
+            tmp_file.do_cleanup()
+
     def _store_in_tmp_otq(self, tmp_otq, operation_suffix="tmp_query", symbols=None, start=None, end=None,
                           add_passthrough=True, name=None, timezone=None,
                           query_parameters: QueryParameters = None):
@@ -628,10 +705,14 @@ class Source:
         query_parameters.symbols = symbols
 
         graph = obj._to_graph(add_passthrough=add_passthrough)
+        content_hash = None
+        if name is None and configuration.config.deduplicate_nested_queries:
+            content_hash = obj._graph_content_hash(add_passthrough=add_passthrough)
 
         suffix = self._name_suffix(suffix=operation_suffix, separator='__', remove_invalid_symbols=True)
         query_parameters = obj._query_parameters.merge(query_parameters)
-        return tmp_otq.add_query(graph, suffix=suffix, name=name, query_parameters=query_parameters)
+        return tmp_otq.add_query(graph, suffix=suffix, name=name, query_parameters=query_parameters,
+                                 content_hash=content_hash)
 
     def __refresh_hash(self):
         """
@@ -657,7 +738,8 @@ class Source:
             node_name = 'SOURCE_CALL_MAIN_OUT_NODE'
             obj.node().node_name(node_name)
 
-        graph = obj._to_graph(add_passthrough=False)
+        with tracing.span('to_graph'):
+            graph = obj._to_graph(add_passthrough=False)
 
         # create name and suffix for generated .otq file
         if otp.config.main_query_generated_filename:
@@ -703,12 +785,15 @@ class Source:
             # So we should force all queries to have this flag
             # running=running_query_flag,
         )
-        query_to_run = obj._tmp_otq.save_to_file(query=graph,
-                                                 query_name=self.get_name(remove_invalid_symbols=True)
-                                                 if self.get_name(remove_invalid_symbols=True) else "main_query",
-                                                 file_path=tmp_file.path,
-                                                 query_parameters=query_parameters,
-                                                 default_query_parameters=default_query_parameters)
+        with tracing.span('save_otq') as span:
+            query_to_run = obj._tmp_otq.save_to_file(query=graph,
+                                                     query_name=self.get_name(remove_invalid_symbols=True)
+                                                     if self.get_name(remove_invalid_symbols=True) else "main_query",
+                                                     file_path=tmp_file.path,
+                                                     query_parameters=query_parameters,
+                                                     default_query_parameters=default_query_parameters)
+            if span.recording and os.path.exists(tmp_file.path):
+                span.set_attribute('bytes', os.path.getsize(tmp_file.path))
 
         # PY-1423: we should set symbol_date in otp.run always
         symbol_date_to_run = None
@@ -950,8 +1035,65 @@ class Source:
         if add_passthrough:
             constructed_obj.sink(otq.Passthrough())
 
+        prune_columns = (configuration.config.prune_columns
+                         and otp.compatibility._is_supported_passthrough_throw_for_missing_fields())
+        if prune_columns or configuration.config.eliminate_common_subgraphs:
+            return otq.GraphQuery(constructed_obj._build_optimized_graph(prune_columns=prune_columns))
+
         return otq.GraphQuery(constructed_obj.node().get())
 
+    def _graph_content_hash(self, add_passthrough=True) -> Optional[str]:
+        """
+        Returns the hash of the content of the graph constructed by :meth:`_to_graph`
+        or None if some node of the graph can't be described fully.
+        """
+        graph_hash = graph_content_hash(self.node().copy_rules(), self.node().key())
+        if graph_hash is None:
+            return None
+        prune_columns = (configuration.config.prune_columns
+                         and otp.compatibility._is_supported_passthrough_throw_for_missing_fields())
+        # the optimizations change the constructed graph depending on the configuration and the schema
+        options = (add_passthrough, bool(prune_columns), bool(configuration.config.eliminate_common_subgraphs),
+                   sorted((name, str(dtype)) for name, dtype in self.columns(skip_meta_fields=True).items())
+                   if prune_columns else None)
+        sha = hashlib.sha256(graph_hash.encode())
+        sha.update(repr(options).encode())
+        return sha.hexdigest()
+
+    def _build_optimized_graph(self, prune_columns=False):
+        """
+        Build the copy of the graph with optimizations enabled in the configuration:
+
+        * identical subgraphs are built only once and are connected to all their consumers,
+        * each source propagates only the fields that may be used by the downstream nodes.
+        """
+        rules = self.node().copy_rules()
+        root_key = self.node().key()
+        source_keys = set(self._get_sources_dates())
+        if configuration.config.eliminate_common_subgraphs:
+            rules, keys_map, report = eliminate_common_subgraphs(rules)
+            root_key = keys_map.get(root_key, root_key)
+            source_keys = {keys_map.get(key, key) for key in source_keys}
+            if report.eliminated_nodes:
+                otp.get_logger(__name__).info(
+                    f'Common subgraph elimination removed {report.eliminated_nodes} nodes, '
+                    f'saved {report.saved_reads} data reads'
+                )
+
+        eps: dict = {}
+        for rule in rules:
+            rule.build(eps)
+        if prune_columns:
+            pruned_fields = get_pruned_fields(rules=rules,
+                                              eps=eps,
+                                              source_keys=source_keys,
+                                              output_key=root_key,
+                                              output_fields=self.columns(skip_meta_fields=True))
+            for key, fields in pruned_fields.items():
+                eps[key].set_fields(','.join(sorted(fields)))
+                eps[key].set_throw_for_missing_fields(False)
+        return eps[root_key]
+
     def to_graph(self, symbols=None, start=None, end=None, *, add_passthrough=True):
         """
         Construct an :py:class:`onetick.query.GraphQuery` object.
@@ -1164,8 +1306,9 @@ class Source:
         --------
         Source.deepcopy
         """
+        build_profiler._record('copies')
         if columns is None:
-            columns = self.columns(skip_meta_fields=True)
+            columns = _ValidatedSchema(self.columns(skip_meta_fields=True))
 
         if ep:
             result = self.__class__(node=ep, schema=columns)
@@ -1207,6 +1350,116 @@ class Source:
         """
         return self.copy(ep, columns, deep=True)
 
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.deepcopy()
+
+    def __reduce__(self):
+        """
+        Sources are pickled with the compact encoding of their calculation graph,
+        so they can be sent to other processes, e.g. with :py:class:`concurrent.futures.ProcessPoolExecutor`.
+
+        The unpickled source is equivalent to the :meth:`copy` of the original one:
+        the graph, the schema, the state variables, the nested queries and the query parameters are restored
+        and the nodes have the same ids.
+        The nested queries get the new names, so they don't collide with the queries created in this process.
+        The data sources of the graph, that are constructed only when the query is executed
+        (e.g. :class:`otp.DataSource <onetick.py.DataSource>`), are constructed at the time of pickling.
+
+        The source can be unpickled only by the same version of onetick-py.
+
+        Examples
+        --------
+        >>> import pickle
+        >>> data = otp.Ticks(A=[1, 2, 3])
+        >>> data['B'] = data['A'] * 2
+        >>> data = pickle.loads(pickle.dumps(data))
+        >>> otp.run(data)
+                             Time  A  B
+        0 2003-12-01 00:00:00.000  1  2
+        1 2003-12-01 00:00:00.001  2  4
+        2 2003-12-01 00:00:00.002  3  6
+        """
+        encoder = _serialization.Encoder()
+        state = self._encode(encoder)
+        return _restore_source, (self.__class__, _serialization.FORMAT_VERSION, encoder.tables(), state)
+
+    def _encode(self, encoder: _serialization.Encoder) -> tuple:
+        base_eps: dict[int, Optional[tuple]] = {}
+        for key, func in self.__sources_base_ep_func.items():
+            if func:
+                base = func()
+                base_eps[encoder.key(key)] = (base.__class__, base._encode(encoder))
+            else:
+                base_eps[encoder.key(key)] = None
+        return encoder.state({
+            'node': encoder.node(self.__node),
+            'schema': self.columns(skip_meta_fields=True),
+            'dates': {encoder.key(key): value for key, value in self.__sources_keys_dates.items()},
+            'modify_query_times': {
+                encoder.key(key): value for key, value in self.__sources_modify_query_times.items()
+            },
+            'base_eps': base_eps,
+            'symbols': {encoder.key(key): value for key, value in self.__sources_symbols.items()},
+            'has_output': self.__source_has_output,
+            'name': self.__name,
+            'hash': self.__hash.bytes,
+            'state_vars': {
+                name: value.copy(name=name) if isinstance(value, _StateBase) else value
+                for name, value in self.state_vars.items
+            },
+            'tmp_otq': encoder.tmp_queries(self._tmp_otq.queries),
+            'query_parameters': {
+                name: value for name, value in self._query_parameters.asdict().items() if value is not None
+            },
+            'properties': {
+                attr: getattr(self, attr) for attr in set(self.__class__._PROPERTIES) - set(Source._PROPERTIES)
+            },
+        })
+
+    @classmethod
+    def _decode(cls, decoder: _serialization.Decoder, state: tuple) -> 'Source':
+        decoded: dict[str, Any] = decoder.state(state)
+        node = decoder.node(decoded['node'])
+        result = cls(node=node, schema=_ValidatedSchema(decoded['schema']))
+        result.node().add_rules(node.copy_rules())
+
+        base_eps: dict[uuid.UUID, Any] = {}
+        for key, base in decoded['base_eps'].items():
+            if base is not None:
+                base_cls, base_state = base
+                # each call must return the new source with the new nodes
+                base = base_cls._decode(decoder, base_state).deepcopy
+            base_eps[decoder.key(key)] = base
+        # pylint: disable=unused-private-member
+        result.__sources_keys_dates = {decoder.key(key): value for key, value in decoded['dates'].items()}
+        result.__sources_modify_query_times = {
+            decoder.key(key): value for key, value in decoded['modify_query_times'].items()
+        }
+        result.__sources_base_ep_func = base_eps
+        result.__sources_symbols = {decoder.key(key): value for key, value in decoded['symbols'].items()}
+        result.__source_has_output = decoded['has_output']
+        result.__name = decoded['name']
+        result.__hash = uuid.UUID(bytes=decoded['hash'])
+        # pylint: enable=unused-private-member
+
+        state_vars = StateVars(result)
+        for name, value in decoded['state_vars'].items():
+            if isinstance(value, _StateBase):
+                value = value.copy(obj_ref=state_vars, name=name)
+            state_vars._columns[name] = value
+        result.__dict__['_state_vars'] = state_vars
+
+        # the nested queries are restored with the new names by the decoder
+        result._tmp_otq = TmpOtq()
+        result._tmp_otq.queries.update(decoded['tmp_otq'])
+        result._query_parameters = _ExtendedQueryParameters(**decoded['query_parameters'])
+        for attr, value in decoded['properties'].items():
+            setattr(result, attr, value)
+        return result
+
     def _copy_properties_from(self, obj):
         # needed if we are doing copy of a child with custom properties
         for attr in set(self.__class__._PROPERTIES) - set(Source._PROPERTIES):
@@ -1228,16 +1481,20 @@ class Source:
         dict
         """
         result = {}
+        cls = self.__class__
+        meta_fields = cls.meta_fields
 
         for key, value in self.__dict__.items():
-            if skip_meta_fields and self._check_key_is_meta(key):
+            if not isinstance(value, _Column):
                 continue
 
-            if self._check_key_in_properties(key):
+            if skip_meta_fields and key in meta_fields:
                 continue
 
-            if isinstance(value, _Column):
-                result[value.name] = value.dtype
+            if _is_property_key(cls, key):
+                continue
+
+            result[value.name] = value.dtype
 
         return result
 
@@ -1306,6 +1563,7 @@ class Source:
 
             ep = getattr(ep, "_ep")
 
+        build_profiler._record('eps')
         return ep, uuid.uuid4(), in_pin, out_pin
 
     def sink(self, ep, out_pin=None, inplace: bool = True):
@@ -1466,7 +1724,8 @@ class Source:
         return _SymbolParamSource(**self.columns())
 
     @staticmethod
-    def _convert_symbol_to_string(symbol, tmp_otq=None, start=None, end=None, timezone=None, symbol_date=None):
+    def _convert_symbol_to_string(symbol, tmp_otq=None, start=None, end=None, timezone=None, symbol_date=None,
+                                  run_kwargs=None):
         if start is adaptive:
             start = None
         if end is adaptive:
@@ -1488,6 +1747,7 @@ class Source:
                                                 operation_suffix='symbol',
                                                 query_name=None,
                                                 symbol_date=symbol_date,
+                                                run_kwargs=run_kwargs,
                                                 **kwargs)
 
         if isinstance(symbol, otp.query):
@@ -1654,13 +1914,18 @@ class Source:
         >>> data.schema['W']
         <class 'onetick.py.types.nsectime'>
         """
-        schema = self.columns(skip_meta_fields=True)
+        schema = {}
         # meta fields will be in schema, but hidden
-        hidden_columns = {
-            k: v
-            for k, v in self.columns(skip_meta_fields=False).items()
-            if self._check_key_is_meta(k)
-        }
+        hidden_columns = {}
+        cls = self.__class__
+        meta_fields = cls.meta_fields
+        for key, value in self.__dict__.items():
+            if not isinstance(value, _Column) or _is_property_key(cls, key):
+                continue
+            if key in meta_fields:
+                hidden_columns[value.name] = value.dtype
+            else:
+                schema[value.name] = value.dtype
         if 'TIMESTAMP' in hidden_columns:
             hidden_columns['Time'] = hidden_columns['TIMESTAMP']
         return Schema(_base_source=self, _hidden_columns=hidden_columns, **schema)
@@ -1787,6 +2052,7 @@ class Source:
     from ._source.source_methods.pandases import (  # type: ignore[misc]
         plot,
         count,
+        estimate_cost,
         head,
         tail,
     )
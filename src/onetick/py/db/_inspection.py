@@ -9,7 +9,7 @@ import pandas as pd
 from dateutil.tz import gettz
 
 import onetick.py as otp
-from onetick.py import configuration, utils
+from onetick.py import configuration, utils, tracing
 from onetick.py import types as ott
 from onetick.py.core import db_constants
 from onetick.py.otq import otq
@@ -53,6 +53,22 @@ def _method_cache(meth):
     return wrapper
 
 
+def _traced(meth):
+    """
+    Trace the calls of the database inspection method as ``db.<method name>`` operation.
+    """
+    @wraps(meth)
+    def wrapper(self, *args, **kwargs):
+        span = tracing.span(f'db.{meth.__name__}', db=self.name)
+        with span:
+            result = meth(self, *args, **kwargs)
+            if span.recording and isinstance(result, (list, dict, pd.DataFrame)):
+                span.set_attribute('rows', len(result))
+            return result
+
+    return wrapper
+
+
 class DB:
 
     """
@@ -83,6 +99,7 @@ class DB:
     def __str__(self):
         return self.name
 
+    @_traced
     @_method_cache
     def access_info(self, deep_scan=False, username=None, query_properties=None) -> Union[pd.DataFrame, dict]:
         """
@@ -167,6 +184,7 @@ class DB:
             return df
         return dict(df.iloc[0] if not df.empty else {})
 
+    @_traced
     def show_config(self, config_type: Literal['locator_entry', 'db_time_intervals'] = 'locator_entry',
                     query_properties: Optional[dict] = None) -> dict:
         """
@@ -465,6 +483,7 @@ class DB:
 
         return dates
 
+    @_traced
     def dates(self, respect_acl=False, check_index_file=utils.adaptive):
         """
         Returns list of dates in GMT timezone for which data is available.
@@ -496,6 +515,7 @@ class DB:
         """
         return self.__get_dates(respect_acl=respect_acl, check_index_file=check_index_file)
 
+    @_traced
     def last_not_empty_date(self, last_date, days_back, timezone=None, tick_type=None):
         """
         Find first day that has data
@@ -535,6 +555,7 @@ class DB:
         """
         return self.get_last_date()
 
+    @_traced
     def get_last_date(self, tick_type=None, timezone=None, show_warnings=True, check_index_file=utils.adaptive):
         last_date = self.__get_dates(only_last=True, respect_acl=True, check_index_file=check_index_file)
         if last_date is None:
@@ -557,6 +578,7 @@ class DB:
             return last_date
         return date
 
+    @_traced
     def tick_types(self, date=None, timezone=None, query_properties: Optional[dict] = None) -> list[str]:
         """
         Returns list of tick types for the ``date``.
@@ -628,6 +650,7 @@ class DB:
                        context=self.context,
                        **safe_params)
 
+    @_traced
     def schema(self, date=None, tick_type=None, timezone=None, check_index_file=utils.adaptive,
                query_properties: Optional[dict] = None) -> dict[str, type]:
         """
@@ -780,6 +803,7 @@ class DB:
 
         return schema
 
+    @_traced
     def symbols(self, date=None, timezone=None, tick_type=None, pattern='.*',
                 query_properties: Optional[dict] = None) -> list[str]:
         """
@@ -830,6 +854,7 @@ class DB:
 
         return result['SYMBOL'].tolist()
 
+    @_traced
     def show_archive_stats(
         self,
         start=utils.adaptive,
@@ -916,6 +941,7 @@ class DB:
                      query_properties=query_properties)
         return df
 
+    @_traced
     def ref_data(
         self,
         ref_data_type: str,
@@ -1083,6 +1109,7 @@ def _get_params_to_ignore_acl_violation():
     )
 
 
+@tracing.traced('otp.databases')
 def databases(
     context=utils.default, derived: bool = False,
     readable_only: bool = False,
@@ -1229,6 +1256,7 @@ def databases(
     return db_dict
 
 
+@tracing.traced('otp.derived_databases')
 def derived_databases(
     context=utils.default,
     start=None, end=None,
@@ -11,7 +11,7 @@ from uuid import uuid4
 
 from onetick import py as otp
 from onetick.py.core import db_constants as constants
-from onetick.py import utils, sources, session, configuration
+from onetick.py import utils, sources, session, configuration, tracing
 
 from ..log import get_logger
 
@@ -267,13 +267,14 @@ class _DB:
         _symbol = symbol if symbol is not None else configuration.config.default_db_symbol
         kwargs.setdefault('propagate', kwargs.get('propagate_ticks', False))
 
-        res = self._session_handler(write_to_db,
-                                    src=src,
-                                    dest=self.name,
-                                    symbol=_symbol,
-                                    tick_type=tick_type,
-                                    timezone=timezone,
-                                    **kwargs)
+        with tracing.span('db.add', db=self.name, tick_type=tick_type):
+            res = self._session_handler(write_to_db,
+                                        src=src,
+                                        dest=self.name,
+                                        symbol=_symbol,
+                                        tick_type=tick_type,
+                                        timezone=timezone,
+                                        **kwargs)
 
         # We need to keep backward-compatibility,
         # because before there was no ability to get written ticks
@@ -0,0 +1,317 @@
+import contextvars
+import math
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+import pandas as pd
+
+from onetick import py as otp
+from onetick.py.otq import otq
+from onetick.py.servers import RemoteTS
+
+
+class LatencyHistogram:
+    """
+    Histogram of request latencies with logarithmic buckets.
+
+    Old observations are gradually forgotten,
+    so the quantiles follow the recent behaviour of the endpoint.
+
+    Parameters
+    ----------
+    history: int
+        Approximate number of the last observations taken into account.
+    """
+
+    MIN_LATENCY = 1e-4
+    # each bucket is 20% wider than the previous one, so the error of the quantile is at most 20%
+    GROWTH = 1.2
+    BUCKETS = 110
+
+    def __init__(self, history: int = 100):
+        if history < 1:
+            raise ValueError("Parameter 'history' must be a positive integer")
+        self._decay = 1 - 1 / history
+        self._counts = [0.0] * self.BUCKETS
+        self.count = 0
+
+    def add(self, latency: float):
+        """
+        Add the latency in seconds to the histogram.
+        """
+        self._counts = [count * self._decay for count in self._counts]
+        self._counts[self._bucket(latency)] += 1
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns the upper bound of the bucket containing ``q``-th quantile of the latencies
+        or None if there are no observations.
+        """
+        total = sum(self._counts)
+        if not total:
+            return None
+        accumulated = 0.0
+        for i, count in enumerate(self._counts):
+            accumulated += count
+            if accumulated >= q * total:
+                return self._upper_bound(i)
+        return self._upper_bound(self.BUCKETS - 1)
+
+    def _bucket(self, latency: float) -> int:
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return min(math.ceil(math.log(latency / self.MIN_LATENCY, self.GROWTH)), self.BUCKETS - 1)
+
+    def _upper_bound(self, bucket: int) -> float:
+        return self.MIN_LATENCY * self.GROWTH ** bucket
+
+
+@dataclass
+class _EndpointStats:
+    histogram: LatencyHistogram
+    requests: int = 0
+    hedges: int = 0
+    wins: int = 0
+    errors: int = 0
+    cancelled: int = 0
+    last_failed: bool = False
+
+
+@dataclass
+class _Request:
+    endpoint: str
+    kwargs: dict
+    hedge: bool
+    start_time: float = field(default_factory=time.perf_counter)
+    cancelled: bool = False
+    result: object = None
+    error: Optional[BaseException] = None
+
+
+class HedgedExecutor:
+    """
+    Runs queries on the fastest of several equivalent endpoints and duplicates ("hedges") slow requests.
+
+    The query is sent to the endpoint with the lowest median latency.
+    If it doesn't answer within the ``hedge_quantile`` quantile of its latencies (95th percentile by default),
+    the same query is sent to the next best endpoint.
+    The first successful result is returned and the other request is cancelled.
+    If the request fails, the next endpoint is tried immediately.
+
+    Latencies of the endpoints are collected in histograms that are used to route the next queries.
+    The endpoints that have fewer than ``min_samples`` successful requests are tried first,
+    and the endpoints whose last request failed are tried last.
+
+    Unlike :py:class:`~onetick.py.servers.LoadBalancing` and :py:class:`~onetick.py.servers.FaultTolerance`
+    configured in the locator and used by the tick server, the endpoints are selected on the client side.
+
+    Parameters
+    ----------
+    endpoints: list of str or :py:class:`~onetick.py.servers.RemoteTS`
+        Endpoints serving the same data.
+        In WebAPI mode these are the HTTP addresses of the servers
+        (set as :py:attr:`otp.config.http_address<onetick.py.configuration.Config.http_address>` for the request).
+        Otherwise, these are the names of the OneTick contexts (passed as ``context`` to
+        :py:func:`otp.run <onetick.py.run>`), e.g. configured with different remote tick servers.
+    max_hedges: int
+        Maximum number of additional requests sent for one query.
+    hedge_quantile: float
+        Quantile of the latencies of the endpoint after which the additional request is sent.
+    default_delay: float
+        Number of seconds after which the additional request is sent
+        if the endpoint has fewer than ``min_samples`` successful requests.
+    min_delay: float
+        Minimal number of seconds before sending the additional request.
+    min_samples: int
+        Number of successful requests to the endpoint before its latency histogram is trusted.
+    history: int
+        Approximate number of the last requests to each endpoint taken into account.
+
+    Note
+    ----
+    The hedged queries must not have side effects (e.g. write to the databases), because they may be executed twice.
+    The requests are cancelled with the cancellation handle of onetick.query,
+    if it's not supported, the losing request is finished in the background.
+
+    Examples
+    --------
+    >>> executor = otp.HedgedExecutor(['http://server1:48028', 'http://server2:48028'])
+    >>> data = otp.DataSource('US_COMP', tick_type='TRD', symbols='AAPL')
+    >>> df = executor.run(data, date=otp.dt(2024, 2, 1))  # doctest: +SKIP
+    >>> executor.report()  # doctest: +SKIP
+                   ENDPOINT  REQUESTS  HEDGES  WINS  ERRORS  CANCELLED    P50    P95
+    0  http://server1:48028        10       1     9       0          1  0.215  0.371
+    1  http://server2:48028         1       0     1       0          0  0.258  0.258
+    """
+
+    def __init__(self,
+                 endpoints: list[Union[str, RemoteTS]],
+                 max_hedges: int = 1,
+                 hedge_quantile: float = 0.95,
+                 default_delay: float = 1.0,
+                 min_delay: float = 0.01,
+                 min_samples: int = 5,
+                 history: int = 100):
+        if len(endpoints) < 2:
+            raise ValueError(f'There must be at least 2 endpoints for hedging but {len(endpoints)} was provided')
+        if max_hedges < 1:
+            raise ValueError("Parameter 'max_hedges' must be a positive integer")
+        if not 0 < hedge_quantile <= 1:
+            raise ValueError("Parameter 'hedge_quantile' must be in (0, 1] interval")
+        self.endpoints = [str(endpoint) for endpoint in endpoints]
+        self.max_hedges = max_hedges
+        self.hedge_quantile = hedge_quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._stats = {endpoint: _EndpointStats(LatencyHistogram(history)) for endpoint in self.endpoints}
+
+    def run(self, query, **kwargs):
+        """
+        Run the query with :py:func:`otp.run <onetick.py.run>` on the best endpoint, hedging it if it's slow.
+
+        Parameters
+        ----------
+        query:
+            Query to run.
+        kwargs:
+            Parameters of :py:func:`otp.run <onetick.py.run>`.
+            Parameters ``context`` (if not in WebAPI mode) and ``cancellation_handle`` are set by the executor.
+        """
+        if kwargs.get('callback') is not None:
+            raise ValueError("Parameter 'callback' can't be used with hedged requests, "
+                             "because it may receive the results of several requests")
+        candidates = self._rank()[:self.max_hedges + 1]
+        finished: queue.Queue = queue.Queue()
+        running: list[_Request] = []
+        first_error = None
+        while True:
+            if not running:
+                if not candidates:
+                    raise first_error  # type: ignore[misc]
+                running.append(self._start(candidates.pop(0), query, kwargs, finished, hedge=first_error is not None))
+            delay = self._hedge_delay(running[0].endpoint) if candidates else None
+            if delay is not None:
+                delay = max(delay - (time.perf_counter() - running[-1].start_time), 0)
+            try:
+                request = finished.get(timeout=delay)
+            except queue.Empty:
+                running.append(self._start(candidates.pop(0), query, kwargs, finished, hedge=True))
+                continue
+            running.remove(request)
+            if request.error is None:
+                with self._lock:
+                    self._stats[request.endpoint].wins += 1
+                for loser in running:
+                    self._cancel(loser)
+                return request.result
+            if first_error is None:
+                first_error = request.error
+
+    def report(self) -> pd.DataFrame:
+        """
+        Returns the statistics of the endpoints.
+
+        Columns:
+
+        * ``ENDPOINT`` - the endpoint.
+        * ``REQUESTS`` - the number of requests sent to the endpoint.
+        * ``HEDGES`` - the number of additional requests sent to the endpoint because other endpoint was slow or failed.
+        * ``WINS`` - the number of requests whose results were returned.
+        * ``ERRORS`` - the number of failed requests.
+        * ``CANCELLED`` - the number of requests cancelled because other endpoint answered first.
+        * ``P50``, ``P95`` - median and 95th percentile of the latency of the successful requests in seconds.
+        """
+        with self._lock:
+            return pd.DataFrame(
+                [
+                    {
+                        'ENDPOINT': endpoint,
+                        'REQUESTS': stats.requests,
+                        'HEDGES': stats.hedges,
+                        'WINS': stats.wins,
+                        'ERRORS': stats.errors,
+                        'CANCELLED': stats.cancelled,
+                        'P50': stats.histogram.quantile(0.5),
+                        'P95': stats.histogram.quantile(0.95),
+                    }
+                    for endpoint, stats in self._stats.items()
+                ],
+                columns=['ENDPOINT', 'REQUESTS', 'HEDGES', 'WINS', 'ERRORS', 'CANCELLED', 'P50', 'P95'],
+            )
+
+    def _rank(self) -> list[str]:
+        def key(item):
+            position, endpoint = item
+            stats = self._stats[endpoint]
+            if stats.histogram.count < self.min_samples:
+                # not enough information, the endpoint is explored first
+                return stats.last_failed, 0, stats.histogram.count, position
+            return stats.last_failed, 1, stats.histogram.quantile(0.5), position
+
+        with self._lock:
+            return [endpoint for _, endpoint in sorted(enumerate(self.endpoints), key=key)]
+
+    def _hedge_delay(self, endpoint: str) -> float:
+        with self._lock:
+            histogram = self._stats[endpoint].histogram
+            delay = histogram.quantile(self.hedge_quantile)
+            if delay is None or histogram.count < self.min_samples:
+                return self.default_delay
+            return max(delay, self.min_delay)
+
+    def _start(self, endpoint: str, query, kwargs: dict, finished: queue.Queue, hedge: bool) -> _Request:
+        if hedge and isinstance(query, otp.Source):
+            # the source is prepared for the execution in each thread
+            query = query.copy()
+        kwargs = dict(kwargs)
+        if not otq.webapi:
+            kwargs['context'] = endpoint
+        sys.modules['onetick.py.run']._create_cancellation_handle(kwargs)
+        request = _Request(endpoint, kwargs, hedge)
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats.requests += 1
+            stats.hedges += hedge
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(self._execute, request, query, finished), daemon=True)
+        thread.start()
+        return request
+
+    def _execute(self, request: _Request, query, finished: queue.Queue):
+        try:
+            if otq.webapi:
+                with otp.config.override(http_address=request.endpoint):
+                    request.result = otp.run(query, **request.kwargs)
+            else:
+                request.result = otp.run(query, **request.kwargs)
+        except Exception as e:
+            request.error = e
+        latency = time.perf_counter() - request.start_time
+        with self._lock:
+            stats = self._stats[request.endpoint]
+            if request.error is None:
+                # the results of the cancelled requests that finished anyway are valid observations too
+                stats.histogram.add(latency)
+                stats.last_failed = False
+            elif not request.cancelled:
+                stats.errors += 1
+                stats.last_failed = True
+        if request.error is not None and not request.cancelled:
+            otp.get_logger(__name__).warning(f'Request to {request.endpoint} failed: {request.error}')
+        finished.put(request)
+
+    def _cancel(self, request: _Request):
+        request.cancelled = True
+        with self._lock:
+            self._stats[request.endpoint].cancelled += 1
+        handle = request.kwargs.get('cancellation_handle')
+        if handle is not None:
+            # the request to the server is sent in a separate thread to return the result immediately
+            threading.Thread(target=sys.modules['onetick.py.run']._cancel_query, args=(handle,), daemon=True).start()
@@ -0,0 +1,349 @@
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from onetick import py as otp
+from onetick.py import configuration, utils
+from onetick.py import types as ott
+from onetick.py.otq import otq
+
+
+# name of the symbol parameter with the watermark timestamp of the symbol,
+# it is passed as milliseconds since epoch with the fraction, the format parsed by MSEC_STR_TO_NSECTIME
+_WATERMARK_PARAM = 'OTP_INCREMENTAL_WATERMARK'
+# otp.run() parameters that can't be used with the incremental runner (with their default values)
+_UNSUPPORTED_PARAMS = dict(
+    date=None,
+    start_time_expression=None,
+    end_time_expression=None,
+    apply_times_daily=None,
+    running=None,
+    callback=None,
+    node_name=None,
+    manual_dataframe_callback=False,
+    output_matrix_per_field=False,
+    return_utc_times=None,
+    result_cache=None,
+)
+# the query is executed in this timezone, so the timestamps and watermarks are not ambiguous around DST changes
+_UTC = 'GMT'
+
+
+def _to_utc(timestamp: pd.Timestamp, timezone: str, ambiguous: bool) -> pd.Timestamp:
+    """
+    Converts the naive ``timestamp`` in ``timezone`` to the naive UTC timestamp.
+    The time in the repeated DST hour is resolved as the DST time if ``ambiguous`` is True,
+    the time in the skipped DST hour is shifted forward.
+    """
+    timestamp = timestamp.tz_localize(timezone, ambiguous=ambiguous, nonexistent='shift_forward')
+    return timestamp.tz_convert('UTC').tz_localize(None)
+
+
+def _from_utc(times: pd.Series, timezone: str) -> pd.Series:
+    return times.dt.tz_localize('UTC').dt.tz_convert(timezone).dt.tz_localize(None)
+
+
+class _ColumnarBuffer:
+    """
+    Appended dataframes stored column by column in numpy arrays growing geometrically,
+    so appending the rows takes time proportional to their number and not to the size of the buffer.
+    """
+
+    MIN_CAPACITY = 16
+
+    def __init__(self):
+        self._columns: dict[str, np.ndarray] = {}
+        self._dtypes: dict = {}
+        self._size = 0
+        self._frame: Optional[pd.DataFrame] = None
+
+    def __len__(self):
+        return self._size
+
+    def append(self, df: pd.DataFrame):
+        if not self._columns or (not self._size and not df.empty):
+            # the schema of the empty results may differ from the schema of the ticks
+            self._reset(df)
+            return
+        if df.empty:
+            return
+        if list(df.columns) != list(self._columns) or any(df[name].dtype != self._dtypes[name] for name in df):
+            # the schema is changed, it is rare, so the buffer is simply rebuilt
+            self._reset(pd.concat([self.frame(), df], ignore_index=True))
+            return
+        size = self._size + len(df)
+        capacity = len(next(iter(self._columns.values()), []))
+        if size > capacity:
+            capacity = max(size, 2 * capacity, self.MIN_CAPACITY)
+            for name, column in self._columns.items():
+                self._columns[name] = np.empty(capacity, dtype=column.dtype)
+                self._columns[name][:self._size] = column[:self._size]
+        for name, column in self._columns.items():
+            column[self._size:size] = df[name].to_numpy()
+        self._size = size
+        self._frame = None
+
+    def _reset(self, df: pd.DataFrame):
+        self._columns = {name: df[name].to_numpy(copy=True) for name in df.columns}
+        self._dtypes = {name: df[name].dtype for name in df.columns}
+        self._size = len(df)
+        self._frame = None
+
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            columns = {}
+            for name, column in self._columns.items():
+                view = column[:self._size]
+                # the dataframe is not copied, pandas copies read-only arrays if the dataframe is modified
+                view.flags.writeable = False
+                columns[name] = pd.Series(view, dtype=self._dtypes[name], copy=False)
+            self._frame = pd.DataFrame(columns)
+        # with copy-on-write the modifications of the returned dataframe don't change the cached one
+        return self._frame.copy(deep=False)
+
+
+class IncrementalRunner:
+    """
+    Runs the query repeatedly over the growing time range, requesting from the server only the new ticks.
+
+    The runner remembers the watermark of each symbol: the timestamp and the sequence number
+    (``OMDSEQ`` field by default) of its last received tick.
+    On each :meth:`poll` the start time of the query is moved to the watermark of the symbol
+    with :meth:`Source.modify_query_times <onetick.py.Source.modify_query_times>`,
+    the ticks of the watermark timestamp that have already been received are dropped
+    and the new ticks are appended to the in-memory columnar buffer.
+    So the time of the poll is proportional to the number of the new ticks, not to the length of the time range.
+    The query is executed in GMT timezone and the watermarks are kept in GMT, so they are not ambiguous
+    when the clocks are turned back, the timestamps of the results are converted to ``timezone``.
+
+    Note that the query must return the same ticks regardless of its start time,
+    e.g. it must not aggregate the data, and the ticks must be added to the database
+    in the order of their timestamps, the ticks added later with the timestamps before the watermark are not received.
+
+    Parameters
+    ----------
+    source: :py:class:`onetick.py.Source`
+        Query to run.
+    symbols: str or list of str
+        Symbols to run the query for.
+    start: :py:class:`otp.datetime <onetick.py.datetime>`, optional
+        Start time of the query.
+        By default, :py:attr:`otp.config.default_start_time<onetick.py.configuration.Config.default_start_time>`
+        is used.
+    end: :py:class:`otp.datetime <onetick.py.datetime>`, optional
+        End time of the query. By default, each poll requests the ticks up to the current time.
+    timezone: str, optional
+        Timezone of the query.
+        By default, :py:attr:`otp.config.tz<onetick.py.configuration.Config.tz>` is used.
+    seq_field: str, optional
+        Field with the sequence number of the ticks with the same timestamp.
+        If it is not in the schema of the ``source``, it is added to the query and dropped from the results.
+        If None, the ticks with the same timestamp are counted instead,
+        this should be used for the sources without ``OMDSEQ`` field, e.g. :py:class:`otp.Ticks <onetick.py.Ticks>`.
+    require_dict: bool
+        If True, :meth:`poll` and :py:attr:`data` return the dictionary even for a single symbol.
+    kwargs:
+        Other parameters of :func:`otp.run <onetick.py.run>`.
+
+    See also
+    --------
+    :func:`otp.run <onetick.py.run>`
+
+    Examples
+    --------
+    >>> data = otp.DataSource('US_COMP', tick_type='TRD')  # doctest: +SKIP
+    >>> runner = otp.IncrementalRunner(data, symbols=['AAPL', 'MSFT'], start=otp.dt.today())  # doctest: +SKIP
+
+    The first poll requests all ticks since the start of the day:
+
+    >>> new_ticks = runner.poll()  # doctest: +SKIP
+
+    The next polls request only the ticks after the watermark of each symbol:
+
+    >>> new_ticks = runner.poll()  # doctest: +SKIP
+    >>> runner.watermarks  # doctest: +SKIP
+    {'AAPL': (Timestamp('2024-02-01 10:15:01.123456789'), 1), 'MSFT': (Timestamp('2024-02-01 10:15:00.987654321'), 3)}
+
+    All received ticks:
+
+    >>> all_ticks = runner.data  # doctest: +SKIP
+    """
+
+    def __init__(self,
+                 source: 'otp.Source',
+                 symbols: Union[str, list],
+                 start=utils.adaptive,
+                 end=None,
+                 timezone=utils.default,
+                 seq_field: Optional[str] = 'OMDSEQ',
+                 require_dict: bool = False,
+                 **kwargs):
+        if not isinstance(source, otp.Source):
+            raise ValueError(f'Only otp.Source queries are supported with the incremental runner, got {type(source)}')
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        if not symbols or not isinstance(symbols, (list, tuple)) or not all(isinstance(s, str) for s in symbols):
+            raise ValueError('Only symbol names (strings) are supported as symbols with the incremental runner')
+        for param, default_value in _UNSUPPORTED_PARAMS.items():
+            if kwargs.get(param, default_value) != default_value:
+                raise ValueError(f"Parameter '{param}' of otp.run() is not supported with the incremental runner")
+        if kwargs.get('output_structure') not in (None, 'df'):
+            raise ValueError("Only output_structure='df' is supported with the incremental runner")
+        for param in ('symbols', 'start', 'end', 'timezone', 'require_dict'):
+            kwargs.pop(param, None)
+
+        if timezone is utils.default:
+            timezone = configuration.config.tz
+        if start is utils.adaptive or start is None:
+            start = configuration.config.get('default_start_time')
+        if start is None:
+            raise ValueError('Start time of the query must be set to use the incremental runner')
+        self.timezone = timezone
+        self.start = utils.to_naive_timestamp(start, timezone)
+        self.end = utils.to_naive_timestamp(end, timezone) if end is not None else None
+        if self.end is not None and self.start >= self.end:
+            raise ValueError(f'Start time {self.start} must be less than end time {self.end}')
+        # the earlier time is used if the start time is ambiguous, the duplicated ticks are dropped anyway
+        self._start_utc = _to_utc(self.start, timezone, ambiguous=True)
+        self.symbols = list(symbols)
+        self.seq_field = seq_field
+        self.require_dict = require_dict
+        self._run_params = kwargs
+        self._query, self._drop_seq_field = self._build_query(source, seq_field)
+        self._watermarks: dict[str, Optional[tuple]] = {}
+        self._buffers: dict[str, _ColumnarBuffer] = {}
+        self.stats = {
+            'polls': 0,
+            'ticks': 0,
+            'duplicates': 0,
+        }
+        self.reset()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(symbols={self.symbols}, start={self.start}, end={self.end})'
+
+    @staticmethod
+    def _build_query(source: 'otp.Source', seq_field: Optional[str]):
+        query = source.copy()
+        drop_seq_field = False
+        if seq_field is not None and seq_field not in query.schema:
+            query = query.table(strict=False, **{seq_field: int})
+            drop_seq_field = True
+        watermark = query.Symbol[_WATERMARK_PARAM, ott.nsectime]
+        # the time range is narrowed, so the original timestamps stay inside of it
+        query = query.modify_query_times(start=otp.math.max(query['_START_TIME'], watermark),
+                                         output_timestamp=query['TIMESTAMP'])
+        return query, drop_seq_field
+
+    @property
+    def watermarks(self) -> dict:
+        """
+        Timestamp and sequence number of the last received tick for each symbol,
+        None for the symbols without ticks.
+        """
+        return {
+            symbol: None if watermark is None else (
+                _from_utc(pd.Series([watermark[0]]), self.timezone).iloc[0], watermark[1]
+            )
+            for symbol, watermark in self._watermarks.items()
+        }
+
+    @property
+    def data(self) -> Union[pd.DataFrame, dict]:
+        """
+        All ticks received by the runner.
+
+        The dataframes share the memory with the buffer of the runner, they are copied if they are modified.
+        """
+        return self._result({symbol: buffer.frame() for symbol, buffer in self._buffers.items()})
+
+    def reset(self):
+        """
+        Forget the received ticks, the next poll requests the data since the start time.
+        """
+        self._watermarks = dict.fromkeys(self.symbols)
+        self._buffers = {symbol: _ColumnarBuffer() for symbol in self.symbols}
+
+    def poll(self, end=None) -> Union[pd.DataFrame, dict]:
+        """
+        Request the ticks received by the server since the previous poll.
+
+        Parameters
+        ----------
+        end: :py:class:`otp.datetime <onetick.py.datetime>`, optional
+            End time of the query.
+            By default, the ``end`` parameter of the runner or the current time is used.
+
+        Returns
+        -------
+        :pandas:`pandas.DataFrame` or dict
+            The new ticks, they are also appended to :py:attr:`data`.
+        """
+        if end is None:
+            end = self.end
+        if end is None:
+            end_utc = pd.Timestamp.now(tz='UTC').tz_localize(None)
+        else:
+            end_utc = _to_utc(utils.to_naive_timestamp(end, self.timezone), self.timezone, ambiguous=False)
+        symbols = [
+            otq.Symbol(symbol, params={_WATERMARK_PARAM: self._watermark_param(symbol)})
+            for symbol in self.symbols
+        ]
+        data = otp.run(self._query, symbols=symbols, start=self._start_utc, end=end_utc, timezone=_UTC,
+                       require_dict=True, **self._run_params)
+        self.stats['polls'] += 1
+
+        result = {}
+        for symbol in self.symbols:
+            new = self._deduplicate(symbol, data.get(symbol, pd.DataFrame()))
+            self._buffers[symbol].append(new)
+            self.stats['ticks'] += len(new)
+            result[symbol] = new
+        return self._result(result)
+
+    def _watermark_param(self, symbol: str) -> str:
+        watermark = self._watermarks[symbol]
+        timestamp = self._start_utc if watermark is None else watermark[0]
+        # naive timestamps are in UTC
+        millis, nanos = divmod(timestamp.value, 1_000_000)
+        return f'{millis}.{nanos:06d}'
+
+    def _deduplicate(self, symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop the ticks that have been received by the previous polls and move the watermark of the symbol.
+        """
+        if df.empty or 'Time' not in df:
+            return df.reset_index(drop=True)
+        times = df['Time']
+        if self.seq_field is None:
+            # the query is started at the watermark timestamp, so all ticks of this timestamp are counted
+            seq = df.groupby('Time', sort=False).cumcount().to_numpy() + 1
+        else:
+            seq = df[self.seq_field].to_numpy()
+        watermark = self._watermarks[symbol]
+        new = df
+        if watermark is not None:
+            timestamp, last_seq = watermark
+            mask = (times > timestamp) | ((times == timestamp) & (seq > last_seq))
+            new = df[mask.to_numpy()]
+            self.stats['duplicates'] += len(df) - len(new)
+            if new.empty:
+                return self._drop_internal_fields(new)
+        self._watermarks[symbol] = (times.iloc[-1], int(seq[-1]))
+        return self._drop_internal_fields(new)
+
+    def _drop_internal_fields(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self._drop_seq_field:
+            df = df.drop(columns=self.seq_field)
+        df = df.reset_index(drop=True)
+        # the query is executed in UTC, the timestamps are returned in the timezone of the runner
+        for column in df.columns:
+            if pd.api.types.is_datetime64_dtype(df[column]):
+                df[column] = _from_utc(df[column], self.timezone)
+        return df
+
+    def _result(self, result: dict):
+        if len(result) == 1 and not self.require_dict:
+            return next(iter(result.values()))
+        return result
@@ -72,6 +72,7 @@ elif otp.__webapi__:
     from onetick.py.pyomd_mock import pyomd
 
     __original_run = otq.run
+    __webapi_run_parameters = inspect.signature(__original_run).parameters
 
     def run(*args, **kwargs):
         from onetick.py import config
@@ -94,6 +95,14 @@ elif otp.__webapi__:
             kwargs['query'] = query
             kwargs['query_name'] = query_name
 
+        if config.webapi_register_queries and isinstance(query, str) and not query.startswith('remote://'):
+            from onetick.py.query_registry import query_registry
+            kwargs['query'], kwargs['query_name'] = query_registry.register(query, kwargs.get('query_name'))
+
+        if config.webapi_keep_alive:
+            from onetick.py.query_registry import install_keep_alive
+            install_keep_alive()
+
         ignore_deleted_params = [
             'time_as_nsec',
             'alternative_username',
@@ -166,8 +175,6 @@ elif otp.__webapi__:
         kwargs.setdefault('http_proxy', config.http_proxy)
         kwargs.setdefault('https_proxy', config.https_proxy)
 
-        webapi_run_parameters = inspect.signature(__original_run).parameters
-
         trusted_certificate_file_arg = kwargs.pop('trusted_certificates_file',
                                                   kwargs.pop('trusted_certificate_file', None))
         trusted_certificate_file_value = (
@@ -175,8 +182,8 @@ elif otp.__webapi__:
             else config.trusted_certificates_file
         )
         if trusted_certificate_file_value is not None:
-            trusted_certificates_supported = set(webapi_run_parameters).intersection({'trusted_certificates_file',
-                                                                                      'trusted_certificate_file'})
+            trusted_certificates_supported = set(__webapi_run_parameters).intersection({'trusted_certificates_file',
+                                                                                        'trusted_certificate_file'})
             if not trusted_certificates_supported:
                 raise ValueError(
                     "Parameter `trusted_certificates_file` was set,"
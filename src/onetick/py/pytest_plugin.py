@@ -0,0 +1,38 @@
+"""
+Pytest fixtures reusing one warm session in all tests of the worker process.
+
+Enable the plugin in ``conftest.py``:
+
+.. code-block:: python
+
+    pytest_plugins = ['onetick.py.pytest_plugin']
+
+and use ``warm_session`` fixture instead of creating :class:`otp.TestSession <onetick.py.TestSession>` in the tests.
+To change the parameters of the session, override ``session_pool`` fixture in ``conftest.py``.
+"""
+import pytest
+
+from onetick.py.session_pool import SessionPool
+
+
+@pytest.fixture(scope='session')
+def session_pool():
+    """
+    :class:`~onetick.py.session_pool.SessionPool` shared by all tests of the worker process.
+    """
+    pool = SessionPool()
+    yield pool
+    pool.close()
+    pool.clear_dbs()
+
+
+@pytest.fixture
+def warm_session(session_pool):
+    """
+    Session of the ``session_pool``, rolled back to the initial state after the test.
+    """
+    session = session_pool.session
+    try:
+        yield session
+    finally:
+        session_pool.rollback()
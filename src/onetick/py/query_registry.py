@@ -0,0 +1,175 @@
+"""
+Upload-once registration of .otq files for WebAPI mode.
+
+WebAPI server doesn't get the content of the .otq file with the request, only its path.
+If the server doesn't have the file with this path and modification time in its cache,
+it requests the client to upload it and the query is executed after that.
+onetick-py saves each query to the new temporary file, so each request required an additional upload.
+
+The registry gives the same name and modification time to all .otq files with the same
+:func:`canonical <onetick.py.utils.query.canonical_otq_text>` content,
+so the file is uploaded to each server only once and the server-side copy is used afterwards.
+The canonical text is used only to compare the files, the original text of the first registered file is uploaded.
+If the server evicts the file from its cache, it requests the upload again
+and the content is taken from the memory of onetick.query_webapi.
+
+Registration relies on the internals of onetick.query_webapi,
+if they are not available in the installed version, the queries are run as usual.
+"""
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from onetick.py.log import get_logger
+from onetick.py.utils.query import canonical_otq_text, _OTQ_SECTION_REGEX
+
+
+# references to other .otq files can't be registered, because they are not uploaded with the query
+_OTQ_FILE_REFERENCE_REGEX = re.compile(r'\.otq\b', re.IGNORECASE)
+_REGISTERED_QUERIES_DIR = os.path.join(tempfile.gettempdir(), 'otp_registered_queries')
+
+
+class QueryRegistry:
+    """
+    Maps the content of .otq files to the stable names known to the WebAPI servers.
+
+    At most ``max_size`` files are registered, the least recently used ones are forgotten
+    and removed from the memory of onetick.query_webapi.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        # fingerprint -> (path, modification time in milliseconds, uploaded text, names of its queries)
+        self._queries: 'OrderedDict[str, tuple[str, float, str, list[str]]]' = OrderedDict()
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._queries)
+
+    def register(self, path: str, query_name: Optional[str] = None) -> tuple[str, Optional[str]]:
+        """
+        Register the .otq file and return the path and query name that should be sent to the server instead.
+
+        If the file can't be registered, e.g. it references other .otq files
+        or the installed onetick.query_webapi doesn't support it, ``path`` and ``query_name`` are returned as is.
+        """
+        webapi_utils = _webapi_utils()
+        if webapi_utils is None:
+            return path, query_name
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            return path, query_name
+        if _OTQ_FILE_REFERENCE_REGEX.search(text):
+            return path, query_name
+        query_names = [name for name in _OTQ_SECTION_REGEX.findall(text) if name != '_meta']
+        if query_name is not None and query_name not in query_names:
+            return path, query_name
+
+        fingerprint = hashlib.sha256(canonical_otq_text(text).encode()).hexdigest()
+        with self._lock:
+            registered = self._queries.get(fingerprint)
+            if registered is None:
+                registered_path = os.path.join(_REGISTERED_QUERIES_DIR, f'{fingerprint}.otq')
+                registered = self._queries[fingerprint] = (registered_path, 1000 * time.time(), text, query_names)
+                while len(self._queries) > self.max_size:
+                    _, (evicted_path, *_) = self._queries.popitem(last=False)
+                    webapi_utils.remove_from_memory(evicted_path)
+            else:
+                self._queries.move_to_end(fingerprint)
+                self.hits += 1
+            registered_path, modification_time, registered_text, registered_query_names = registered
+            # onetick.query_webapi uploads the content from memory when the server requests it
+            webapi_utils.save_in_memory(registered_path, registered_text, modification_time)
+        if query_name is not None:
+            # queries of the files with the same canonical text are in the same order
+            query_name = registered_query_names[query_names.index(query_name)]
+        return registered_path, query_name
+
+    def clear(self):
+        """
+        Forget all registered queries, they will be uploaded to the servers again.
+        """
+        webapi_utils = _webapi_utils()
+        with self._lock:
+            if webapi_utils is not None:
+                for path, *_ in self._queries.values():
+                    webapi_utils.remove_from_memory(path)
+            self._queries.clear()
+            self.hits = 0
+
+
+class _KeepAliveRequests:
+    """
+    Replacement of ``requests`` module in onetick.query_webapi
+    reusing HTTP connections when :py:attr:`otp.config.webapi_keep_alive` is set.
+
+    ``requests.post`` opens the new connection for each request.
+    Sessions are not thread-safe, so each thread uses its own one.
+    """
+
+    def __init__(self, requests_module):
+        self._requests = requests_module
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._requests, name)
+
+    def post(self, *args, **kwargs):
+        from onetick.py import config
+
+        if not config.webapi_keep_alive:
+            return self._requests.post(*args, **kwargs)
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        # cookies are managed by onetick.query_webapi itself, they shouldn't be shared between requests
+        session.cookies.clear()
+        return session.post(*args, **kwargs)
+
+
+def install_keep_alive():
+    """
+    Make onetick.query_webapi requests go through :class:`_KeepAliveRequests`.
+    """
+    webapi_query = sys.modules.get('onetick.query_webapi.query')
+    if webapi_query is None or not hasattr(webapi_query, '_requests'):
+        _warn_unsupported('HTTP connections reuse')
+        return
+    if not isinstance(webapi_query._requests, _KeepAliveRequests):
+        webapi_query._requests = _KeepAliveRequests(webapi_query._requests)
+
+
+def _webapi_utils():
+    """
+    Returns the module of onetick.query_webapi with the in-memory .otq files
+    or None if it's not available in the installed version.
+    """
+    webapi_utils = sys.modules.get('onetick.query_webapi._internal_utils')
+    if webapi_utils is None or not all(
+        callable(getattr(webapi_utils, name, None)) for name in ('save_in_memory', 'remove_from_memory')
+    ):
+        _warn_unsupported('Query registration')
+        return None
+    return webapi_utils
+
+
+_warned_unsupported: set = set()
+
+
+def _warn_unsupported(feature: str):
+    if feature not in _warned_unsupported:
+        _warned_unsupported.add(feature)
+        get_logger(__name__).warning(f'{feature} is not supported by the installed version of onetick.query_webapi, '
+                                     'the queries are run as usual')
+
+
+query_registry = QueryRegistry()
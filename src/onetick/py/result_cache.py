@@ -0,0 +1,434 @@
+import os
+import json
+from pathlib import Path
+from typing import Optional, Union
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+from onetick import py as otp
+from onetick.py import configuration, utils
+from onetick.py.otq import pyomd
+from onetick.py.core.source import _is_dict_required
+from onetick.py.core._source.source_methods.pandases import _get_time_range
+
+
+# these otp.run() parameters don't change the result of the query, so they are not included in the cache key
+_PARAMS_NOT_AFFECTING_RESULT = (
+    'batch_size', 'concurrency', 'max_expected_ticks_per_symbol', 'print_symbol_errors',
+    'password', 'connection', 'svg_path', 'use_connection_pool', 'cancellation_handle',
+)
+# otp.run() parameters that can't be used with the result cache (with their default values)
+_UNSUPPORTED_PARAMS = dict(
+    start_time_expression=None,
+    end_time_expression=None,
+    apply_times_daily=None,
+    callback=None,
+    node_name=None,
+    manual_dataframe_callback=False,
+    output_matrix_per_field=False,
+    return_utc_times=None,
+)
+# name of the column with symbol names in partitions that have the results for several symbols
+_SYMBOL_COLUMN = '_OTP_RESULT_CACHE_SYMBOL_NAME'
+_SYMBOLS_METADATA_KEY = b'onetick.py.result_cache.symbols'
+# the name of the directory for the queries run without symbols (with bound symbols)
+_BOUND_SYMBOLS_DIR = '_bound_symbols_'
+
+
+class ResultCache:
+    """
+    Client-side cache of :func:`otp.run <onetick.py.run>` results partitioned by day.
+
+    The results of the query are stored in the ``path`` directory as one file
+    for each query, symbol and day.
+    When the query is run again for the same or overlapping time range,
+    only the days that are missing in the cache are requested from the tick server,
+    then cached and fresh partitions are concatenated together.
+
+    The query is identified by the hash of its graph and
+    the parameters of :func:`otp.run <onetick.py.run>` that may change its result
+    (e.g. ``timezone``, ``context`` or ``query_params``).
+
+    Only full days that already ended in the query timezone are cached,
+    so the incomplete parts of the interval (e.g. today or the first and the last partial days of the interval)
+    are requested from the server on each run.
+    CEP queries (with ``running=True`` parameter) are never cached.
+
+    Note that the data is requested from the server in day-sized (or longer) intervals,
+    so the query must return the same ticks for each day regardless of the full query interval,
+    e.g. it must not aggregate the data or look up ticks across day boundaries.
+
+    Requires :pyarrow:`pyarrow <>` package to be installed.
+
+    Parameters
+    ----------
+    path: str, :py:class:`pathlib.Path`, optional
+        Directory where cached results are stored.
+        By default, :py:attr:`otp.config.result_cache_dir<onetick.py.configuration.Config.result_cache_dir>`
+        is used.
+    max_size: int, optional
+        Maximum total size of the cached files in bytes.
+        When it is exceeded, least recently used files are deleted.
+        By default, :py:attr:`otp.config.result_cache_max_size<onetick.py.configuration.Config.result_cache_max_size>`
+        is used.
+    file_format: str
+        Format of the cached files: ``parquet`` (default) or ``arrow`` (Arrow IPC).
+
+    See also
+    --------
+    :func:`otp.run <onetick.py.run>`
+
+    Examples
+    --------
+
+    Pass the cache object to :func:`otp.run <onetick.py.run>`:
+
+    >>> cache = otp.ResultCache('/tmp/otp_result_cache')  # doctest: +SKIP
+    >>> data = otp.DataSource('US_COMP_SAMPLE', tick_type='TRD')  # doctest: +SKIP
+    >>> otp.run(data, symbols=['AAPL', 'MSFT'], result_cache=cache,
+    ...         start=otp.dt(2024, 2, 1), end=otp.dt(2024, 2, 6))  # doctest: +SKIP
+
+    Running the query for the overlapping interval will only request the data for 2024-02-06 from the server:
+
+    >>> otp.run(data, symbols=['AAPL', 'MSFT'], result_cache=cache,
+    ...         start=otp.dt(2024, 2, 2), end=otp.dt(2024, 2, 7))  # doctest: +SKIP
+
+    Remove cached data for the query:
+
+    >>> cache.invalidate(data)  # doctest: +SKIP
+    """
+
+    FILE_FORMATS = ('parquet', 'arrow')
+
+    def __init__(self,
+                 path: Union[str, os.PathLike, None] = None,
+                 max_size: Optional[int] = None,
+                 file_format: str = 'parquet'):
+        try:
+            import pyarrow as _  # noqa: F401
+        except ImportError:
+            raise ValueError("Module pyarrow can't be imported, but it is required to use otp.ResultCache. "
+                             "Use 'pip install pyarrow' command to install it.")
+        if file_format not in self.FILE_FORMATS:
+            raise ValueError(f"Parameter 'file_format' must be one of {self.FILE_FORMATS}, got '{file_format}'")
+        if path is None:
+            path = configuration.config.result_cache_dir
+        if max_size is None:
+            max_size = configuration.config.result_cache_max_size
+        if max_size <= 0:
+            raise ValueError("Parameter 'max_size' must be a positive number")
+        self.path = Path(path)
+        self.max_size = max_size
+        self.file_format = file_format
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path='{self.path}', max_size={self.max_size})"
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the cached files in bytes.
+        """
+        return sum(size for _, _, size in self._files())
+
+    def run(self, query, **kwargs):
+        """
+        Run the query with :func:`otp.run <onetick.py.run>` using this cache.
+
+        Parameters
+        ----------
+        query: :py:class:`onetick.py.Source`
+            Query to run.
+        kwargs:
+            Parameters of :func:`otp.run <onetick.py.run>`.
+        """
+        kwargs.pop('result_cache', None)
+        if kwargs.get('running'):
+            return otp.run(query, **kwargs)
+        if not isinstance(query, otp.Source):
+            raise ValueError(f'Only otp.Source queries are supported with the result cache, got {type(query)}')
+        for param, default_value in _UNSUPPORTED_PARAMS.items():
+            if kwargs.get(param, default_value) != default_value:
+                raise ValueError(f"Parameter '{param}' of otp.run() is not supported with the result cache")
+        if kwargs.get('output_structure') not in (None, 'df'):
+            raise ValueError("Only output_structure='df' is supported with the result cache")
+        log_symbol = kwargs.get('log_symbol', utils.default)
+        if log_symbol is utils.default:
+            log_symbol = configuration.config.log_symbol
+        if log_symbol:
+            raise ValueError("Parameter 'log_symbol' of otp.run() is not supported with the result cache")
+
+        symbols = kwargs.pop('symbols', None)
+        require_dict = kwargs.pop('require_dict', False) or _is_dict_required(symbols)
+        timezone = kwargs.pop('timezone', utils.default)
+        if timezone is utils.default:
+            timezone = configuration.config.tz
+        start, end = self._get_interval(query, kwargs, timezone)
+
+        if symbols is None:
+            slots = [_BOUND_SYMBOLS_DIR]
+        else:
+            if isinstance(symbols, str):
+                symbols = [symbols]
+            if not isinstance(symbols, (list, tuple)) or not all(isinstance(s, str) for s in symbols):
+                raise ValueError('Only symbol names (strings) are supported as symbols with the result cache')
+            slots = list(symbols)
+
+        query_dir = self.path / self._query_key(query, timezone, kwargs)
+        segments = _split_by_days(start, end, timezone)
+
+        # partitions[slot][segment index] = {symbol name: dataframe}
+        partitions: dict[str, dict[int, dict]] = {slot: {} for slot in slots}
+        to_fetch: dict[tuple, list] = {}
+        for slot in slots:
+            missing = []
+            for i, (seg_start, _, cacheable) in enumerate(segments):
+                file = self._file(query_dir, slot, seg_start)
+                if cacheable and file.exists():
+                    partitions[slot][i] = self._read(file)
+                else:
+                    missing.append(i)
+            if missing:
+                to_fetch.setdefault(tuple(missing), []).append(slot)
+
+        for missing_segments, group_slots in to_fetch.items():
+            fetched = self._fetch(query, group_slots, [segments[i] for i in missing_segments], timezone, kwargs)
+            for slot in group_slots:
+                for i, seg_result in zip(missing_segments, fetched[slot]):
+                    partitions[slot][i] = seg_result
+                    seg_start, _, cacheable = segments[i]
+                    if cacheable:
+                        self._write(self._file(query_dir, slot, seg_start), seg_result)
+        if to_fetch:
+            self._evict()
+
+        result = {}
+        for slot in slots:
+            dfs_by_symbol: dict[str, list] = {}
+            for i in range(len(segments)):
+                for symbol, df in partitions[slot][i].items():
+                    dfs_by_symbol.setdefault(symbol, []).append(df)
+            if slot != _BOUND_SYMBOLS_DIR:
+                dfs_by_symbol.setdefault(slot, [])
+            for symbol, dfs in dfs_by_symbol.items():
+                result[symbol] = utils.concat_dataframes(dfs)
+
+        if len(result) == 1 and not require_dict:
+            return list(result.values())[0]
+        return result
+
+    def invalidate(self,
+                   query: Union['otp.Source', str, None] = None,
+                   symbols: Union[str, list, None] = None,
+                   start=None,
+                   end=None,
+                   timezone: Optional[str] = None) -> int:
+        """
+        Remove cached results.
+
+        Parameters
+        ----------
+        query: :py:class:`onetick.py.Source`, str, optional
+            Remove cached results only for this query.
+            Note that the results of the same query run with different :func:`otp.run <onetick.py.run>` parameters
+            (e.g. ``timezone`` or ``query_params``) are all removed.
+            By default, results of all queries are removed.
+        symbols: str, list of str, optional
+            Remove cached results only for these symbols.
+        start: :py:class:`otp.datetime <onetick.py.datetime>`, optional
+            Remove cached results only for the days starting from this date.
+        end: :py:class:`otp.datetime <onetick.py.datetime>`, optional
+            Remove cached results only for the days before this date (exclusive).
+        timezone: str, optional
+            Timezone of ``start`` and ``end``.
+            By default, :py:attr:`otp.config.tz<onetick.py.configuration.Config.tz>` is used.
+
+        Returns
+        -------
+        int
+            The number of removed files.
+        """
+        if timezone is None:
+            timezone = configuration.config.tz
+        graph_hash = None
+        if isinstance(query, otp.Source):
+            graph_hash = query._fingerprint(timezone=timezone)
+        elif query is not None:
+            graph_hash = query
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        start_day = utils.to_naive_timestamp(start, timezone).normalize() if start is not None else None
+        end_day = utils.to_naive_timestamp(end, timezone) if end is not None else None
+
+        removed = 0
+        for file, _, _ in self._files():
+            query_key, slot, day = file.relative_to(self.path).parts
+            if graph_hash is not None and not query_key.startswith(graph_hash):
+                continue
+            if symbols is not None and unquote(slot) not in symbols:
+                continue
+            day = pd.Timestamp(day.split('.')[0])
+            if start_day is not None and day < start_day:
+                continue
+            if end_day is not None and day >= end_day:
+                continue
+            file.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        """
+        Remove all cached results.
+
+        Returns
+        -------
+        int
+            The number of removed files.
+        """
+        return self.invalidate()
+
+    @staticmethod
+    def _get_interval(query: 'otp.Source', run_params: dict, timezone):
+        # the interval is resolved the same way as in otp.run(), including the bound times of the sources
+        start, end = _get_time_range(query, run_params, timezone)
+        if start >= end:
+            raise ValueError(f'Start time {start} must be less than end time {end}')
+        return start, end
+
+    @staticmethod
+    def _query_key(query: 'otp.Source', timezone, run_params: dict) -> str:
+        params = {
+            key: value for key, value in run_params.items()
+            if key not in _PARAMS_NOT_AFFECTING_RESULT and value is not None and value is not utils.default
+        }
+        if 'context' not in params:
+            params['context'] = configuration.config.context
+        if isinstance(params.get('query_properties'), pyomd.QueryProperties):
+            params['query_properties'] = utils.query_properties_to_dict(params['query_properties'])
+        params_str = utils.json_dumps(dict(timezone=timezone, **params), sort_keys=True)
+        params_hash = utils.otq_text_fingerprint(params_str)[:16]
+        return f'{query._fingerprint(timezone=timezone)}_{params_hash}'
+
+    def _file(self, query_dir: Path, slot: str, day: pd.Timestamp) -> Path:
+        return query_dir / quote(slot, safe='') / f'{day.strftime("%Y%m%d")}.{self.file_format}'
+
+    def _fetch(self, query, slots, segments, timezone, run_params) -> dict[str, list[dict]]:
+        """
+        Request the data for the ``segments`` from the server and split it into segments.
+        Returns the list of {symbol name: dataframe} for each segment for each symbol slot.
+        """
+        symbols = None if slots == [_BOUND_SYMBOLS_DIR] else slots
+        result: dict[str, list[dict]] = {slot: [] for slot in slots}
+        # neighbouring segments are requested with a single query
+        ranges: list[list] = []
+        for segment in segments:
+            if ranges and ranges[-1][-1][1] == segment[0]:
+                ranges[-1].append(segment)
+            else:
+                ranges.append([segment])
+        for range_segments in ranges:
+            range_start, range_end = range_segments[0][0], range_segments[-1][1]
+            data = otp.run(query, symbols=symbols, start=range_start, end=range_end, timezone=timezone,
+                           require_dict=True, **run_params)
+            for slot in slots:
+                if symbols is None:
+                    slot_data = data
+                else:
+                    slot_data = {slot: data.get(slot, pd.DataFrame())}
+                split: list[dict] = [{} for _ in range_segments]
+                for symbol, df in slot_data.items():
+                    for i, seg_df in enumerate(_split_dataframe(df, range_segments)):
+                        split[i][symbol] = seg_df
+                result[slot].extend(split)
+        return result
+
+    def _read(self, file: Path) -> dict:
+        import pyarrow
+        if self.file_format == 'parquet':
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(file)
+        else:
+            with pyarrow.memory_map(str(file)) as source:
+                table = pyarrow.ipc.open_file(source).read_all()
+        # update modification time of the file, it's used to find least recently used files
+        os.utime(file)
+        symbols = json.loads(table.schema.metadata[_SYMBOLS_METADATA_KEY])
+        df = table.to_pandas()
+        if _SYMBOL_COLUMN not in df:
+            return {symbol: df for symbol in symbols}
+        result = {}
+        for symbol in symbols:
+            result[symbol] = df[df[_SYMBOL_COLUMN] == symbol].drop(columns=_SYMBOL_COLUMN).reset_index(drop=True)
+        return result
+
+    def _write(self, file: Path, data: dict):
+        import pyarrow
+        if len(data) == 1:
+            df = list(data.values())[0]
+        else:
+            df = pd.concat([df.assign(**{_SYMBOL_COLUMN: symbol}) for symbol, df in data.items()],
+                           ignore_index=True)
+        table = pyarrow.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_SYMBOLS_METADATA_KEY] = json.dumps(list(data)).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = file.with_name(f'.{file.name}.{os.getpid()}.tmp')
+        if self.file_format == 'parquet':
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(table, tmp_file)
+        else:
+            with pyarrow.OSFile(str(tmp_file), 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        # replacing the file atomically, so the other processes don't read partially written files
+        os.replace(tmp_file, file)
+
+    def _files(self):
+        for file in self.path.glob(f'*/*/*.{self.file_format}'):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            yield file, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        files = sorted(self._files(), key=lambda x: x[1])
+        total_size = sum(size for _, _, size in files)
+        for file, _, size in files:
+            if total_size <= self.max_size:
+                break
+            file.unlink(missing_ok=True)
+            total_size -= size
+
+
+def _split_by_days(start: pd.Timestamp, end: pd.Timestamp, timezone) -> list[tuple]:
+    """
+    Split the interval by day boundaries.
+    Returns the list of (start, end, cacheable) tuples,
+    where cacheable is True if the segment is a full day that has already ended.
+    """
+    now = pd.Timestamp.now(tz=timezone).tz_localize(None)
+    segments = []
+    seg_start = start
+    while seg_start < end:
+        next_day = seg_start.normalize() + pd.Timedelta(days=1)
+        seg_end = min(next_day, end)
+        cacheable = seg_start == seg_start.normalize() and seg_end == next_day and seg_end <= now
+        segments.append((seg_start, seg_end, cacheable))
+        seg_start = seg_end
+    return segments
+
+
+def _split_dataframe(df: pd.DataFrame, segments: list[tuple]) -> list[pd.DataFrame]:
+    if 'Time' not in df or len(segments) == 1:
+        return [df.reset_index(drop=True)] + [df.iloc[:0] for _ in segments[1:]]
+    result = []
+    for i, (seg_start, seg_end, _) in enumerate(segments):
+        mask = df['Time'] >= seg_start
+        if i < len(segments) - 1:
+            mask &= df['Time'] < seg_end
+        result.append(df[mask].reset_index(drop=True))
+    return result
@@ -0,0 +1,337 @@
+import os
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+from urllib.parse import quote
+
+import pandas as pd
+
+from onetick import py as otp
+from onetick.py.callback import CallbackBase
+
+
+DEFAULT_ROW_GROUP_SIZE = 100_000
+_EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+# name of the partition for the queries with bound symbols
+_NO_SYMBOL = '_bound_symbols_'
+
+
+def _arrow_type(dtype_str: str):
+    import pyarrow
+    return {
+        'int': pyarrow.int64(),
+        'float': pyarrow.float64(),
+        'string': pyarrow.string(),
+        'datetime': pyarrow.timestamp('ns'),
+    }.get(dtype_str)
+
+
+class _PartitionWriter:
+    """
+    Writes ticks of one symbol and one day to the single file.
+
+    The data is written to the temporary file that is renamed when the writer is closed,
+    so the readers never see incomplete files.
+    """
+
+    def __init__(self, directory: Path, file_format: str, schema):
+        import pyarrow
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f'part-{uuid.uuid4().hex}.{_EXTENSIONS[file_format]}'
+        self.path = directory / name
+        self._tmp_path = directory / f'.{name}.tmp'
+        self.schema = schema
+        self._sink = None
+        if file_format == 'parquet':
+            import pyarrow.parquet
+            self._writer = pyarrow.parquet.ParquetWriter(str(self._tmp_path), schema)
+        else:
+            self._sink = pyarrow.OSFile(str(self._tmp_path), 'wb')
+            self._writer = pyarrow.ipc.new_file(self._sink, schema)
+
+    def write(self, table, row_group_size: int):
+        if self._sink is None:
+            self._writer.write_table(table, row_group_size=row_group_size)
+        else:
+            self._writer.write_table(table, max_chunksize=row_group_size)
+
+    def close(self) -> Path:
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """
+        Closes the writer and removes the incomplete temporary file.
+        """
+        try:
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+        finally:
+            self._tmp_path.unlink(missing_ok=True)
+
+
+class ResultWriterCallback(CallbackBase):
+    """
+    Callback writing the results of the query to Parquet or Arrow IPC files incrementally.
+
+    The results are written to ``SYMBOL=<symbol>/DATE=<YYYYMMDD>`` (hive-style) subdirectories of ``path``.
+    Each directory contains one or more files with unique names,
+    so several writers (e.g. running the query for different symbols in different processes)
+    can write to the same ``path`` concurrently.
+    At most ``row_group_size`` ticks are buffered in memory for each symbol,
+    except in WebAPI mode, where all ticks of the symbol are delivered to the callback at once.
+
+    If the schema of the ticks changes (e.g. different days in the database have different schemas),
+    the new file is started, so each file has a single schema.
+    The files can be read together with :pyarrow:`pyarrow.dataset.dataset`
+    by passing the schema unified with :pyarrow:`pyarrow.unify_schemas`.
+
+    Parameters
+    ----------
+    path: str, :py:class:`pathlib.Path`
+        Root directory of the dataset.
+    file_format: str
+        ``parquet`` (default) or ``arrow`` (Arrow IPC).
+    row_group_size: int
+        Maximum number of ticks in the row group (record batch for Arrow IPC).
+    timezone: str, optional
+        Timezone of the query. Tick timestamps and the days of the partitions are in this timezone.
+        By default, :py:attr:`otp.config.tz<onetick.py.configuration.Config.tz>` is used.
+    """
+
+    def __init__(self,
+                 path: Union[str, os.PathLike],
+                 file_format: str = 'parquet',
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 timezone: Optional[str] = None,
+                 _files: Optional[list] = None,
+                 _open_writers: Optional[set] = None):
+        super().__init__()
+        try:
+            import pyarrow as _  # noqa: F401
+        except ImportError:
+            raise ValueError("Module pyarrow can't be imported, but it is required to write query results to files. "
+                             "Use 'pip install pyarrow' command to install it.")
+        if file_format not in _EXTENSIONS:
+            raise ValueError(f"Parameter 'file_format' must be one of {tuple(_EXTENSIONS)}, got '{file_format}'")
+        if row_group_size < 1:
+            raise ValueError("Parameter 'row_group_size' must be a positive integer")
+        self.path = Path(path)
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.timezone = timezone or otp.config.tz
+        # list of the written files shared between all replicated objects
+        self._files = [] if _files is None else _files
+        # not finished writers of this object and its replicas, removed if the query fails
+        self._open_writers = set() if _open_writers is None else _open_writers
+        self._symbol_name = None
+        self._columns: Optional[dict[str, str]] = None
+        self._times: list = []
+        self._values: dict[str, list] = {}
+        self._writers: dict[str, _PartitionWriter] = {}
+
+    @property
+    def files(self) -> list[Path]:
+        """
+        Paths of the files written by this callback and its replicas.
+        """
+        return list(self._files)
+
+    def replicate(self):
+        return ResultWriterCallback(self.path, file_format=self.file_format, row_group_size=self.row_group_size,
+                                    timezone=self.timezone, _files=self._files, _open_writers=self._open_writers)
+
+    def process_symbol_name(self, symbol_name):
+        self._symbol_name = symbol_name
+
+    def process_tick_descriptor(self, tick_descriptor):
+        self._flush()
+        columns = {name: type_dict['type'] for name, type_dict in tick_descriptor}
+        if self._columns is not None and columns != self._columns:
+            # the files with the old schema are finished
+            self._close_writers()
+        self._columns = columns
+        self._values = {name: [] for name in columns}
+
+    def process_tick(self, tick, time):
+        self._times.append(time)
+        for name, values in self._values.items():
+            values.append(tick.get(name))
+        if len(self._times) >= self.row_group_size:
+            self._flush()
+
+    def process_ticks(self, ticks):
+        # WebAPI delivers all ticks at once with timestamps already converted to the query timezone
+        df = pd.DataFrame(ticks)
+        for start in range(0, len(df), self.row_group_size):
+            self._write(df.iloc[start:start + self.row_group_size])
+
+    def done(self):
+        self._flush()
+        self._close_writers()
+
+    def abort(self):
+        """
+        Removes the incomplete files of this callback and its replicas, e.g. if the query failed.
+        The files that are already completely written are kept.
+        """
+        for writer in list(self._open_writers):
+            writer.abort()
+        self._open_writers.clear()
+        self._writers = {}
+
+    def _flush(self):
+        if not self._times:
+            return
+        # tick timestamps and datetime fields are delivered in GMT
+        data = {'Time': self._to_timezone(self._times)}
+        for name, values in self._values.items():
+            if self._columns and self._columns.get(name) == 'datetime':
+                values = self._to_timezone(values)
+            data[name] = values
+        self._times = []
+        self._values = {name: [] for name in self._values}
+        self._write(pd.DataFrame(data))
+
+    def _to_timezone(self, values) -> pd.Series:
+        times = pd.to_datetime(pd.Series(values))
+        return times.dt.tz_localize('UTC').dt.tz_convert(self.timezone).dt.tz_localize(None)
+
+    def _schema(self, df: pd.DataFrame):
+        import pyarrow
+        fields = []
+        for name in df.columns:
+            arrow_type = _arrow_type((self._columns or {}).get(name, ''))
+            if name == 'Time':
+                arrow_type = pyarrow.timestamp('ns')
+            if arrow_type is None:
+                arrow_type = pyarrow.Array.from_pandas(df[name]).type
+            fields.append(pyarrow.field(name, arrow_type))
+        return pyarrow.schema(fields)
+
+    def _write(self, df: pd.DataFrame):
+        import pyarrow
+        if df.empty:
+            return
+        days = df['Time'].dt.strftime('%Y%m%d')
+        for day, part in df.groupby(days, sort=False):
+            # ticks are ordered by time, so the files for the previous days won't be appended anymore
+            for finished_day in [d for d in self._writers if d < day]:
+                self._close_writer(finished_day)
+            schema = self._schema(part)
+            writer = self._writers.get(day)
+            if writer is not None and writer.schema != schema:
+                self._close_writer(day)
+                writer = None
+            if writer is None:
+                symbol = quote(self._symbol_name or _NO_SYMBOL, safe='')
+                directory = self.path / f'SYMBOL={symbol}' / f'DATE={day}'
+                writer = self._writers[day] = _PartitionWriter(directory, self.file_format, schema)
+                self._open_writers.add(writer)
+            table = pyarrow.Table.from_pandas(part, schema=schema, preserve_index=False)
+            writer.write(table, self.row_group_size)
+
+    def _close_writer(self, day: str):
+        writer = self._writers.pop(day)
+        self._open_writers.discard(writer)
+        self._files.append(writer.close())
+
+    def _close_writers(self):
+        for day in list(self._writers):
+            self._close_writer(day)
+
+
+def _run_to_files(query, path, file_format, row_group_size, kwargs) -> list[Path]:
+    for param in ('callback', 'output_structure', 'manual_dataframe_callback'):
+        if kwargs.get(param):
+            raise ValueError(f"Parameter '{param}' can't be used when writing the results to files")
+    timezone = kwargs.get('timezone') or otp.config.tz
+    callback = ResultWriterCallback(path, file_format=file_format, row_group_size=row_group_size, timezone=timezone)
+    try:
+        otp.run(query, callback=callback, timezone=timezone,
+                **{k: v for k, v in kwargs.items() if k != 'timezone'})
+    except BaseException:
+        callback.abort()
+        raise
+    return callback.files
+
+
+def run_to_parquet(query,
+                   path: Union[str, os.PathLike],
+                   row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                   **kwargs) -> list[Path]:
+    """
+    Run the query and write its results to Parquet files partitioned by symbol and day.
+
+    Unlike :py:func:`otp.run <onetick.py.run>` followed by :pandas:`pandas.DataFrame.to_parquet`,
+    the results are not loaded in memory completely:
+    the ticks are consumed with :py:class:`callback <onetick.py.ResultWriterCallback>`
+    and written in row groups of ``row_group_size`` ticks.
+    Note that in WebAPI mode the whole result of the symbol is still received in memory before it is written.
+
+    If the query fails, the incomplete files are removed.
+
+    Files are written to ``<path>/SYMBOL=<symbol>/DATE=<YYYYMMDD>/part-<unique id>.parquet``,
+    so the runs for different symbols or time ranges can write to the same ``path`` concurrently.
+    If the schema of the ticks changes, the new file is started.
+
+    Requires :pyarrow:`pyarrow <>` package to be installed.
+
+    Parameters
+    ----------
+    query:
+        Query to run, the same as in :py:func:`otp.run <onetick.py.run>`.
+    path: str, :py:class:`pathlib.Path`
+        Root directory of the dataset.
+    row_group_size: int
+        Maximum number of ticks in the row group.
+        Also the maximum number of ticks buffered in memory for each symbol.
+    kwargs:
+        Other parameters of :py:func:`otp.run <onetick.py.run>`.
+        Parameters ``callback`` and ``output_structure`` are not supported.
+
+    Returns
+    -------
+    list of :py:class:`pathlib.Path`
+        Paths of the written files.
+
+    See also
+    --------
+    :py:func:`otp.run_to_arrow_dataset <onetick.py.run_to_arrow_dataset>`
+
+    Examples
+    --------
+    >>> data = otp.DataSource('US_COMP', tick_type='TRD')
+    >>> files = otp.run_to_parquet(data, 'trades', symbols=['AAPL', 'MSFT'],  # doctest: +SKIP
+    ...                            start=otp.dt(2024, 2, 1), end=otp.dt(2024, 2, 3))
+    >>> import pyarrow.dataset as ds
+    >>> ds.dataset('trades', format='parquet', partitioning='hive').to_table().num_rows  # doctest: +SKIP
+    5313012
+    """
+    return _run_to_files(query, path, 'parquet', row_group_size, kwargs)
+
+
+def run_to_arrow_dataset(query,
+                         path: Union[str, os.PathLike],
+                         row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                         **kwargs) -> list[Path]:
+    """
+    Run the query and write its results to Arrow IPC files partitioned by symbol and day.
+
+    The same as :py:func:`otp.run_to_parquet <onetick.py.run_to_parquet>`,
+    but the files are written in Arrow IPC format with record batches of ``row_group_size`` ticks.
+
+    Examples
+    --------
+    >>> data = otp.DataSource('US_COMP', tick_type='TRD')
+    >>> files = otp.run_to_arrow_dataset(data, 'trades', symbols=['AAPL', 'MSFT'],  # doctest: +SKIP
+    ...                                  start=otp.dt(2024, 2, 1), end=otp.dt(2024, 2, 3))
+    >>> import pyarrow.dataset as ds
+    >>> ds.dataset('trades', format='arrow', partitioning='hive').to_table().num_rows  # doctest: +SKIP
+    5313012
+    """
+    return _run_to_files(query, path, 'arrow', row_group_size, kwargs)
@@ -1,7 +1,9 @@
 import asyncio
 import inspect
 import datetime
+import time
 import warnings
+import weakref
 from typing import Union, Optional, Any, Callable
 from collections import defaultdict
 
@@ -10,7 +12,7 @@ import pandas as pd
 from onetick.py.otq import otq, pyomd, otli
 
 from onetick import py as otp
-from onetick.py import utils, configuration
+from onetick.py import utils, configuration, tracing
 from onetick.py.core.column_operations.base import _Operation
 from onetick.py.types import datetime2timeval, datetime2expr
 from onetick.py.core.source import _is_dict_required
@@ -22,6 +24,7 @@ from onetick.py._stack_info import _add_stack_info_to_exception
 from onetick.py.callback import LogCallback, ManualDataframeCallback
 
 
+@tracing.traced('otp.run')
 def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSONAR
                      otp.query, str, otq.EpBase, otq.GraphQuery,
                      otq.ChainQuery, otq.Chainlet, otq.SqlQuery, otp.SqlQuery],
@@ -60,7 +63,10 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
         encoding: Optional[str] = None,
         manual_dataframe_callback: bool = False,
         print_symbol_errors: Union[bool, type[utils.default]] = utils.default,
-        preserve_decimal_flag: Optional[bool] = None):
+        preserve_decimal_flag: Optional[bool] = None,
+        result_cache: Union[bool, 'otp.ResultCache', None] = None,
+        cancellation_handle=None,
+        autotune: Union[bool, 'otp.Autotuner', None] = None):
     """
     Executes a query and returns its result.
 
@@ -236,6 +242,22 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
         If set to False (default), they are returned as float values, with possible precision loss.
         If set to True, they are returned as :py:class:`decimal.Decimal` objects without precision loss.
         This parameter may not be supported on older OneTick versions.
+    result_cache: bool, :py:class:`otp.ResultCache <onetick.py.ResultCache>`, optional
+        Use client-side cache of the query results partitioned by symbol and day.
+        Only the days missing in the cache are requested from the server.
+        If set to True, the cache with default parameters is used.
+        Supported only for :py:class:`onetick.py.Source` queries returning :pandas:`pandas.DataFrame` results.
+        See :py:class:`otp.ResultCache <onetick.py.ResultCache>` for details.
+    cancellation_handle: otq.QueryCancellationHandle, optional
+        Handle that can be used to cancel the running query on the server from another thread
+        with its ``cancel_query()`` method.
+        Used by :py:func:`otp.run_async <onetick.py.run_async>` to cancel the queries on timeout.
+    autotune: bool, :py:class:`otp.Autotuner <onetick.py.Autotuner>`, optional
+        Choose ``concurrency``, ``batch_size`` and ``max_expected_ticks_per_symbol`` parameters
+        (if they are not set explicitly) based on the statistics of the previous runs of the same query.
+        If set to True, the autotuner with default parameters is used.
+        By default, :py:attr:`otp.config.autotune<onetick.py.configuration.Config.autotune>` is used.
+        See :py:class:`otp.Autotuner <onetick.py.Autotuner>` for details.
 
     Returns
     -------
@@ -495,6 +517,50 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
                         symbols='AAPL', node_name='OUTPUT_1',
                         date=otp.dt(2022, 3, 1))
     """
+    if autotune is None:
+        autotune = otp.config.autotune
+    if autotune:
+        from onetick.py.autotuner import Autotuner
+        if not isinstance(autotune, Autotuner):
+            autotune = Autotuner.get_default()
+        return autotune.run(
+            query, symbols=symbols, start=start, end=end, date=date,
+            start_time_expression=start_time_expression, end_time_expression=end_time_expression,
+            timezone=timezone, context=context, username=username, alternative_username=alternative_username,
+            password=password, batch_size=batch_size, running=running, query_properties=query_properties,
+            concurrency=concurrency, apply_times_daily=apply_times_daily, symbol_date=symbol_date,
+            query_params=query_params, time_as_nsec=time_as_nsec,
+            treat_byte_arrays_as_strings=treat_byte_arrays_as_strings,
+            output_matrix_per_field=output_matrix_per_field, output_structure=output_structure,
+            return_utc_times=return_utc_times, connection=connection, callback=callback, svg_path=svg_path,
+            use_connection_pool=use_connection_pool, node_name=node_name, require_dict=require_dict,
+            max_expected_ticks_per_symbol=max_expected_ticks_per_symbol, log_symbol=log_symbol,
+            encoding=encoding, manual_dataframe_callback=manual_dataframe_callback,
+            print_symbol_errors=print_symbol_errors, preserve_decimal_flag=preserve_decimal_flag,
+            result_cache=result_cache, cancellation_handle=cancellation_handle,
+        )
+
+    if result_cache:
+        from onetick.py.result_cache import ResultCache
+        if not isinstance(result_cache, ResultCache):
+            result_cache = ResultCache()
+        return result_cache.run(
+            query, symbols=symbols, start=start, end=end, date=date,
+            start_time_expression=start_time_expression, end_time_expression=end_time_expression,
+            timezone=timezone, context=context, username=username, alternative_username=alternative_username,
+            password=password, batch_size=batch_size, running=running, query_properties=query_properties,
+            concurrency=concurrency, apply_times_daily=apply_times_daily, symbol_date=symbol_date,
+            query_params=query_params, time_as_nsec=time_as_nsec,
+            treat_byte_arrays_as_strings=treat_byte_arrays_as_strings,
+            output_matrix_per_field=output_matrix_per_field, output_structure=output_structure,
+            return_utc_times=return_utc_times, connection=connection, callback=callback, svg_path=svg_path,
+            use_connection_pool=use_connection_pool, node_name=node_name, require_dict=require_dict,
+            max_expected_ticks_per_symbol=max_expected_ticks_per_symbol, log_symbol=log_symbol,
+            encoding=encoding, manual_dataframe_callback=manual_dataframe_callback,
+            print_symbol_errors=print_symbol_errors, preserve_decimal_flag=preserve_decimal_flag,
+            cancellation_handle=cancellation_handle,
+        )
+
     _ = otli.OneTickLib()
 
     query_schema = None
@@ -543,6 +609,12 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
         start = otp.date(date)
         end = start + otp.Day(1)
 
+    if isinstance(query, otp.Source) and (otp.config.query_budget_ticks is not None
+                                          or otp.config.query_budget_bytes is not None):
+        report = query.estimate_cost(symbols=symbols, start=start, end=end, timezone=timezone,
+                                     context=context, query_properties=qp_dict)
+        report.check_budget(max_ticks=otp.config.query_budget_ticks, max_bytes=otp.config.query_budget_bytes)
+
     has_source_start, has_source_end = False, False
     if isinstance(query, otp.Source):
         has_source_start, has_source_end = query.has_start_end_time()
@@ -650,18 +722,26 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
                 warnings.warn('Using as a symbol list a source without "SYMBOL_NAME" field '
                               'and with more than one field! This won\'t work unless the schema is incomplete')
 
-        symbols = otp.Source._convert_symbol_to_string(
-            symbol=symbols,
-            tmp_otq=query._tmp_otq if isinstance(query, otp.Source) else None,
-            start=start,
-            end=end,
-            timezone=timezone,
-        )
+        with tracing.span('convert_symbols'):
+            symbols = otp.Source._convert_symbol_to_string(
+                symbol=symbols,
+                tmp_otq=query._tmp_otq if isinstance(query, otp.Source) else None,
+                start=start,
+                end=end,
+                timezone=timezone,
+                # materialized evaluated queries are run with the same connection parameters
+                run_kwargs=dict(context=context, username=username, alternative_username=alternative_username,
+                                password=password, query_properties=qp_dict),
+            )
     if isinstance(symbols, str):
         symbols = [symbols]
     if isinstance(symbols, pd.DataFrame):
         symbols = utils.get_symbol_list_from_df(symbols)
 
+    run_span = tracing.current_span()
+    if run_span.recording:
+        run_span.set_attribute('symbols', len(symbols) if isinstance(symbols, list) else int(symbols is not None))
+
     if isinstance(query, dict):
         # we assume it's a dictionary of sources for the MultiOutputSource object
         query = otp.MultiOutputSource(query)
@@ -750,6 +830,9 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
     if preserve_decimal_flag is not None:
         kwargs['preserve_decimal_flag'] = preserve_decimal_flag
 
+    if cancellation_handle is not None:
+        kwargs['cancellation_handle'] = cancellation_handle
+
     run_params = dict(
         query=query,
         symbols=symbols, start=start, end=end, context=context, username=username,
@@ -772,7 +855,8 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
     otp.get_logger(__name__).info(otp.utils.json_dumps(debug_params))
 
     try:
-        result = otq.run(**run_params)
+        with tracing.span('otq.run'):
+            result = otq.run(**run_params)
     except Exception as e:
         e = _add_stack_info_to_exception(e)
         e = _add_version_info_to_exception(e)
@@ -795,34 +879,55 @@ def run(query: Union[Callable, dict, otp.Source, otp.MultiOutputSource,  # NOSON
         node_names = node_name
 
     # check if we have empty result for any symbol to add schema to empty dataframes
-    _process_empty_results(result, query_schema, output_structure)
-
-    return _format_call_output(result, output_structure=output_structure,
-                               require_dict=require_dict, node_names=node_names,
-                               print_symbol_errors=print_symbol_errors)
+    with tracing.span('process_empty_results'):
+        _process_empty_results(result, query_schema, output_structure)
+
+    with tracing.span('format_output') as format_span:
+        result = _format_call_output(result, output_structure=output_structure,
+                                     require_dict=require_dict, node_names=node_names,
+                                     print_symbol_errors=print_symbol_errors)
+        if format_span.recording:
+            rows, size = _get_result_size(result)
+            for span in (format_span, run_span):
+                span.set_attribute('rows', rows)
+                span.set_attribute('bytes', size)
+    return result
 
 
-async def run_async(*args, **kwargs):
+async def run_async(*args, timeout: Optional[float] = None, semaphore: Optional[asyncio.Semaphore] = None,
+                    **kwargs):
     """
     Asynchronous alternative to :func:`otp.run <onetick.py.run>`.
 
-    All parameters are the same.
+    All parameters of :func:`otp.run <onetick.py.run>` are supported.
 
     This function can be used via built-in python ``await`` syntax
     and standard `asyncio <https://docs.python.org/3/library/asyncio.html>`_ library.
 
+    Parameters
+    ----------
+    timeout: float, optional
+        Maximum number of seconds to wait for the result of the query.
+        When it is exceeded, the query is cancelled and :py:class:`asyncio.TimeoutError` is raised.
+        The time spent waiting for the ``semaphore`` is not included.
+    semaphore: :py:class:`asyncio.Semaphore`, optional
+        Semaphore limiting the number of queries executed at the same time.
+        By default, the semaphore of the current event loop with
+        :py:attr:`otp.config.async_queries_limit<onetick.py.configuration.Config.async_queries_limit>`
+        slots is used, if this option is set.
+        The slot is released as soon as the query is finished, cancelled or timed out.
+    kwargs:
+        Parameters of :func:`otp.run <onetick.py.run>`.
+
     Note
     ----
     Internally this function is implemented as :func:`otp.run <onetick.py.run>` running in a separate thread.
 
-    Threads in python are generally not interruptable,
-    so some `asyncio` functionality may not work as expected.
-
-    For example, canceling :func:`otp.run_async <onetick.py.run_async>` task by
-    `timeout <https://docs.python.org/3/library/asyncio-task.html#timeouts>`_
-    may block the waiting function
-    or exiting the python process will block until the task is finished,
-    depending on python and `asyncio` back-end implementation.
+    When the task is cancelled or timed out, the cancellation request for the query is sent to the server
+    (using ``cancellation_handle`` parameter of :func:`otp.run <onetick.py.run>`),
+    so the server stops executing it and the thread finishes shortly after that.
+    If the cancellation is not supported by the installed ``onetick.query`` version,
+    the thread keeps running until the query is finished.
 
     Examples
     --------
@@ -868,7 +973,68 @@ async def run_async(*args, **kwargs):
     >>> print('Finished in', time.time() - start_time, 'seconds') # doctest: +SKIP
     Finished in 3.0108885765075684 seconds
     """
-    return await asyncio.to_thread(run, *args, **kwargs)
+    with tracing.span('otp.run_async') as span:
+        if semaphore is None:
+            semaphore = _get_async_semaphore()
+        if semaphore is None:
+            return await _run_cancellable(args, kwargs, timeout)
+        start_waiting = time.perf_counter()
+        async with semaphore:
+            if span.recording:
+                span.set_attribute('semaphore_wait', time.perf_counter() - start_waiting)
+            return await _run_cancellable(args, kwargs, timeout)
+
+
+# semaphores for otp.config.async_queries_limit, asyncio primitives can't be shared between event loops
+_ASYNC_SEMAPHORES: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[int, asyncio.Semaphore]]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_async_semaphore() -> Optional[asyncio.Semaphore]:
+    limit = otp.config.async_queries_limit
+    if not limit:
+        return None
+    loop = asyncio.get_running_loop()
+    if loop not in _ASYNC_SEMAPHORES or _ASYNC_SEMAPHORES[loop][0] != limit:
+        _ASYNC_SEMAPHORES[loop] = (limit, asyncio.Semaphore(limit))
+    return _ASYNC_SEMAPHORES[loop][1]
+
+
+def _create_cancellation_handle(kwargs: dict):
+    if kwargs.get('cancellation_handle') is not None:
+        return kwargs['cancellation_handle']
+    handle_class = getattr(otq, 'QueryCancellationHandle', None)
+    if handle_class is None:
+        return None
+    kwargs['cancellation_handle'] = handle_class()
+    return kwargs['cancellation_handle']
+
+
+def _cancel_query(handle):
+    try:
+        handle.cancel_query()
+    except Exception as e:
+        otp.get_logger(__name__).warning(f"Can't cancel the query: {e}")
+
+
+async def _run_cancellable(args, kwargs: dict, timeout: Optional[float]):
+    handle = _create_cancellation_handle(kwargs)
+    future = asyncio.ensure_future(asyncio.to_thread(run, *args, **kwargs))
+    try:
+        # shield doesn't let wait_for wait for the thread to finish after timeout
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        # the query will fail after cancellation, its error is not interesting anymore
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if handle is None:
+            otp.get_logger(__name__).warning(
+                "Query cancellation is not supported by onetick.query, the query will run until it's finished"
+            )
+        else:
+            # the request to the server is sent in a separate thread to not block the event loop
+            asyncio.get_running_loop().run_in_executor(None, _cancel_query, handle)
+        raise
 
 
 def _filter_returned_map_by_node(result, _node_names):
@@ -1008,6 +1174,22 @@ def _format_call_output(result, output_structure, node_names, require_dict, prin
         return result_dict
 
 
+def _get_result_size(result) -> tuple[int, int]:
+    """
+    Returns the number of rows and the number of bytes in the dataframes of the formatted result.
+    """
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(index=True).sum())
+    if isinstance(result, (dict, list)):
+        rows = size = 0
+        for item in (result.values() if isinstance(result, dict) else result):
+            item_rows, item_size = _get_result_size(item)
+            rows += item_rows
+            size += item_size
+        return rows, size
+    return 0, 0
+
+
 def _process_empty_results(result, query_schema, output_structure):
     """
     Process query results and add columns to empty responses based on query schema.
@@ -1353,23 +1353,40 @@ class HTTPSession:
                  http_password=None,
                  access_token=None,
                  http_proxy=None,
-                 https_proxy=None):
+                 https_proxy=None,
+                 context_local=False):
         """
         This class must be used only for WebAPI connection,
         to set HTTP connection parameters.
+
+        If ``context_local`` is set, the parameters are set with
+        :py:meth:`otp.config.override <onetick.py.configuration.Config.override>`,
+        i.e. only for the current thread or asyncio task,
+        so several sessions with different HTTP endpoints can be used concurrently.
+        In this case the session must be closed in the same thread or task.
         """
         import onetick.py as otp
+        arguments = locals()
+        params = {param: arguments[param] for param in self.param_list if arguments[param]}
         self._restore_config = {}
-        for param in self.param_list:
-            if locals()[param]:
-                self._restore_config[param] = otp.config.get(param)
-                otp.config.__setattr__(param, locals()[param])
+        self._override = None
+        if context_local:
+            self._override = otp.config.override(**params)
+            self._override.__enter__()
+            return
+        for param, value in params.items():
+            self._restore_config[param] = otp.config.get(param)
+            otp.config.__setattr__(param, value)
 
     def close(self):
+        if self._override is not None:
+            self._override.__exit__(None, None, None)
+            self._override = None
         # restore config
         import onetick.py as otp
         for param, value in self._restore_config.items():
             otp.config.__setattr__(param, value)
+        self._restore_config = {}
 
     def __enter__(self):
         return self
@@ -0,0 +1,309 @@
+"""
+Warm session reused by many tests.
+
+Creating :class:`otp.Session <onetick.py.Session>` generates config, locator and ACL files
+and initializes OneTick library, which takes most of the time of the short tests.
+:class:`SessionPool` creates the session once, remembers the state of its files
+and rolls it back after each test instead of creating the new session.
+It also keeps databases with the test data loaded, so the same data is written only once.
+
+The fixtures using the pool are defined in the pytest plugin ``onetick.py.pytest_plugin``.
+"""
+import hashlib
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from onetick.py import configuration, utils
+from onetick.py.db import DB
+from onetick.py.session import Session, TestSession
+
+
+def _source_fingerprint(src) -> str:
+    """
+    Fingerprint of the query of the source.
+    Generated identifiers of the nodes and the queries are different each time the query is built,
+    so the canonical text of the query is hashed.
+    """
+    path = src.to_otq().split('::')[0]
+    return utils.otq_text_fingerprint(Path(path).read_text())
+
+
+def _fingerprint(value) -> str:
+    """
+    String identifying the content of the ``value``.
+    """
+    from onetick.py.core.source import Source
+
+    if isinstance(value, Source):
+        return _source_fingerprint(value)
+    if isinstance(value, pd.DataFrame):
+        hashed = pd.util.hash_pandas_object(value, index=True).values.tobytes()
+        return f'DataFrame({list(value.columns)}, {list(map(str, value.dtypes))}, {hashlib.sha256(hashed).hexdigest()})'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f'{k!r}: {_fingerprint(v)}' for k, v in sorted(value.items(), key=str)) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(map(_fingerprint, value)) + ']'
+    return repr(value)
+
+
+def _chain(key: str, value: str) -> str:
+    return hashlib.sha256(f'{key}\n{value}'.encode()).hexdigest()
+
+
+class _SessionSnapshot:
+    """
+    Contents of the config, locator and ACL files of the session
+    and the list of the entities added to them.
+    """
+
+    def __init__(self, session: Session):
+        self.config = session.config
+        self.files = []
+        for handler in (session.config, session.acl, session.locator, *session.config._context_locators.values()):
+            with open(handler.path) as f:
+                text = f.read()
+            added = {
+                name: list(getattr(handler, name))
+                for name in ('_added_dbs', '_added_ts')
+                if hasattr(handler, name)
+            }
+            self.files.append((handler, text, added))
+        self.options = {
+            name: option._set_value
+            for name, option in configuration.Config.get_changeable_config_options().items()
+        }
+
+    def restore(self) -> int:
+        """
+        Restore the saved state, returns the number of the reloaded files.
+        """
+        changed = []
+        for handler, text, added in self.files:
+            for name, value in added.items():
+                setattr(handler, name, list(value))
+            with open(handler.path) as f:
+                if f.read() == text:
+                    continue
+            with open(handler.path, 'w') as f:
+                f.write(text)
+            changed.append(handler)
+        for name, option in configuration.Config.get_changeable_config_options().items():
+            option._set_value = self.options.get(name, configuration.nothing)
+        # the main config is reloaded first, because locator and ACL files are referenced in it
+        for handler in changed:
+            handler.reload()
+        return len(changed)
+
+
+class _CachedDB:
+    """
+    Directory with the data of the database loaded by the pool.
+    """
+
+    def __init__(self, db: DB, location: utils.TmpDir):
+        self.db = db
+        self.location = location
+        self.hits = 0
+
+
+class SessionPool:
+    """
+    Session created once and rolled back to its initial state between tests.
+
+    The pool is intended for the test suites where each test creates
+    :class:`otp.TestSession <onetick.py.TestSession>` and adds some databases to it.
+    After the test :meth:`rollback` restores the config, locator and ACL files of the session
+    and :py:attr:`otp.config <onetick.py.configuration.Config>` values,
+    reloading in OneTick only the files that have been changed by the test.
+    If the test has closed the session, the new one is created.
+
+    With ``pytest-xdist`` each worker process has its own pool.
+
+    Parameters
+    ----------
+    session_class: type
+        Class of the created session, :class:`otp.TestSession <onetick.py.TestSession>` by default.
+    setup: callable, optional
+        Function called with the created session before its state is saved,
+        e.g. to add databases available in all tests.
+    max_dbs: int, optional
+        Maximum number of the databases kept by :meth:`db`.
+        The least recently used databases are removed when the limit is exceeded.
+    kwargs:
+        Parameters of the session.
+
+    Examples
+    --------
+    >>> pool = otp.session_pool.SessionPool()  # doctest: +SKIP
+    >>> session = pool.session  # doctest: +SKIP
+    >>> session.use(otp.DB('TEST_DB'))  # doctest: +SKIP
+    >>> pool.rollback()  # doctest: +SKIP
+    >>> 'TEST_DB' in session.locator.databases  # doctest: +SKIP
+    False
+    """
+
+    def __init__(self, session_class=TestSession, setup=None, max_dbs: Optional[int] = None, **kwargs):
+        if max_dbs is not None and max_dbs < 1:
+            raise ValueError("Parameter 'max_dbs' must be a positive integer")
+        self._session_class = session_class
+        self._setup = setup
+        self._session_kwargs = kwargs
+        self._session: Optional[Session] = None
+        self._snapshot: Optional[_SessionSnapshot] = None
+        self.max_dbs = max_dbs
+        # data of the databases is kept in the separate directory,
+        # because the directory of the session is removed when the session is recreated
+        self._dbs_dir = utils.TmpDir(suffix='.dbs', base_dir=None)
+        self._dbs: OrderedDict[str, _CachedDB] = OrderedDict()
+        self.stats = {
+            'sessions': 0,
+            'rollbacks': 0,
+            'reloads': 0,
+            'db_hits': 0,
+            'db_misses': 0,
+        }
+
+    @property
+    def session(self) -> Session:
+        """
+        The session of the pool, it is created on the first access.
+        """
+        if self._session is None or Session._instance is not self._session:
+            self._start()
+        return self._session  # type: ignore[return-value]
+
+    def _start(self):
+        if Session._instance is not None and Session._instance is not self._session:
+            raise ValueError("Can't create the session of the pool: another session is active. "
+                             "Probably it was not closed by the previous test.")
+        self.close()
+        self._session = self._session_class(**self._session_kwargs)
+        self.stats['sessions'] += 1
+        if self._setup is not None:
+            self._setup(self._session)
+        self._snapshot = _SessionSnapshot(self._session)
+
+    def rollback(self):
+        """
+        Restore the state of the session saved after its creation.
+
+        If the session has been closed or its config has been replaced, the new session is created.
+        """
+        if self._session is None:
+            return
+        if Session._instance is not self._session or self._session.config is not self._snapshot.config:
+            self._start()
+            return
+        self.stats['rollbacks'] += 1
+        self.stats['reloads'] += self._snapshot.restore()  # type: ignore[union-attr]
+        self._session._ts_dbs = {}
+
+    def close(self):
+        """
+        Close the session of the pool. Loaded databases are kept.
+        """
+        if self._session is not None:
+            self._session.close()
+        self._session = None
+        self._snapshot = None
+
+    def db(self, name: str, *data, **kwargs) -> DB:
+        """
+        Returns the database ``name`` with the ``data`` loaded.
+
+        Databases are identified by the hash of their parameters
+        and the inputs of all :meth:`DB.add <onetick.py.DB.add>` calls:
+        the query of the source, the content of the dataframe, date, symbol, tick type, etc.
+        If the database with the same hash has already been loaded, it is returned without writing the data again.
+        If only the first part of the ``data`` has been loaded,
+        the data of that database is copied and the rest of the ``data`` is added to the copy.
+
+        The database is returned without write access,
+        so the tests can't change the data shared with other tests.
+        It is not added to the session, use :meth:`Session.use <onetick.py.Session.use>` for that.
+
+        Parameters
+        ----------
+        name: str
+            Name of the database.
+        data:
+            Data to add to the database: :class:`otp.Source <onetick.py.Source>`, :pandas:`pandas.DataFrame`
+            or dictionary with the parameters of :meth:`DB.add <onetick.py.DB.add>`.
+        kwargs:
+            Parameters of :class:`otp.DB <onetick.py.DB>`.
+            Location of the database is set by the pool,
+            so ``db_locations`` can contain only one location without the ``location`` key.
+
+        Examples
+        --------
+        >>> db = pool.db('TEST_DB', otp.Ticks(A=[1, 2, 3]), {'src': otp.Ticks(A=[4]), 'symbol': 'S2'})  # doctest: +SKIP
+        >>> pool.session.use(db)  # doctest: +SKIP
+        """
+        db_locations = kwargs.pop('db_locations', None) or [{}]
+        if len(db_locations) != 1 or 'location' in db_locations[0]:
+            raise ValueError("Parameter 'db_locations' of the pooled database can contain only one location "
+                             "without the 'location' key, the location is set by the pool")
+        for name_ in ('src', 'date', 'symbol', 'tick_type', 'clean_up'):
+            if name_ in kwargs:
+                raise ValueError(f"Parameter '{name_}' can't be set for the pooled database, "
+                                 "pass the data in the positional parameters instead")
+
+        adds = [dict(item) if isinstance(item, dict) else {'src': item} for item in data]
+        for add in adds:
+            if 'src' not in add:
+                raise ValueError("Parameter 'src' must be set for each data item of the pooled database")
+            # the defaults of DB.add depend on otp.config, so they are resolved here to be part of the hash
+            add.setdefault('timezone', configuration.config.tz)
+            if not (add.get('start') and add.get('end')):
+                add.setdefault('date', configuration.config.default_start_time)
+            add.setdefault('symbol', configuration.config.default_db_symbol)
+
+        # the key of each prefix of the data is computed, so the longest loaded prefix can be found
+        keys = [_chain(name, _fingerprint({**kwargs, 'db_locations': db_locations}))]
+        for add in adds:
+            keys.append(_chain(keys[-1], _fingerprint(add)))
+
+        if keys[-1] in self._dbs:
+            self.stats['db_hits'] += 1
+            return self._get(keys[-1]).db
+        self.stats['db_misses'] += 1
+
+        location = utils.TmpDir(suffix='.db', base_dir=self._dbs_dir)
+        loaded = 0
+        for i in range(len(adds) - 1, 0, -1):
+            if keys[i] in self._dbs:
+                # copy-on-write: the data of the shared database is not changed
+                shutil.copytree(self._get(keys[i]).location.path, location.path, dirs_exist_ok=True)
+                loaded = i
+                break
+
+        db = DB(name, db_locations=[{**db_locations[0], 'location': location.path}], **kwargs)
+        # the session must be active while the data is written
+        _ = self.session
+        for add in adds[loaded:]:
+            db.add(**add)
+        db._write = False
+
+        self._dbs[keys[-1]] = _CachedDB(db, location)
+        if self.max_dbs is not None:
+            while len(self._dbs) > self.max_dbs:
+                # the directory of the database is removed with the last reference to it
+                self._dbs.popitem(last=False)
+        return db
+
+    def _get(self, key: str) -> _CachedDB:
+        cached = self._dbs[key]
+        cached.hits += 1
+        self._dbs.move_to_end(key)
+        return cached
+
+    def clear_dbs(self):
+        """
+        Remove all loaded databases.
+        """
+        self._dbs.clear()
+
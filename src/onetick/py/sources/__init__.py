@@ -17,6 +17,7 @@ from .snapshots import ReadSnapshot, ShowSnapshotList, FindSnapshotSymbols
 from .split_query_output_by_symbol import SplitQueryOutputBySymbol, by_symbol
 from .symbology_mapping import SymbologyMapping
 from .symbols import Symbols
+from .symbol_list_file import SymbolListFile
 from .pit import PointInTime
 from .ref_data import RefData
 from .kdb import ReadFromKdb
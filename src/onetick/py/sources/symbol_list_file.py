@@ -0,0 +1,172 @@
+import csv
+import hashlib
+import os
+from collections.abc import Iterable
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from onetick.py import configuration
+from onetick.py.core.source import Source
+
+from .csv import _CSV
+
+
+_SYMBOL_NAME = 'SYMBOL_NAME'
+
+
+def _to_dataframe(symbols, symbol_name_column: str) -> pd.DataFrame:
+    if isinstance(symbols, pd.DataFrame):
+        df = symbols
+    elif hasattr(symbols, 'to_pandas') and hasattr(symbols, 'schema'):
+        # pyarrow.Table or pyarrow.RecordBatch
+        df = symbols.to_pandas()
+    elif isinstance(symbols, Iterable) and not isinstance(symbols, (str, bytes, dict)):
+        df = pd.DataFrame({symbol_name_column: np.asarray(list(symbols), dtype=object)})
+    else:
+        raise ValueError(f'Symbol list must be a pandas.DataFrame, pyarrow.Table or an iterable of symbol names, '
+                         f'got {type(symbols)}')
+
+    if symbol_name_column not in df.columns:
+        raise ValueError(f'Symbol list does not contain a {symbol_name_column} column')
+    # BDS-511: adding Time column to the query may result in problems with otq.run
+    if 'Time' in df.columns:
+        df = df.drop(columns=['Time'])
+    if symbol_name_column != _SYMBOL_NAME:
+        if _SYMBOL_NAME in df.columns:
+            raise ValueError(f"Symbol list can't contain both {symbol_name_column} and {_SYMBOL_NAME} columns")
+        df = df.rename(columns={symbol_name_column: _SYMBOL_NAME})
+    # symbol name is always the first column
+    return df[[_SYMBOL_NAME] + [column for column in df.columns if column != _SYMBOL_NAME]]
+
+
+def _column_type(name: str, column: pd.Series) -> str:
+    dtype = column.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'long'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'double'
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        length = column.astype(str).str.len().max() if len(column) else 0
+        return f'string[{max(int(length), 1)}]'
+    raise ValueError(f"Unsupported type '{dtype}' of column '{name}' in symbol list, "
+                     "only string, integer, float and boolean columns are supported")
+
+
+def _content_hash(df: pd.DataFrame) -> str:
+    """
+    Vectorized hash of the symbol list contents, including column names and types.
+    """
+    sha = hashlib.sha256()
+    for column in df.columns:
+        sha.update(f'{column}:{df[column].dtype};'.encode())
+    sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+def write_symbol_list_file(symbols, symbol_name_column: str = _SYMBOL_NAME, directory: Optional[str] = None) -> str:
+    """
+    Write symbol list to a CSV file that can be read by OneTick.
+
+    The file name is the hash of the symbol list contents,
+    so if the file for the same symbol list was already written, it is reused.
+
+    Parameters
+    ----------
+    symbols: :pandas:`pandas.DataFrame`, :pyarrow:`pyarrow.Table`, iterable of str
+        Symbol list. Column ``symbol_name_column`` is interpreted as symbol names,
+        while other columns are interpreted as symbol params.
+    symbol_name_column: str
+        Name of the column with symbol names.
+    directory: str, optional
+        Directory to write the file to.
+        By default, ``symbol_lists`` subdirectory of the onetick-py cache directory is used.
+
+    Returns
+    -------
+    str
+        Path to the file.
+    """
+    df = _to_dataframe(symbols, symbol_name_column)
+    if directory is None:
+        directory = os.path.join(configuration.DEFAULT_CACHE_DIR, 'symbol_lists')
+    path = os.path.join(directory, f'{_content_hash(df)}.csv')
+    if os.path.exists(path):
+        return path
+
+    # '#' in the beginning of the title forces OneTick to use the first line as the title,
+    # types of the columns are declared in the title too, so they are not converted from strings
+    title = '#' + ','.join(f'{_column_type(column, df[column])} {column}' for column in df.columns)
+    for column in df.columns:
+        if pd.api.types.is_bool_dtype(df[column].dtype):
+            df[column] = df[column].astype(int)
+    body = df.to_csv(header=False, index=False, lineterminator='\n',
+                     quoting=csv.QUOTE_NONNUMERIC, doublequote=False, escapechar='\\')
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        f.write(title + '\n')
+        f.write(body)
+    os.replace(tmp_path, path)
+    return path
+
+
+def SymbolListFile(  # NOSONAR
+    symbols,
+    symbol_name_column: str = _SYMBOL_NAME,
+    directory: Optional[str] = None,
+    db='LOCAL',
+) -> Source:
+    """
+    Construct source reading symbol list from a file.
+
+    Can be used as ``symbols`` parameter of :py:func:`otp.run <onetick.py.run>`
+    or other methods accepting "symbols" query to run the query for a very large list of symbols.
+    Instead of creating a python object for each symbol,
+    symbol list is written to the CSV file at once and bound to the query on the server side.
+
+    The file name is the hash of the symbol list contents,
+    so the file is written only once for the same symbol list and reused in the next runs.
+
+    Parameters
+    ----------
+    symbols: :pandas:`pandas.DataFrame`, :pyarrow:`pyarrow.Table`, iterable of str
+        Symbol list. Column ``symbol_name_column`` is interpreted as symbol names,
+        while other columns are interpreted as symbol params.
+        String, integer, float and boolean symbol params are supported.
+    symbol_name_column: str
+        Name of the column with symbol names.
+    directory: str, optional
+        Directory to write the file to.
+        By default, ``symbol_lists`` subdirectory of the onetick-py cache directory is used.
+        The file must be accessible by OneTick server running the query.
+    db: str
+        Database to read the file on. By default the file is read on the site where the query runs.
+
+    Returns
+    -------
+    :py:class:`onetick.py.Source`
+
+    See also
+    --------
+    | **CSV_FILE_LISTING** OneTick event processor
+    | :py:func:`otp.CSV <onetick.py.CSV>`
+
+    Examples
+    --------
+    >>> symbols = pd.DataFrame({'SYMBOL_NAME': ['A', 'B'], 'PARAM': [1, 2]})
+    >>> data = otp.Tick(X=1)
+    >>> data['PARAM'] = data.Symbol.get('PARAM', int)
+    >>> otp.run(data, symbols=otp.SymbolListFile(symbols))  # doctest: +SKIP
+    {'A':         Time  X  PARAM
+    0 2003-12-01  1      1, 'B':         Time  X  PARAM
+    0 2003-12-01  1      2}
+    """
+    path = write_symbol_list_file(symbols, symbol_name_column=symbol_name_column, directory=directory)
+    return _CSV(path,
+                first_line_is_title=True,
+                auto_increase_timestamps=False,
+                db=db,
+                handle_escaped_chars=True)
@@ -705,10 +705,12 @@ class _DataCSV(Source):
 
         if use_absolute_time:
             # converting values of "time" column to onetick expressions
-            converted_times = []
-            for d in data["time"]:
-                converted_times.append(datetime_to_expr(d))
-            data["time"] = converted_times
+            times = data["time"]
+            if all(ott.is_time_type(d) and getattr(d, 'tzinfo', None) is None for d in times):
+                # the most common case of timezone-naive values is converted at once
+                data["time"] = ott.datetime2expr_array(times, timezone_naive=timezone_for_time)
+            else:
+                data["time"] = [datetime_to_expr(d) for d in times]
 
         def csv_rep(value):
             if issubclass(type(value), str):
@@ -0,0 +1,342 @@
+"""
+Tracing of the phases of the query execution.
+
+Tracing is disabled until at least one hook is added with :func:`add_hook`,
+spans are not even created in this case.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Optional
+
+import pandas as pd
+
+from onetick.py.log import get_logger
+
+
+class Span:
+    """
+    Single traced operation.
+
+    Spans are created by onetick-py and passed to the hooks,
+    they should not be created manually.
+
+    Attributes
+    ----------
+    name: str
+        Name of the operation, e.g. ``otp.run`` or ``to_graph``.
+    attributes: dict
+        Additional information about the operation: number of symbols, rows, bytes, etc.
+    parent: Span or None
+        Span of the operation this operation is a part of.
+    start_time: int
+        Time of the start of the operation in nanoseconds since the epoch.
+    duration: float or None
+        Duration of the operation in seconds, None if the operation is not finished.
+    error: Exception or None
+        Exception raised by the operation.
+    """
+
+    recording = True
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.parent: Optional[Span] = None
+        self.start_time = 0
+        self.duration: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self._hooks: tuple = ()
+        self._start = 0.0
+        self._token = None
+
+    @property
+    def depth(self) -> int:
+        """Number of the ancestors of the span."""
+        depth = 0
+        parent = self.parent
+        while parent is not None:
+            depth += 1
+            parent = parent.parent
+        return depth
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._hooks = _hooks
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.start_time = time.time_ns()
+        self._start = time.perf_counter()
+        _call_hooks(self._hooks, 'on_start', self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self._start
+        self.error = exc_value
+        _current_span.reset(self._token)
+        _call_hooks(self._hooks, 'on_end', self)
+        return False
+
+    def __repr__(self):
+        return f'Span({self.name!r}, duration={self.duration}, attributes={self.attributes})'
+
+
+class _NoopSpan:
+    """Span returned when tracing is disabled, does nothing."""
+
+    recording = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('onetick_py_span', default=None)
+# the tuple is replaced instead of changing, so the spans can use it without locking
+_hooks: tuple = ()
+_hooks_lock = threading.Lock()
+
+
+def _call_hooks(hooks, method, span):
+    for hook in hooks:
+        try:
+            getattr(hook, method)(span)
+        except Exception as e:
+            # the query must not fail because of the tracing
+            get_logger(__name__).warning(f'Tracing hook {hook!r} failed in {method}: {e}')
+
+
+def span(name: str, **attributes):
+    """
+    Returns the context manager tracing the operation ``name``.
+
+    If tracing is disabled, the shared object doing nothing is returned.
+    Check ``recording`` attribute of the span before computing expensive attributes.
+    """
+    if not _hooks:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def current_span():
+    """
+    Returns the span of the currently traced operation
+    or the object doing nothing if there is no such operation or tracing is disabled.
+    """
+    if not _hooks:
+        return _NOOP_SPAN
+    return _current_span.get() or _NOOP_SPAN
+
+
+def traced(name: str):
+    """
+    Decorator tracing each call of the function as operation ``name``.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_hook(hook: 'TracingHook'):
+    """
+    Enable tracing and send the spans to the ``hook``.
+    """
+    global _hooks
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook: 'TracingHook'):
+    """
+    Stop sending the spans to the ``hook``.
+    Tracing is disabled when the last hook is removed.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def get_hooks() -> list:
+    """
+    Returns the list of the added hooks.
+    """
+    return list(_hooks)
+
+
+@contextmanager
+def collect():
+    """
+    Context manager collecting the spans in the :class:`InMemoryCollector`
+    while the code inside of it is executed.
+
+    Examples
+    --------
+    >>> data = otp.Ticks(A=[1, 2, 3])
+    >>> with otp.tracing.collect() as collector:  # doctest: +SKIP
+    ...     df = otp.run(data)
+    >>> collector.report()[['NAME', 'DEPTH', 'DURATION', 'ROWS']]  # doctest: +SKIP
+                        NAME  DEPTH  DURATION  ROWS
+    0                otp.run      0  0.081531   3.0
+    1             copy_graph      1  0.000412   NaN
+    2        convert_symbols      1  0.000004   NaN
+    3               to_graph      1  0.001121   NaN
+    4               save_otq      1  0.002208   NaN
+    5                otq.run      1  0.073922   NaN
+    6  process_empty_results      1  0.000015   NaN
+    7          format_output      1  0.000613   3.0
+    """
+    collector = InMemoryCollector()
+    add_hook(collector)
+    try:
+        yield collector
+    finally:
+        remove_hook(collector)
+
+
+class TracingHook:
+    """
+    Base class of the tracing hooks.
+
+    Hooks are added with :func:`add_hook`.
+    The methods are called in the thread executing the operation
+    and should be fast, exceptions raised by them are logged and ignored.
+    """
+
+    def on_start(self, span: Span):
+        """Called when the operation is started."""
+
+    def on_end(self, span: Span):
+        """Called when the operation is finished, ``span.duration`` is set at this point."""
+
+
+class InMemoryCollector(TracingHook):
+    """
+    Hook collecting finished spans in memory.
+
+    Parameters
+    ----------
+    max_spans: int, optional
+        If set, only this number of the last spans is kept.
+    """
+
+    def __init__(self, max_spans: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._spans: deque[Span] = deque()
+        self.max_spans = max_spans
+
+    @property
+    def max_spans(self) -> Optional[int]:
+        return self._spans.maxlen
+
+    @max_spans.setter
+    def max_spans(self, value: Optional[int]):
+        if value is not None and value < 1:
+            raise ValueError("Parameter 'max_spans' must be a positive integer")
+        with self._lock:
+            # the oldest spans are dropped from the bounded deque
+            self._spans = deque(self._spans, maxlen=value)
+
+    def on_end(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> list[Span]:
+        """
+        Collected spans ordered by the start time.
+        """
+        with self._lock:
+            spans = list(self._spans)
+        return sorted(spans, key=lambda s: s.start_time)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def report(self) -> pd.DataFrame:
+        """
+        Returns the collected spans as a dataframe ordered by the start time.
+
+        Columns ``NAME``, ``DEPTH``, ``START``, ``DURATION`` and ``ERROR`` are always present,
+        the attributes of the spans are added as upper-cased columns.
+        """
+        rows = []
+        for s in self.spans:
+            row = {
+                'NAME': s.name,
+                'DEPTH': s.depth,
+                'START': pd.Timestamp(s.start_time, unit='ns'),
+                'DURATION': s.duration,
+            }
+            row.update({key.upper(): value for key, value in s.attributes.items()})
+            row['ERROR'] = repr(s.error) if s.error is not None else None
+            rows.append(row)
+        if not rows:
+            return pd.DataFrame(columns=['NAME', 'DEPTH', 'START', 'DURATION', 'ERROR'])
+        return pd.DataFrame(rows)
+
+
+class OpenTelemetryHook(TracingHook):
+    """
+    Hook sending the spans to `OpenTelemetry <https://opentelemetry.io/docs/languages/python/>`_.
+
+    Requires ``opentelemetry-api`` package.
+    The spans become children of the OpenTelemetry span active when the operation is started.
+
+    Parameters
+    ----------
+    tracer: opentelemetry.trace.Tracer, optional
+        Tracer creating the spans. By default, the tracer of the global tracer provider is used.
+
+    Examples
+    --------
+    >>> otp.tracing.add_hook(otp.tracing.OpenTelemetryHook())  # doctest: +SKIP
+    """
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ValueError("Module opentelemetry can't be imported. "
+                             "Use 'pip install opentelemetry-api' command to install it.")
+        self._trace = trace
+        self._tracer = tracer or trace.get_tracer('onetick.py')
+        self._spans: dict[int, Any] = {}
+
+    def on_start(self, span: Span):
+        context = None
+        if span.parent is not None and id(span.parent) in self._spans:
+            context = self._trace.set_span_in_context(self._spans[id(span.parent)])
+        self._spans[id(span)] = self._tracer.start_span(span.name, context=context, start_time=span.start_time)
+
+    def on_end(self, span: Span):
+        otel_span = self._spans.pop(id(span), None)
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            if isinstance(value, (bool, int, float, str)):
+                otel_span.set_attribute(f'onetick.{key}', value)
+        if span.error is not None:
+            otel_span.record_exception(span.error)
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(span.error)))
+        # duration is always set for the finished spans
+        duration = span.duration or 0.0
+        otel_span.end(end_time=span.start_time + int(duration * 1e9))
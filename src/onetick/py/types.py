@@ -1,5 +1,7 @@
+import copyreg
 import ctypes
 import functools
+import operator
 import inspect
 import warnings
 import decimal as _decimal
@@ -16,7 +18,7 @@ from packaging.version import parse as parse_version
 import onetick.py as otp
 from onetick.py.otq import otq, pyomd
 from onetick.py.core._internal._op_utils.every_operand import every_operand
-from onetick.py.utils import get_tzfile_by_name, get_timezone_from_datetime
+from onetick.py.utils import get_tzfile_by_name, get_timezone_from_datetime, get_timezone_from_tzinfo
 from onetick.py.docs.utils import is_windows
 
 # --------------------------------------------------------------- #
@@ -635,6 +637,16 @@ class string(str, metaclass=_inner_string):  # type: ignore[misc]
 varstring = string[...]  # type: ignore[type-arg,misc]
 
 
+def _reduce_string_type(cls):
+    # string types with the length are created dynamically and can't be pickled by name
+    if cls is string:
+        return 'string'
+    return operator.getitem, (string, cls.length)
+
+
+copyreg.pickle(_inner_string, _reduce_string_type)
+
+
 class _nan_base(type):
     def __str__(cls):
         return "double"
@@ -1162,6 +1174,15 @@ class datetime(AbstractTime):
         tzinfo=None,
         tz=None,
     ):  # TODO: python 3.8 change first_arg to positional only arg
+        if tz is None and tzinfo is None and month is None and day is None and hour is None and minute is None \
+                and second is None and microsecond is None and nanosecond is None:
+            # pandas.Timestamp is immutable, so it can be shared instead of creating the new one
+            if type(first_arg) is pd.Timestamp:
+                self.ts = first_arg
+                return
+            if type(first_arg) is datetime:
+                self.ts = first_arg.ts
+                return
         tz, tzinfo = self._process_timezones_args(tz, tzinfo)
 
         if not any([month, day, hour, minute, second, microsecond, nanosecond]):
@@ -1980,6 +2001,8 @@ def datetime2expr(
     timezone_naive: str or Operation
         This timezone will be used if ``dt_obj`` is timezone-naive.
     """
+    if isinstance(dt_obj, datetime):
+        dt_obj = dt_obj.ts
     if isinstance(dt_obj, pd.Timestamp):
         # strftime is kinda slow in pandas
         dt_str = (
@@ -2016,6 +2039,76 @@ def datetime2timeval(dt_obj: Union[_datetime, _date, pd.Timestamp, date, datetim
         return pyomd.TimeParser('%Y-%m-%d %H:%M:%S.%J', timezone).parse_time(dt_str)
 
 
+def _time_index(values) -> tuple[pd.DatetimeIndex, Optional[str]]:
+    """
+    Converts ``values`` to timezone-naive :pandas:`pandas.DatetimeIndex` with wall-clock times
+    and returns it with the name of the timezone of the values (None if they are timezone-naive).
+    """
+    if not isinstance(values, (np.ndarray, pd.Index, pd.Series)):
+        values = [value.ts if isinstance(value, datetime) else value for value in values]
+    index = pd.DatetimeIndex(values)
+    if index.hasnans:
+        raise ValueError("Can't convert NaT values to OneTick time")
+    if index.tz is None:
+        return index, None
+    timezone = get_timezone_from_tzinfo(index.tz)
+    if timezone is None:
+        raise ValueError(f"Can't get timezone name from tzinfo {index.tz}")
+    return index.tz_localize(None), timezone
+
+
+def _format_time_index(index: pd.DatetimeIndex) -> list[str]:
+    """
+    Formats the times in '%Y-%m-%d %H:%M:%S.%J' format.
+    """
+    # numpy formats datetime64 values as YYYY-MM-DDTHH:MM:SS.nnnnnnnnn
+    strings = np.datetime_as_string(index.values.astype('datetime64[ns]'), unit='ns')
+    return [string.replace('T', ' ', 1) for string in strings.tolist()]
+
+
+def datetime2expr_array(values, timezone: Optional[str] = None, timezone_naive: Optional[str] = None) -> list[str]:
+    """
+    Vectorized version of :func:`datetime2expr`.
+
+    Parameters
+    ----------
+    values
+        numpy datetime64 array, :pandas:`pandas.DatetimeIndex`, :pandas:`pandas.Series`
+        or a list of date or datetime values.
+        All values must be in the same timezone.
+    timezone: str or Operation
+        This timezone will be used unconditionally.
+    timezone_naive: str or Operation
+        This timezone will be used if ``values`` are timezone-naive.
+
+    Returns
+    -------
+    list of str
+    """
+    index, values_timezone = _time_index(values)
+    if timezone is None:
+        timezone = values_timezone
+    if timezone is None:
+        timezone = timezone_naive
+    if not isinstance(timezone, otp.Operation):
+        timezone = f'"{timezone}"' if timezone else '_TIMEZONE'
+    prefix = 'PARSE_NSECTIME("%Y-%m-%d %H:%M:%S.%J", "'
+    suffix = f'", {str(timezone)})'
+    return [prefix + dt_str + suffix for dt_str in _format_time_index(index)]
+
+
+def datetime2timeval_array(values, timezone: str = 'GMT') -> list:
+    """
+    Vectorized version of :func:`datetime2timeval`.
+
+    ``values`` can be numpy datetime64 array, :pandas:`pandas.DatetimeIndex`, :pandas:`pandas.Series`
+    or a list of date or datetime values in the same timezone.
+    """
+    index, values_timezone = _time_index(values)
+    parser = pyomd.TimeParser('%Y-%m-%d %H:%M:%S.%J', values_timezone or timezone)
+    return [parser.parse_time(dt_str) for dt_str in _format_time_index(index)]
+
+
 def _format_datetime(dt_obj, fmt, add_nano_suffix=True):
     dt_str = dt_obj.strftime(fmt)
     if add_nano_suffix:
@@ -5,6 +5,7 @@ from .helpers import (
     query_properties_to_dict,
     query_properties_from_dict,
     symbol_date_to_str,
+    concat_dataframes,
 )
 from .temp import (
     File,
@@ -19,6 +20,7 @@ from .default import (
     get_local_number_of_cores,
     default_license_dir,
     default_license_file,
+    default_cache_dir,
     default_day_boundary_tz,
 )
 from .acl import (
@@ -49,6 +51,8 @@ from .query import (
     abspath_to_query_by_otq_path,
     abspath_to_query_by_name,
     query_to_path_and_name,
+    canonical_otq_text,
+    otq_text_fingerprint,
 )
 from .types import (
     get_type_that_includes,
@@ -60,7 +64,10 @@ from .types import (
 from .tz import (
     get_tzfile_by_name,
     get_timezone_from_datetime,
+    get_timezone_from_tzinfo,
     convert_timezone,
+    convert_timezone_array,
+    to_naive_timestamp,
 )
 from .file import (
     FileBuffer,
@@ -33,6 +33,19 @@ def default_license_file():
     return None
 
 
+def default_cache_dir():
+    """
+    Directory where onetick-py stores its persistent client-side caches.
+    """
+    if sys.platform == "win32":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+        return os.path.join(base_dir, "onetick-py", "cache")
+    elif sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Caches", "onetick-py")
+    base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_dir, "onetick-py")
+
+
 def default_day_boundary_tz(db_name):
     import onetick.py as otp
     if otp.config.tz:
@@ -1,5 +1,7 @@
 import json
 
+import pandas as pd
+
 from onetick.py.otq import otq, pyomd
 from datetime import datetime
 
@@ -76,3 +78,18 @@ def symbol_date_to_str(symbol_date) -> str:
     if hasattr(symbol_date, 'strftime'):
         symbol_date = symbol_date.strftime('%Y%m%d')
     return symbol_date
+
+
+def concat_dataframes(dfs: list) -> pd.DataFrame:
+    """
+    Concatenate the dataframes with the same columns, skipping the empty ones.
+    If all dataframes are empty, the first of them is returned to keep its columns.
+    """
+    if not dfs:
+        return pd.DataFrame()
+    non_empty = [df for df in dfs if not df.empty]
+    if not non_empty:
+        return dfs[0]
+    if len(non_empty) == 1:
+        return non_empty[0].reset_index(drop=True)
+    return pd.concat(non_empty, ignore_index=True)
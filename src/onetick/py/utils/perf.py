@@ -8,6 +8,7 @@ from dataclasses import dataclass
 from typing import Optional, Union
 from functools import cache
 
+import numpy as np
 import pandas as pd
 import onetick.py as otp
 from onetick.py.core import query_inspector
@@ -495,3 +496,219 @@ class MeasurePerformance(PerformanceSummaryFile):
                 traceback = _get_traceback_with_id(stack_info_uuid)
                 entry['stack_info'] = stack_info_uuid
                 entry['traceback'] = traceback
+
+
+# metrics of the ordinary summary compared by :func:`compare` and aggregated by :func:`hotspots`
+_COMPARED_METRICS = ('running_time', 'allocated_memory', 'processed_tick_events')
+
+
+def _get_summary_file(summary: Union[PerformanceSummaryFile, str, os.PathLike]) -> PerformanceSummaryFile:
+    if isinstance(summary, PerformanceSummaryFile):
+        return summary
+    return PerformanceSummaryFile(summary)
+
+
+def _get_entries_dataframe(summary_file: PerformanceSummaryFile) -> pd.DataFrame:
+    columns = OrdinarySummaryEntry.field_names()
+    return pd.DataFrame([entry.asdict() for entry in summary_file.ordinary_summary], columns=columns)
+
+
+class PerformanceDiff:
+    """
+    Result of the comparison of two performance summaries returned by :func:`compare`.
+    """
+
+    def __init__(self, dataframe: pd.DataFrame):
+        #: pandas.DataFrame with one row per aligned EP.
+        #:
+        #: For each compared metric (``running_time``, ``allocated_memory`` and ``processed_tick_events``)
+        #: there are columns with the values from both summaries (``<metric>_a``, ``<metric>_b``),
+        #: the difference (``<metric>_delta``) and the relative change (``<metric>_change``).
+        #: Column ``status`` is ``matched`` for the EPs found in both summaries,
+        #: ``added`` for the EPs found only in the second summary and ``removed`` for the EPs only in the first one.
+        #: Column ``regression`` is ``True`` if any metric of the EP increased more than the threshold.
+        self.dataframe = dataframe
+
+    @property
+    def regressions(self) -> pd.DataFrame:
+        """
+        Rows of :attr:`dataframe` with the regressions sorted by the increase of the running time.
+        """
+        df = self.dataframe[self.dataframe['regression']]
+        return df.sort_values('running_time_delta', ascending=False)
+
+    def __str__(self):
+        columns = ['EP_name', 'tag_a', 'tag_b', 'status']
+        for metric in _COMPARED_METRICS:
+            columns += [f'{metric}_a', f'{metric}_b', f'{metric}_change']
+        columns.append('regression')
+        return self.dataframe[columns].to_string(index=False)
+
+
+def compare(a: Union[PerformanceSummaryFile, str, os.PathLike],
+            b: Union[PerformanceSummaryFile, str, os.PathLike],
+            by: str = 'tag',
+            threshold: float = 0.2,
+            min_time: int = 1000,
+            min_memory: int = 1 << 20,
+            min_ticks: int = 1000) -> PerformanceDiff:
+    """
+    Compare the ordinary summaries of two **measure_perf.exe** runs,
+    e.g. of two versions of the query or of the same query on different OneTick builds.
+
+    Parameters
+    ----------
+    a: :class:`PerformanceSummaryFile` or str
+        Old summary or path to the summary file.
+    b: :class:`PerformanceSummaryFile` or str
+        New summary or path to the summary file.
+    by: 'tag' or 'stack_info'
+        How to align the EPs of the summaries.
+        ``tag`` aligns EPs with the same tag and EP name, it works for the same .otq file.
+        ``stack_info`` aligns EPs created by the same python code.
+        It requires :class:`MeasurePerformance` objects collected with
+        :py:attr:`show_stack_info<onetick.py.configuration.Config.show_stack_info>` set.
+    threshold: float
+        Relative increase of the metric considered a regression.
+    min_time: int
+        Running time in microseconds. EPs running faster in the new summary are not reported as regressions.
+    min_memory: int
+        Allocated memory in bytes. EPs allocating less in the new summary are not reported as regressions.
+    min_ticks: int
+        EPs processing fewer ticks in the new summary are not reported as regressions.
+
+    Returns
+    -------
+    :class:`PerformanceDiff`
+
+    Examples
+    --------
+    >>> t = otp.Tick(A=1)
+    >>> old = otp.perf.MeasurePerformance(t)
+    >>> t = t.agg({'S': otp.agg.sum('A')})
+    >>> new = otp.perf.MeasurePerformance(t)
+    >>> diff = otp.perf.compare(old, new)
+    >>> print(diff.dataframe[['EP_name', 'tag_a', 'tag_b', 'status']])  # doctest: +SKIP
+                 EP_name  tag_a  tag_b   status
+    0        PASSTHROUGH    0.0    0.0  matched
+    1     TICK_GENERATOR    1.0    NaN  removed
+    ...
+    """
+    if by not in ('tag', 'stack_info'):
+        raise ValueError(f"Parameter 'by' must be either 'tag' or 'stack_info', got '{by}'")
+    frames = []
+    for summary in (a, b):
+        df = _get_entries_dataframe(_get_summary_file(summary))
+        if by == 'tag':
+            keys = ['EP_name', 'tag']
+        else:
+            if not df.empty and df['traceback'].isna().any():
+                raise ValueError("Can't align EPs by stack info: it is not available in the summary. "
+                                 "Use otp.perf.MeasurePerformance with otp.config.show_stack_info set.")
+            # EPs created by the same line of code (e.g. in a loop) are numbered in the order of their tags
+            df = df.sort_values('tag', kind='stable')
+            df['_occurrence'] = df.groupby(['EP_name', 'traceback'], dropna=False).cumcount()
+            keys = ['EP_name', 'traceback', '_occurrence']
+        df['_tag'] = df['tag']
+        frames.append(df[keys + ['_tag', *_COMPARED_METRICS]])
+
+    df = pd.merge(frames[0], frames[1], on=keys, how='outer', suffixes=('_a', '_b'), indicator=True, sort=False)
+    df['status'] = df.pop('_merge').map({'both': 'matched', 'left_only': 'removed', 'right_only': 'added'})
+    df = df.rename(columns={'_tag_a': 'tag_a', '_tag_b': 'tag_b'})
+    df = df.drop(columns=['tag', '_occurrence'], errors='ignore')
+    df = df.sort_values(['tag_a', 'tag_b'], kind='stable')
+
+    minimums = {'running_time': min_time, 'allocated_memory': min_memory, 'processed_tick_events': min_ticks}
+    df['regression'] = False
+    for metric in _COMPARED_METRICS:
+        old = df[f'{metric}_a'].fillna(0)
+        new = df[f'{metric}_b'].fillna(0)
+        df[f'{metric}_delta'] = new - old
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df[f'{metric}_change'] = np.where(old > 0, new / old - 1, np.where(new > 0, np.inf, 0.0))
+        df['regression'] |= (new >= minimums[metric]) & (df[f'{metric}_change'] > threshold)
+    return PerformanceDiff(df.reset_index(drop=True))
+
+
+def _find_summary_files(paths, pattern: str) -> list[Union[PerformanceSummaryFile, Path]]:
+    result: list[Union[PerformanceSummaryFile, Path]] = []
+    for path in paths:
+        if isinstance(path, PerformanceSummaryFile):
+            result.append(path)
+        elif Path(path).is_dir():
+            result.extend(sorted(p for p in Path(path).rglob(pattern) if p.is_file()))
+        else:
+            result.append(Path(path))
+    return result
+
+
+def hotspots(summaries, group_by: str = 'EP_name', pattern: str = '*') -> pd.DataFrame:
+    """
+    Aggregate the ordinary summaries of many **measure_perf.exe** runs, e.g. of the whole query library,
+    to find the EPs spending the most time.
+
+    Parameters
+    ----------
+    summaries: list or str
+        :class:`PerformanceSummaryFile` objects, paths to the summary files
+        or to the directories searched recursively for the summary files.
+    group_by: 'EP_name', 'file' or 'ep'
+        Aggregate the metrics by the name of the EP, by the summary file or report each EP separately.
+    pattern: str
+        Glob pattern of the summary file names in the directories.
+        Files that can't be read as text are skipped with a warning.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Sums of ``running_time``, ``allocated_memory`` and ``processed_tick_events``,
+        number of EPs (``count``), number of summary files (``files``),
+        maximum running time of a single EP (``max_running_time``)
+        and the share of the total running time (``time_share``),
+        sorted by the running time.
+
+    Examples
+    --------
+    >>> otp.perf.hotspots('perf_summaries/')  # doctest: +SKIP
+             EP_name  running_time  allocated_memory  processed_tick_events  count  files  max_running_time  time_share
+    0  JOIN_BY_TIME        8520311          10485760                9000000     12      8           2048211    0.713256
+    1      GROUP_BY        2110322           4194304                4500000      6      4            981231    0.176661
+    ...
+    """
+    if group_by not in ('EP_name', 'file', 'ep'):
+        raise ValueError(f"Parameter 'group_by' must be one of 'EP_name', 'file', 'ep', got '{group_by}'")
+    if isinstance(summaries, (str, os.PathLike, PerformanceSummaryFile)):
+        summaries = [summaries]
+
+    frames = []
+    for summary in _find_summary_files(summaries, pattern):
+        try:
+            summary_file = _get_summary_file(summary)
+        except (UnicodeDecodeError, ValueError) as e:
+            warnings.warn(f"Can't read performance summary from file {summary}: {e}")
+            continue
+        df = _get_entries_dataframe(summary_file)[['EP_name', 'tag', *_COMPARED_METRICS]]
+        df['file'] = str(summary_file.summary_file)
+        frames.append(df)
+
+    columns = ['running_time', 'allocated_memory', 'processed_tick_events', 'count', 'files',
+               'max_running_time', 'time_share']
+    if group_by == 'ep':
+        keys = ['file', 'tag', 'EP_name']
+    else:
+        keys = [group_by]
+    if not frames:
+        return pd.DataFrame(columns=keys + columns)
+
+    df = pd.concat(frames, ignore_index=True)
+    result = df.groupby(keys, sort=False).agg(
+        running_time=('running_time', 'sum'),
+        allocated_memory=('allocated_memory', 'sum'),
+        processed_tick_events=('processed_tick_events', 'sum'),
+        count=('EP_name', 'size'),
+        files=('file', 'nunique'),
+        max_running_time=('running_time', 'max'),
+    )
+    total_time = result['running_time'].sum()
+    result['time_share'] = result['running_time'] / total_time if total_time else 0.0
+    return result.sort_values('running_time', ascending=False, kind='stable').reset_index()
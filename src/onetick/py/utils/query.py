@@ -1,4 +1,6 @@
 import os
+import re
+import hashlib
 
 from .config import get_config_param
 
@@ -47,3 +49,39 @@ def query_to_path_and_name(path):
         query_path = path
 
     return query_path, query_name
+
+
+_OTQ_NODE_ID_REGEX = re.compile(r'\bNODE_\d+')
+_OTQ_SECTION_REGEX = re.compile(r'^\[([^\]]+)\]\s*$', re.MULTILINE)
+
+
+def canonical_otq_text(text: str) -> str:
+    """
+    Returns the text of .otq file with all generated identifiers replaced with stable ones.
+
+    Node ids (``NODE_<n>``) and names of the queries in the file are generated by onetick-py
+    and onetick.query and are different each time the same graph is saved,
+    so they are renumbered in the order of their first appearance.
+    The result is the same for the same graphs and can be used to compare or hash them.
+    """
+    node_ids: dict[str, str] = {}
+
+    def replace_node_id(match):
+        return node_ids.setdefault(match.group(0), f'NODE_{len(node_ids)}')
+
+    text = _OTQ_NODE_ID_REGEX.sub(replace_node_id, text)
+
+    query_names = [name for name in _OTQ_SECTION_REGEX.findall(text) if name != '_meta']
+    if query_names:
+        names_map = {name: f'QUERY_{i}' for i, name in enumerate(query_names)}
+        names_alternatives = '|'.join(re.escape(name) for name in sorted(names_map, key=len, reverse=True))
+        names_regex = re.compile(r'(?<![\w-])(' + names_alternatives + r')(?![\w-])')
+        text = names_regex.sub(lambda match: names_map[match.group(1)], text)
+    return text
+
+
+def otq_text_fingerprint(text: str) -> str:
+    """
+    Returns sha256 hex digest of the :func:`canonical <canonical_otq_text>` representation of .otq file text.
+    """
+    return hashlib.sha256(canonical_otq_text(text).encode()).hexdigest()
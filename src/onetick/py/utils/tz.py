@@ -1,12 +1,14 @@
 import datetime
+import functools
 import sys
 import warnings
 import zoneinfo
 
 from typing import Optional
-from contextlib import suppress
 
 import dateutil.tz
+import numpy as np
+import pandas as pd
 import tzlocal
 
 import onetick.py as otp
@@ -14,13 +16,42 @@ import onetick.py as otp
 
 def get_tzfile_by_name(timezone):
     if isinstance(timezone, str):
-        try:
-            timezone = zoneinfo.ZoneInfo(timezone)
-        except zoneinfo.ZoneInfoNotFoundError:
-            timezone = dateutil.tz.gettz(timezone)
+        timezone = _get_tzfile_by_name(timezone)
     return timezone
 
 
+@functools.lru_cache(maxsize=1024)
+def _get_tzfile_by_name(timezone: str):
+    try:
+        return zoneinfo.ZoneInfo(timezone)
+    except zoneinfo.ZoneInfoNotFoundError:
+        return dateutil.tz.gettz(timezone)
+
+
+@functools.cache
+def _pytz():
+    # failed imports are not cached by python, so the optional module is looked up only once
+    try:
+        import pytz  # type: ignore
+    except ModuleNotFoundError:
+        return None
+    return pytz
+
+
+@functools.lru_cache(maxsize=None)
+def _available_timezones() -> tuple:
+    # zoneinfo.available_timezones() walks the whole timezone database directory
+    return tuple(sorted(zoneinfo.available_timezones()))
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_timezone_by_filename(filename: str) -> Optional[str]:
+    for timezone in _available_timezones():
+        if filename.endswith(timezone):
+            return timezone
+    return None
+
+
 def get_local_timezone_name():
     tz = tzlocal.get_localzone()
     try:
@@ -33,12 +64,21 @@ def get_timezone_from_datetime(dt) -> Optional[str]:
     tzinfo = getattr(dt, 'tzinfo', None)
     if tzinfo is None:
         return None
+    timezone = get_timezone_from_tzinfo(tzinfo)
+    if timezone is None:
+        raise ValueError(f"Can't get timezone name from datetime '{dt}' with tzinfo {tzinfo}")
+    return timezone
+
+
+def get_timezone_from_tzinfo(tzinfo) -> Optional[str]:
+    """
+    Returns the name of the timezone of ``tzinfo`` object or None if it can't be found.
+    """
     if tzinfo is datetime.timezone.utc:
         return 'UTC'
-    with suppress(ModuleNotFoundError):
-        import pytz  # type: ignore
-        if isinstance(tzinfo, pytz.BaseTzInfo):
-            return tzinfo.zone
+    pytz = _pytz()
+    if pytz is not None and isinstance(tzinfo, pytz.BaseTzInfo):
+        return tzinfo.zone
     if isinstance(tzinfo, zoneinfo.ZoneInfo):
         return tzinfo.key
     if isinstance(tzinfo, dateutil.tz.tzlocal):
@@ -55,13 +95,13 @@ def get_timezone_from_datetime(dt) -> Optional[str]:
         if hasattr(tzinfo, '_filename'):
             if tzinfo._filename == '/etc/localtime':
                 return get_local_timezone_name()
-            for timezone in zoneinfo.available_timezones():
-                if tzinfo._filename.endswith(timezone):
-                    return timezone
+            timezone = _get_timezone_by_filename(tzinfo._filename)
+            if timezone is not None:
+                return timezone
     if sys.platform == 'win32':
         if isinstance(tzinfo, dateutil.tz.win.tzwin) and hasattr(tzinfo, '_name'):
             return tzinfo._name
-    raise ValueError(f"Can't get timezone name from datetime '{dt}' with tzinfo {tzinfo}")
+    return None
 
 
 def convert_timezone(dt, src_timezone, dest_timezone) -> datetime.datetime:
@@ -72,7 +112,7 @@ def convert_timezone(dt, src_timezone, dest_timezone) -> datetime.datetime:
     if src_timezone is None:
         src_timezone = get_local_timezone_name()
     # using pandas, because stdlib datetime has some bug around epoch on Windows
-    dt = otp.datetime(dt).ts
+    dt = pd.Timestamp(dt.ts if isinstance(dt, otp.datetime) else dt)
     # change timezone-naive to timezone-aware
     dt = dt.tz_localize(src_timezone)
     # convert timezone
@@ -82,3 +122,29 @@ def convert_timezone(dt, src_timezone, dest_timezone) -> datetime.datetime:
     # convert to datetime
     dt = dt.to_pydatetime()
     return dt
+
+
+def to_naive_timestamp(value, timezone) -> pd.Timestamp:
+    """
+    Convert datetime ``value`` to timezone-naive pandas.Timestamp in the specified ``timezone``.
+    Timezone-naive values are considered to be already in this timezone.
+    """
+    ts = otp.datetime(value).ts
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(timezone).tz_localize(None)
+    return ts
+
+
+def convert_timezone_array(values, src_timezone, dest_timezone) -> np.ndarray:
+    """
+    Vectorized version of :func:`convert_timezone`.
+
+    Converting timezone-naive ``values`` (list or array of datetime objects or numpy datetime64 array)
+    localized in ``src_timezone`` timezone to the specified ``dest_timezone``.
+    Returns numpy datetime64[ns] array of timezone-naive values.
+    """
+    if src_timezone is None:
+        src_timezone = get_local_timezone_name()
+    index = pd.DatetimeIndex(values)
+    index = index.tz_localize(src_timezone).tz_convert(dest_timezone).tz_localize(None)
+    return index.values.astype('datetime64[ns]')
@@ -0,0 +1,153 @@
+"""
+Benchmarks of the client-side overhead of onetick-py: building the queries, saving them and formatting the results.
+
+The benchmarks don't need a tick server.
+Each benchmark is compared with the baseline and fails if it is more than ``--benchmark-tolerance`` times slower.
+The medians of the timings are compared, they are normalized by the time of a fixed pure python workload
+measured right before each benchmark, so the baseline can be compared with the results from a different machine
+and the temporary load of the machine slows down both of them.
+The normalized timings of the same benchmark still differ up to two times between the runs on a loaded machine,
+so the default tolerance is bigger than that.
+
+Update the baseline after the intended changes with::
+
+    pytest tests/benchmarks --benchmark-save=tests/benchmarks/baseline.json
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+
+DEFAULT_BASELINE = Path(__file__).parent / 'baseline.json'
+CALIBRATION_ROUNDS = 5
+# each benchmark is repeated at least the minimum number of rounds and then
+# until this time is spent or the maximum number of rounds is reached
+MIN_TIME = 1.0
+MIN_ROUNDS = 5
+MAX_ROUNDS = 20
+DEFAULT_TOLERANCE = 2.5
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--benchmark-baseline', default=str(DEFAULT_BASELINE),
+                    help='JSON file with the baseline results, comparison is skipped if it does not exist')
+    group.addoption('--benchmark-save', default=None,
+                    help='save the results to this JSON file')
+    group.addoption('--benchmark-tolerance', type=float, default=DEFAULT_TOLERANCE,
+                    help='fail the benchmark if it is more than this number of times slower than the baseline')
+
+
+def _calibration_workload():
+    values = [(i * 7919) % 10007 for i in range(200_000)]
+    values.sort()
+    return sum(str(value) < '5' for value in values)
+
+
+def _measure(func, args, kwargs, rounds):
+    # the first call warms up the caches and is not measured
+    result = func(*args, **kwargs)
+    timings: list[float] = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(timings) < (rounds or MAX_ROUNDS) and (
+            rounds or len(timings) < MIN_ROUNDS or sum(timings) < MIN_TIME
+        ):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+            gc.collect()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return result, timings
+
+
+class _Results:
+
+    def __init__(self, config):
+        self.config = config
+        self.benchmarks: dict = {}
+        # options are not registered if this conftest is not loaded on the start of the test session
+        baseline_path = Path(config.getoption('--benchmark-baseline', DEFAULT_BASELINE))
+        self.baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+
+    @staticmethod
+    def calibrate() -> float:
+        _, timings = _measure(_calibration_workload, (), {}, rounds=CALIBRATION_ROUNDS)
+        return statistics.median(timings)
+
+    def add(self, name, timings, calibration):
+        self.benchmarks[name] = {
+            'calibration': calibration,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'rounds': len(timings),
+        }
+
+    def check(self, name):
+        if self.baseline is None or name not in self.baseline['benchmarks']:
+            return
+        tolerance = self.config.getoption('--benchmark-tolerance', DEFAULT_TOLERANCE)
+        benchmark, baseline = self.benchmarks[name], self.baseline['benchmarks'][name]
+        relative = benchmark['median'] / benchmark['calibration']
+        baseline_relative = baseline['median'] / baseline['calibration']
+        if relative > baseline_relative * tolerance:
+            pytest.fail(f'Benchmark {name} is {relative / baseline_relative:.2f} times slower than the baseline '
+                        f'(tolerance is {tolerance})', pytrace=False)
+
+    def save(self, path):
+        data = {
+            'machine': {
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+            },
+            'benchmarks': dict(sorted(self.benchmarks.items())),
+        }
+        Path(path).write_text(json.dumps(data, indent=4) + os.linesep)
+
+
+_RESULTS_KEY = pytest.StashKey[_Results]()
+
+
+def pytest_configure(config):
+    config.stash[_RESULTS_KEY] = _Results(config)
+
+
+def pytest_sessionfinish(session):
+    results = session.config.stash[_RESULTS_KEY]
+    path = session.config.getoption('--benchmark-save', None)
+    if path and results.benchmarks:
+        results.save(path)
+
+
+@pytest.fixture
+def benchmark(request):
+    """
+    Measures the time of the function call: ``benchmark(func, *args, rounds=None, **kwargs)``.
+
+    Returns the result of the function.
+    If ``rounds`` is not set, the function is called at least ``MIN_ROUNDS`` times
+    and repeatedly during at least ``MIN_TIME`` seconds.
+    """
+    results = request.config.stash[_RESULTS_KEY]
+    name = f'{request.node.module.__name__.rpartition(".")[2]}::{request.node.name}'
+
+    def run(func, *args, rounds=None, **kwargs):
+        calibration = results.calibrate()
+        result, timings = _measure(func, args, kwargs, rounds)
+        results.add(name, timings, calibration)
+        results.check(name)
+        return result
+
+    return run
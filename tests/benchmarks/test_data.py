@@ -0,0 +1,34 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+
+
+pytestmark = pytest.mark.performance
+
+
+def test_ticks(benchmark):
+    size = 1_000_000
+    benchmark(otp.Ticks, A=list(range(size)), B=[0.5] * size, rounds=1)
+
+
+def test_ticks_with_time(benchmark):
+    size = 100_000
+    times = list(pd.date_range('2024-01-01', periods=size, freq='1ms'))
+    benchmark(otp.Ticks, time=times, A=list(range(size)))
+
+
+def test_format_output(benchmark):
+    # results in the format of onetick.query with output_structure='list'
+    ticks = [
+        ('Time', np.arange(10).astype('datetime64[ns]')),
+        ('A', np.arange(10)),
+        ('B', np.array(['x'] * 10)),
+    ]
+    result = [(f'SYMBOL_{i}', ticks, [], 'NODE') for i in range(5000)]
+    formatted = benchmark(sys.modules['onetick.py.run']._format_call_output,
+                          result, output_structure='df', node_names=None, require_dict=True, print_symbol_errors=True)
+    assert len(formatted) == 5000
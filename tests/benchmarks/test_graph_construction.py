@@ -0,0 +1,80 @@
+import pytest
+
+import onetick.py as otp
+
+
+pytestmark = pytest.mark.performance
+
+WIDE_SCHEMA = {f'FIELD_{i}': i for i in range(1000)}
+
+
+def _chain(steps):
+    data = otp.Tick(A=1)
+    for i in range(steps):
+        data[f'B{i % 10}'] = data['A'] + i
+    return data
+
+
+def test_wide_schema(benchmark):
+    benchmark(otp.Tick, **WIDE_SCHEMA)
+
+
+def test_wide_schema_copy(benchmark):
+    data = otp.Tick(**WIDE_SCHEMA)
+    benchmark(data.copy)
+
+
+def test_wide_schema_columns(benchmark):
+    data = otp.Tick(**WIDE_SCHEMA)
+    benchmark(lambda: data.schema)
+
+
+def test_chain(benchmark):
+    data = benchmark(_chain, 1000)
+    assert len(data.node().copy_rules()) > 1000
+
+
+def test_chain_to_graph(benchmark):
+    data = _chain(1000)
+    benchmark(data._to_graph)
+
+
+def test_merge(benchmark):
+    benchmark(lambda: otp.merge([otp.Tick(A=i) for i in range(500)]))
+
+
+def test_merge_to_graph(benchmark):
+    data = otp.merge([otp.Tick(A=i) for i in range(500)])
+    benchmark(data._to_graph)
+
+
+def test_save_to_file(benchmark, tmp_path):
+    # onetick.query copies deep graphs recursively, so the chain is shorter here
+    data = _chain(300)
+    path = str(tmp_path / 'query.otq')
+    benchmark(lambda: data._tmp_otq.save_to_file(query=data._to_graph(), query_name='query', file_path=path))
+
+
+def test_per_tick_script(benchmark):
+    def script(tick):
+        if tick['A'] > 0:
+            tick['B'] = tick['B'] * 2
+        else:
+            tick['B'] = 0
+        for i in range(3):
+            tick['A'] += i
+
+    data = otp.Tick(A=1, B=2.0)
+    benchmark(data.script, script)
+
+
+def test_operations(benchmark):
+    data = otp.Tick(**{f'F{i}': i for i in range(100)})
+
+    def build():
+        expression = data['F0']
+        for i in range(1, 100):
+            expression = expression + data[f'F{i}'] * 2
+        return str(expression)
+
+    benchmark(build)
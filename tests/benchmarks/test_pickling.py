@@ -0,0 +1,46 @@
+import os
+import pickle
+
+import pytest
+
+import onetick.py as otp
+
+from .test_graph_construction import _chain
+
+
+pytestmark = pytest.mark.performance
+
+OTQ_PARAMS = dict(symbols='DB::S', start=otp.dt(2003, 1, 1), end=otp.dt(2003, 1, 2), timezone='GMT')
+
+
+def _merge():
+    return otp.merge([otp.Tick(A=i) for i in range(200)])
+
+
+def _otq_size(data):
+    return os.path.getsize(data.to_otq(**OTQ_PARAMS).split('::')[0])
+
+
+def test_pickle_chain(benchmark):
+    data = _chain(300)
+    restored = benchmark(lambda: pickle.loads(pickle.dumps(data)))
+    assert len(restored.node().copy_rules()) == len(data.copy().node().copy_rules())
+    # the graph is sent to the worker in less bytes than the query file
+    assert len(pickle.dumps(data)) < _otq_size(data)
+
+
+def test_to_otq_chain(benchmark):
+    data = _chain(300)
+    benchmark(data.to_otq, **OTQ_PARAMS)
+
+
+def test_pickle_merge(benchmark):
+    data = _merge()
+    benchmark(lambda: pickle.loads(pickle.dumps(data)))
+    # unlike the query file, the pickle keeps the base source of each merged source
+    assert len(pickle.dumps(data)) < 2 * _otq_size(data)
+
+
+def test_to_otq_merge(benchmark):
+    data = _merge()
+    benchmark(data.to_otq, **OTQ_PARAMS)
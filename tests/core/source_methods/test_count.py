@@ -1,3 +1,4 @@
+import pandas as pd
 import pytest
 
 import onetick.py as otp
@@ -16,3 +17,34 @@ def test_count(m_session):
     with pytest.warns(UserWarning, match='Eval statement returned no symbols'):
         data = otp.merge([otp.Ticks(X=[1])], symbols=otp.Empty())
         assert data.count() == 0
+
+
+def test_count_archive_stats(f_session, mocker):
+    db = otp.DB('MY_DB')
+    db.add(otp.Ticks(X=[1, 2, 3]), tick_type='TT', symbol='A', date=otp.dt(2003, 12, 1))
+    db.add(otp.Ticks(X=[1, 2]), tick_type='TT', symbol='B', date=otp.dt(2003, 12, 1))
+    f_session.use(db)
+    stats = mocker.patch('onetick.py.db._inspection.DB.show_archive_stats',
+                         return_value=pd.DataFrame({'TOTAL_TICKS': [6], 'TOTAL_SYMBOLS': [2]}))
+
+    data = otp.DataSource('MY_DB', tick_type='TT')
+    assert data.count(use_archive_stats=True, symbols=['A', 'B'], date=otp.dt(2003, 12, 1)) == 6
+    stats.assert_called_once()
+    assert stats.call_args.kwargs['start'] == pd.Timestamp(2003, 12, 1)
+    assert stats.call_args.kwargs['end'] == pd.Timestamp(2003, 12, 2)
+    # total number of ticks is scaled by the share of the queried symbols
+    assert data.count(use_archive_stats=True, symbols='A', date=otp.dt(2003, 12, 1)) == 3
+
+    # symbols evaluated in runtime can't be counted with stats
+    symbols = otp.Ticks(SYMBOL_NAME=['A'])
+    assert data.count(use_archive_stats=True, symbols=symbols, date=otp.dt(2003, 12, 1)) == 3
+
+    # stats are not available, falling back to the full scan
+    stats.return_value = pd.DataFrame({'TOTAL_TICKS': [-1], 'TOTAL_SYMBOLS': [2]})
+    assert data.count(use_archive_stats=True, symbols='A', date=otp.dt(2003, 12, 1)) == 3
+
+    # modified query can't use stats
+    stats.reset_mock()
+    data, _ = data[data['X'] > 1]
+    assert data.count(use_archive_stats=True, symbols='A', date=otp.dt(2003, 12, 1)) == 2
+    stats.assert_not_called()
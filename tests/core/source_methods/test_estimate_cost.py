@@ -0,0 +1,138 @@
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+
+
+DATE = otp.dt(2024, 2, 1)
+
+
+def _data_source(db, **kwargs):
+    return otp.DataSource(db, schema_policy='manual', schema={'X': int}, **kwargs)
+
+
+@pytest.fixture
+def archive_stats(mocker):
+    stats = {
+        'DB_A': pd.DataFrame({'TOTAL_TICKS': [1000, 3000], 'TOTAL_SYMBOLS': [10, 10], 'TOTAL_SIZE': [10000, 30000]}),
+        'DB_B': pd.DataFrame({'TOTAL_TICKS': [500], 'TOTAL_SYMBOLS': [5], 'TOTAL_SIZE': [8000]}),
+        'OLD_DB': pd.DataFrame({'TOTAL_TICKS': [-1], 'TOTAL_SYMBOLS': [5], 'TOTAL_SIZE': [8000]}),
+        'EMPTY_DB': pd.DataFrame(),
+        'MEMORY_DB': pd.DataFrame(),
+    }
+
+    def show_archive_stats(db, **kwargs):
+        if db.name not in stats:
+            raise Exception('Database is not found')
+        return stats[db.name]
+
+    mocker.patch('onetick.py.db._inspection.DB._show_loaded_time_ranges', autospec=True,
+                 side_effect=lambda db, start, end: [start.date()] if db.name == 'MEMORY_DB' else [])
+    return mocker.patch('onetick.py.db._inspection.DB.show_archive_stats', autospec=True,
+                        side_effect=show_archive_stats)
+
+
+def test_symbols(archive_stats):
+    data = _data_source('DB_A', tick_type='TRD')
+    report = data.estimate_cost(symbols=['S1', 'S2'], date=DATE)
+    assert report.complete
+    assert report.ticks == 800
+    assert report.bytes == 8000
+    row = report.reads.iloc[0]
+    assert (row['DB'], row['TICK_TYPE'], row['SYMBOLS']) == ('DB_A', 'TRD', 2)
+    assert row['START'] == pd.Timestamp(2024, 2, 1)
+    assert row['END'] == pd.Timestamp(2024, 2, 2)
+    assert report.fan_out.empty
+    archive_stats.assert_called_once()
+
+    # the fraction of symbols can't be more than the whole archive
+    report = data.estimate_cost(symbols=[f'S{i}' for i in range(100)], date=DATE)
+    assert report.ticks == 4000
+
+
+def test_sources(archive_stats):
+    bound = _data_source('DB_A', tick_type='TRD', symbols='S1')
+    cross_symbol = _data_source('DB_B', tick_type='QTE', symbols=['S1', 'S2'])
+    unbound = _data_source(['DB_A::QTE', 'DB_B::QTE'], start=otp.dt(2024, 1, 1), end=otp.dt(2024, 1, 2))
+    other_tick_type = _data_source('DB_A', tick_type='NBBO')
+    data = otp.merge([bound, cross_symbol, unbound, other_tick_type])
+    report = data.estimate_cost(symbols=['S1', 'S2', 'S3'], date=DATE)
+    reads = report.reads[['DB', 'TICK_TYPE', 'SYMBOLS', 'START']].values.tolist()
+    # bound symbols are read for each symbol of the query
+    assert reads == [
+        ['DB_A', 'TRD', 3, pd.Timestamp(2024, 2, 1)],
+        ['DB_B', 'QTE', 6, pd.Timestamp(2024, 2, 1)],
+        ['DB_A', 'QTE', 3, pd.Timestamp(2024, 1, 1)],
+        ['DB_B', 'QTE', 3, pd.Timestamp(2024, 1, 1)],
+        ['DB_A', 'NBBO', 3, pd.Timestamp(2024, 2, 1)],
+    ]
+    assert report.ticks == 1200 + 500 + 1200 + 300 + 1200
+    # archive stats are requested once for each database and time range
+    assert archive_stats.call_count == 4
+
+
+def test_database_from_symbols(archive_stats):
+    data = _data_source(None, tick_type='TRD')
+    report = data.estimate_cost(symbols=['DB_A::S1', 'DB_A::S2', 'DB_B::S1', 'S4'], date=DATE)
+    assert report.reads[['DB', 'SYMBOLS']].values.tolist() == [['DB_A', 2], ['DB_B', 1]]
+    assert not report.complete
+    assert report.notes == ['database is not specified for tick type TRD and symbol S4']
+
+
+def test_not_available(archive_stats):
+    data = otp.merge([
+        _data_source('OLD_DB', tick_type='TRD'),
+        _data_source('EMPTY_DB', tick_type='TRD'),
+        _data_source('MEMORY_DB', tick_type='TRD'),
+        _data_source('UNKNOWN_DB', tick_type='TRD'),
+    ])
+    report = data.estimate_cost(symbols='S1', date=DATE)
+    reads = report.reads.set_index('DB')
+    assert reads.loc['OLD_DB', 'TICKS'] is None
+    assert reads.loc['OLD_DB', 'BYTES'] == 1600
+    assert reads.loc['EMPTY_DB', 'TICKS'] == 0
+    assert reads.loc['MEMORY_DB', 'TICKS'] is None
+    assert reads.loc['UNKNOWN_DB', 'BYTES'] is None
+    assert report.ticks == 0
+    assert report.bytes == 1600
+    assert report.notes == [
+        'number of ticks is not stored in the archives of database OLD_DB',
+        'archive stats are not available for database MEMORY_DB',
+        'archive stats are not available for database UNKNOWN_DB',
+    ]
+
+
+def test_evaluated_symbols(archive_stats):
+    data = _data_source('DB_A', tick_type='TRD')
+    report = data.estimate_cost(symbols=otp.Ticks(SYMBOL_NAME=['S1', 'S2']), date=DATE)
+    assert report.reads['SYMBOLS'].tolist() == [None]
+    assert report.ticks == 4000
+    assert not report.complete
+
+
+def test_fan_out(archive_stats):
+    data = _data_source('DB_A', tick_type='TRD')
+    other = _data_source('DB_B', tick_type='TRD')
+    data = data.join_with_query(otp.Tick(A=1))
+    data = otp.join(data, other, on='all')
+    data = data.process_by_group(lambda source: source, group_by=['X'])
+    report = data.estimate_cost(symbols='S1', date=DATE)
+    assert report.fan_out.values.tolist() == [
+        ['JOIN_WITH_QUERY', 'the query is executed for each input tick', 400, 400],
+        ['JOIN', 'all pairs of ticks with the same timestamp are joined', 500, None],
+        ['GROUP_BY', 'the query is executed for each group', 500, None],
+    ]
+
+
+def test_budget(archive_stats, monkeypatch):
+    data = _data_source('DB_A', tick_type='TRD')
+    report = data.estimate_cost(symbols='S1', date=DATE)
+    report.check_budget(max_ticks=400, max_bytes=4000)
+    with pytest.raises(ValueError, match='estimated to read 400 ticks'):
+        report.check_budget(max_ticks=399)
+    with pytest.raises(ValueError, match='estimated to read 4000 bytes'):
+        report.check_budget(max_bytes=3999)
+
+    monkeypatch.setattr(otp.config, 'query_budget_ticks', 100)
+    with pytest.raises(ValueError, match='more than the budget of 100 ticks'):
+        otp.run(data, symbols='S1', date=DATE, concurrency=1)
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+
+
+@pytest.fixture
+def data():
+    data = otp.Tick(X=1, bucket_interval=otp.Hour(1))
+    # symbol B has data only since the second day
+    data, _ = data[(data['_SYMBOL_NAME'] != 'B') | (data['TIMESTAMP'] >= otp.dt(2003, 12, 2))]
+    return data
+
+
+def test_head_tail(m_session):
+    data = otp.Ticks(X=list('abcdefgik'))
+    assert list(data.head()['X']) == list('abcde')
+    assert list(data.tail(3)['X']) == list('gik')
+
+
+def test_preview_head(m_session, data, mocker):
+    spy = mocker.spy(otp, 'run')
+    res = data.head(3, preview=True, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4))
+    assert list(res['Time']) == [pd.Timestamp(2003, 12, 1, hour) for hour in range(3)]
+    # one hour window and then two hours window
+    assert spy.call_count == 2
+    assert spy.call_args.kwargs['start'] == pd.Timestamp(2003, 12, 1, 1)
+    assert spy.call_args.kwargs['end'] == pd.Timestamp(2003, 12, 1, 3)
+
+    spy.reset_mock()
+    expected = data.head(3, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4))
+    assert spy.call_count == 1
+    assert res.equals(expected)
+
+
+def test_preview_tail(m_session, data, mocker):
+    spy = mocker.spy(otp, 'run')
+    res = data.tail(3, preview=True, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4))
+    assert list(res['Time']) == [pd.Timestamp(2003, 12, 3, hour) for hour in range(21, 24)]
+    assert spy.call_count == 2
+    assert res.equals(data.tail(3, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4)))
+
+
+def test_preview_symbols(m_session, data, mocker):
+    spy = mocker.spy(otp, 'run')
+    res = data.head(2, preview=True, preview_window=pd.Timedelta(hours=6),
+                    symbols=['A', 'B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4))
+    assert list(res['A']['Time']) == [pd.Timestamp(2003, 12, 1, hour) for hour in range(2)]
+    assert list(res['B']['Time']) == [pd.Timestamp(2003, 12, 2, hour) for hour in range(2)]
+    # symbol A is not queried after the first window
+    assert [call.kwargs['symbols'] for call in spy.call_args_list] == [['A', 'B'], ['B'], ['B']]
+
+
+def test_preview_short_range(m_session, data):
+    res = data.head(100, preview=True, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 1, 5))
+    assert len(res) == 5
+    res = data.tail(100, preview=True, symbols='B', start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 1, 5))
+    assert res.empty
+
+
+def test_preview_errors(m_session, data):
+    with pytest.raises(ValueError, match='symbols'):
+        data.head(preview=True, symbols=otp.Ticks(SYMBOL_NAME=['A']))
+    with pytest.raises(ValueError, match='preview_window'):
+        data.head(preview=True, preview_window=pd.Timedelta(0))
+    data = otp.Tick(X=1, start=otp.dt(2003, 12, 2), end=otp.dt(2003, 12, 3))
+    with pytest.raises(ValueError, match='different time ranges'):
+        data.head(preview=True, start=otp.dt(2003, 12, 1))
@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+
+
+@pytest.fixture
+def data():
+    data = otp.Tick(X=1)
+    data['NAME'] = data.Symbol.name
+    data['INT_PARAM'] = data.Symbol.get('INT_PARAM', int)
+    data['STR_PARAM'] = data.Symbol.get('STR_PARAM', str)
+    return data
+
+
+def test_dataframe(session, data, tmp_path):
+    symbols = pd.DataFrame({
+        'SYMBOL_NAME': ['A', 'B'],
+        'INT_PARAM': [1, 2],
+        'STR_PARAM': ['a,b', 'c"d'],
+    })
+    res = otp.run(data, symbols=otp.SymbolListFile(symbols, directory=tmp_path))
+    assert list(res) == ['A', 'B']
+    assert list(res['A']['INT_PARAM']) == [1]
+    assert list(res['B']['INT_PARAM']) == [2]
+    assert list(res['A']['STR_PARAM']) == ['a,b']
+    assert list(res['B']['STR_PARAM']) == ['c"d']
+
+
+def test_iterable(session, tmp_path):
+    data = otp.Tick(X=1)
+    data['NAME'] = data.Symbol.name
+    res = otp.run(data, symbols=otp.SymbolListFile((f'S{i}' for i in range(1000)), directory=tmp_path))
+    assert len(res) == 1000
+    assert list(res['S999']['NAME']) == ['S999']
+
+
+def test_arrow_table(session, data, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    symbols = pa.table({'NAME_COLUMN': ['A'], 'INT_PARAM': [3], 'STR_PARAM': ['x']})
+    res = otp.run(data, symbols=otp.SymbolListFile(symbols, symbol_name_column='NAME_COLUMN', directory=tmp_path))
+    assert list(res['A']['INT_PARAM']) == [3]
+
+
+def test_file_reused(tmp_path):
+    symbols = pd.DataFrame({'SYMBOL_NAME': ['A', 'B'], 'PARAM': [1.5, 2.5]})
+    path = otp.sources.symbol_list_file.write_symbol_list_file(symbols, directory=tmp_path)
+    mtime = os.path.getmtime(path)
+    assert otp.sources.symbol_list_file.write_symbol_list_file(symbols.copy(), directory=tmp_path) == path
+    assert os.path.getmtime(path) == mtime
+    assert len(os.listdir(tmp_path)) == 1
+
+    symbols.loc[1, 'PARAM'] = 3.5
+    assert otp.sources.symbol_list_file.write_symbol_list_file(symbols, directory=tmp_path) != path
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_errors(tmp_path):
+    with pytest.raises(ValueError, match='SYMBOL_NAME'):
+        otp.SymbolListFile(pd.DataFrame({'X': ['A']}), directory=tmp_path)
+    with pytest.raises(ValueError, match='Unsupported type'):
+        otp.SymbolListFile(pd.DataFrame({'SYMBOL_NAME': ['A'], 'T': [pd.Timestamp(2003, 12, 1)]}),
+                           directory=tmp_path)
+    with pytest.raises(ValueError, match='iterable'):
+        otp.SymbolListFile('A', directory=tmp_path)
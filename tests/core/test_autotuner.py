@@ -0,0 +1,98 @@
+import json
+
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+
+
+@pytest.fixture
+def tuner(tmp_path):
+    return otp.Autotuner(tmp_path / 'stats.json', max_concurrency=8, memory_limit=10 ** 9)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    # imitates the query that runs faster with bigger concurrency up to 4
+    calls = []
+    original_run = otp.run
+
+    def run(query, **kwargs):
+        if kwargs.get('autotune') or otp.config.autotune:
+            return original_run(query, **kwargs)
+        calls.append(kwargs)
+        concurrency = kwargs.get('concurrency')
+        wall_time = 1.0 / min(concurrency if isinstance(concurrency, int) and concurrency else 1, 4)
+        run.time += wall_time
+        return {symbol: pd.DataFrame({'X': range(100)}) for symbol in kwargs['symbols']}
+
+    run.time = 0.0
+    monkeypatch.setattr(otp, 'run', run)
+    monkeypatch.setattr('onetick.py.autotuner.time.perf_counter', lambda: run.time)
+    # default concurrency depends on the version of the server
+    monkeypatch.setattr('onetick.py.configuration.default_query_concurrency', lambda: 1)
+    return calls
+
+
+def test_no_statistics(session, tuner):
+    decision = tuner.decide('fingerprint', 10)
+    assert decision.params == {}
+    assert decision.reasons == ['no statistics for the query yet']
+
+
+def test_run(session, tuner, calls):
+    data = otp.Tick(X=1)
+    symbols = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+    for _ in range(5):
+        tuner.run(data, symbols=symbols, concurrency=otp.utils.default)
+    assert 'max_expected_ticks_per_symbol' not in calls[0]
+    assert calls[1]['max_expected_ticks_per_symbol'] == 120
+    # concurrency is increased until the query stops getting faster
+    assert [call['concurrency'] for call in calls[1:]] == [2, 4, 8, 4]
+    decision = tuner.decide(data._fingerprint(), len(symbols))
+    assert decision.params['concurrency'] == 4
+    assert any(reason.startswith('concurrency=4: the fastest') for reason in decision.reasons)
+
+    # statistics are persisted
+    stats = json.loads(tuner.path.read_text())
+    assert len(stats[data._fingerprint()]['runs']) == 5
+    new_tuner = otp.Autotuner(tuner.path, max_concurrency=8)
+    assert new_tuner.decide(data._fingerprint(), len(symbols)).params == decision.params
+    report = tuner.report()
+    assert list(report['RUNS']) == [5]
+    assert list(report['MAX_TICKS_PER_SYMBOL']) == [100]
+
+
+def test_explicit_params_not_changed(session, tuner, calls):
+    data = otp.Tick(X=1)
+    for _ in range(3):
+        tuner.run(data, symbols=['A', 'B'], concurrency=3, max_expected_ticks_per_symbol=10)
+    assert all(call['concurrency'] == 3 and call['max_expected_ticks_per_symbol'] == 10 for call in calls)
+
+
+def test_batch_size(session, tmp_path, calls):
+    tuner = otp.Autotuner(tmp_path / 'stats.json', memory_limit=2000)
+    data = otp.Tick(X=1)
+    symbols = [f'S{i}' for i in range(10)]
+    tuner.run(data, symbols=symbols)
+    tuner.run(data, symbols=symbols)
+    # each symbol returns 800 bytes
+    assert calls[1]['batch_size'] == 2
+    assert tuner.last_decision.params['batch_size'] == 2
+
+
+def test_run_parameter(session, tmp_path, calls):
+    with otp.config('autotuner_stats_file', str(tmp_path / 'stats.json')):
+        otp.run(otp.Tick(X=1), symbols=['A', 'B'], autotune=True)
+        otp.run(otp.Tick(X=1), symbols=['A', 'B'], autotune=True)
+        assert otp.Autotuner.get_default().last_decision.params['max_expected_ticks_per_symbol'] == 120
+        assert (tmp_path / 'stats.json').exists()
+    assert len(calls) == 2
+
+
+def test_real_run(session, tuner):
+    data = otp.Ticks(X=[1, 2, 3])
+    for _ in range(2):
+        res = otp.run(data, symbols=['A', 'B'], autotune=tuner)
+        assert list(res['A']['X']) == [1, 2, 3]
+    assert tuner.last_decision.params['max_expected_ticks_per_symbol'] == 4
@@ -0,0 +1,100 @@
+import sys
+import threading
+
+import pytest
+
+import onetick.py as otp
+
+
+def build(size):
+    data = otp.Tick(A=1)
+    for i in range(size):
+        data[f'B{i}'] = data['A'] + i
+    return data
+
+
+def test_report():
+    with otp.profile_build() as profile:
+        build(10)
+        copied = otp.Tick(A=1).copy()
+    assert copied
+
+    report = profile.report(sort_by='EPS')
+    assert list(report.columns) == ['FILE', 'LINE', 'FUNCTION', 'CALL', 'CALLS', 'EPS', 'COPIES', 'TIME']
+    assert (report['FILE'] == __file__).all()
+    assert set(report['FUNCTION']) == {'build', 'test_report'}
+
+    setitem = report[report['CALL'] == 'Tick.__setitem__'].iloc[0]
+    assert setitem['FUNCTION'] == 'build'
+    assert setitem['LINE'] == build.__code__.co_firstlineno + 3
+    assert setitem['CALLS'] == 10
+    assert setitem['EPS'] == 10
+    assert report.iloc[0]['CALL'] == 'Tick.__setitem__'
+
+    copy = report[report['CALL'] == 'Tick.copy'].iloc[0]
+    assert copy['FUNCTION'] == 'test_report'
+    assert copy['COPIES'] == 1
+    assert copy['EPS'] == 0
+
+    assert profile.eps == report['EPS'].sum()
+    assert profile.copies == report['COPIES'].sum()
+    assert profile.time == pytest.approx(report['TIME'].sum())
+    assert (report['TIME'] > 0).all()
+    assert list(profile.report()['TIME']) == sorted(report['TIME'], reverse=True)
+
+
+def test_profiler_is_restored():
+    previous = sys.getprofile()
+    with otp.profile_build():
+        pass
+    assert sys.getprofile() is previous
+
+    with pytest.raises(ValueError, match='inside of another'):
+        with otp.profile_build():
+            with otp.profile_build():
+                pass
+    assert sys.getprofile() is previous
+
+    with pytest.raises(ValueError, match='sort_by'):
+        with otp.profile_build() as profile:
+            pass
+        profile.report(sort_by='WRONG')
+
+
+def test_not_profiled():
+    with otp.profile_build() as profile:
+        pass
+    build(3)
+    assert profile.report().empty
+
+    # only the thread using the profiler is profiled
+    with otp.profile_build() as profile:
+        thread = threading.Thread(target=build, args=(3,))
+        thread.start()
+        thread.join()
+    assert profile.eps == 0
+
+
+def test_flamegraph(tmp_path):
+    with otp.profile_build() as profile:
+        build(5)
+
+    lines = profile.flamegraph(metric='eps').splitlines()
+    stacks = dict(line.rsplit(' ', 1) for line in lines)
+    setitem = [stack for stack in stacks if stack.endswith('onetick.py Tick.__setitem__')]
+    assert len(setitem) == 1
+    frames = setitem[0].split(';')
+    assert frames[-2].startswith(f'build ({__file__}:')
+    assert frames[-3].startswith(f'test_flamegraph ({__file__}:')
+    assert stacks[setitem[0]] == '5'
+    assert sum(map(int, stacks.values())) == profile.eps
+
+    for line in profile.flamegraph().splitlines():
+        assert int(line.rsplit(' ', 1)[1]) > 0
+
+    path = tmp_path / 'build.folded'
+    profile.save_flamegraph(str(path), metric='calls')
+    assert path.read_text() == profile.flamegraph(metric='calls') + '\n'
+
+    with pytest.raises(ValueError, match='metric'):
+        profile.flamegraph(metric='wrong')
@@ -0,0 +1,54 @@
+import pytest
+
+import onetick.py as otp
+
+
+def _query():
+    data = otp.Tick(X=1, db='LOCAL', tick_type='TRD')
+    data['Y'] = data['X'] + 1
+    return data
+
+
+def test_promotion(f_session, mocker):
+    create_cache = mocker.spy(otp.cache_promoter, 'create_cache')
+    delete_cache = mocker.spy(otp.cache_promoter, 'delete_cache')
+    with otp.CachePromoter(threshold=2, tick_type='TRD', db='LOCAL', symbol='SYM') as promoter:
+        for day in range(1, 6):
+            res = promoter.run(_query(), symbols='SYM', date=otp.dt(2022, 6, day))
+            assert list(res['Y']) == [2]
+            assert res['Time'][0] == otp.dt(2022, 6, day)
+        assert create_cache.call_count == 1
+        report = promoter.report()
+        assert len(report) == 1
+        assert report['CACHE_NAME'][0].startswith('__otp_promoted_')
+        assert report['USES'][0] == 5
+        assert report['UNCACHED_RUNS'][0] == 2
+        assert report['CACHED_RUNS'][0] == 3
+    assert delete_cache.call_count == 1
+    assert promoter.report().empty
+
+
+def test_wrap(session, mocker):
+    mocker.patch('onetick.py.cache_promoter.create_cache')
+    promoter = otp.CachePromoter(threshold=3)
+    sources = [promoter.wrap(_query()) for _ in range(5)]
+    assert [isinstance(source, otp.ReadCache) for source in sources] == [False, False, False, True, True]
+    assert dict(sources[-1].schema) == dict(_query().schema)
+    # different sources are tracked separately
+    other = otp.Tick(X=2, db='LOCAL', tick_type='TRD')
+    assert not isinstance(promoter.wrap(other), otp.ReadCache)
+    assert list(promoter.report()['USES']) == [5, 1]
+
+
+def test_not_cacheable(session, mocker):
+    mocker.patch('onetick.py.cache_promoter.create_cache', side_effect=RuntimeError('error'))
+    promoter = otp.CachePromoter(threshold=1)
+    for _ in range(3):
+        assert not isinstance(promoter.wrap(_query()), otp.ReadCache)
+    assert otp.cache_promoter.create_cache.call_count == 1
+    assert promoter.report()['CACHE_NAME'][0] == ''
+
+
+def test_wrong_threshold():
+    with pytest.raises(ValueError):
+        otp.CachePromoter(threshold=0)
@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+from onetick.py.callback import BatchedCallback
+
+
+DESCRIPTOR = [('X', {'type': 'int'}), ('S', {'type': 'string'})]
+
+
+def _produce(callback, symbol, count, descriptor=DESCRIPTOR, start=0):
+    replica = callback.replicate()
+    replica.process_symbol_name(symbol)
+    replica.process_tick_descriptor(descriptor)
+    for i in range(start, start + count):
+        replica.process_tick({'X': i, 'S': symbol}, datetime(2003, 12, 1, 5, 0, i % 60))
+    replica.done()
+    return replica
+
+
+def _consume(callback, timeout=5):
+    batches = []
+    while True:
+        batch = callback.get_batch(timeout=timeout)
+        if batch is None:
+            return batches
+        batches.append(batch)
+
+
+def test_batches(session):
+    callback = BatchedCallback(batch_size=3, timezone='EST5EDT')
+    _produce(callback, 'A', 7)
+    callback.finish()
+    batches = _consume(callback)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert all(batch.symbol == 'A' for batch in batches)
+    assert list(np.concatenate([batch.data['X'] for batch in batches])) == list(range(7))
+    df = batches[0].to_pandas()
+    assert list(df.columns) == ['Time', 'X', 'S']
+    # timestamps are converted from GMT
+    assert df['Time'][0] == pd.Timestamp(2003, 12, 1, 0, 0, 0)
+    metrics = callback.metrics
+    assert metrics['ticks_received'] == metrics['ticks_delivered'] == 7
+    assert metrics['batches_delivered'] == 3
+    assert metrics['ticks_buffered'] == 0
+
+
+def test_round_robin(session):
+    callback = BatchedCallback(batch_size=2)
+    _produce(callback, 'A', 4)
+    _produce(callback, 'B', 4)
+    callback.finish()
+    assert [batch.symbol for batch in _consume(callback)] == ['A', 'B', 'A', 'B']
+
+
+def test_max_latency(session):
+    callback = BatchedCallback(batch_size=100, max_latency=0.05)
+    replica = callback.replicate()
+    replica.process_symbol_name('A')
+    replica.process_tick_descriptor(DESCRIPTOR)
+    replica.process_tick({'X': 1, 'S': 'A'}, datetime(2003, 12, 1))
+    assert callback.get_batch(timeout=0.01) is None
+    batch = callback.get_batch(timeout=5)
+    assert len(batch) == 1
+    assert batch.lag >= 0.05
+
+
+def test_schema_change(session):
+    callback = BatchedCallback(batch_size=10)
+    replica = _produce(callback, 'A', 2)
+    replica.process_tick_descriptor([('Y', {'type': 'float'})])
+    replica.process_tick({'Y': 1.5}, datetime(2003, 12, 1))
+    callback.finish()
+    batches = _consume(callback)
+    assert [list(batch.data) for batch in batches] == [['Time', 'X', 'S'], ['Time', 'Y']]
+
+
+@pytest.mark.parametrize('overflow,expected', [
+    ('drop_oldest', [6, 7, 8, 9]),
+    ('drop_newest', [0, 1, 2, 3]),
+])
+def test_drop(session, overflow, expected):
+    callback = BatchedCallback(batch_size=4, capacity=4, overflow=overflow)
+    _produce(callback, 'A', 10)
+    callback.finish()
+    batches = _consume(callback)
+    assert list(np.concatenate([batch.data['X'] for batch in batches])) == expected
+    assert callback.metrics['ticks_dropped'] == 6
+
+
+def test_block(session):
+    callback = BatchedCallback(batch_size=2, capacity=2, overflow='block')
+    producer = threading.Thread(target=_produce, args=(callback, 'A', 10))
+    producer.start()
+    time.sleep(0.1)
+    # producer waits for the consumer
+    assert producer.is_alive()
+    assert callback.metrics['ticks_buffered'] == 2
+    batches = []
+    while len(batches) < 5:
+        batches.append(callback.get_batch(timeout=5))
+    producer.join(timeout=5)
+    assert list(np.concatenate([batch.data['X'] for batch in batches])) == list(range(10))
+    assert callback.metrics['ticks_dropped'] == 0
+
+
+def test_stop_releases_producer(session):
+    callback = BatchedCallback(batch_size=2, capacity=2, overflow='block')
+    producer = threading.Thread(target=_produce, args=(callback, 'A', 10))
+    producer.start()
+    time.sleep(0.1)
+    callback.stop()
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+    assert callback.metrics['ticks_dropped'] == 8
+
+
+def test_consumer(session):
+    data = otp.Ticks(X=list(range(10)))
+    consumer = otp.CEPConsumer(data, batch_size=4, running=False, symbols=['A', 'B'])
+    result = {}
+    for batch in consumer:
+        result.setdefault(batch.symbol, []).extend(batch.data['X'])
+    assert result == {'A': list(range(10)), 'B': list(range(10))}
+    assert consumer.metrics['ticks_delivered'] == 20
+
+
+def test_consumer_async(session):
+    data = otp.Ticks(X=list(range(10)))
+
+    async def main():
+        ticks = []
+        async with otp.CEPConsumer(data, batch_size=4, running=False) as consumer:
+            async for batch in consumer:
+                ticks.extend(batch.to_pandas()['X'])
+        return ticks
+
+    assert asyncio.run(main()) == list(range(10))
+
+
+def test_consumer_error(session):
+    consumer = otp.CEPConsumer(otp.Tick(X=1), running=False, symbols='A', start=otp.dt(2003, 12, 2),
+                               end=otp.dt(2003, 12, 1))
+    with pytest.raises(Exception):
+        list(consumer)
+
+
+def test_consumer_stop(session, monkeypatch):
+    def run(query, callback, running, cancellation_handle=None, **kwargs):
+        # endless feed that stops only when the consumer is stopped
+        assert running
+        i = 0
+        replica = callback.replicate()
+        replica.process_symbol_name('A')
+        replica.process_tick_descriptor(DESCRIPTOR)
+        while not callback._state.stopped:
+            replica.process_tick({'X': i, 'S': 'A'}, datetime(2003, 12, 1))
+            i += 1
+        raise Exception('Query is cancelled')
+
+    monkeypatch.setattr(otp, 'run', run)
+    with otp.CEPConsumer(otp.Tick(X=1), batch_size=5, capacity=10) as consumer:
+        batches = [consumer.get_batch(timeout=5) for _ in range(3)]
+    assert [list(batch.data['X']) for batch in batches] == [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9], [10, 11, 12, 13, 14]]
+    consumer._thread.join(timeout=5)
+    assert not consumer._thread.is_alive()
+    # the rest of the buffered ticks are delivered and the error caused by the cancellation is not raised
+    assert all(len(batch) <= 5 for batch in consumer)
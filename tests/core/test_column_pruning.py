@@ -0,0 +1,100 @@
+from pathlib import Path
+
+import pytest
+
+import onetick.py as otp
+
+
+@pytest.fixture
+def data():
+    return otp.Ticks(A=[1, 2, 3], B=[4, 5, 6], C=['a', 'b', 'c'], D=[1.5, 2.5, 3.5])
+
+
+def _passthrough_fields(query):
+    text = Path(query.to_otq().split('::')[0]).read_text()
+    return [
+        set(line.split('FIELDS="')[1].split('"')[0].split(','))
+        for line in text.splitlines()
+        if '=PASSTHROUGH(FIELDS=' in line and 'THROW_FOR_MISSING_FIELDS=False' in line
+    ]
+
+
+def _compare(query):
+    expected = otp.run(query)
+    with otp.config('prune_columns', True):
+        result = otp.run(query)
+    assert result.equals(expected)
+    return result
+
+
+def test_disabled_by_default(session, data):
+    data = data[['A']]
+    assert _passthrough_fields(data) == []
+
+
+def test_prune(session, data):
+    data['X'] = data['A'] * 2
+    data, _ = data[data['B'] > 4]
+    data = data[['X']]
+    result = _compare(data)
+    assert list(result['X']) == [4, 6]
+    with otp.config('prune_columns', True):
+        fields = _passthrough_fields(data)
+    assert len(fields) == 1
+    assert {'A', 'B', 'X'} <= fields[0]
+    assert not {'C', 'D'} & fields[0]
+
+
+def test_aggregation(session, data):
+    data = data.agg({'S': otp.agg.sum('D')})
+    result = _compare(data)
+    assert list(result['S']) == [7.5]
+    with otp.config('prune_columns', True):
+        fields = _passthrough_fields(data)
+    assert 'D' in fields[0]
+    assert not {'A', 'B', 'C'} & fields[0]
+
+
+def test_merge(session, data):
+    other = otp.Ticks(E=[1, 2], F=[3, 4])
+    data = otp.merge([data, other])
+    data = data[['A', 'E']]
+    _compare(data)
+    with otp.config('prune_columns', True):
+        fields = _passthrough_fields(data)
+    assert len(fields) == 2
+    for source_fields in fields:
+        assert not {'B', 'C', 'D', 'F'} & source_fields
+
+
+def test_not_pruned(session, data):
+    with otp.config('prune_columns', True):
+        script = data.script('tick.A = tick.B;')
+        assert _passthrough_fields(script[['A']]) == []
+
+        named = data.copy()
+        named.node_name('NAMED')
+        assert _passthrough_fields(named[['A']]) == []
+
+        regex = data.drop(r'[BC]')
+        assert _passthrough_fields(regex[['A']]) == []
+
+
+def test_incomplete_schema(session, data):
+    # fields B, C and D are not declared, but they are still propagated to the output
+    data.schema.set(A=int)
+    data['X'] = data['A'] * 2
+    with otp.config('prune_columns', True):
+        assert _passthrough_fields(data) == []
+    result = _compare(data)
+    assert list(result.columns) == ['Time', 'A', 'B', 'C', 'D', 'X']
+
+    # the undeclared fields are dropped explicitly
+    narrowed = data.table(X=int, strict=True)
+    with otp.config('prune_columns', True):
+        fields = _passthrough_fields(narrowed)
+    assert len(fields) == 1
+    assert {'A', 'X'} <= fields[0]
+    assert not {'B', 'C', 'D', 'FIELD', 'VALUE', 'long'} & fields[0]
+    result = _compare(narrowed)
+    assert list(result.columns) == ['Time', 'X']
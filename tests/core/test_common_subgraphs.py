@@ -0,0 +1,78 @@
+import re
+
+import pytest
+
+import onetick.py as otp
+from onetick.py.core._internal._common_subgraphs import eliminate_common_subgraphs
+
+
+@pytest.fixture
+def reports(mocker):
+    reports = []
+
+    def wrapper(rules):
+        result = eliminate_common_subgraphs(rules)
+        reports.append(result[2])
+        return result
+
+    mocker.patch('onetick.py.core.source.eliminate_common_subgraphs', side_effect=wrapper)
+    return reports
+
+
+def _branch(column, node_name=None):
+    data = otp.Ticks(A=[1, 2, 3], B=[4, 5, 6])
+    if node_name:
+        data.node_name(node_name)
+    data, _ = data[data['A'] > 1]
+    data[column] = data['B'] * 2
+    return data
+
+
+def _nodes_count(query):
+    with open(query.to_otq().split('::')[0]) as f:
+        return len(re.findall(r'^(?:ROOT|NODE_\d+)=', f.read(), re.MULTILINE))
+
+
+def test_join(session, reports):
+    data = otp.join_by_time([_branch('X')[['X']], _branch('Y')[['Y']]])
+    expected = otp.run(data)
+    nodes_count = _nodes_count(data)
+
+    with otp.config('eliminate_common_subgraphs', True):
+        result = otp.run(data)
+        assert _nodes_count(data) < nodes_count
+    assert result.equals(expected)
+    assert reports[0].saved_reads == 1
+    assert reports[0].eliminated_nodes > 1
+
+
+def test_merge_identical_branches(session, reports):
+    data = otp.merge([_branch('X'), _branch('X')])
+    expected = otp.run(data)
+    assert len(expected) == 4
+
+    with otp.config('eliminate_common_subgraphs', True):
+        result = otp.run(data)
+    assert result.equals(expected)
+    assert reports[0].saved_reads == 1
+
+
+def test_different_branches(session, reports):
+    first = _branch('X')
+    second = otp.Ticks(A=[1, 2, 3], B=[4, 5, 7])
+    second, _ = second[second['A'] > 1]
+    second['X'] = second['B'] * 2
+    data = otp.merge([first, second])
+
+    with otp.config('eliminate_common_subgraphs', True):
+        result = otp.run(data)
+    assert list(result['X']) == [10, 10, 12, 14]
+    assert reports[0].saved_reads == 0
+
+
+def test_named_nodes(session, reports):
+    # named nodes may be requested as outputs of the query, so they and their consumers are not merged
+    with otp.config('eliminate_common_subgraphs', True):
+        otp.run(otp.merge([_branch('X'), _branch('X')]))
+        otp.run(otp.merge([_branch('X', node_name='FIRST'), _branch('X')]))
+    assert reports[1].eliminated_nodes < reports[0].eliminated_nodes
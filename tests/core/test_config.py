@@ -169,3 +169,76 @@ def test_context_manager_multiple(config_preserving_session):
 
     assert otp.config.context == original_context
     assert otp.config.default_symbol == original_default_symbol
+
+
+class TestOverride:
+
+    def test_scope(self, config_preserving_session):
+        original = otp.config.default_symbol
+        with otp.config.override(default_symbol='A'):
+            assert otp.config.default_symbol == 'A'
+            assert otp.config['default_symbol'] == 'A'
+            with otp.config.override(default_symbol='B'):
+                assert otp.config.default_symbol == 'B'
+            assert otp.config.default_symbol == 'A'
+        assert otp.config.default_symbol == original
+
+    def test_priority(self, config_preserving_session):
+        otp.config.tz = 'GMT'
+        with otp.config.override(tz='America/Chicago'):
+            otp.config.tz = 'Europe/London'
+            assert otp.config.tz == 'America/Chicago'
+        assert otp.config.tz == 'Europe/London'
+
+    def test_default(self, config_preserving_session, monkeypatch):
+        monkeypatch.delenv('OTP_DEDUPLICATE_NESTED_QUERIES', raising=False)
+        otp.config.deduplicate_nested_queries = False
+        with otp.config.override(deduplicate_nested_queries=otp.config.default):
+            assert otp.config.deduplicate_nested_queries is True
+        assert otp.config.deduplicate_nested_queries is False
+
+    def test_threads(self, config_preserving_session):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        barrier = threading.Barrier(2)
+
+        def get_symbol(symbol):
+            with otp.config.override(default_symbol=symbol):
+                # both threads are inside their scopes at the same time
+                barrier.wait(timeout=10)
+                return otp.config.default_symbol
+
+        with ThreadPoolExecutor(2) as executor:
+            assert list(executor.map(get_symbol, ['A', 'B'])) == ['A', 'B']
+
+    def test_asyncio_tasks(self, config_preserving_session):
+        import asyncio
+
+        async def get_symbol(symbol):
+            with otp.config.override(default_symbol=symbol):
+                await asyncio.sleep(0.01)
+                inherited = await asyncio.create_task(asyncio.to_thread(lambda: otp.config.default_symbol))
+                return otp.config.default_symbol, inherited
+
+        async def main():
+            return await asyncio.gather(get_symbol('A'), get_symbol('B'))
+
+        assert asyncio.run(main()) == [('A', 'A'), ('B', 'B')]
+
+    def test_run(self, config_preserving_session):
+        data = otp.Tick(A=1)
+        with otp.config.override(default_start_time=otp.dt(2023, 2, 3), default_end_time=otp.dt(2023, 2, 4)):
+            df = otp.run(data)
+        assert df['Time'][0] == otp.dt(2023, 2, 3)
+
+    def test_errors(self, config_preserving_session):
+        with pytest.raises(AttributeError):
+            with otp.config.override(timezone='GMT'):
+                pass
+        with pytest.raises(ValueError):
+            with otp.config.override(tz=123):
+                pass
+        with pytest.raises(ValueError):
+            with otp.config.override(show_stack_info=True):
+                pass
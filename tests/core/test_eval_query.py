@@ -1,3 +1,4 @@
+import pandas as pd
 import pytest
 
 import onetick.py as otp
@@ -362,3 +363,106 @@ def test_generated_otq(f_session):
     gen_query = t.to_otq().split('::')[0]
     queries = otp.core.query_inspector.get_queries(gen_query)
     assert len(queries) == 2
+
+
+class TestMaterialize:
+    @pytest.fixture(autouse=True)
+    def clear_materialized(self):
+        from onetick.py.core.eval_query import _MATERIALIZED_EVALS
+        _MATERIALIZED_EVALS.clear()
+        yield
+        _MATERIALIZED_EVALS.clear()
+
+    def test_symbols(self, session, mocker):
+        universe = otp.eval(otp.Ticks(SYMBOL_NAME=['A', 'B'], PARAM=[1, 2])).materialize()
+        data = otp.Tick(X=1)
+        data['PARAM'] = data.Symbol.get('PARAM', int)
+        spy = mocker.spy(otp, 'run')
+        for _ in range(3):
+            res = otp.run(data, symbols=universe)
+            assert set(res) == {'A', 'B'}
+            assert res['A']['PARAM'][0] == 1
+            assert res['B']['PARAM'][0] == 2
+        # the evaluated query itself is run only once
+        assert spy.call_count == 3 + 1
+
+    def test_time_range_and_context(self, session, mocker):
+        universe = otp.eval(otp.Ticks(SYMBOL_NAME=['A'])).materialize()
+        data = otp.Tick(X=1)
+        spy = mocker.spy(otp, 'run')
+        otp.run(data, symbols=universe, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 2))
+        otp.run(data, symbols=universe, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 2))
+        otp.run(data, symbols=universe, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 3))
+        otp.run(data, symbols=universe, start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 3), timezone='GMT')
+        assert spy.call_count == 4 + 3
+
+    def test_ttl(self, session, mocker):
+        universe = otp.eval(otp.Ticks(SYMBOL_NAME=['A'])).materialize(ttl=10)
+        data = otp.Tick(X=1)
+        spy = mocker.spy(otp, 'run')
+        monotonic = mocker.patch('onetick.py.core.eval_query.time.monotonic', return_value=100)
+        otp.run(data, symbols=universe)
+        monotonic.return_value = 105
+        otp.run(data, symbols=universe)
+        assert spy.call_count == 2 + 1
+        monotonic.return_value = 111
+        otp.run(data, symbols=universe)
+        assert spy.call_count == 3 + 2
+
+    def test_value(self, session):
+        def get_filter(a):
+            return otp.Tick(WHERE=f'X >= {a}')
+
+        data = otp.Ticks(X=[1, 2, 3])
+        data = data.where(otp.eval(get_filter, a=2).materialize())
+        assert list(otp.run(data)['X']) == [2, 3]
+
+    def test_not_materializable(self, session):
+        def get_filter(a):
+            return otp.Tick(WHERE=f'X >= {a}')
+
+        data = otp.Ticks(X=[1, 2, 3])
+        with pytest.raises(ValueError, match='depending on the main query'):
+            otp.eval(get_filter, a=data['_START_TIME']).materialize()
+        with pytest.raises(ValueError, match='Continuous'):
+            otp.eval(otp.Tick(SYMBOL_NAME='A'), continuous=True).materialize()
+
+    def test_run_parameters(self, session, mocker):
+        universe = otp.eval(otp.Ticks(SYMBOL_NAME=['A'])).materialize()
+        run = mocker.patch.object(otp, 'run', return_value=pd.DataFrame({'Time': [pd.Timestamp(2003, 12, 1)],
+                                                                         'SYMBOL_NAME': ['A']}))
+        run_kwargs = dict(context='OTHER', username='user', query_properties={'ALLOW_GRAPH_REUSE': 'true'})
+        for _ in range(2):
+            universe.to_eval_string(run_kwargs=run_kwargs)
+        assert run.call_count == 1
+        kwargs = run.call_args.kwargs
+        assert kwargs['context'] == 'OTHER'
+        assert kwargs['username'] == 'user'
+        assert kwargs['query_properties'] == {'ALLOW_GRAPH_REUSE': 'true'}
+        # the results for other contexts, users and query properties are stored separately
+        universe.to_eval_string(run_kwargs={**run_kwargs, 'context': 'DEFAULT'})
+        universe.to_eval_string(run_kwargs={**run_kwargs, 'username': 'other_user'})
+        universe.to_eval_string(run_kwargs={**run_kwargs, 'query_properties': {}})
+        assert run.call_count == 4
+
+    def test_max_size(self):
+        from onetick.py.core.eval_query import _MaterializedEvals
+
+        evals = _MaterializedEvals(max_size=2)
+        evals.set('a', pd.DataFrame(), None)
+        evals.set('b', pd.DataFrame(), None)
+        assert evals.get('a') is not None
+        evals.set('c', pd.DataFrame(), None)
+        # the least recently used result is removed
+        assert evals.get('b') is None
+        assert evals.get('a') is not None
+        assert evals.get('c') is not None
+
+    def test_empty_result(self, session):
+        from onetick.py.core.eval_query import _result_to_source
+
+        result = pd.DataFrame({'Time': pd.Series(dtype='datetime64[ns]'), 'A': pd.Series(dtype='int64'),
+                               'B': pd.Series(dtype='float64'), 'S': pd.Series(dtype=object)})
+        data = _result_to_source(result)
+        assert isinstance(data, otp.Empty)
+        assert data.schema == {'A': int, 'B': float, 'S': str}
@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+import onetick.py as otp
+from onetick.py.otq import otq
+from onetick.py.hedging import LatencyHistogram
+
+
+class FakeCancellationHandle:
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel_query(self):
+        self.cancelled.set()
+
+
+class StandInServers:
+    """
+    Imitates the servers answering with the configured latencies.
+    """
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+        self.requests = []
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    def run(self, query, cancellation_handle=None, **kwargs):
+        endpoint = otp.config.http_address if otq.webapi else kwargs['context']
+        with self._lock:
+            self.requests.append(endpoint)
+        latency = self.latencies[endpoint]
+        if latency is None:
+            raise Exception(f'{endpoint} is down')
+        if cancellation_handle.cancelled.wait(timeout=latency):
+            with self._lock:
+                self.cancelled.append(endpoint)
+            raise Exception('Query is cancelled')
+        return endpoint
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    monkeypatch.setattr(otq, 'QueryCancellationHandle', FakeCancellationHandle, raising=False)
+
+    def create(latencies):
+        stand_in = StandInServers(latencies)
+        monkeypatch.setattr(otp, 'run', stand_in.run)
+        return stand_in
+
+    return create
+
+
+class TestLatencyHistogram:
+    def test_quantile(self):
+        histogram = LatencyHistogram(history=10 ** 6)
+        assert histogram.quantile(0.5) is None
+        for i in range(1, 101):
+            histogram.add(i / 100)
+        assert histogram.quantile(0.5) == pytest.approx(0.5, rel=0.2)
+        assert histogram.quantile(0.95) == pytest.approx(0.95, rel=0.2)
+        assert histogram.quantile(0.5) <= histogram.quantile(0.95)
+
+    def test_history(self):
+        histogram = LatencyHistogram(history=10)
+        for _ in range(100):
+            histogram.add(1)
+        for _ in range(50):
+            histogram.add(0.01)
+        # old observations are forgotten
+        assert histogram.quantile(0.95) == pytest.approx(0.01, rel=0.2)
+
+    def test_limits(self):
+        histogram = LatencyHistogram()
+        histogram.add(0)
+        histogram.add(10 ** 9)
+        assert histogram.quantile(0) == LatencyHistogram.MIN_LATENCY
+        assert histogram.quantile(1) > 3600
+
+
+def test_validation():
+    with pytest.raises(ValueError, match='at least 2 endpoints'):
+        otp.HedgedExecutor(['a'])
+    with pytest.raises(ValueError, match='max_hedges'):
+        otp.HedgedExecutor(['a', 'b'], max_hedges=0)
+    with pytest.raises(ValueError, match='hedge_quantile'):
+        otp.HedgedExecutor(['a', 'b'], hedge_quantile=0)
+    with pytest.raises(ValueError, match='callback'):
+        otp.HedgedExecutor(['a', 'b']).run(otp.Tick(A=1), callback=otp.CallbackBase())
+
+
+def test_hedge_slow_endpoint(servers):
+    stand_in = servers({'slow': 5, 'fast': 0.01})
+    executor = otp.HedgedExecutor(['slow', 'fast'], default_delay=0.05)
+    assert executor.run(otp.Tick(A=1)) == 'fast'
+    assert stand_in.requests == ['slow', 'fast']
+    report = executor.report().set_index('ENDPOINT')
+    assert report.loc['slow', 'CANCELLED'] == 1
+    assert report.loc['fast', 'HEDGES'] == 1
+    assert report.loc['fast', 'WINS'] == 1
+    # only the order of magnitude is checked, the latency depends on the load of the machine
+    assert 0 < report.loc['fast', 'P50'] < 1
+
+
+def test_routing_by_latency(servers):
+    stand_in = servers({'a': 0.05, 'b': 0.005})
+    executor = otp.HedgedExecutor(['a', 'b'], min_samples=2, default_delay=1)
+    for _ in range(4):
+        # both endpoints are explored first
+        executor.run(otp.Tick(A=1))
+    assert stand_in.requests == ['a', 'b', 'a', 'b']
+    stand_in.requests.clear()
+    for _ in range(3):
+        assert executor.run(otp.Tick(A=1)) == 'b'
+    assert stand_in.requests == ['b', 'b', 'b']
+    assert stand_in.cancelled == []
+
+
+def test_failover(servers):
+    stand_in = servers({'down': None, 'up': 0.01})
+    executor = otp.HedgedExecutor(['down', 'up'], default_delay=10)
+    assert executor.run(otp.Tick(A=1)) == 'up'
+    assert executor.run(otp.Tick(A=1)) == 'up'
+    # the failed endpoint is tried last
+    assert stand_in.requests == ['down', 'up', 'up']
+    report = executor.report().set_index('ENDPOINT')
+    assert report.loc['down', 'ERRORS'] == 1
+    assert report.loc['up', 'WINS'] == 2
+
+
+def test_all_failed(servers):
+    servers({'a': None, 'b': None, 'c': 0.01})
+    executor = otp.HedgedExecutor(['a', 'b', 'c'], max_hedges=1)
+    with pytest.raises(Exception, match='a is down'):
+        executor.run(otp.Tick(A=1))
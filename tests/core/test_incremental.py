@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+from onetick.py.incremental import _ColumnarBuffer, _WATERMARK_PARAM
+
+
+class GrowingData:
+    """
+    Ticks of the symbols available on the server, the new ticks are added between the polls.
+    Tick timestamps are stored in UTC.
+    """
+
+    def __init__(self, tz):
+        self.tz = tz
+        self.ticks = {}
+        self.requests = []
+
+    def add(self, symbol, *ticks):
+        df = pd.DataFrame(ticks, columns=['Time', 'OMDSEQ', 'X'])
+        times = [pd.Timestamp(t) for t in df['Time']]
+        df['Time'] = pd.to_datetime([
+            (t.tz_localize(self.tz) if t.tzinfo is None else t).tz_convert('UTC').tz_localize(None) for t in times
+        ])
+        self.ticks[symbol] = pd.concat([self.ticks.get(symbol), df], ignore_index=True)
+
+    def _convert(self, ts, src_tz, dest_tz):
+        return pd.Timestamp(ts).tz_localize(src_tz).tz_convert(dest_tz).tz_localize(None)
+
+    def run(self, query, symbols, start, end, timezone, require_dict, **kwargs):
+        result = {}
+        start, end = self._convert(start, timezone, 'UTC'), self._convert(end, timezone, 'UTC')
+        for symbol in symbols:
+            millis, fraction = symbol.params[_WATERMARK_PARAM].split('.')
+            watermark = pd.Timestamp(int(millis) * 1_000_000 + int(fraction))
+            query_start = max(start, watermark)
+            self.requests.append((symbol.name, self._convert(query_start, 'UTC', self.tz),
+                                  self._convert(end, 'UTC', self.tz)))
+            df = self.ticks.get(symbol.name, pd.DataFrame(columns=['Time', 'OMDSEQ', 'X']))
+            df = df[(df['Time'] >= query_start) & (df['Time'] < end)].reset_index(drop=True)
+            df['Time'] = pd.to_datetime(df['Time']).dt.tz_localize('UTC').dt.tz_convert(timezone).dt.tz_localize(None)
+            result[symbol.name] = df
+        return result
+
+
+@pytest.fixture
+def server(session, mocker):
+    server = GrowingData(otp.config.tz)
+    mocker.patch.object(otp, 'run', side_effect=server.run)
+    return server
+
+
+@pytest.fixture
+def source():
+    return otp.Tick(X=1).table(OMDSEQ=int, X=int)
+
+
+def test_poll(server, source):
+    runner = otp.IncrementalRunner(source, ['A', 'B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 2))
+    server.add('A', ('2003-12-01 10:00', 1, 1), ('2003-12-01 10:01', 1, 2), ('2003-12-01 10:01', 2, 3))
+    res = runner.poll()
+    assert list(res['A']['X']) == [1, 2, 3]
+    assert res['B'].empty
+    assert runner.watermarks == {'A': (pd.Timestamp(2003, 12, 1, 10, 1), 2), 'B': None}
+
+    # the new tick with the same timestamp as the watermark
+    server.add('A', ('2003-12-01 10:01', 3, 4), ('2003-12-01 10:02', 1, 5))
+    server.add('B', ('2003-12-01 11:00', 1, 10))
+    res = runner.poll()
+    assert list(res['A']['X']) == [4, 5]
+    assert list(res['B']['X']) == [10]
+    # only the ticks since the watermark are requested
+    assert server.requests[-2] == ('A', pd.Timestamp(2003, 12, 1, 10, 1), pd.Timestamp(2003, 12, 2))
+    assert server.requests[-1] == ('B', pd.Timestamp(2003, 12, 1), pd.Timestamp(2003, 12, 2))
+
+    res = runner.poll()
+    assert res['A'].empty
+    assert runner.watermarks['A'] == (pd.Timestamp(2003, 12, 1, 10, 2), 1)
+
+    data = runner.data
+    assert list(data['A']['X']) == [1, 2, 3, 4, 5]
+    assert list(data['A']['Time'])[-1] == pd.Timestamp(2003, 12, 1, 10, 2)
+    assert list(data['B']['X']) == [10]
+    assert runner.stats == {'polls': 3, 'ticks': 6, 'duplicates': 4}
+
+    runner.reset()
+    assert runner.data['A'].empty
+    assert list(runner.poll()['A']['X']) == [1, 2, 3, 4, 5]
+
+
+def test_count_same_timestamps(server, source):
+    runner = otp.IncrementalRunner(source.drop('OMDSEQ'), 'A', start=otp.dt(2003, 12, 1), seq_field=None,
+                                   end=otp.dt(2003, 12, 2))
+    server.add('A', ('2003-12-01 10:00', 0, 1), ('2003-12-01 10:00', 0, 2))
+    assert list(runner.poll()['X']) == [1, 2]
+    server.add('A', ('2003-12-01 10:00', 0, 3))
+    assert list(runner.poll()['X']) == [3]
+    assert runner.watermarks['A'] == (pd.Timestamp(2003, 12, 1, 10), 3)
+    assert list(runner.data['X']) == [1, 2, 3]
+
+
+def test_dst_change(server, source):
+    runner = otp.IncrementalRunner(source, 'A', start=otp.dt(2003, 10, 26), end=otp.dt(2003, 10, 27),
+                                   timezone='EST5EDT')
+    server.add('A', ('2003-10-26 01:30-04:00', 1, 1))
+    assert list(runner.poll()['X']) == [1]
+    assert runner.watermarks['A'] == (pd.Timestamp(2003, 10, 26, 1, 30), 1)
+    # the clocks are turned back, the tick is after the watermark, though its local time is less
+    server.add('A', ('2003-10-26 01:10-05:00', 1, 2))
+    res = runner.poll()
+    assert list(res['X']) == [2]
+    assert list(res['Time']) == [pd.Timestamp(2003, 10, 26, 1, 10)]
+    assert runner.watermarks['A'] == (pd.Timestamp(2003, 10, 26, 1, 10), 1)
+    assert runner.poll().empty
+
+
+def test_seq_field_not_in_schema(server):
+    runner = otp.IncrementalRunner(otp.Tick(X=1), 'A', start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 2),
+                                   require_dict=True)
+    server.add('A', ('2003-12-01 10:00', 1, 1))
+    res = runner.poll()
+    assert list(res['A'].columns) == ['Time', 'X']
+    assert runner.watermarks['A'] == (pd.Timestamp(2003, 12, 1, 10), 1)
+
+
+def test_parameters(session, source):
+    with pytest.raises(ValueError, match='Only symbol names'):
+        otp.IncrementalRunner(source, [1])
+    with pytest.raises(ValueError, match="Parameter 'running'"):
+        otp.IncrementalRunner(source, 'A', running=True)
+    with pytest.raises(ValueError, match='must be less than end time'):
+        otp.IncrementalRunner(source, 'A', start=otp.dt(2003, 12, 2), end=otp.dt(2003, 12, 1))
+
+
+def test_columnar_buffer():
+    buffer = _ColumnarBuffer()
+    buffer.append(pd.DataFrame())
+    for i in range(100):
+        buffer.append(pd.DataFrame({'A': [i, i], 'S': ['a', 'b'], 'T': pd.to_datetime([i, i])}))
+    df = buffer.frame()
+    assert len(buffer) == len(df) == 200
+    assert list(df['A'][:4]) == [0, 0, 1, 1]
+    assert df['S'].dtype == pd.Series(['a']).dtype
+
+    # the buffer is not changed by the modifications of the returned dataframe
+    df.loc[0, 'A'] = 100
+    assert buffer.frame()['A'][0] == 0
+
+    # new columns are added with the missing values
+    buffer.append(pd.DataFrame({'A': [1], 'B': [1.5]}))
+    df = buffer.frame()
+    assert len(df) == 201
+    assert np.isnan(df['B'][0])
+    assert df['B'][200] == 1.5
+
+
+def test_run(session):
+    data = otp.Ticks(X=[1, 2, 3], offset=[0, 1000, 1000])
+    runner = otp.IncrementalRunner(data, ['A', 'B'], seq_field=None)
+    runner.poll(end=otp.dt(2003, 12, 1, 0, 0, 1))
+    res = runner.poll(end=otp.dt(2003, 12, 1, 0, 0, 2))
+    assert list(res['A']['X']) == [2, 3]
+    assert list(runner.data['B']['X']) == [1, 2, 3]
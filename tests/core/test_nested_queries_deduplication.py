@@ -0,0 +1,100 @@
+import onetick.py as otp
+
+from onetick.py.core.query_inspector import get_queries
+
+
+def _build(n):
+    sources = []
+    for i in range(n):
+        data = otp.Tick(A=i)
+        data = data.join_with_query(lambda: otp.Tick(B=2))
+        sources.append(data)
+    return otp.merge(sources)
+
+
+def test_identical_queries(session):
+    data = _build(5)
+    queries = get_queries(data.to_otq().split('::')[0])
+    assert len(queries) == 2
+    res = otp.run(data)
+    assert list(res['A']) == [0, 1, 2, 3, 4]
+    assert list(res['B']) == [2] * 5
+
+
+def test_disabled(session):
+    with otp.config('deduplicate_nested_queries', False):
+        data = _build(5)
+    queries = get_queries(data.to_otq().split('::')[0])
+    assert len(queries) == 6
+
+
+def test_different_queries(session):
+    data = otp.Tick(A=1)
+    data = data.join_with_query(lambda: otp.Tick(B=2))
+    data = data.join_with_query(lambda: otp.Tick(C=3))
+    data = data.join_with_query(lambda: otp.Tick(D=3), symbol='AAPL')
+    queries = get_queries(data.to_otq().split('::')[0])
+    assert len(queries) == 4
+    res = otp.run(data)
+    assert res['B'][0] == 2
+    assert res['C'][0] == 3
+    assert res['D'][0] == 3
+
+
+def test_nested_levels(session):
+    def inner():
+        data = otp.Tick(B=2)
+        return data.join_with_query(lambda: otp.Tick(C=3))
+
+    sources = []
+    for i in range(3):
+        data = otp.Tick(A=i)
+        sources.append(data.join_with_query(inner))
+    data = otp.merge(sources)
+    queries = get_queries(data.to_otq().split('::')[0])
+    assert len(queries) == 3
+    res = otp.run(data)
+    assert list(res['C']) == [3] * 3
+
+
+def test_explicit_names(session):
+    tmp_otq = otp.core._source.tmp_otq.TmpOtq()
+    assert otp.Tick(A=1)._store_in_tmp_otq(tmp_otq, name='first') == 'first'
+    assert otp.Tick(A=1)._store_in_tmp_otq(tmp_otq, name='second') == 'second'
+    name = otp.Tick(A=1)._store_in_tmp_otq(tmp_otq)
+    assert name not in ('first', 'second')
+    assert otp.Tick(A=1)._store_in_tmp_otq(tmp_otq) == name
+    assert otp.Tick(A=2)._store_in_tmp_otq(tmp_otq) != name
+    assert otp.Tick(A=1)._store_in_tmp_otq(tmp_otq, symbols='MSFT') != name
+    assert len(tmp_otq.queries) == 5
+
+
+def test_names_by_content_limit(session, monkeypatch):
+    TmpOtq = otp.core._source.tmp_otq.TmpOtq
+    monkeypatch.setattr(TmpOtq, 'names_by_content', type(TmpOtq.names_by_content)())
+    monkeypatch.setattr(TmpOtq, 'names_by_content_max_size', 2)
+    tmp_otq = TmpOtq()
+    first = otp.Tick(A=1)._store_in_tmp_otq(tmp_otq)
+    second = otp.Tick(A=2)._store_in_tmp_otq(tmp_otq)
+    assert otp.Tick(A=1)._store_in_tmp_otq(tmp_otq) == first
+    otp.Tick(A=3)._store_in_tmp_otq(tmp_otq)
+    assert len(TmpOtq.names_by_content) == 2
+    # the least recently used query is forgotten
+    assert otp.Tick(A=1)._store_in_tmp_otq(tmp_otq) == first
+    assert otp.Tick(A=2)._store_in_tmp_otq(tmp_otq) != second
+
+
+def test_names_by_content_threads(session, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    TmpOtq = otp.core._source.tmp_otq.TmpOtq
+    monkeypatch.setattr(TmpOtq, 'names_by_content', type(TmpOtq.names_by_content)())
+    monkeypatch.setattr(TmpOtq, 'names_by_content_max_size', 3)
+
+    def store(i):
+        return otp.Tick(A=i % 5)._store_in_tmp_otq(TmpOtq())
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        names = list(executor.map(store, range(200)))
+    assert len(names) == 200
+    assert len(TmpOtq.names_by_content) <= 3
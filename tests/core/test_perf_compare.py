@@ -0,0 +1,155 @@
+import argparse
+
+import numpy as np
+import pytest
+
+import onetick.py as otp
+from onetick.py.cli import perf_diff
+from onetick.py.utils.perf import _OrdinarySummaryEntry
+
+
+def write_summary(path, rows, header='Running result of query'):
+    """
+    Writes the ordinary summary in the format of measure_perf.exe,
+    rows are tuples (EP_name, tag, running_time, allocated_memory, processed_tick_events).
+    """
+    names = _OrdinarySummaryEntry.field_names()
+    lines = [header, '', ','.join(names)]
+    for i, (ep_name, tag, running_time, memory, ticks) in enumerate(rows):
+        values = dict.fromkeys(names, 0)
+        values.update(index=i, EP_name=ep_name, tag=tag, running_time=running_time,
+                      allocated_memory=memory, processed_tick_events=ticks)
+        lines.append(','.join(str(values[name]) for name in names))
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+@pytest.fixture
+def summaries(tmp_path):
+    old = write_summary(tmp_path / 'old.summary', [
+        ('PASSTHROUGH', 0, 100, 0, 10),
+        ('TICK_GENERATOR', 1, 5000, 2 << 20, 5000),
+        ('GROUP_BY', 2, 3000, 4 << 20, 5000),
+        ('ADD_FIELD', 3, 500, 0, 10),
+    ])
+    new = write_summary(tmp_path / 'new.summary', [
+        ('PASSTHROUGH', 0, 200, 0, 10),
+        ('TICK_GENERATOR', 1, 5100, 2 << 20, 5000),
+        ('GROUP_BY', 2, 3000, 16 << 20, 5000),
+        ('UPDATE_FIELD', 4, 2000, 0, 10),
+    ])
+    return old, new
+
+
+def test_compare(summaries):
+    diff = otp.perf.compare(*summaries)
+    df = diff.dataframe
+    assert list(df['EP_name']) == ['PASSTHROUGH', 'TICK_GENERATOR', 'GROUP_BY', 'ADD_FIELD', 'UPDATE_FIELD']
+    assert list(df['status']) == ['matched', 'matched', 'matched', 'removed', 'added']
+
+    passthrough = df.iloc[0]
+    assert passthrough['running_time_delta'] == 100
+    assert passthrough['running_time_change'] == 1.0
+    # the running time doubled, but it is less than min_time
+    assert not passthrough['regression']
+
+    assert not df.iloc[1]['regression']
+    assert df.iloc[2]['allocated_memory_change'] == 3.0
+    assert df.iloc[2]['regression']
+    assert df.iloc[3]['running_time_change'] == -1.0
+    assert not df.iloc[3]['regression']
+    assert df.iloc[4]['running_time_change'] == np.inf
+    assert df.iloc[4]['regression']
+
+    assert list(diff.regressions['EP_name']) == ['UPDATE_FIELD', 'GROUP_BY']
+    assert 'GROUP_BY' in str(diff)
+
+    diff = otp.perf.compare(*summaries, threshold=0.01, min_time=100)
+    assert set(diff.regressions['EP_name']) == {'PASSTHROUGH', 'TICK_GENERATOR', 'GROUP_BY', 'UPDATE_FIELD'}
+
+
+def test_compare_objects(summaries):
+    old, new = (otp.perf.PerformanceSummaryFile(path) for path in summaries)
+    diff = otp.perf.compare(old, new)
+    assert len(diff.dataframe) == 5
+
+    with pytest.raises(ValueError, match="Parameter 'by'"):
+        otp.perf.compare(old, new, by='wrong')
+    with pytest.raises(ValueError, match='stack info: it is not available'):
+        otp.perf.compare(old, new, by='stack_info')
+
+
+def test_compare_by_stack_info(summaries):
+    old, new = (otp.perf.PerformanceSummaryFile(path) for path in summaries)
+    for summary, tracebacks in ((old, ['a', 'b', 'c', 'd']), (new, ['a', 'b', 'c', 'e'])):
+        for entry, traceback in zip(summary.ordinary_summary, tracebacks):
+            entry['traceback'] = traceback
+            # tags are different for the changed query
+            entry['tag'] += 10 if summary is new else 0
+
+    df = otp.perf.compare(old, new, by='stack_info').dataframe
+    assert list(df['status']) == ['matched', 'matched', 'matched', 'removed', 'added']
+    assert list(df['tag_a'].fillna(-1)) == [0, 1, 2, 3, -1]
+    assert list(df['tag_b'].fillna(-1)) == [10, 11, 12, -1, 14]
+
+
+def test_hotspots(tmp_path, summaries):
+    (tmp_path / 'not_summary.bin').write_bytes(b'\xff\xfe\x00')
+    with pytest.warns(UserWarning, match="Can't read performance summary"):
+        df = otp.perf.hotspots(tmp_path)
+    assert list(df['EP_name']) == ['TICK_GENERATOR', 'GROUP_BY', 'UPDATE_FIELD', 'ADD_FIELD', 'PASSTHROUGH']
+    group_by = df.iloc[1]
+    assert group_by['running_time'] == 6000
+    assert group_by['allocated_memory'] == 20 << 20
+    assert group_by['count'] == 2
+    assert group_by['files'] == 2
+    assert group_by['max_running_time'] == 3000
+    assert df['time_share'].sum() == pytest.approx(1.0)
+
+    df = otp.perf.hotspots(tmp_path, pattern='*.summary', group_by='file')
+    assert list(df['file']) == [str(summaries[1]), str(summaries[0])]
+    assert list(df['running_time']) == [10300, 8600]
+
+    df = otp.perf.hotspots(list(summaries), group_by='ep')
+    assert len(df) == 8
+    assert list(df.columns[:3]) == ['file', 'tag', 'EP_name']
+
+    assert otp.perf.hotspots([]).empty
+    with pytest.raises(ValueError, match="Parameter 'group_by'"):
+        otp.perf.hotspots(tmp_path, group_by='wrong')
+
+
+def parse_args(*args):
+    parser = argparse.ArgumentParser()
+    perf_diff.parser_impl(parser)
+    return parser.parse_args(args)
+
+
+def test_cli(summaries, capsys):
+    old, new = map(str, summaries)
+    perf_diff.run(parse_args(old, new))
+    output = capsys.readouterr().out
+    assert 'Found 2 regression(s) in 5 EP(s)' in output
+    assert 'GROUP_BY' in output
+    assert 'TICK_GENERATOR' not in output
+
+    perf_diff.run(parse_args(old, new, '--all'))
+    assert 'TICK_GENERATOR' in capsys.readouterr().out
+
+    with pytest.raises(SystemExit) as exc:
+        perf_diff.run(parse_args(old, new, '--fail-on-regression'))
+    assert exc.value.code == 1
+    capsys.readouterr()
+
+    perf_diff.run(parse_args(old, new, '--fail-on-regression', '--threshold', '10', '--min-time', '5000'))
+    assert 'Found 0 regression(s)' in capsys.readouterr().out
+
+    with pytest.raises(SystemExit) as exc:
+        perf_diff.run(parse_args(old))
+    assert exc.value.code == 2
+    assert 'exactly two summary files' in capsys.readouterr().err
+
+    perf_diff.run(parse_args(old, new, '--hotspots', '--top', '2'))
+    output = capsys.readouterr().out.splitlines()
+    assert len(output) == 3
+    assert output[1].split()[0] == 'TICK_GENERATOR'
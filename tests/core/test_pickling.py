@@ -0,0 +1,154 @@
+import copy
+import pickle
+import re
+import subprocess
+import sys
+
+import pytest
+
+import onetick.py as otp
+from onetick.py.core._internal import _serialization
+from onetick.py.core._source.tmp_otq import TmpOtq
+
+
+def query_text(src):
+    path = src.to_otq().split('::')[0]
+    with open(path) as f:
+        text = f.read()
+    # identifiers of the nodes are different each time the query is built
+    ids = {}
+    return re.sub(r'\bNODE_\d+', lambda m: ids.setdefault(m.group(0), f'NODE_{len(ids)}'), text)
+
+
+def round_trip(src):
+    return pickle.loads(pickle.dumps(src))
+
+
+def test_chain(session):
+    data = otp.Ticks(A=[1, 2, 3])
+    data['B'] = data['A'] * 2
+    data['S'] = otp.string[10]('x')
+    data = data.where(data['A'] > 1)
+    data = data.sort('B')
+
+    restored = round_trip(data)
+    assert restored is not data
+    assert restored.schema == data.schema
+    assert restored.schema['S'] is otp.string[10]
+    assert query_text(restored) == query_text(data)
+    assert restored.node().key() == data.node().key()
+
+    # the restored source is independent from the original one
+    restored['C'] = 1
+    assert 'C' not in data.schema
+
+
+def test_merge_shared_branches(session):
+    data = otp.Ticks(A=[1, 2])
+    left = data.copy()
+    left['B'] = 1
+    right = data.copy()
+    right['C'] = 2
+    merged = otp.merge([left, right])
+    joined = otp.join(merged, data, on='all')
+
+    restored = round_trip(joined)
+    assert query_text(restored) == query_text(joined)
+
+    # EPs referenced by several rules are stored once
+    encoder = _serialization.Encoder()
+    joined._encode(encoder)
+    eps, keys, rules, _ = encoder.tables()
+    ep_references = [
+        value
+        for code, *values in rules
+        for field, value in zip(_serialization._RULE_FIELDS[_serialization._RULE_CLASSES[code]], values)
+        if field.endswith('ep')
+    ]
+    assert len(eps) == len(set(ep_references)) < len(ep_references)
+    assert len(keys) < len(rules)
+
+
+def test_state_vars(session):
+    data = otp.Ticks(A=[1, 2])
+    data.state_vars['X'] = 1
+    data.state_vars['L'] = otp.state.tick_list()
+    data['B'] = data.state_vars['X']
+
+    restored = round_trip(data)
+    assert restored.state_vars.names == ('X', 'L')
+    assert restored.state_vars['X'].obj_ref is restored.state_vars
+    assert query_text(restored) == query_text(data)
+
+
+def test_tmp_queries(session):
+    data = otp.merge([otp.Tick(A=1)], symbols=otp.eval(otp.Tick(SYMBOL_NAME='X')))
+    assert data._tmp_otq.queries
+
+    restored = round_trip(data)
+    names = dict(zip(data._tmp_otq.queries, restored._tmp_otq.queries))
+    assert len(names) == len(restored._tmp_otq.queries)
+    # the restored queries get the new names with the same suffixes
+    for name, new_name in names.items():
+        assert new_name != name
+        assert new_name[6:] == name[6:]
+    text = query_text(data)
+    for name, new_name in names.items():
+        text = text.replace(name, new_name)
+    assert query_text(restored) == text
+
+
+def test_tmp_query_names():
+    renames = TmpOtq.restored_names(['aaaaaa__eval', 'explicit_name'])
+    assert renames['aaaaaa__eval'].endswith('__eval')
+    assert renames['aaaaaa__eval'] != 'aaaaaa__eval'
+    assert renames['explicit_name'] == 'explicit_name'
+
+
+def test_tmp_queries_from_another_process(session, tmp_path, monkeypatch):
+    pickled = tmp_path / 'source.pickle'
+    code = '\n'.join([
+        'import pickle',
+        'import onetick.py as otp',
+        'data = otp.Tick(A=1).join_with_query(lambda: otp.Tick(B=2))',
+        f'with open({str(pickled)!r}, "wb") as f:',
+        '    pickle.dump(data, f)',
+    ])
+    subprocess.run([sys.executable, '-c', code], check=True)
+    # the names are generated in this process from the start too, like in the other process
+    monkeypatch.setattr(TmpOtq, 'name_generator', type(TmpOtq.name_generator)())
+    local = otp.Tick(A=1).join_with_query(lambda: otp.Tick(C=3))
+    with open(pickled, 'rb') as f:
+        restored = pickle.load(f)
+
+    assert not restored._tmp_otq.queries.keys() & local._tmp_otq.queries.keys()
+    data = otp.merge([restored, local])
+    assert len(data._tmp_otq.queries) == 2
+    text = query_text(data)
+    for name in data._tmp_otq.queries:
+        assert f'THIS::{name}' in text
+    assert 'long B=2' in text
+    assert 'long C=3' in text
+
+
+def test_data_source(session):
+    data = otp.DataSource('SOME_DB', tick_type='TRD', symbols='A', schema_policy='manual', schema={'PRICE': float})
+    restored = round_trip(data)
+    assert restored.schema == data.schema
+    assert query_text(restored) == query_text(data)
+
+
+def test_copy(session):
+    data = otp.Ticks(A=[1, 2])
+    data['B'] = 1
+    for copied in (copy.copy(data), copy.deepcopy(data)):
+        assert copied is not data
+        assert query_text(copied) == query_text(data)
+
+
+def test_version(session):
+    data = otp.Tick(A=1)
+    func, args = data.__reduce__()
+    cls, version, tables, state = args
+    with pytest.raises(ValueError, match='format version'):
+        func(cls, version + 1, tables, state)
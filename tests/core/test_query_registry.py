@@ -0,0 +1,178 @@
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import onetick.py as otp
+from onetick.py.otq import otq
+from onetick.py.query_registry import QueryRegistry, _KeepAliveRequests, query_registry
+
+
+pytestmark = pytest.mark.skipif(not otq.webapi, reason='Query registration is used only in WebAPI mode')
+
+
+def _otq_text(node_id, query_name, value=1):
+    return '\n'.join([
+        f'[{query_name}_nested]',
+        f'NODE_{node_id}=TICK_GENERATOR(BUCKET_INTERVAL=0,FIELDS="long A={value}")',
+        f'ROOT_SOURCE = NODE_{node_id}',
+        'TYPE = GRAPH',
+        f'[{query_name}]',
+        f'NODE_{node_id + 1}=JOIN_WITH_QUERY(OTQ_QUERY="THIS::{query_name}_nested")',
+        f'ROOT_SOURCE = NODE_{node_id + 1}',
+        'TYPE = GRAPH',
+        '[_meta]',
+        'file_version = 1.0',
+        '',
+    ])
+
+
+@pytest.fixture
+def write_otq(tmp_path):
+    counter = iter(range(1000))
+
+    def write(text):
+        path = tmp_path / f'query_{next(counter)}.otq'
+        path.write_text(text)
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def webapi_memory():
+    return sys.modules['onetick.query_webapi._internal_utils'].cached_memory_files
+
+
+class TestQueryRegistry:
+    def test_same_content(self, write_otq, webapi_memory):
+        registry = QueryRegistry()
+        path_1, name_1 = registry.register(write_otq(_otq_text(10, 'query')), 'query')
+        path_2, name_2 = registry.register(write_otq(_otq_text(25, 'other')), 'other')
+        assert path_1 == path_2
+        # the query names of the first registered file are used
+        assert name_1 == name_2 == 'query'
+        assert len(registry) == 1
+        assert registry.hits == 1
+        # the original text is uploaded
+        content, _ = webapi_memory[path_1]
+        assert content == _otq_text(10, 'query')
+        registry.clear()
+        assert path_1 not in webapi_memory
+
+    def test_different_content(self, write_otq):
+        registry = QueryRegistry()
+        path_1, _ = registry.register(write_otq(_otq_text(10, 'query', value=1)), 'query')
+        path_2, _ = registry.register(write_otq(_otq_text(10, 'query', value=2)), 'query')
+        assert path_1 != path_2
+        assert len(registry) == 2
+        assert registry.hits == 0
+        registry.clear()
+
+    def test_modification_time_is_stable(self, write_otq, webapi_memory):
+        registry = QueryRegistry()
+        path, _ = registry.register(write_otq(_otq_text(10, 'query')), 'query')
+        _, modification_time = webapi_memory[path]
+        # the content is put back in memory even if it was removed
+        del webapi_memory[path]
+        registry.register(write_otq(_otq_text(10, 'query')), 'query')
+        assert webapi_memory[path][1] == modification_time
+        registry.clear()
+
+    def test_max_size(self, write_otq, webapi_memory):
+        registry = QueryRegistry(max_size=2)
+        path_1, _ = registry.register(write_otq(_otq_text(10, 'query', value=1)), 'query')
+        path_2, _ = registry.register(write_otq(_otq_text(10, 'query', value=2)), 'query')
+        registry.register(write_otq(_otq_text(10, 'query', value=1)), 'query')
+        path_3, _ = registry.register(write_otq(_otq_text(10, 'query', value=3)), 'query')
+        assert len(registry) == 2
+        # the least recently used file is forgotten and removed from memory
+        assert path_2 not in webapi_memory
+        assert path_1 in webapi_memory
+        assert path_3 in webapi_memory
+        registry.clear()
+
+    @pytest.mark.parametrize('text,query_name', [
+        (_otq_text(10, 'query').replace('THIS::', '/tmp/other.otq::'), 'query'),
+        (_otq_text(10, 'query'), 'unknown'),
+    ])
+    def test_not_registered(self, write_otq, text, query_name):
+        registry = QueryRegistry()
+        path = write_otq(text)
+        assert registry.register(path, query_name) == (path, query_name)
+        assert registry.register('not_existing.otq', query_name) == ('not_existing.otq', query_name)
+        assert len(registry) == 0
+
+
+def test_not_supported(monkeypatch, write_otq):
+    # private internals of onetick.query_webapi are missing in the installed version
+    monkeypatch.delattr(sys.modules['onetick.query_webapi._internal_utils'], 'save_in_memory')
+    registry = QueryRegistry()
+    path = write_otq(_otq_text(10, 'query'))
+    assert registry.register(path, 'query') == (path, 'query')
+    assert len(registry) == 0
+    registry.clear()
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_run_registered_query(monkeypatch, write_otq, enabled):
+    otq_module = sys.modules['onetick.py.otq']
+    calls = []
+    monkeypatch.setattr(otq_module, '__original_run', lambda *args, **kwargs: calls.append(kwargs))
+    monkeypatch.setattr(otp.config, 'http_address', 'http://localhost:1')
+
+    paths = [write_otq(_otq_text(10, 'query')), write_otq(_otq_text(20, 'query'))]
+    with otp.config.override(webapi_register_queries=enabled):
+        for path in paths:
+            otq.run(query=f'{path}::query')
+    query_registry.clear()
+
+    sent = [(kwargs['query'], kwargs['query_name']) for kwargs in calls]
+    if enabled:
+        assert sent[0] == sent[1]
+        assert sent[0][0] not in paths
+        assert sent[0][1] == 'query'
+    else:
+        assert sent == [(path, 'query') for path in paths]
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CountingHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('keep_alive,expected_connections', [(True, 1), (False, 3)])
+def test_keep_alive(http_server, keep_alive, expected_connections):
+    import requests
+
+    url = f'http://127.0.0.1:{http_server.server_address[1]}'
+    keep_alive_requests = _KeepAliveRequests(requests)
+    with otp.config.override(webapi_keep_alive=keep_alive):
+        for _ in range(3):
+            response = keep_alive_requests.post(url, data='{}', cookies={'session': 'x'})
+            assert response.content == b'ok'
+    assert len(http_server.connections) == expected_connections
+    # other attributes are taken from the original module
+    assert keep_alive_requests.Session is requests.Session
@@ -0,0 +1,153 @@
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def data():
+    data = otp.Tick(A=1, bucket_interval=24 * 60 * 60)
+    data['A'] = data['TIMESTAMP'].dt.day_of_month()
+    data['S'] = data['_SYMBOL_NAME']
+    return data
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return otp.ResultCache(tmp_path / 'cache')
+
+
+def _server_calls(spy):
+    # otp.run is called recursively by the cache, only count the calls that go to the server
+    return [call for call in spy.call_args_list if 'result_cache' not in call.kwargs]
+
+
+def test_partial_range_reuse(session, data, cache, mocker):
+    spy = mocker.spy(otp, 'run')
+    res = otp.run(data, symbols=['A', 'B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4), result_cache=cache)
+    assert list(res['A']['A']) == [1, 2, 3]
+    assert list(res['B']['S']) == ['B', 'B', 'B']
+    assert len(_server_calls(spy)) == 1
+
+    spy.reset_mock()
+    res = otp.run(data, symbols=['A', 'B'], start=otp.dt(2003, 12, 2), end=otp.dt(2003, 12, 6), result_cache=cache)
+    assert list(res['A']['A']) == [2, 3, 4, 5]
+    assert list(res['A']['Time']) == [pd.Timestamp(2003, 12, day) for day in (2, 3, 4, 5)]
+    server_calls = _server_calls(spy)
+    assert len(server_calls) == 1
+    assert server_calls[0].kwargs['start'] == pd.Timestamp(2003, 12, 4)
+    assert server_calls[0].kwargs['end'] == pd.Timestamp(2003, 12, 6)
+
+    spy.reset_mock()
+    res = otp.run(data, symbols='A', start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 6), result_cache=cache)
+    assert isinstance(res, pd.DataFrame)
+    assert list(res['A']) == [1, 2, 3, 4, 5]
+    assert not _server_calls(spy)
+
+
+def test_partial_days_not_cached(session, data, cache, mocker):
+    spy = mocker.spy(otp, 'run')
+    for _ in range(2):
+        res = otp.run(data, symbols=['A'], start=otp.dt(2003, 12, 1, 12), end=otp.dt(2003, 12, 3, 12),
+                      result_cache=cache)
+        assert list(res['A']) == [2, 3]
+    # the first and the last partial days are requested each time
+    server_calls = _server_calls(spy)
+    assert len(server_calls) == 3
+    assert server_calls[-1].kwargs['start'] == pd.Timestamp(2003, 12, 1, 12)
+    assert server_calls[-1].kwargs['end'] == pd.Timestamp(2003, 12, 2)
+
+
+def test_open_day_not_cached(session, cache):
+    today = pd.Timestamp.now(tz=otp.config.tz).tz_localize(None).normalize()
+    data = otp.Tick(A=1)
+    otp.run(data, symbols=['A'], start=today - pd.Timedelta(days=1), end=today + pd.Timedelta(days=1),
+            result_cache=cache)
+    files = list(cache._files())
+    assert len(files) == 1
+    assert files[0][0].name == f'{(today - pd.Timedelta(days=1)).strftime("%Y%m%d")}.parquet'
+
+
+def test_empty_results(session, cache):
+    data = otp.Empty(schema={'X': int})
+    for _ in range(2):
+        res = otp.run(data, symbols=['A', 'B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 3),
+                      result_cache=cache)
+        assert set(res) == {'A', 'B'}
+        assert res['A'].empty
+        assert 'X' in res['A']
+
+
+def test_different_queries_and_params(session, data, cache):
+    other_data = data.copy()
+    other_data['A'] = other_data['A'] * 10
+    kwargs = dict(symbols=['A'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 2), result_cache=cache)
+    assert list(otp.run(data, **kwargs)['A']) == [1]
+    assert list(otp.run(other_data, **kwargs)['A']) == [10]
+    res = otp.run(data, timezone='GMT', **kwargs)
+    assert list(res['Time']) == [pd.Timestamp(2003, 12, 1)]
+    assert len(list(cache._files())) == 3
+
+
+def test_invalidate(session, data, cache, mocker):
+    otp.run(data, symbols=['A', 'B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4), result_cache=cache)
+    assert len(list(cache._files())) == 6
+    assert cache.invalidate(data, symbols='A', start=otp.dt(2003, 12, 2)) == 2
+    assert cache.invalidate(otp.Tick(X=1)) == 0
+
+    spy = mocker.spy(otp, 'run')
+    otp.run(data, symbols=['A', 'B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 4), result_cache=cache)
+    server_calls = _server_calls(spy)
+    assert len(server_calls) == 1
+    assert server_calls[0].kwargs['symbols'] == ['A']
+    assert server_calls[0].kwargs['start'] == pd.Timestamp(2003, 12, 2)
+
+    assert cache.clear() == 6
+    assert cache.size == 0
+
+
+def test_lru_eviction(session, data, tmp_path):
+    cache = otp.ResultCache(tmp_path / 'cache', max_size=1)
+    otp.run(data, symbols=['A'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 3), result_cache=cache)
+    assert cache.size == 0
+
+    cache = otp.ResultCache(tmp_path / 'cache')
+    otp.run(data, symbols=['A'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 3), result_cache=cache)
+    files = {file.name: size for file, _, size in cache._files()}
+    # reading the partition for the first day makes the second one least recently used
+    otp.run(data, symbols=['A'], date=otp.dt(2003, 12, 1), result_cache=cache)
+    cache.max_size = files['20031201.parquet']
+    cache._evict()
+    assert [file.name for file, _, _ in cache._files()] == ['20031201.parquet']
+
+
+def test_arrow_format(session, data, tmp_path):
+    cache = otp.ResultCache(tmp_path / 'cache', file_format='arrow')
+    for _ in range(2):
+        res = otp.run(data, symbols=['A'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 3), result_cache=cache)
+        assert list(res['A']) == [1, 2]
+    assert {file.suffix for file, _, _ in cache._files()} == {'.arrow'}
+
+
+def test_unsupported(session, data, cache):
+    with pytest.raises(ValueError, match='output_structure'):
+        otp.run(data, output_structure='list', result_cache=cache)
+    with pytest.raises(ValueError, match='start_time_expression'):
+        otp.run(data, start_time_expression='20031201000000', result_cache=cache)
+    with pytest.raises(ValueError, match='symbol names'):
+        otp.run(data, symbols=otp.Ticks(SYMBOL_NAME=['A']), result_cache=cache)
+    with pytest.raises(ValueError, match='file_format'):
+        otp.ResultCache(cache.path, file_format='csv')
+
+
+def test_bound_interval(session, data):
+    bound = otp.Ticks(A=[1], start=otp.dt(2003, 12, 2), end=otp.dt(2003, 12, 3))
+    run_params = {}
+    assert otp.ResultCache._get_interval(bound, run_params, 'GMT') == (pd.Timestamp(2003, 12, 2),
+                                                                      pd.Timestamp(2003, 12, 3))
+    assert otp.ResultCache._get_interval(data, {'date': otp.dt(2003, 12, 5)}, 'GMT') == (pd.Timestamp(2003, 12, 5),
+                                                                                       pd.Timestamp(2003, 12, 6))
+    with pytest.raises(ValueError, match='must be less than end time'):
+        otp.ResultCache._get_interval(data, {'start': otp.dt(2003, 12, 2), 'end': otp.dt(2003, 12, 1)}, 'GMT')
@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+
+pytest.importorskip('pyarrow')
+import pyarrow.dataset as ds  # noqa: E402
+
+
+@pytest.fixture
+def data():
+    data = otp.Tick(A=1, bucket_interval=12 * 60 * 60)
+    data['S'] = data['_SYMBOL_NAME']
+    return data
+
+
+def _read(path, file_format='parquet'):
+    import pyarrow
+
+    dataset = ds.dataset(path, format=file_format, partitioning='hive')
+    # files may have different schemas
+    schema = pyarrow.unify_schemas([fragment.physical_schema for fragment in dataset.get_fragments()]
+                                   + [dataset.partitioning.schema])
+    table = ds.dataset(path, schema=schema, format=file_format, partitioning='hive').to_table()
+    return table.to_pandas().sort_values(['SYMBOL', 'Time']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_run(session, data, tmp_path, file_format):
+    func = otp.run_to_parquet if file_format == 'parquet' else otp.run_to_arrow_dataset
+    files = func(data, tmp_path, symbols=['A', 'B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 3))
+    assert len(files) == 4
+    assert all(file.exists() for file in files)
+    assert {file.parent.name for file in files} == {'DATE=20031201', 'DATE=20031202'}
+    assert {file.parent.parent.name for file in files} == {'SYMBOL=A', 'SYMBOL=B'}
+    df = _read(tmp_path, file_format)
+    assert list(df['S']) == ['A'] * 4 + ['B'] * 4
+    assert list(df['Time'][:4]) == [pd.Timestamp(2003, 12, 1), pd.Timestamp(2003, 12, 1, 12),
+                                    pd.Timestamp(2003, 12, 2), pd.Timestamp(2003, 12, 2, 12)]
+
+
+def test_same_path_appended(session, data, tmp_path):
+    otp.run_to_parquet(data, tmp_path, symbols=['A'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 2))
+    otp.run_to_parquet(data, tmp_path, symbols=['B'], start=otp.dt(2003, 12, 1), end=otp.dt(2003, 12, 2))
+    df = _read(tmp_path)
+    assert list(df['S']) == ['A', 'A', 'B', 'B']
+
+
+def test_unsupported_parameters(tmp_path):
+    with pytest.raises(ValueError, match='callback'):
+        otp.run_to_parquet(otp.Tick(A=1), tmp_path, callback=otp.CallbackBase())
+    with pytest.raises(ValueError, match='file_format'):
+        otp.ResultWriterCallback(tmp_path, file_format='csv')
+
+
+class TestCallback:
+
+    def _feed(self, callback, symbol, descriptor, ticks):
+        callback = callback.replicate()
+        callback.process_symbol_name(symbol)
+        callback.process_tick_descriptor(descriptor)
+        for time, tick in ticks:
+            callback.process_tick(tick, time)
+        callback.done()
+
+    def test_row_groups(self, tmp_path):
+        import pyarrow.parquet as pq
+
+        callback = otp.ResultWriterCallback(tmp_path, row_group_size=2, timezone='GMT')
+        ticks = [(datetime(2003, 12, 1, i), {'X': i}) for i in range(5)]
+        self._feed(callback, 'A', [('X', {'type': 'int'})], ticks)
+        assert len(callback.files) == 1
+        metadata = pq.ParquetFile(callback.files[0]).metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [2, 2, 1]
+        assert list(_read(tmp_path)['X']) == [0, 1, 2, 3, 4]
+
+    def test_timezone(self, tmp_path):
+        callback = otp.ResultWriterCallback(tmp_path, timezone='EST5EDT')
+        # 2003-12-02 03:00 GMT is 2003-12-01 22:00 EST
+        ticks = [(datetime(2003, 12, 2, 3), {'T': datetime(2003, 12, 2, 3)})]
+        self._feed(callback, 'A', [('T', {'type': 'datetime'})], ticks)
+        assert callback.files[0].parent.name == 'DATE=20031201'
+        df = _read(tmp_path)
+        assert df['Time'][0] == pd.Timestamp(2003, 12, 1, 22)
+        assert df['T'][0] == pd.Timestamp(2003, 12, 1, 22)
+
+    def test_schema_evolution(self, tmp_path):
+        callback = otp.ResultWriterCallback(tmp_path, timezone='GMT').replicate()
+        callback.process_symbol_name('A')
+        callback.process_tick_descriptor([('X', {'type': 'int'})])
+        callback.process_tick({'X': 1}, datetime(2003, 12, 1))
+        callback.process_tick_descriptor([('X', {'type': 'int'}), ('Y', {'type': 'string'})])
+        callback.process_tick({'X': 2, 'Y': 'b'}, datetime(2003, 12, 1, 1))
+        callback.done()
+        # each file has its own schema
+        assert len(callback.files) == 2
+        assert len({file.parent for file in callback.files}) == 1
+        df = _read(tmp_path)
+        assert list(df['X']) == [1, 2]
+        assert df['Y'].isna()[0]
+        assert df['Y'][1] == 'b'
+
+    def test_symbol_quoted(self, tmp_path):
+        callback = otp.ResultWriterCallback(tmp_path, timezone='GMT')
+        self._feed(callback, 'DB::A/B', [('X', {'type': 'float'})], [(datetime(2003, 12, 1), {'X': 1.5})])
+        assert callback.files[0].parent.parent.name == 'SYMBOL=DB%3A%3AA%2FB'
+        assert not list(tmp_path.rglob('*.tmp'))
+
+    def test_failed_query(self, tmp_path, mocker):
+        def run(query, callback, **kwargs):
+            callback = callback.replicate()
+            callback.process_symbol_name('A')
+            callback.process_tick_descriptor([('X', {'type': 'int'})])
+            callback.process_tick({'X': 1}, datetime(2003, 12, 1))
+            callback.process_tick({'X': 2}, datetime(2003, 12, 2))
+            raise ValueError('query failed')
+
+        mocker.patch.object(otp, 'run', side_effect=run)
+        with pytest.raises(ValueError, match='query failed'):
+            otp.run_to_parquet(otp.Tick(X=1), tmp_path, row_group_size=1, timezone='GMT')
+        # the file of the finished day is kept, the incomplete one is removed
+        assert len(list(tmp_path.rglob('*.parquet'))) == 1
+        assert not list(tmp_path.rglob('*.tmp'))
@@ -0,0 +1,105 @@
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+
+import onetick.py as otp
+from onetick.py.otq import otq
+
+# otp.run function shadows the module of the same name
+run_module = sys.modules['onetick.py.run']
+
+
+class FakeCancellationHandle:
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel_query(self):
+        self.cancelled.set()
+
+
+@pytest.fixture
+def handles(monkeypatch):
+    created = []
+
+    def create():
+        handle = FakeCancellationHandle()
+        created.append(handle)
+        return handle
+
+    monkeypatch.setattr(otq, 'QueryCancellationHandle', create, raising=False)
+    return created
+
+
+@pytest.fixture
+def blocking_run(monkeypatch):
+    # imitates the query running on the server until it's cancelled
+    def run(query, cancellation_handle=None, **kwargs):
+        if not cancellation_handle.cancelled.wait(timeout=10):
+            raise AssertionError('Query was not cancelled')
+        raise Exception('Query is cancelled')
+
+    monkeypatch.setattr(run_module, 'run', run)
+
+
+def test_run_async(session):
+    data = otp.Ticks(A=[1, 2, 3])
+    df = asyncio.run(otp.run_async(data))
+    assert list(df['A']) == [1, 2, 3]
+
+
+def test_timeout(handles, blocking_run):
+    start_time = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(otp.run_async(otp.Tick(A=1), timeout=0.1))
+    assert time.monotonic() - start_time < 5
+    assert len(handles) == 1
+    assert handles[0].cancelled.is_set()
+
+
+def test_cancel(handles, blocking_run):
+    async def main():
+        task = asyncio.create_task(otp.run_async(otp.Tick(A=1)))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert handles[0].cancelled.wait(timeout=5)
+
+
+def test_user_cancellation_handle(handles, blocking_run):
+    handle = FakeCancellationHandle()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(otp.run_async(otp.Tick(A=1), timeout=0.1, cancellation_handle=handle))
+    assert not handles
+    assert handle.cancelled.is_set()
+
+
+@pytest.mark.parametrize('use_config', [True, False])
+def test_semaphore(monkeypatch, use_config):
+    lock = threading.Lock()
+    running = []
+    max_running = []
+
+    def run(query, **kwargs):
+        with lock:
+            running.append(query)
+            max_running.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(query)
+        return query
+
+    monkeypatch.setattr(run_module, 'run', run)
+
+    async def main():
+        semaphore = None if use_config else asyncio.Semaphore(2)
+        return await asyncio.gather(*(otp.run_async(i, semaphore=semaphore) for i in range(6)))
+
+    with otp.config.override(async_queries_limit=2 if use_config else otp.config.default):
+        assert asyncio.run(main()) == list(range(6))
+    assert max(max_running) == 2
@@ -71,3 +71,28 @@ def test_update(session):
     with pytest.raises(TypeError):
         with pytest.warns(FutureWarning, match='instance of the class is deprecated'):
             t.schema.update(A=Schema())
+
+
+def test_copy_wide_schema(session):
+    schema = {f'F{i}': (int, float, str, otp.string[64], otp.msectime)[i % 5] for i in range(1000)}
+    data = otp.Empty(schema=schema)
+    copy = data.copy()
+    assert dict(copy.schema) == schema
+    assert copy['F3'].dtype is otp.string[64]
+    # columns of the copy belong to the copy
+    assert copy['F0'].obj_ref is copy
+    assert copy['F0'] is not data['F0']
+    copy['F0'] = copy['F0'] + 1
+    copy.schema['NEW'] = float
+    assert 'NEW' not in data.schema
+    assert len(data.schema) == 1000
+    assert data.schema['Time'] is otp.nsectime
+    assert 'TIMESTAMP' not in list(copy.schema)
+
+
+def test_copy_invalid_columns(session):
+    data = otp.Tick(A=1)
+    with pytest.raises(ValueError, match="Can't set meta field"):
+        data.copy(columns={'_SYMBOL_NAME': str})
+    with pytest.raises(ValueError, match='not a valid field name'):
+        data.copy(columns={'A B': str})
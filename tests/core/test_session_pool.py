@@ -0,0 +1,152 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+from onetick.py import utils
+from onetick.py.db import db as db_module
+from onetick.py.session_pool import SessionPool, _fingerprint
+
+pytest_plugins = ['onetick.py.pytest_plugin']
+
+
+@pytest.fixture
+def reloads(monkeypatch):
+    # there is no OneTick server to reload the config in
+    reloaded = []
+    monkeypatch.setattr(utils, 'reload_config', lambda db=None, config_type='LOCATOR': reloaded.append(config_type))
+    return reloaded
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    written = []
+    monkeypatch.setattr(db_module, 'write_to_db', lambda **kwargs: written.append(kwargs))
+    return written
+
+
+@pytest.fixture
+def pool(reloads):
+    pool = SessionPool()
+    yield pool
+    pool.close()
+
+
+def test_rollback(pool, reloads):
+    session = pool.session
+    assert otp.Session._instance is session
+    locator_text = Path(session.locator.path).read_text()
+    acl_text = Path(session.acl.path).read_text()
+
+    session.use(otp.DB('TEST_POOL_DB'))
+    otp.config.default_symbol = 'MSFT'
+    assert 'TEST_POOL_DB' in session.locator.databases
+    reloads.clear()
+
+    pool.rollback()
+    assert pool.session is session
+    assert 'TEST_POOL_DB' not in session.locator.databases
+    assert 'TEST_POOL_DB' not in session.acl.databases
+    assert Path(session.locator.path).read_text() == locator_text
+    assert Path(session.acl.path).read_text() == acl_text
+    assert session.locator._added_dbs == []
+    assert otp.config.default_symbol == 'AAPL'
+    assert reloads == ['ACCESS_LIST', 'LOCATOR']
+
+    # nothing changed, nothing is reloaded
+    reloads.clear()
+    pool.rollback()
+    assert reloads == []
+    assert pool.stats['sessions'] == 1
+    assert pool.stats['rollbacks'] == 2
+    assert pool.stats['reloads'] == 2
+
+
+def test_closed_session(pool):
+    session = pool.session
+    session.close()
+    pool.rollback()
+    assert pool.session is not session
+    assert otp.Session._instance is pool.session
+    assert pool.stats['sessions'] == 2
+
+    pool.close()
+    with otp.Session():
+        with pytest.raises(ValueError, match='another session is active'):
+            _ = pool.session
+
+
+def test_setup(reloads):
+    pool = SessionPool(setup=lambda session: session.use(otp.DB('COMMON_TEST_DB')))
+    try:
+        pool.session.use(otp.DB('OTHER_TEST_DB'))
+        pool.rollback()
+        assert 'COMMON_TEST_DB' in pool.session.locator.databases
+        assert 'OTHER_TEST_DB' not in pool.session.locator.databases
+    finally:
+        pool.close()
+
+
+def test_db(pool, writes):
+    data = otp.Ticks(A=[1, 2, 3])
+    db = pool.db('TEST_POOL_DB', data)
+    assert len(writes) == 1
+    assert writes[0]['dest'] == 'TEST_POOL_DB'
+    assert not db._write
+
+    # the same data is not written again
+    assert pool.db('TEST_POOL_DB', otp.Ticks(A=[1, 2, 3])) is db
+    assert len(writes) == 1
+
+    other = pool.db('TEST_POOL_DB', otp.Ticks(A=[1, 2, 4]))
+    assert other is not db
+    assert other._db_locations[0]['location'] != db._db_locations[0]['location']
+    assert pool.db('TEST_POOL_DB', {'src': data, 'symbol': 'S2'}) is not db
+    assert len(writes) == 3
+
+    # only the new data is written to the copy of the loaded database
+    extended = pool.db('TEST_POOL_DB', data, {'src': otp.Ticks(B=[1]), 'symbol': 'S2'})
+    assert len(writes) == 4
+    assert writes[-1]['symbol'] == 'S2'
+    assert extended is not db
+    assert pool.stats['db_hits'] == 1
+    assert pool.stats['db_misses'] == 4
+
+    with pytest.raises(ValueError, match='location is set by the pool'):
+        pool.db('TEST_POOL_DB', data, db_locations=[{'location': '/tmp'}])
+    with pytest.raises(ValueError, match="Parameter 'symbol'"):
+        pool.db('TEST_POOL_DB', data, symbol='S')
+
+
+def test_db_max_dbs(reloads, writes):
+    pool = SessionPool(max_dbs=1)
+    try:
+        first = pool.db('TEST_POOL_DB', otp.Ticks(A=[1]))
+        pool.db('TEST_POOL_DB', otp.Ticks(A=[2]))
+        assert pool.db('TEST_POOL_DB', otp.Ticks(A=[1])) is not first
+        assert len(writes) == 3
+    finally:
+        pool.close()
+
+
+def test_fingerprint(session):
+    def build():
+        data = otp.Ticks(A=[1, 2, 3])
+        data['B'] = data['A'] * 2
+        return data.agg({'S': otp.agg.sum('B')})
+
+    assert _fingerprint(build()) == _fingerprint(build())
+    assert _fingerprint(build()) != _fingerprint(otp.Ticks(A=[1, 2, 3]))
+
+    df = pd.DataFrame({'A': [1, 2]})
+    assert _fingerprint(df) == _fingerprint(df.copy())
+    assert _fingerprint(df) != _fingerprint(pd.DataFrame({'A': [1, 3]}))
+    assert _fingerprint({'b': 1, 'a': df}) == _fingerprint({'a': df.copy(), 'b': 1})
+
+
+def test_fixtures(reloads, warm_session, session_pool):
+    assert otp.Session._instance is warm_session
+    assert session_pool.session is warm_session
+    # the session of the pool must not stay active in the other tests
+    session_pool.close()
@@ -0,0 +1,106 @@
+import datetime
+import time
+
+import dateutil.tz
+import numpy as np
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+from onetick.py import types as ott
+from onetick.py import utils
+
+
+TIMES = [
+    pd.Timestamp('2022-01-01 00:00:00'),
+    pd.Timestamp('2022-03-27 03:30:00.123456789'),
+    pd.Timestamp('2022-10-30 02:59:59.999999999'),
+    pd.Timestamp('1970-01-01 00:00:00.000000001'),
+]
+
+
+class TestDatetime2ExprArray:
+    @pytest.mark.parametrize('values', [
+        TIMES,
+        [ts.to_pydatetime(warn=False) for ts in TIMES],
+        [otp.datetime(ts) for ts in TIMES],
+        pd.DatetimeIndex(TIMES),
+        pd.Series(TIMES),
+        pd.DatetimeIndex(TIMES).values,
+    ])
+    def test_naive(self, values):
+        # python datetime objects don't have nanoseconds, so the expected values are built from the values
+        expected = [ott.datetime2expr(pd.Timestamp(ts) if isinstance(ts, np.datetime64) else ts) for ts in values]
+        assert ott.datetime2expr_array(values) == expected
+
+    def test_dates(self):
+        values = [datetime.date(2022, 1, 1), otp.date(2022, 1, 2)]
+        assert ott.datetime2expr_array(values) == [ott.datetime2expr(value) for value in values]
+
+    @pytest.mark.parametrize('tz', ['EST5EDT', 'Europe/London', 'GMT'])
+    def test_timezone_aware(self, tz):
+        values = [ts.tz_localize(tz, ambiguous=True) for ts in TIMES]
+        result = ott.datetime2expr_array(values)
+        assert result == [ott.datetime2expr(value) for value in values]
+        assert f'"{tz}")' in result[0]
+
+    def test_tzfile(self):
+        tzinfo = dateutil.tz.gettz('Europe/Berlin')
+        values = [datetime.datetime(2022, 1, 1, tzinfo=tzinfo), datetime.datetime(2022, 7, 1, tzinfo=tzinfo)]
+        assert ott.datetime2expr_array(values) == [ott.datetime2expr(value) for value in values]
+
+    @pytest.mark.parametrize('kwargs', [
+        {'timezone': 'Asia/Tokyo'},
+        {'timezone_naive': 'Asia/Tokyo'},
+        {'timezone': otp.Operation(op_str='_TIMEZONE', dtype=str)},
+    ])
+    def test_timezone_parameters(self, kwargs):
+        assert ott.datetime2expr_array(TIMES, **kwargs) == [ott.datetime2expr(ts, **kwargs) for ts in TIMES]
+
+    def test_empty(self):
+        assert ott.datetime2expr_array([]) == []
+
+    def test_nat(self):
+        with pytest.raises(ValueError, match='NaT'):
+            ott.datetime2expr_array([TIMES[0], pd.NaT])
+
+
+@pytest.mark.parametrize('src,dest', [('GMT', 'EST5EDT'), ('Europe/London', 'Asia/Tokyo'), ('EST5EDT', 'EST5EDT')])
+def test_convert_timezone_array(src, dest):
+    values = [ts.to_pydatetime(warn=False) for ts in TIMES[:2]]
+    result = utils.convert_timezone_array(values, src, dest)
+    assert result.dtype == np.dtype('datetime64[ns]')
+    assert list(pd.DatetimeIndex(result).to_pydatetime()) == [utils.convert_timezone(v, src, dest) for v in values]
+
+
+def test_timezone_from_tzinfo():
+    assert utils.get_timezone_from_tzinfo(None) is None
+    assert utils.get_timezone_from_tzinfo(dateutil.tz.gettz('Europe/Berlin')) == 'Europe/Berlin'
+    assert utils.get_timezone_from_tzinfo(datetime.timezone.utc) == 'UTC'
+
+
+def test_datetime_from_timestamp():
+    ts = pd.Timestamp('2022-01-01 01:02:03.123456789')
+    dt = otp.datetime(ts)
+    assert dt.ts == ts
+    assert otp.datetime(dt) == dt
+    assert otp.datetime(ts, tz='EST5EDT').tzinfo is not None
+
+
+@pytest.mark.performance
+def test_datetime2expr_array_performance():
+    values = pd.date_range('2022-01-01', periods=1_000_000, freq='1ms')
+    timestamps = list(values)
+
+    start = time.perf_counter()
+    expected = [ott.datetime2expr(ts) for ts in timestamps]
+    duration_scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = ott.datetime2expr_array(values)
+    duration_vectorized = time.perf_counter() - start
+
+    assert result == expected
+    better = duration_scalar / duration_vectorized
+    print(f'Better: {better} times')
+    assert better > 3
@@ -0,0 +1,174 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import onetick.py as otp
+from onetick.py import tracing
+from onetick.py.otq import otq
+
+
+def fake_otq_run(**kwargs):
+    ticks = [
+        ('Time', np.arange(3).astype('datetime64[ns]')),
+        ('A', np.arange(3)),
+    ]
+    return [('AAPL', ticks, [], 'SOURCE_CALL_MAIN_OUT_NODE')]
+
+
+@pytest.fixture
+def collector():
+    with tracing.collect() as collector:
+        yield collector
+
+
+@pytest.fixture
+def stand_in_otq_run(monkeypatch):
+    monkeypatch.setattr(otq, 'run', fake_otq_run)
+
+
+def test_disabled():
+    assert not tracing.get_hooks()
+    span = tracing.span('test', a=1)
+    assert not span.recording
+    assert span is tracing.span('other')
+    assert tracing.current_span() is span
+    with span as s:
+        s.set_attribute('b', 2)
+
+
+def test_nested(collector):
+    with tracing.span('parent', a=1) as parent:
+        assert tracing.current_span() is parent
+        with tracing.span('child') as child:
+            child.set_attribute('rows', 10)
+        with pytest.raises(ValueError):
+            with tracing.span('failed'):
+                raise ValueError('error')
+    assert tracing.current_span() is not parent
+
+    assert [s.name for s in collector.spans] == ['parent', 'child', 'failed']
+    assert child.parent is parent
+    assert child.depth == 1
+    assert isinstance(collector.spans[2].error, ValueError)
+    assert parent.duration >= child.duration
+
+    report = collector.report()
+    assert list(report['NAME']) == ['parent', 'child', 'failed']
+    assert list(report['DEPTH']) == [0, 1, 1]
+    assert report['A'][0] == 1
+    assert report['ROWS'][1] == 10
+    assert pd.isna(report['ERROR'][0])
+    assert 'ValueError' in report['ERROR'][2]
+
+
+def test_collect_removes_hook():
+    with tracing.collect() as collector:
+        assert tracing.get_hooks() == [collector]
+    assert not tracing.get_hooks()
+    assert collector.report().empty
+
+
+def test_failing_hook(collector):
+    class FailingHook(tracing.TracingHook):
+        def on_end(self, span):
+            raise RuntimeError('hook error')
+
+    hook = FailingHook()
+    tracing.add_hook(hook)
+    try:
+        with tracing.span('test'):
+            pass
+    finally:
+        tracing.remove_hook(hook)
+    assert [s.name for s in collector.spans] == ['test']
+
+
+def test_max_spans():
+    with pytest.raises(ValueError):
+        tracing.InMemoryCollector(max_spans=0)
+    with tracing.collect() as collector:
+        collector.max_spans = 2
+        for i in range(5):
+            with tracing.span(f'span_{i}'):
+                pass
+    assert [s.name for s in collector.spans] == ['span_3', 'span_4']
+
+
+@pytest.mark.parametrize('decorator', [tracing.traced('decorated'), None])
+def test_traced(collector, decorator):
+    def func(a, b=1):
+        """Docstring."""
+        return a + b
+
+    if decorator is None:
+        # tracing is disabled
+        tracing.remove_hook(collector)
+        assert tracing.traced('decorated')(func)(1, b=2) == 3
+        assert not collector.spans
+    else:
+        decorated = decorator(func)
+        assert decorated.__doc__ == 'Docstring.'
+        assert decorated(1, b=2) == 3
+        assert [s.name for s in collector.spans] == ['decorated']
+
+
+def test_run(session, stand_in_otq_run, collector):
+    data = otp.Ticks(A=[0, 1, 2])
+    df = otp.run(data, symbols='AAPL', concurrency=1)
+    assert list(df['A']) == [0, 1, 2]
+
+    spans = {s.name: s for s in collector.spans}
+    assert list(spans) == ['otp.run', 'copy_graph', 'convert_symbols', 'to_graph', 'save_otq', 'otq.run',
+                           'process_empty_results', 'format_output']
+    run_span = spans['otp.run']
+    assert all(s.parent is run_span for s in collector.spans[1:])
+    assert run_span.attributes['rows'] == 3
+    assert run_span.attributes['bytes'] == df.memory_usage(index=True).sum()
+    assert spans['format_output'].attributes['rows'] == 3
+    assert spans['convert_symbols'].attributes['symbols'] == 1
+    assert spans['save_otq'].attributes['bytes'] > 0
+
+
+def test_run_error(session, monkeypatch, collector):
+    def failing_run(*args, **kwargs):
+        raise Exception('server error')
+
+    monkeypatch.setattr(otq, 'run', failing_run)
+    with pytest.raises(Exception, match='server error'):
+        otp.run(otp.Tick(A=1), concurrency=1)
+    spans = {s.name: s for s in collector.spans}
+    assert spans['otq.run'].error is not None
+    assert spans['otp.run'].error is not None
+    assert 'format_output' not in spans
+
+
+def test_run_async(session, stand_in_otq_run, collector):
+    asyncio.run(otp.run_async(otp.Ticks(A=[0, 1, 2]), concurrency=1))
+    spans = collector.spans
+    assert spans[0].name == 'otp.run_async'
+    # the context is copied to the thread executing the query
+    assert spans[1].name == 'otp.run'
+    assert spans[1].parent is spans[0]
+
+
+def test_open_telemetry(session, stand_in_otq_run):
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    hook = tracing.OpenTelemetryHook(provider.get_tracer('test'))
+    tracing.add_hook(hook)
+    try:
+        otp.run(otp.Ticks(A=[0, 1, 2]), concurrency=1)
+    finally:
+        tracing.remove_hook(hook)
+
+    otel_spans = {s.name: s for s in exporter.get_finished_spans()}
+    assert otel_spans['otq.run'].parent.span_id == otel_spans['otp.run'].context.span_id
+    assert otel_spans['otp.run'].attributes['onetick.rows'] == 3